@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Teste de carga da API REST
+Compara a vazão com requisições concorrentes entre a api_rest.py (Flask, servidor
+com uma thread por requisição), a api_async.py (aiohttp + pool aiosqlite) e a
+api_ultra_simple.py (http.server com pool de threads e keep-alive), todas sobre o
+mesmo banco sintético
+"""
+
+import asyncio
+import os
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.migrations import run_migrations
+
+CATALOG_SIZE = 20_000
+CONCURRENCY = [1, 10, 50, 200]
+REQUESTS_PER_LEVEL = 2_000
+HEADERS = {'X-API-Key': 'benchmark'}
+
+NOMES = ['Notebook', 'Mouse', 'Monitor', 'Cadeira', 'Teclado', 'Impressora', 'Switch', 'Projetor']
+MARCAS = ['Dell', 'Logitech', 'Samsung', 'HP', 'Lenovo', 'Epson', 'Corsair', 'FlexForm']
+CATEGORIAS = ['notebook', 'mouse', 'monitor', 'mobiliario', 'teclado', 'impressora', 'informatica']
+
+# Servidores iniciados em subprocessos apontando para o banco sintético
+# (RATE_LIMIT=0 desliga o rate limit: o teste mede as rotas, não o limite por IP)
+SERVERS = {
+    'flask (threads)': '''
+import sys
+sys.path.insert(0, 'server')
+import api_rest
+api_rest.DB_PATH = sys.argv[1]
+api_rest.app.run(host='127.0.0.1', port=int(sys.argv[2]), threaded=True)
+''',
+    'aiohttp (asyncio)': '''
+import sys
+sys.path.insert(0, 'server')
+import api_async
+from aiohttp import web
+web.run_app(api_async.create_app(sys.argv[1]), host='127.0.0.1', port=int(sys.argv[2]), print=None)
+''',
+    'http.server (pool)': '''
+import sys
+sys.path.insert(0, 'server')
+import api_ultra_simple
+api_ultra_simple.DB_PATH = sys.argv[1]
+api_ultra_simple.PORT = int(sys.argv[2])
+api_ultra_simple.run_server()
+'''
+}
+
+
+def create_synthetic_db(path, size):
+    """Cria banco com o schema atual e `size` itens"""
+    run_migrations(path)
+    rng = random.Random(42)
+    rows = []
+    for i in range(size):
+        categoria = rng.choice(CATEGORIAS)
+        nome = f"{rng.choice(NOMES)} {rng.choice(MARCAS)} {i}"
+        rows.append((
+            nome, f"{nome} do setor {rng.randint(1, 40)}", rng.randint(0, 50), 'ativo',
+            f"{categoria[:4].upper()}-{i + 1:03d}", categoria, rng.choice(MARCAS),
+            round(rng.uniform(10, 5000), 2)
+        ))
+
+    conn = sqlite3.connect(path)
+    conn.executemany('''
+        INSERT INTO itens (nome, descricao, quantidade, status, codigo, categoria, marca, preco_unitario)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+    return [row[4] for row in rows]
+
+
+def request_mix(codes, count):
+    """Mistura de leituras típica dos clientes da API"""
+    rng = random.Random(7)
+    paths = []
+    for _ in range(count):
+        choice = rng.random()
+        if choice < 0.4:
+            paths.append(f"/api/v1/items/{rng.choice(codes)}")
+        elif choice < 0.6:
+            paths.append(f"/api/v1/items?limit=50&category={rng.choice(CATEGORIAS)}")
+        elif choice < 0.8:
+            paths.append(f"/api/v1/items/search?q={rng.choice(MARCAS)}&limit=20")
+        elif choice < 0.9:
+            paths.append("/api/v1/reports/dashboard")
+        else:
+            paths.append("/api/v1/categories")
+    return paths
+
+
+async def wait_ready(base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError("Servidor encerrou durante a inicialização")
+            try:
+                async with session.get(f"{base_url}/api/v1/") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"Servidor não respondeu em {timeout}s")
+
+
+async def run_level(base_url, paths, concurrency):
+    """Dispara `paths` com no máximo `concurrency` requisições em andamento"""
+    latencies = []
+    failures = 0
+    queue = iter(paths)
+
+    async def worker(session):
+        nonlocal failures
+        for path in queue:
+            start = time.perf_counter()
+            try:
+                async with session.get(base_url + path, headers=HEADERS) as response:
+                    await response.read()
+                    if response.status != 200:
+                        failures += 1
+            except aiohttp.ClientError:
+                failures += 1
+            latencies.append(time.perf_counter() - start)
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50': latencies[len(latencies) // 2] * 1000,
+        'p95': latencies[int(len(latencies) * 0.95)] * 1000,
+        'failures': failures
+    }
+
+
+async def benchmark_server(name, bootstrap, db_path, port, paths):
+    process = subprocess.Popen(
+        [sys.executable, '-c', bootstrap, db_path, str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env={**os.environ, 'RATE_LIMIT': '0'},
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        await wait_ready(base_url, process)
+        # Aquecimento: caches de statements, totais e páginas do SQLite
+        await run_level(base_url, paths[:200], 10)
+
+        print(f"\n🖥️  {name}")
+        results = {}
+        for concurrency in CONCURRENCY:
+            result = results[concurrency] = await run_level(base_url, paths, concurrency)
+            print(f"   {concurrency:>4} concorrentes: {result['rps']:8.1f} req/s | "
+                  f"p50 {result['p50']:7.1f} ms | p95 {result['p95']:7.1f} ms | "
+                  f"falhas {result['failures']}")
+        return results
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+async def run_benchmark():
+    """Executa o teste de carga nos dois servidores"""
+    print("⏱️  TESTE DE CARGA DA API REST")
+    print("=" * 60)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, 'bench.db')
+        codes = create_synthetic_db(db_path, CATALOG_SIZE)
+        paths = request_mix(codes, REQUESTS_PER_LEVEL)
+        print(f"📦 {CATALOG_SIZE:,} itens | {REQUESTS_PER_LEVEL:,} requisições por nível")
+
+        results = {}
+        for offset, (name, bootstrap) in enumerate(SERVERS.items()):
+            results[name] = await benchmark_server(name, bootstrap, db_path, 5800 + offset, paths)
+
+        baseline_name, *candidates = SERVERS
+        baseline = results[baseline_name]
+        print(f"\n📊 Vazão relativa a {baseline_name}")
+        for name in candidates:
+            ratios = ' | '.join(
+                f"{concurrency}: {results[name][concurrency]['rps'] / baseline[concurrency]['rps']:.2f}x"
+                for concurrency in CONCURRENCY
+            )
+            print(f"   {name:20} {ratios}")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_benchmark())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Benchmark do cálculo de relevância da busca inteligente
+Compara o score por item (legado) com o score em lote sobre texto pré-normalizado;
+os scores devem ser idênticos (diferença máxima 0)
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.migrations import run_migrations
+from utils.search_index import run_backfill
+from utils.smart_search import SmartSearch
+
+SIZES = [10_000, 100_000]
+QUERIES = ["notebook dell", "mouse", "cadeira ergonomica", "NOTE-001", "samsung monitor"]
+PAGE_SIZE = 50
+BROAD_LIMIT = 5_000
+
+NOMES = ['Notebook', 'Mouse', 'Monitor', 'Cadeira', 'Teclado', 'Impressora', 'Switch', 'Projetor']
+MARCAS = ['Dell', 'Logitech', 'Samsung', 'HP', 'Lenovo', 'Epson', 'Corsair', 'FlexForm']
+CATEGORIAS = ['notebook', 'mouse', 'monitor', 'mobiliario', 'teclado', 'impressora', 'informatica']
+ADJETIVOS = ['Ergonômica', 'Gamer', 'Sem Fio', 'Full HD', 'Pro', 'Compacto', 'Básico', 'Premium']
+
+
+def create_synthetic_db(path, size):
+    """Cria banco sintético com `size` itens"""
+    rng = random.Random(42)
+    conn = sqlite3.connect(path)
+    conn.execute('''
+        CREATE TABLE itens (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            nome TEXT NOT NULL, descricao TEXT, quantidade INTEGER NOT NULL,
+            catalogo TEXT, status TEXT NOT NULL, foto_path TEXT, foto_id TEXT,
+            info_reparo TEXT,
+            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            codigo TEXT UNIQUE, codigo_barras TEXT UNIQUE, categoria TEXT,
+            localizacao TEXT, qr_code TEXT, marca TEXT, modelo TEXT, numero_serie TEXT
+        )
+    ''')
+
+    rows = []
+    for i in range(size):
+        nome = f"{rng.choice(NOMES)} {rng.choice(MARCAS)} {rng.choice(ADJETIVOS)}"
+        categoria = rng.choice(CATEGORIAS)
+        rows.append((
+            nome,
+            f"{nome} para uso no setor {rng.randint(1, 40)}, patrimônio {rng.randint(1000, 9999)}",
+            rng.randint(0, 50),
+            'ativo',
+            f"{categoria[:4].upper()}-{i + 1:03d}",
+            f"{rng.randint(10, 99)}{i:011d}",
+            categoria,
+            f"Sala {rng.randint(1, 300)}",
+            rng.choice(MARCAS),
+            f"M{rng.randint(100, 999)}",
+            f"SN{rng.randint(10 ** 8, 10 ** 9)}"
+        ))
+
+    conn.executemany('''
+        INSERT INTO itens (nome, descricao, quantidade, status, codigo, codigo_barras,
+                           categoria, localizacao, marca, modelo, numero_serie)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+
+
+def legacy_relevance_score(search, item, query):
+    """Cópia do cálculo anterior: normaliza e compara cada campo por linha"""
+    score = 0.0
+    normalized_query = search.normalize_text(query).lower()
+    query_terms = normalized_query.split()
+
+    field_weights = {
+        'codigo': 1.0,
+        'codigo_barras': 1.0,
+        'nome': 0.8,
+        'marca': 0.6,
+        'modelo': 0.6,
+        'categoria': 0.4,
+        'descricao': 0.3
+    }
+
+    for field, weight in field_weights.items():
+        field_value = str(item.get(field, ''))
+        normalized_field = search.normalize_text(field_value).lower()
+
+        if normalized_query in normalized_field:
+            score += weight * 1.0
+
+        for term in query_terms:
+            if term in normalized_field:
+                score += weight * 0.5
+
+        if normalized_field and normalized_query:
+            similarity = SequenceMatcher(None, normalized_query, normalized_field).ratio()
+            if similarity > 0.3:
+                score += weight * similarity * 0.3
+
+    return min(score, 1.0)
+
+
+def fetch_candidates(conn, limit):
+    """Carrega `limit` linhas como candidatos de pontuação"""
+    conn.row_factory = sqlite3.Row
+    cursor = conn.execute('''
+        SELECT id, nome, descricao, quantidade, status, categoria, localizacao,
+               codigo, codigo_barras, marca, modelo, numero_serie, data_cadastro
+        FROM itens ORDER BY RANDOM() LIMIT ?
+    ''', (limit,))
+    return [dict(row) for row in cursor.fetchall()]
+
+
+def benchmark_scoring(search, conn, candidates, query):
+    """Retorna (tempo legado, tempo em lote, diferença máxima de score)"""
+    start = time.perf_counter()
+    legacy_scores = [legacy_relevance_score(search, item, query) for item in candidates]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    normalized = search.search_index.get_normalized(conn, [item['id'] for item in candidates])
+    batch_scores = search._calculate_relevance_scores(
+        [normalized[item['id']] for item in candidates], query
+    )
+    batch_time = time.perf_counter() - start
+
+    max_diff = max(abs(a - b) for a, b in zip(legacy_scores, batch_scores))
+    return legacy_time, batch_time, max_diff
+
+
+def run_benchmark():
+    """Executa o benchmark para cada tamanho de catálogo"""
+    print("⏱️  BENCHMARK DO SCORE DE RELEVÂNCIA")
+    print("=" * 60)
+
+    for size in SIZES:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            db_path = os.path.join(tmp_dir, 'bench.db')
+            create_synthetic_db(db_path, size)
+
+            # Migrações só criam os índices; a carga inicial normaliza o catálogo (custo único)
+            start = time.perf_counter()
+            run_migrations(db_path, backfill=False)
+            migration_time = time.perf_counter() - start
+            start = time.perf_counter()
+            run_backfill(db_path)
+            index_time = time.perf_counter() - start
+
+            search = SmartSearch(db_path)
+            conn = sqlite3.connect(db_path)
+
+            print(f"\n📦 {size:,} itens (migrações: {migration_time:.2f}s, carga inicial: {index_time:.2f}s)")
+
+            for label, limit in (("página", PAGE_SIZE), ("amplo", BROAD_LIMIT)):
+                candidates = fetch_candidates(conn, limit)
+                total_legacy = total_batch = 0.0
+                max_diff = 0.0
+
+                for query in QUERIES:
+                    legacy_time, batch_time, diff = benchmark_scoring(search, conn, candidates, query)
+                    total_legacy += legacy_time
+                    total_batch += batch_time
+                    max_diff = max(max_diff, diff)
+
+                speedup = total_legacy / total_batch if total_batch else float('inf')
+                print(f"   {label:7} ({len(candidates):>5} linhas x {len(QUERIES)} buscas): "
+                      f"legado {total_legacy * 1000:8.1f} ms | lote {total_batch * 1000:8.1f} ms | "
+                      f"{speedup:5.1f}x | diferença máxima {max_diff:.2e}")
+
+            search.search_items(QUERIES[0], limit=PAGE_SIZE)
+            start = time.perf_counter()
+            for query in QUERIES:
+                search.search_items(query, limit=PAGE_SIZE)
+            print(f"   search_items completo: {(time.perf_counter() - start) * 1000 / len(QUERIES):.1f} ms/busca")
+
+            conn.close()
+
+
+if __name__ == "__main__":
+    run_benchmark()
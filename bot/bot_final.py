@@ -12,7 +12,6 @@ from datetime import datetime
 from dotenv import load_dotenv
 import json
 import asyncio
-import uuid
 import subprocess
 import time
 import sqlite3
@@ -134,6 +133,13 @@ except ImportError as e:
     print("📦 Execute: pip install aiosqlite pandas")
     sys.exit(1)
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.job_executor import get_job_executor, shutdown_job_executor
+from utils.migrations import run_migrations
+from utils.photo_store import store_photo
+from utils.search_index import sync_search_index
+from utils.stats_snapshot import SNAPSHOT_QUERY, ranked, rebuild_stats, stats_from_rows
+
 # Constantes
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 ADMINS_FILE = os.path.join(os.path.dirname(__file__), 'admins.txt')
@@ -252,18 +258,12 @@ async def init_database():
             await conn.close()
 
 async def salvar_foto(photo_file, item_nome):
-    """Salva a foto no diretório e retorna o caminho"""
+    """Salva a foto (nome pelo hash do conteúdo, com miniaturas) e retorna o nome"""
     try:
-        # Criar diretório de fotos se não existir (verificação extra)
-        os.makedirs(FOTOS_DIR, exist_ok=True)
-        
-        # Gerar nome único para a foto
-        filename = f"{uuid.uuid4().hex}_{item_nome.replace(' ', '_')[:30]}.jpg"
-        filepath = os.path.join(FOTOS_DIR, filename)
-        
-        # Baixar e salvar foto
-        await photo_file.download_to_drive(filepath)
-        print(f"📸 Foto salva: {filepath}")
+        # Foto em memória; gravação e miniaturas no pool de processos
+        foto = bytes(await photo_file.download_as_bytearray())
+        filename = await get_job_executor().run_cpu(store_photo, foto, FOTOS_DIR)
+        print(f"📸 Foto salva: {filename} ({item_nome})")
         return filename
     except Exception as e:
         logger.error(f"Erro ao salvar foto: {e}")
@@ -286,6 +286,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
             texto += '• /editaritem - ✏️ Editar item\n'
             texto += '• /deletaritem - 🗑️ Deletar item\n'
             texto += '• /backup - 💾 Backup do banco\n'
+            texto += '• /recalcular_stats - 🔄 Recalcular estatísticas\n'
             texto += '• /adminusers - 👥 Gerenciar admins\n\n'
         
         texto += '*Comandos Gerais:*\n'
@@ -349,6 +350,7 @@ async def ajuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
             texto += "• /editaritem - Editar item\n"
             texto += "• /deletaritem - Remover item\n"
             texto += "• /backup - Fazer backup\n"
+            texto += "• /recalcular_stats - Recalcular estatísticas\n"
             texto += "• /adminusers - Gerenciar admins\n"
         
         await update.message.reply_text(texto, parse_mode='Markdown')
@@ -462,29 +464,19 @@ async def relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE):
         async with aiosqlite.connect(DB_PATH) as db:
             db.row_factory = aiosqlite.Row
             
-            # Total de itens
-            cursor = await db.execute("SELECT COUNT(*) as total FROM itens")
-            resultado = await cursor.fetchone()
-            total_itens = resultado['total']
-            
-            # Contagem por status
-            cursor = await db.execute(
-                "SELECT status, COUNT(*) as contagem FROM itens GROUP BY status"
-            )
-            status = {row['status']: row['contagem'] for row in await cursor.fetchall()}
+            # Totais materializados em stats_snapshot (sem varrer itens)
+            cursor = await db.execute(SNAPSHOT_QUERY)
+            stats = stats_from_rows(await cursor.fetchall())
+            total_itens = stats['total']['itens']
+            status = {s: m['itens'] for s, m in ranked(stats['status'], include_empty=True)}
+            com_foto = stats['total']['com_foto']
             
-            # Top 5 itens com maior quantidade
+            # Top 5 itens com maior quantidade (índice em quantidade)
             cursor = await db.execute(
                 "SELECT nome, quantidade FROM itens ORDER BY quantidade DESC LIMIT 5"
             )
             maiores = await cursor.fetchall()
             
-            # Itens com foto vs sem foto
-            cursor = await db.execute(
-                "SELECT COUNT(*) as com_foto FROM itens WHERE foto_path IS NOT NULL"
-            )
-            com_foto = (await cursor.fetchone())['com_foto']
-            
         # Montar relatório
         data_atual = datetime.now().strftime("%d/%m/%Y %H:%M")
         relatorio = f"*📊 RELATÓRIO DE ESTOQUE - {data_atual}*\n\n"
@@ -510,6 +502,23 @@ async def relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Erro ao gerar relatório: {e}")
         await update.message.reply_text("❌ Ocorreu um erro ao gerar relatório. Por favor, tente novamente.")
 
+async def recalcular_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Recalcula os agregados do relatório a partir da tabela de itens (admin)"""
+    try:
+        user_id = update.effective_user.id
+        if not is_admin(user_id):
+            await update.message.reply_text("❌ Acesso negado. Você não é administrador.")
+            return
+        
+        await update.message.reply_text("🔄 Recalculando estatísticas...")
+        total = (await asyncio.to_thread(rebuild_stats, DB_PATH))['total']
+        await update.message.reply_text(
+            f"✅ Estatísticas recalculadas: {total['itens']} itens, {total['quantidade']} unidades."
+        )
+    except Exception as e:
+        logger.error(f"Erro ao recalcular estatísticas: {e}")
+        await update.message.reply_text("❌ Ocorreu um erro ao recalcular as estatísticas.")
+
 async def backup(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Faz backup do banco em Excel"""
     try:
@@ -826,6 +835,7 @@ async def finalizar_cadastro(update: Update, context: ContextTypes.DEFAULT_TYPE)
             )
             
             await db.commit()
+        await get_job_executor().run_io(sync_search_index, DB_PATH)
         
         # Responder usuário
         await update.message.reply_text(
@@ -902,6 +912,9 @@ def main():
         if not lock_fd:
             print("❌ Outra instância do bot já está em execução. Saindo.")
             sys.exit(1)
+        
+        # Schema e índices atualizados antes de aceitar mensagens
+        run_migrations(DB_PATH)
             
         # Registrar handlers de sinais
         signal.signal(signal.SIGINT, signal_handler)
@@ -923,6 +936,8 @@ def main():
         app_builder.read_timeout(30.0)
         app_builder.write_timeout(30.0)
         
+        app_builder.post_shutdown(shutdown_job_executor)
+        
         app = app_builder.build()
         
         # Adicionar handler de erro global
@@ -954,6 +969,7 @@ def main():
         app.add_handler(CommandHandler('webapp', webapp_command))
         app.add_handler(CommandHandler('adminusers', adminusers))
         app.add_handler(CommandHandler('backup', backup))
+        app.add_handler(CommandHandler('recalcular_stats', recalcular_stats))
         app.add_handler(conv_handler)
         app.add_handler(CallbackQueryHandler(handle_callback))
         
@@ -962,7 +978,7 @@ def main():
         print("   • /start, /menu, /ajuda")
         print("   • /buscar, /listar, /relatorio") 
         print("   • /novoitem (COM FOTOS), /webapp")
-        print("   • /adminusers, /backup")
+        print("   • /adminusers, /backup, /recalcular_stats")
         print("   • Callbacks interativos")
         
         # Sinalizar que estamos prontos para o sistema
@@ -1,4 +1,6 @@
 import os
+import sys
+import html
 import logging
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -8,17 +10,26 @@ load_dotenv()
 
 from telegram import Update, ReplyKeyboardRemove, InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
 from telegram.ext import (ApplicationBuilder, CommandHandler, MessageHandler, filters, ContextTypes, ConversationHandler, CallbackQueryHandler)
-import aiosqlite
-import pandas as pd
-from pyzbar.pyzbar import decode
-from PIL import Image
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.bot_jobs import INVENTORY_REPORT_EXTENSIONS, decode_qr_bytes, render_inventory_report, render_qr_png
+from utils.database import connect, connect_async, close_async_pools
+from utils.inventory_reconciler import InventoryReconciler
+from utils.inventory_sessions import find_session_by_key, save_session
+from utils.item_lookup import lookup_items_async, scanned_refs, tally_scanned_items
+from utils.job_executor import JobTimeout, get_job_executor, shutdown_job_executor
+from utils.migrations import run_migrations
+from utils.photo_store import photo_file_path, store_photo
+from utils.report_engine import REPORT_FORMATS, REPORT_TYPES, generate_report
+from utils.search_index import sync_search_index
+from utils.suggestion_index import get_suggestion_index
+
 # Constantes
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 FOTOS_DIR = os.path.join(os.path.dirname(__file__), '../fotos')
+# Tamanho máximo do relatório de inventário enviado no chat (limite do Telegram: 4096)
+LIMITE_TEXTO_RELATORIO = 3500
 
 # URL do WebApp (configurar com sua URL pública)
 WEBAPP_URL = os.getenv('WEBAPP_URL', 'http://localhost:8080')
@@ -31,7 +42,7 @@ REPARO_FORNECEDOR, REPARO_DATA = range(300, 302)
 RETORNO_CONFIRMA = 400
 EXCLUIR_CONFIRMA = 500
 # Estados para Inventário
-INVENTARIO_QR, INVENTARIO_QTD, INVENTARIO_CONFIRMA = range(600, 603)
+INVENTARIO_QR, INVENTARIO_QTD, INVENTARIO_CONFIRMA, INVENTARIO_LOTE = range(600, 604)
 
 def is_admin(user_id):
     try:
@@ -57,7 +68,7 @@ async def ajuda(update: Update, context: ContextTypes.DEFAULT_TYPE):
         '/enviar_reparo <ID> - Enviar item para reparo (admin)\n'
         '/retornar_reparo <ID> - Retornar item de reparo (admin)\n'
         '/excluir <ID> - Excluir item (admin)\n'
-        '/relatorio <estoque|reparo|baixados> [csv|pdf] - Gerar relatório\n'
+        '/relatorio <estoque|reparo|baixados> [csv|xlsx|pdf] - Gerar relatório\n'
         '/historico <ID> - Ver histórico do item\n'
         '/verificar_alertas - Itens com estoque baixo/reparo longo\n'
         '/gerar_qr <ID> - Gerar QR Code do item\n'
@@ -179,6 +190,25 @@ async def webapp_message_handler(update: Update, context: ContextTypes.DEFAULT_T
             logging.error(f'Erro no WebApp handler: {str(e)}')
             await update.message.reply_text('Erro interno ao processar dados.')
 
+def registrar_inventario_webapp(data, chave):
+    """
+    Aplica as contagens e grava a sessão na mesma transação (mesmo caminho do
+    /api/inventory/finish); retorna (id da sessão, resultado, já registrado)
+    """
+    with connect(DB_PATH) as conn:
+        # Trava de escrita antes de consultar a chave: reenvios não aplicam duas vezes
+        if not conn.in_transaction:
+            conn.execute('BEGIN IMMEDIATE')
+        existing = find_session_by_key(conn, chave)
+        if existing:
+            return existing, None, True
+        
+        resultado = InventoryReconciler(DB_PATH).apply_counts(
+            data['items'], data['user_name'], 'Inventário WebApp', data['timestamp']
+        )
+        session_id = save_session(conn, data, resultado, chave=chave)
+    return session_id, resultado, False
+
 async def processar_inventario_webapp(update: Update, context: ContextTypes.DEFAULT_TYPE, data):
     """Processar inventário finalizado no WebApp"""
     try:
@@ -201,48 +231,45 @@ async def processar_inventario_webapp(update: Update, context: ContextTypes.DEFA
         texto_relatorio += f'📅 Data: {datetime.now().strftime("%d/%m/%Y %H:%M")}\n'
         texto_relatorio += f'📦 Total de itens: {len(items)}\n\n'
         
-        # Processar cada item
-        for item in items:
-            item_id = item.get('id')
-            quantidade_inventario = item.get('quantity', 0)
+        # Contagens e sessão em uma única transação (fora do event loop); a
+        # mensagem identifica o envio caso o update seja reprocessado
+        chave = f'telegram:{update.effective_chat.id}:{update.message.message_id}'
+        session_id, resultado, duplicado = await get_job_executor().run_io(
+            registrar_inventario_webapp, {
+                'timestamp': timestamp,
+                'user_id': user_id,
+                'user_name': user_name,
+                'total_items': len(items),
+                'items': items,
+                'summary': summary
+            }, chave
+        )
+        if duplicado:
+            await update.message.reply_text(f'Inventário já registrado (sessão #{session_id}).')
+            return
+        
+        itens_omitidos = 0
+        for item_atual in resultado['items']:
+            # Mensagens do Telegram têm limite de 4096 caracteres
+            if len(texto_relatorio) > LIMITE_TEXTO_RELATORIO:
+                itens_omitidos += 1
+                continue
             
-            # Buscar dados atuais do item
-            async with aiosqlite.connect(DB_PATH) as db:
-                cursor = await db.execute(
-                    "SELECT nome, quantidade FROM itens WHERE id = ?", 
-                    (item_id,)
-                )
-                item_atual = await cursor.fetchone()
+            diferenca = item_atual['diferenca']
+            texto_relatorio += f'• <b>{item_atual["nome"]}</b> (ID: {item_atual["id"]})\n'
+            texto_relatorio += f'  Estoque atual: {item_atual["quantidade_anterior"]}\n'
+            texto_relatorio += f'  Inventariado: {item_atual["quantidade_inventariada"]}\n'
             
-            if item_atual:
-                nome_item, quantidade_atual = item_atual
-                diferenca = quantidade_inventario - quantidade_atual
-                
-                texto_relatorio += f'• <b>{nome_item}</b> (ID: {item_id})\n'
-                texto_relatorio += f'  Estoque atual: {quantidade_atual}\n'
-                texto_relatorio += f'  Inventariado: {quantidade_inventario}\n'
-                
-                if diferenca > 0:
-                    texto_relatorio += f'  📈 Diferença: +{diferenca}\n'
-                elif diferenca < 0:
-                    texto_relatorio += f'  📉 Diferença: {diferenca}\n'
-                else:
-                    texto_relatorio += f'  ✅ Sem diferença\n'
-                texto_relatorio += '\n'
-                
-                # Atualizar quantidade no banco
-                await db.execute(
-                    "UPDATE itens SET quantidade = ? WHERE id = ?",
-                    (quantidade_inventario, item_id)
-                )
-                
-                # Registrar movimentação
-                await db.execute(
-                    "INSERT INTO movimentacoes (item_id, acao, detalhes, usuario, data_hora) VALUES (?, ?, ?, ?, ?)",
-                    (item_id, 'Inventário WebApp', f'Ajuste: {quantidade_atual} → {quantidade_inventario}', user_name, timestamp)
-                )
-                
-                await db.commit()
+            if diferenca > 0:
+                texto_relatorio += f'  📈 Diferença: +{diferenca}\n'
+            elif diferenca < 0:
+                texto_relatorio += f'  📉 Diferença: {diferenca}\n'
+            else:
+                texto_relatorio += f'  ✅ Sem diferença\n'
+            texto_relatorio += '\n'
+        
+        if itens_omitidos:
+            texto_relatorio += f'… e mais {itens_omitidos} itens (detalhes na sessão #{session_id})\n\n'
         
         # Resumo
         if summary:
@@ -252,25 +279,8 @@ async def processar_inventario_webapp(update: Update, context: ContextTypes.DEFA
         
         await update.message.reply_text(texto_relatorio, parse_mode='HTML')
         
-        # Salvar relatório em arquivo
-        relatorio_path = os.path.join(os.path.dirname(__file__), '../inventarios')
-        os.makedirs(relatorio_path, exist_ok=True)
-        
-        filename = f'inventario_webapp_{timestamp.replace(":", "-").replace(".", "-")}.json'
-        filepath = os.path.join(relatorio_path, filename)
-        
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump({
-                'timestamp': timestamp,
-                'user_id': user_id,
-                'user_name': user_name,
-                'items': items,
-                'summary': summary,
-                'total_items': len(items)
-            }, f, ensure_ascii=False, indent=2)
-        
         await update.message.reply_text(
-            f'✅ Inventário salvo com sucesso!\nArquivo: {filename}'
+            f'✅ Inventário salvo com sucesso!\nSessão: #{session_id}'
         )
         
     except Exception as e:
@@ -286,7 +296,7 @@ async def responder_item_lookup(update: Update, context: ContextTypes.DEFAULT_TY
             await update.message.reply_text('ID do item não fornecido.')
             return
         
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect_async(DB_PATH) as db:
             cursor = await db.execute(
                 "SELECT id, nome, descricao, quantidade, categoria, status FROM itens WHERE id = ?",
                 (item_id,)
@@ -326,10 +336,17 @@ async def novoitem(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def receber_foto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     photo = update.message.photo[-1]
     file = await photo.get_file()
-    foto_id = f"{update.message.from_user.id}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
-    foto_path = os.path.join(FOTOS_DIR, foto_id)
-    await file.download_to_drive(foto_path)
-    context.user_data['foto_path'] = foto_path
+    foto = bytes(await file.download_as_bytearray())
+    # Arquivo pelo hash do conteúdo e miniaturas, no pool de processos
+    try:
+        context.user_data['foto_path'] = await get_job_executor().run_cpu(store_photo, foto, FOTOS_DIR)
+    except JobTimeout:
+        await update.message.reply_text('O processamento da foto demorou demais. Envie a foto novamente.')
+        return FOTO
+    except OSError:
+        # Inclui UnidentifiedImageError (arquivo que não é imagem ou truncado)
+        await update.message.reply_text('Não foi possível ler a imagem. Envie outra foto.')
+        return FOTO
     await update.message.reply_text('Agora, informe o nome do item.')
     return NOME
 
@@ -362,7 +379,7 @@ async def confirmar_cadastro(update: Update, context: ContextTypes.DEFAULT_TYPE)
     if update.message.text.lower() != 'sim':
         await update.message.reply_text('Cadastro cancelado.', reply_markup=ReplyKeyboardRemove())
         return ConversationHandler.END
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         cursor = await db.execute(
             'INSERT INTO itens (nome, descricao, quantidade, status, foto_path) VALUES (?, ?, ?, ?, ?)',
             (context.user_data['nome'], context.user_data['descricao'], context.user_data['quantidade'], 'Em Estoque', context.user_data['foto_path'])
@@ -374,6 +391,9 @@ async def confirmar_cadastro(update: Update, context: ContextTypes.DEFAULT_TYPE)
             (item_id, str(update.effective_user.id), 'Cadastro', f"Nome: {context.user_data['nome']}")
         )
         await db.commit()
+    # Texto de busca normalizado na escrita, fora do loop do bot
+    await get_job_executor().run_io(sync_search_index, DB_PATH)
+    get_suggestion_index(DB_PATH).invalidate()
     await update.message.reply_text('Item cadastrado com sucesso!', reply_markup=ReplyKeyboardRemove())
     return ConversationHandler.END
 
@@ -383,11 +403,20 @@ async def buscar(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('Use: /buscar <palavra-chave>')
         return
     termo = ' '.join(context.args)
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         cursor = await db.execute("SELECT id, nome FROM itens WHERE nome LIKE ? OR descricao LIKE ?", (f"%{termo}%", f"%{termo}%"))
         resultados = await cursor.fetchall()
     if not resultados:
-        await update.message.reply_text('Nenhum item encontrado.')
+        try:
+            sugestoes = await get_job_executor().run_io(get_suggestion_index(DB_PATH).suggest, termo)
+        except Exception as e:
+            logging.error(f'Erro ao obter sugestões: {e}')
+            sugestoes = []
+        if sugestoes:
+            lista = '\n'.join(f"• {s['text']}" for s in sugestoes[:5])
+            await update.message.reply_text(f'Nenhum item encontrado. Você quis dizer:\n{lista}')
+        else:
+            await update.message.reply_text('Nenhum item encontrado.')
         return
     botoes = [
         [InlineKeyboardButton(f"{row[1]} (ID: {row[0]})", callback_data=f"detalhe_{row[0]}")]
@@ -402,15 +431,16 @@ async def mostrar_detalhe_item(update: Update, context: ContextTypes.DEFAULT_TYP
     if not query.data.startswith('detalhe_'):
         return
     item_id = int(query.data.split('_')[1])
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         cursor = await db.execute("SELECT id, nome, descricao, quantidade, status, foto_path FROM itens WHERE id = ?", (item_id,))
         item = await cursor.fetchone()
     if not item:
         await query.edit_message_text('Item não encontrado.')
         return
     texto = (f"ID: {item[0]}\nNome: {item[1]}\nDescrição: {item[2]}\nQuantidade: {item[3]}\nStatus: {item[4]}")
-    if item[5] and os.path.exists(item[5]):
-        with open(item[5], 'rb') as f:
+    foto = photo_file_path(item[5], FOTOS_DIR) if item[5] else None
+    if foto and os.path.exists(foto):
+        with open(foto, 'rb') as f:
             await query.message.reply_photo(f, caption=texto)
         await query.edit_message_text('')
     else:
@@ -426,7 +456,7 @@ async def atualizar(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     item_id = int(context.args[0])
     context.user_data['atualizar_id'] = item_id
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         cursor = await db.execute("SELECT nome, descricao, quantidade FROM itens WHERE id = ?", (item_id,))
         item = await cursor.fetchone()
     if not item:
@@ -464,22 +494,26 @@ async def atualizar_callback(update: Update, context: ContextTypes.DEFAULT_TYPE)
 async def atualizar_nome(update: Update, context: ContextTypes.DEFAULT_TYPE):
     novo_nome = update.message.text
     item_id = context.user_data['atualizar_id']
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         await db.execute("UPDATE itens SET nome = ? WHERE id = ?", (novo_nome, item_id))
         await db.execute("INSERT INTO movimentacoes (item_id, usuario, acao, detalhes) VALUES (?, ?, ?, ?)",
             (item_id, str(update.effective_user.id), 'Atualização', f'Alterou nome para: {novo_nome}'))
         await db.commit()
+    await get_job_executor().run_io(sync_search_index, DB_PATH)
+    get_suggestion_index(DB_PATH).invalidate()
     await update.message.reply_text('Nome atualizado com sucesso!')
     return ConversationHandler.END
 
 async def atualizar_desc(update: Update, context: ContextTypes.DEFAULT_TYPE):
     nova_desc = update.message.text
     item_id = context.user_data['atualizar_id']
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         await db.execute("UPDATE itens SET descricao = ? WHERE id = ?", (nova_desc, item_id))
         await db.execute("INSERT INTO movimentacoes (item_id, usuario, acao, detalhes) VALUES (?, ?, ?, ?)",
             (item_id, str(update.effective_user.id), 'Atualização', f'Alterou descrição para: {nova_desc}'))
         await db.commit()
+    await get_job_executor().run_io(sync_search_index, DB_PATH)
+    get_suggestion_index(DB_PATH).invalidate()
     await update.message.reply_text('Descrição atualizada com sucesso!')
     return ConversationHandler.END
 
@@ -490,7 +524,7 @@ async def atualizar_qtd(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('Por favor, envie um número inteiro.')
         return ATUAL_QTD
     item_id = context.user_data['atualizar_id']
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         await db.execute("UPDATE itens SET quantidade = ? WHERE id = ?", (nova_qtd, item_id))
         await db.execute("INSERT INTO movimentacoes (item_id, usuario, acao, detalhes) VALUES (?, ?, ?, ?)",
             (item_id, str(update.effective_user.id), 'Atualização', f'Ajustou quantidade para: {nova_qtd}'))
@@ -501,11 +535,19 @@ async def atualizar_qtd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def atualizar_foto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     photo = update.message.photo[-1]
     file = await photo.get_file()
-    foto_id = f"atual_{context.user_data['atualizar_id']}_{datetime.now().strftime('%Y%m%d%H%M%S')}.jpg"
-    foto_path = os.path.join(FOTOS_DIR, foto_id)
-    await file.download_to_drive(foto_path)
+    foto = bytes(await file.download_as_bytearray())
+    # A foto anterior, sem referência, sai na coleta de órfãs (utils/photo_store.py)
+    try:
+        foto_path = await get_job_executor().run_cpu(store_photo, foto, FOTOS_DIR)
+    except JobTimeout:
+        await update.message.reply_text('O processamento da foto demorou demais. Envie a foto novamente.')
+        return ATUAL_FOTO
+    except OSError:
+        # Inclui UnidentifiedImageError (arquivo que não é imagem ou truncado)
+        await update.message.reply_text('Não foi possível ler a imagem. Envie outra foto.')
+        return ATUAL_FOTO
     item_id = context.user_data['atualizar_id']
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         await db.execute("UPDATE itens SET foto_path = ? WHERE id = ?", (foto_path, item_id))
         await db.execute("INSERT INTO movimentacoes (item_id, usuario, acao, detalhes) VALUES (?, ?, ?, ?)",
             (item_id, str(update.effective_user.id), 'Atualização', 'Atualizou foto'))
@@ -523,7 +565,7 @@ async def enviar_reparo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     item_id = int(context.args[0])
     context.user_data['reparo_id'] = item_id
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         cursor = await db.execute("SELECT nome, quantidade, status FROM itens WHERE id = ?", (item_id,))
         item = await cursor.fetchone()
     if not item:
@@ -548,7 +590,7 @@ async def receber_data_envio(update: Update, context: ContextTypes.DEFAULT_TYPE)
     item_id = context.user_data['reparo_id']
     fornecedor = context.user_data['reparo_fornecedor']
     info_reparo = f"Fornecedor/Local: {fornecedor} | Data de envio: {data_envio}"
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         await db.execute("UPDATE itens SET status = 'Em Reparo Externo', info_reparo = ?, quantidade = quantidade - 1 WHERE id = ?", (info_reparo, item_id))
         await db.execute("INSERT INTO movimentacoes (item_id, usuario, acao, detalhes) VALUES (?, ?, ?, ?)",
             (item_id, str(update.effective_user.id), 'Envio para Reparo', info_reparo))
@@ -566,7 +608,7 @@ async def retornar_reparo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     item_id = int(context.args[0])
     context.user_data['retorno_id'] = item_id
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         cursor = await db.execute("SELECT nome, status FROM itens WHERE id = ?", (item_id,))
         item = await cursor.fetchone()
     if not item:
@@ -583,7 +625,7 @@ async def confirmar_retorno(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('Operação cancelada.')
         return ConversationHandler.END
     item_id = context.user_data['retorno_id']
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         await db.execute("UPDATE itens SET status = 'Em Estoque', info_reparo = NULL, quantidade = quantidade + 1 WHERE id = ?", (item_id,))
         await db.execute("INSERT INTO movimentacoes (item_id, usuario, acao, detalhes) VALUES (?, ?, ?, ?)",
             (item_id, str(update.effective_user.id), 'Retorno de Reparo', 'Item retornou ao estoque'))
@@ -601,7 +643,7 @@ async def excluir(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return ConversationHandler.END
     item_id = int(context.args[0])
     context.user_data['excluir_id'] = item_id
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         cursor = await db.execute("SELECT nome FROM itens WHERE id = ?", (item_id,))
         item = await cursor.fetchone()
     if not item:
@@ -615,7 +657,7 @@ async def confirmar_exclusao(update: Update, context: ContextTypes.DEFAULT_TYPE)
         await update.message.reply_text('Operação cancelada.')
         return ConversationHandler.END
     item_id = context.user_data['excluir_id']
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         await db.execute("INSERT INTO movimentacoes (item_id, usuario, acao, detalhes) VALUES (?, ?, ?, ?)",
             (item_id, str(update.effective_user.id), 'Exclusão', 'Item excluído'))
         await db.execute("DELETE FROM itens WHERE id = ?", (item_id,))
@@ -625,51 +667,21 @@ async def confirmar_exclusao(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
 # Relatórios
 async def relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    if not context.args or context.args[0] not in ['estoque', 'reparo', 'baixados']:
-        await update.message.reply_text('Use: /relatorio <estoque|reparo|baixados> [csv|pdf]')
+    if not context.args or context.args[0] not in REPORT_TYPES:
+        await update.message.reply_text('Use: /relatorio <estoque|reparo|baixados> [csv|xlsx|pdf]')
         return
     tipo = context.args[0]
     formato = context.args[1] if len(context.args) > 1 else 'csv'
-    status_map = {
-        'estoque': 'Em Estoque',
-        'reparo': 'Em Reparo Externo',
-        'baixados': 'Baixado'
-    }
-    status = status_map[tipo]
-    async with aiosqlite.connect(DB_PATH) as db:
-        cursor = await db.execute("SELECT id, nome, descricao, quantidade, status, data_cadastro FROM itens WHERE status = ?", (status,))
-        rows = await cursor.fetchall()
-    if not rows:
-        await update.message.reply_text('Nenhum item encontrado para esse relatório.')
+    if formato not in REPORT_FORMATS:
+        await update.message.reply_text('Formato não suportado. Use csv, xlsx ou pdf.')
         return
-    df = pd.DataFrame(rows, columns=['ID', 'Nome', 'Descrição', 'Quantidade', 'Status', 'Data Cadastro'])
-    file_path = f"relatorio_{tipo}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{formato}"
-    if formato == 'csv':
-        df.to_csv(file_path, index=False)
-        with open(file_path, 'rb') as f:
-            await update.message.reply_document(f, filename=file_path)
-    elif formato == 'pdf':
-        c = canvas.Canvas(file_path, pagesize=letter)
-        width, height = letter
-        c.setFont('Helvetica', 10)
-        y = height - 40
-        for col in df.columns:
-            c.drawString(40 + 100 * list(df.columns).index(col), y, str(col))
-        y -= 20
-        for _, row in df.iterrows():
-            for i, val in enumerate(row):
-                c.drawString(40 + 100 * i, y, str(val))
-            y -= 20
-            if y < 40:
-                c.showPage()
-                y = height - 40
-        c.save()
-        with open(file_path, 'rb') as f:
-            await update.message.reply_document(f, filename=file_path)
-    else:
-        await update.message.reply_text('Formato não suportado. Use csv ou pdf.')
+    # Gerado fora do event loop: outros chats continuam sendo atendidos
+    arquivo, filename = await get_job_executor().run_io(generate_report, DB_PATH, tipo, formato)
+    if arquivo is None:
+        await update.message.reply_text('Nenhum item encontrado para esse relatório.')
         return
-    os.remove(file_path)
+    with arquivo:
+        await update.message.reply_document(arquivo, filename=filename)
 
 # Histórico de movimentações
 async def historico(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -677,7 +689,7 @@ async def historico(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text('Use: /historico <ID>')
         return
     item_id = int(context.args[0])
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         cursor = await db.execute("SELECT acao, detalhes, usuario, data_hora FROM movimentacoes WHERE item_id = ? ORDER BY data_hora DESC", (item_id,))
         rows = await cursor.fetchall()
     if not rows:
@@ -693,7 +705,7 @@ async def verificar_alertas(update: Update, context: ContextTypes.DEFAULT_TYPE):
     LIMITE_ESTOQUE_BAIXO = 2
     dias_reparo = 7
     hoje = datetime.now()
-    async with aiosqlite.connect(DB_PATH) as db:
+    async with connect_async(DB_PATH) as db:
         cursor = await db.execute("SELECT id, nome, quantidade FROM itens WHERE quantidade <= ? AND status = 'Em Estoque'", (LIMITE_ESTOQUE_BAIXO,))
         baixos = await cursor.fetchall()
         cursor = await db.execute("SELECT id, nome, info_reparo, data_cadastro FROM itens WHERE status = 'Em Reparo Externo'")
@@ -724,18 +736,17 @@ async def buscar_qr(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
     photo = update.message.photo[-1]
     file = await photo.get_file()
-    qr_path = 'temp_qr.jpg'
-    await file.download_to_drive(qr_path)
+    # Foto em memória: sem arquivo temporário por leitura
+    foto = bytes(await file.download_as_bytearray())
     try:
-        img = Image.open(qr_path)
-        decoded = decode(img)
+        decoded = await get_job_executor().run_cpu(decode_qr_bytes, foto)
         if not decoded:
             await update.message.reply_text('QR Code não reconhecido.')
             return
-        conteudo = decoded[0].data.decode('utf-8')
+        conteudo = decoded[0]
         if conteudo.isdigit():
             item_id = int(conteudo)
-            async with aiosqlite.connect(DB_PATH) as db:
+            async with connect_async(DB_PATH) as db:
                 cursor = await db.execute("SELECT id, nome, descricao, quantidade, status FROM itens WHERE id = ?", (item_id,))
                 item = await cursor.fetchone()
             if not item:
@@ -745,22 +756,16 @@ async def buscar_qr(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(texto)
         else:
             await update.message.reply_text(f'Conteúdo do QR: {conteudo}')
-    finally:
-        if os.path.exists(qr_path):
-            os.remove(qr_path)
+    except JobTimeout:
+        await update.message.reply_text('A leitura do QR Code demorou demais. Tente novamente.')
 
 async def gerar_qr(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    import qrcode
     if not context.args or not context.args[0].isdigit():
         await update.message.reply_text('Use: /gerar_qr <ID>')
         return
     item_id = int(context.args[0])
-    qr_img = qrcode.make(str(item_id))
-    qr_path = f'qr_{item_id}.png'
-    qr_img.save(qr_path)
-    with open(qr_path, 'rb') as f:
-        await update.message.reply_photo(f, caption=f'QR Code para o item {item_id}')
-    os.remove(qr_path)
+    png = await get_job_executor().run_cpu(render_qr_png, str(item_id))
+    await update.message.reply_photo(png, caption=f'QR Code para o item {item_id}')
 
 # Módulo de Inventário
 async def inventario(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -770,6 +775,7 @@ async def inventario(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text(
         '📋 <b>Inventário Iniciado!</b>\n\n'
         'Envie a foto do QR Code do item que deseja inventariar.\n'
+        'Uma foto com vários códigos (caixa ou prateleira) é contada em lote.\n'
         'Para finalizar o inventário, digite /finalizar_inventario',
         parse_mode='HTML'
     )
@@ -779,58 +785,50 @@ async def inventario_receber_qr(update: Update, context: ContextTypes.DEFAULT_TY
     if update.message.photo:
         # Processar QR Code da foto
         file = await update.message.photo[-1].get_file()
-        qr_path = f'temp_qr_{update.effective_user.id}.jpg'
-        await file.download_to_drive(qr_path)
+        foto = bytes(await file.download_as_bytearray())
         
         try:
-            # Ler QR Code
-            img = Image.open(qr_path)
-            decoded_objects = decode(img)
+            # Ler QR Code em memória (pool de processos)
+            decoded_objects = await get_job_executor().run_cpu(decode_qr_bytes, foto)
+            
+            if len(decoded_objects) > 1:
+                return await inventario_lote(update, context, decoded_objects)
             
             if decoded_objects:
-                qr_content = decoded_objects[0].data.decode('utf-8')
+                # Mesma resolução do lote: id, etiqueta ITEM:<id>|... ou código
+                async with connect_async(DB_PATH) as db:
+                    ids, codes = scanned_refs(decoded_objects)
+                    resultado = await lookup_items_async(db, ids, codes)
+                contagem, _ = tally_scanned_items(decoded_objects, resultado)
                 
-                # Verificar se é um ID válido
-                if qr_content.isdigit():
-                    item_id = int(qr_content)
+                if contagem:
+                    item = contagem[0][0]
                     
-                    # Buscar item no banco
-                    async with aiosqlite.connect(DB_PATH) as db:
-                        cursor = await db.execute('SELECT * FROM itens WHERE id = ?', (item_id,))
-                        item = await cursor.fetchone()
+                    # Armazenar item atual no contexto
+                    context.user_data['item_atual'] = {
+                        'id': item['id'],
+                        'nome': item['nome'],
+                        'codigo': item.get('codigo'),
+                        'categoria': item.get('categoria'),
+                        'localizacao': item.get('localizacao'),
+                        'quantidade_sistema': item['quantidade']
+                    }
                     
-                    if item:
-                        # Armazenar item atual no contexto
-                        context.user_data['item_atual'] = {
-                            'id': item[0],
-                            'nome': item[1],
-                            'codigo': item[2],
-                            'categoria': item[3],
-                            'localizacao': item[4],
-                            'quantidade_sistema': item[5]
-                        }
-                        
-                        await update.message.reply_text(
-                            f'📦 <b>Item Encontrado:</b>\n'
-                            f'ID: {item[0]}\n'
-                            f'Nome: {item[1]}\n'
-                            f'Código: {item[2] or "N/A"}\n'
-                            f'Categoria: {item[3] or "N/A"}\n'
-                            f'Localização: {item[4] or "N/A"}\n'
-                            f'Quantidade no Sistema: {item[5]}\n\n'
-                            f'Digite a quantidade encontrada no inventário:',
-                            parse_mode='HTML'
-                        )
-                        return INVENTARIO_QTD
-                    else:
-                        await update.message.reply_text(
-                            'Item não encontrado no banco de dados.\n'
-                            'Envie outro QR Code ou digite /finalizar_inventario'
-                        )
-                        return INVENTARIO_QR
+                    await update.message.reply_text(
+                        f'📦 <b>Item Encontrado:</b>\n'
+                        f'ID: {item["id"]}\n'
+                        f'Nome: {html.escape(item["nome"] or "")}\n'
+                        f'Código: {html.escape(item.get("codigo") or "N/A")}\n'
+                        f'Categoria: {html.escape(item.get("categoria") or "N/A")}\n'
+                        f'Localização: {html.escape(item.get("localizacao") or "N/A")}\n'
+                        f'Quantidade no Sistema: {item["quantidade"]}\n\n'
+                        f'Digite a quantidade encontrada no inventário:',
+                        parse_mode='HTML'
+                    )
+                    return INVENTARIO_QTD
                 else:
                     await update.message.reply_text(
-                        'QR Code não contém um ID válido.\n'
+                        'Item não encontrado no banco de dados.\n'
                         'Envie outro QR Code ou digite /finalizar_inventario'
                     )
                     return INVENTARIO_QR
@@ -841,21 +839,104 @@ async def inventario_receber_qr(update: Update, context: ContextTypes.DEFAULT_TY
                 )
                 return INVENTARIO_QR
                 
+        except JobTimeout:
+            await update.message.reply_text(
+                'A leitura do QR Code demorou demais. Tente novamente.\n'
+                'Envie outro QR Code ou digite /finalizar_inventario'
+            )
+            return INVENTARIO_QR
         except Exception as e:
             await update.message.reply_text(
                 f'Erro ao processar QR Code: {str(e)}\n'
                 'Envie outro QR Code ou digite /finalizar_inventario'
             )
             return INVENTARIO_QR
-        finally:
-            if os.path.exists(qr_path):
-                os.remove(qr_path)
     else:
         await update.message.reply_text(
             'Por favor, envie uma foto do QR Code ou digite /finalizar_inventario'
         )
         return INVENTARIO_QR
 
+async def inventario_lote(update: Update, context: ContextTypes.DEFAULT_TYPE, codigos):
+    """Foto com vários códigos: um lookup para todos, contagem por item e confirmação do lote"""
+    async with connect_async(DB_PATH) as db:
+        ids, codes = scanned_refs(codigos)
+        resultado = await lookup_items_async(db, ids, codes)
+    contagem, desconhecidos = tally_scanned_items(codigos, resultado)
+    
+    if not contagem:
+        await update.message.reply_text(
+            f'{len(codigos)} códigos lidos, mas nenhum corresponde a um item cadastrado.\n'
+            'Envie outra foto ou digite /finalizar_inventario'
+        )
+        return INVENTARIO_QR
+    
+    context.user_data['inventario_lote'] = [
+        {
+            'id': item['id'],
+            'nome': item['nome'],
+            'codigo': item.get('codigo'),
+            'categoria': item.get('categoria'),
+            'localizacao': item.get('localizacao'),
+            'quantidade_sistema': item['quantidade'],
+            'quantidade_inventario': quantidade
+        }
+        for item, quantidade in contagem
+    ]
+    
+    texto = f'📦 <b>Lote lido:</b> {len(codigos)} códigos, {len(contagem)} itens\n\n'
+    itens_omitidos = 0
+    for item, quantidade in contagem:
+        if len(texto) > LIMITE_TEXTO_RELATORIO:
+            itens_omitidos += 1
+            continue
+        texto += f'• {html.escape(item["nome"])} (ID: {item["id"]}): <b>{quantidade}</b> (sistema: {item["quantidade"]})\n'
+    if itens_omitidos:
+        texto += f'… e mais {itens_omitidos} itens\n'
+    if desconhecidos:
+        texto += f'\n⚠️ Não cadastrados: {html.escape(", ".join(desconhecidos[:20]))}\n'
+    texto += '\nConfirmar as quantidades do lote?'
+    
+    keyboard = [[
+        InlineKeyboardButton('✅ Confirmar lote', callback_data='lote_confirmar'),
+        InlineKeyboardButton('❌ Descartar', callback_data='lote_descartar')
+    ]]
+    await update.message.reply_text(texto, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='HTML')
+    return INVENTARIO_LOTE
+
+async def inventario_confirmar_lote(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    query = update.callback_query
+    await query.answer()
+    lote = context.user_data.pop('inventario_lote', None)
+    
+    if query.data != 'lote_confirmar' or not lote:
+        await query.edit_message_text('Lote descartado. Envie outra foto ou digite /finalizar_inventario')
+        return INVENTARIO_QR
+    
+    lista = context.user_data.setdefault('inventario_lista', [])
+    por_id = {item['id']: item for item in lista}
+    data_inventario = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    for entrada in lote:
+        existente = por_id.get(entrada['id'])
+        if existente:
+            # Mesmo item em outra caixa/prateleira: soma à contagem anterior
+            existente['quantidade_inventario'] += entrada['quantidade_inventario']
+            existente['diferenca'] = existente['quantidade_inventario'] - existente['quantidade_sistema']
+            existente['data_inventario'] = data_inventario
+        else:
+            entrada['diferenca'] = entrada['quantidade_inventario'] - entrada['quantidade_sistema']
+            entrada['data_inventario'] = data_inventario
+            lista.append(entrada)
+            por_id[entrada['id']] = entrada
+    
+    await query.edit_message_text(
+        f'✅ Lote confirmado: {len(lote)} itens, {sum(e["quantidade_inventario"] for e in lote)} unidades.\n'
+        f'Total de itens inventariados: {len(lista)}\n\n'
+        'Envie o próximo QR Code ou digite /finalizar_inventario'
+    )
+    return INVENTARIO_QR
+
 async def inventario_receber_quantidade(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         quantidade = int(update.message.text)
@@ -935,68 +1016,12 @@ async def gerar_relatorio_inventario(update: Update, context: ContextTypes.DEFAU
     formato = query.data.split('_')[1]  # txt, csv, ou excel
     
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f'inventario_{timestamp}.{INVENTORY_REPORT_EXTENSIONS[formato]}'
     
     try:
-        if formato == 'txt':
-            # Gerar relatório TXT
-            filename = f'inventario_{timestamp}.txt'
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(f'RELATÓRIO DE INVENTÁRIO\n')
-                f.write(f'Data: {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}\n')
-                f.write(f'Total de itens: {len(lista)}\n')
-                f.write('=' * 80 + '\n\n')
-                
-                for item in lista:
-                    f.write(f'ID: {item["id"]}\n')
-                    f.write(f'Nome: {item["nome"]}\n')
-                    f.write(f'Código: {item["codigo"] or "N/A"}\n')
-                    f.write(f'Categoria: {item["categoria"] or "N/A"}\n')
-                    f.write(f'Localização: {item["localizacao"] or "N/A"}\n')
-                    f.write(f'Qtd Sistema: {item["quantidade_sistema"]}\n')
-                    f.write(f'Qtd Inventário: {item["quantidade_inventario"]}\n')
-                    f.write(f'Diferença: {item["diferenca"]:+d}\n')
-                    f.write(f'Data Inventário: {item["data_inventario"]}\n')
-                    f.write('-' * 50 + '\n')
-            
-            with open(filename, 'rb') as f:
-                await query.message.reply_document(f, filename=filename)
-            
-        elif formato == 'csv':
-            # Gerar relatório CSV
-            filename = f'inventario_{timestamp}.csv'
-            df = pd.DataFrame(lista)
-            df.to_csv(filename, index=False, encoding='utf-8-sig', sep=';')
-            
-            with open(filename, 'rb') as f:
-                await query.message.reply_document(f, filename=filename)
-                
-        elif formato == 'excel':
-            # Gerar relatório Excel
-            filename = f'inventario_{timestamp}.xlsx'
-            df = pd.DataFrame(lista)
-            
-            with pd.ExcelWriter(filename, engine='openpyxl') as writer:
-                df.to_excel(writer, sheet_name='Inventário', index=False)
-                
-                # Formatar planilha
-                workbook = writer.book
-                worksheet = writer.sheets['Inventário']
-                
-                # Ajustar largura das colunas
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            with open(filename, 'rb') as f:
-                await query.message.reply_document(f, filename=filename)
+        # DataFrame e planilha montados no pool de processos, enviados da memória
+        content = await get_job_executor().run_cpu(render_inventory_report, lista, formato)
+        await query.message.reply_document(content, filename=filename)
         
         # Limpar dados do inventário
         context.user_data.pop('inventario_lista', None)
@@ -1008,10 +1033,6 @@ async def gerar_relatorio_inventario(update: Update, context: ContextTypes.DEFAU
             f'Total de itens: {len(lista)}'
         )
         
-        # Remover arquivo temporário
-        if os.path.exists(filename):
-            os.remove(filename)
-            
     except Exception as e:
         await query.edit_message_text(f'Erro ao gerar relatório: {str(e)}')
     
@@ -1057,6 +1078,10 @@ async def cancelar(update: Update, context: ContextTypes.DEFAULT_TYPE):
     await update.message.reply_text('Operação cancelada.', reply_markup=ReplyKeyboardRemove())
     return ConversationHandler.END
 
+async def encerrar_recursos(app):
+    await close_async_pools()
+    await shutdown_job_executor()
+
 def main():
     logging.basicConfig(level=logging.INFO)
     TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
@@ -1064,7 +1089,10 @@ def main():
         print('Defina a variável de ambiente TELEGRAM_BOT_TOKEN')
         return
     
-    app = ApplicationBuilder().token(TOKEN).build()
+    # Schema e índices atualizados antes de aceitar mensagens
+    run_migrations(DB_PATH)
+    
+    app = ApplicationBuilder().token(TOKEN).post_shutdown(encerrar_recursos).build()
 
     # Conversation handlers
     cadastro_conv = ConversationHandler(
@@ -1124,6 +1152,7 @@ def main():
                 CommandHandler('finalizar_inventario', finalizar_inventario)
             ],
             INVENTARIO_QTD: [MessageHandler(filters.TEXT & ~filters.COMMAND, inventario_receber_quantidade)],
+            INVENTARIO_LOTE: [CallbackQueryHandler(inventario_confirmar_lote, pattern=r'^lote_')],
             INVENTARIO_CONFIRMA: [CallbackQueryHandler(gerar_relatorio_inventario, pattern=r'^relatorio_')]
         },
         fallbacks=[CommandHandler('cancelar', cancelar_inventario)],
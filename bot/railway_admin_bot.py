@@ -5,6 +5,7 @@ Versão completa com funcionalidades administrativas
 """
 
 import os
+import sys
 import logging
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -22,6 +23,10 @@ from PIL import Image
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.migrations import run_migrations
+from utils.search_index import sync_search_index
+
 # Constantes
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 FOTOS_DIR = os.path.join(os.path.dirname(__file__), '../fotos')
@@ -226,15 +231,15 @@ async def novo_item_quantidade(update: Update, context: ContextTypes.DEFAULT_TYP
         # Salvar no banco
         async with aiosqlite.connect(DB_PATH) as db:
             await db.execute('''
-                INSERT INTO itens (nome, descricao, quantidade, status, data_cadastro)
-                VALUES (?, ?, ?, 'ativo', ?)
+                INSERT INTO itens (nome, descricao, quantidade, status)
+                VALUES (?, ?, ?, 'ativo')
             ''', (
                 context.user_data['nome'],
                 context.user_data['descricao'],
-                quantidade,
-                datetime.now().isoformat()
+                quantidade
             ))
             await db.commit()
+        await asyncio.to_thread(sync_search_index, DB_PATH)
         
         texto = (
             '✅ *Item cadastrado com sucesso!*\n\n'
@@ -413,6 +418,9 @@ def main():
         print('❌ Defina a variável de ambiente TELEGRAM_BOT_TOKEN')
         return
     
+    # Schema e índices atualizados antes de aceitar mensagens
+    run_migrations(DB_PATH)
+    
     print(f'🚀 Iniciando Bot Administrativo Railway...')
     print(f'🔑 Token configurado: {TOKEN[:10]}...')
     print(f'🌐 WebApp URL: {WEBAPP_URL}')
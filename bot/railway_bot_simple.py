@@ -5,6 +5,7 @@ Versão simplificada sem dependências problemáticas
 """
 
 import os
+import sys
 import logging
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
@@ -21,6 +22,9 @@ from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
 import json
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.migrations import run_migrations
+
 # Constantes
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 FOTOS_DIR = os.path.join(os.path.dirname(__file__), '../fotos')
@@ -220,6 +224,9 @@ def main():
         print('❌ Defina a variável de ambiente TELEGRAM_BOT_TOKEN')
         return
     
+    # Schema e índices atualizados antes de aceitar mensagens
+    run_migrations(DB_PATH)
+    
     print(f'🚀 Iniciando Bot Railway...')
     print(f'🔑 Token configurado: {TOKEN[:10]}...')
     print(f'🌐 WebApp URL: {WEBAPP_URL}')
@@ -5,6 +5,7 @@ Versão com cadastro, edição, busca, relatórios e gestão administrativa
 """
 
 import os
+import sys
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
@@ -22,6 +23,10 @@ from telegram.ext import (
 import aiosqlite
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.migrations import run_migrations
+from utils.search_index import sync_search_index
+
 # Constantes
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 ADMINS_FILE = os.path.join(os.path.dirname(__file__), 'admins.txt')
@@ -364,19 +369,19 @@ async def novo_item_quantidade(update: Update, context: ContextTypes.DEFAULT_TYP
         # Salvar no banco
         async with aiosqlite.connect(DB_PATH) as db:
             await db.execute('''
-                INSERT INTO itens (nome, descricao, quantidade, status, data_cadastro)
-                VALUES (?, ?, ?, 'ativo', ?)
+                INSERT INTO itens (nome, descricao, quantidade, status)
+                VALUES (?, ?, ?, 'ativo')
             ''', (
                 context.user_data['nome'],
                 context.user_data['descricao'],
-                quantidade,
-                datetime.now().isoformat()
+                quantidade
             ))
             await db.commit()
             
             # Obter ID do item criado
             cursor = await db.execute('SELECT last_insert_rowid()')
             item_id = (await cursor.fetchone())[0]
+        await asyncio.to_thread(sync_search_index, DB_PATH)
         
         texto = (
             f'✅ *Item cadastrado com sucesso!*\n\n'
@@ -762,6 +767,9 @@ def main():
         print('❌ Defina TELEGRAM_BOT_TOKEN')
         return
     
+    # Schema e índices atualizados antes de aceitar mensagens
+    run_migrations(DB_PATH)
+    
     print(f'🚀 Iniciando Bot Completo Railway...')
     print(f'🔑 Token: {TOKEN[:10]}...')
     print(f'🌐 WebApp: {WEBAPP_URL}')
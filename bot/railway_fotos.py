@@ -5,6 +5,7 @@ Versão com upload, armazenamento e exibição de fotos dos itens
 """
 
 import os
+import sys
 import logging
 from datetime import datetime
 from dotenv import load_dotenv
@@ -23,6 +24,10 @@ from telegram.ext import (
 import aiosqlite
 import pandas as pd
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.migrations import run_migrations
+from utils.search_index import sync_search_index
+
 # Constantes
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 ADMINS_FILE = os.path.join(os.path.dirname(__file__), 'admins.txt')
@@ -378,22 +383,22 @@ async def novo_item_foto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     try:
         async with aiosqlite.connect(DB_PATH) as db:
             await db.execute('''
-                INSERT INTO itens (nome, descricao, catalogo, quantidade, status, foto_path, foto_id, data_cadastro)
-                VALUES (?, ?, ?, ?, 'ativo', ?, ?, ?)
+                INSERT INTO itens (nome, descricao, catalogo, quantidade, status, foto_path, foto_id)
+                VALUES (?, ?, ?, ?, 'ativo', ?, ?)
             ''', (
                 context.user_data['nome'],
                 context.user_data['descricao'],
                 context.user_data.get('catalogo'),
                 context.user_data['quantidade'],
                 foto_path,
-                foto_id,
-                datetime.now().isoformat()
+                foto_id
             ))
             await db.commit()
             
             # Obter ID do item criado
             cursor = await db.execute('SELECT last_insert_rowid()')
             item_id = (await cursor.fetchone())[0]
+        await asyncio.to_thread(sync_search_index, DB_PATH)
         
         foto_emoji = '📸' if foto_path else '📄'
         catalogo_info = f'\n📋 Catálogo: {context.user_data.get("catalogo")}' if context.user_data.get('catalogo') else ''
@@ -592,6 +597,9 @@ def main():
         print('❌ Defina TELEGRAM_BOT_TOKEN')
         return
     
+    # Schema e índices atualizados antes de aceitar mensagens
+    run_migrations(DB_PATH)
+    
     print(f'🚀 Iniciando Bot Completo com FOTOS...')
     print(f'🔑 Token: {TOKEN[:10]}...')
     print(f'🌐 WebApp: {WEBAPP_URL}')
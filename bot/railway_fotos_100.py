@@ -12,7 +12,6 @@ from datetime import datetime
 from dotenv import load_dotenv
 import json
 import asyncio
-import uuid
 import subprocess
 import random
 
@@ -83,6 +82,14 @@ except ImportError as e:
     print("📦 Execute: pip install aiosqlite pandas")
     sys.exit(1)
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.database import connect_async, close_async_pools
+from utils.job_executor import get_job_executor, shutdown_job_executor
+from utils.migrations import run_migrations
+from utils.photo_store import store_photo
+from utils.search_index import sync_search_index
+from utils.stats_snapshot import SNAPSHOT_QUERY, ranked, stats_from_rows
+
 # Constantes
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 ADMINS_FILE = os.path.join(os.path.dirname(__file__), 'admins.txt')
@@ -139,7 +146,7 @@ def remove_admin(user_id):
         return False
 
 async def init_database():
-    """Inicializa o banco de dados com as tabelas necessárias"""
+    """Inicializa o banco de dados aplicando as migrações versionadas"""
     print("🗄️ Inicializando banco de dados...")
     
     # Verificar se diretório do banco existe
@@ -148,65 +155,22 @@ async def init_database():
         os.makedirs(db_dir)
         print(f"📁 Diretório do banco criado: {db_dir}")
     
-    conn = None
     try:
-        # Conectar ao banco de dados com timeout explícito
-        conn = await aiosqlite.connect(DB_PATH, timeout=30.0)
-        
-        # Tabela principal com campos para fotos e catálogo
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS itens (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                nome TEXT NOT NULL,
-                descricao TEXT,
-                catalogo TEXT,
-                quantidade INTEGER NOT NULL,
-                status TEXT NOT NULL,
-                foto_path TEXT,
-                foto_id TEXT,
-                info_reparo TEXT,
-                data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Tabela de movimentações
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS movimentacoes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            item_id INTEGER NOT NULL,
-            usuario TEXT,
-            acao TEXT NOT NULL,
-            detalhes TEXT,
-            data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (item_id) REFERENCES itens(id)
-        )
-        ''')
-        
-        await conn.commit()
-        print("✅ Banco de dados inicializado com sucesso!")
+        # Tabelas, colunas e índices (passos já aplicados são ignorados)
+        version = await asyncio.to_thread(run_migrations, DB_PATH)
+        print(f"✅ Banco de dados inicializado com sucesso! (schema v{version})")
         return True
     except Exception as e:
         print(f"❌ Erro ao inicializar banco de dados: {e}")
         raise e
-    finally:
-        # Garantir que a conexão seja fechada
-        if conn:
-            await conn.close()
 
 async def salvar_foto(photo_file, item_nome):
-    """Salva a foto no diretório e retorna o caminho"""
+    """Salva a foto (nome pelo hash do conteúdo, com miniaturas) e retorna o nome"""
     try:
-        # Criar diretório de fotos se não existir (verificação extra)
-        os.makedirs(FOTOS_DIR, exist_ok=True)
-        
-        # Gerar nome único para a foto
-        filename = f"{uuid.uuid4().hex}_{item_nome.replace(' ', '_')[:30]}.jpg"
-        filepath = os.path.join(FOTOS_DIR, filename)
-        
-        # Baixar e salvar foto
-        await photo_file.download_to_drive(filepath)
-        print(f"📸 Foto salva: {filepath}")
+        # Foto em memória; gravação e miniaturas no pool de processos
+        foto = bytes(await photo_file.download_as_bytearray())
+        filename = await get_job_executor().run_cpu(store_photo, foto, FOTOS_DIR)
+        print(f"📸 Foto salva: {filename} ({item_nome})")
         return filename
     except Exception as e:
         logging.error(f"Erro ao salvar foto: {e}")
@@ -456,7 +420,7 @@ async def novo_item_foto(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Salvar no banco
         try:
-            async with aiosqlite.connect(DB_PATH) as db:
+            async with connect_async(DB_PATH) as db:
                 cursor = await db.execute(
                     '''INSERT INTO itens (nome, descricao, catalogo, quantidade, status, foto_path, foto_id, data_atualizacao)
                     VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))''',
@@ -473,6 +437,7 @@ async def novo_item_foto(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 
                 await db.commit()
+            await get_job_executor().run_io(sync_search_index, DB_PATH)
             
             # Mensagem de confirmação com info de foto
             if foto_path:
@@ -533,7 +498,7 @@ async def buscar_itens(update: Update, context: ContextTypes.DEFAULT_TYPE):
         termo = ' '.join(context.args).strip()
         
         try:
-            async with aiosqlite.connect(DB_PATH) as db:
+            async with connect_async(DB_PATH) as db:
                 db.row_factory = aiosqlite.Row
                 cursor = await db.execute(
                     '''SELECT id, nome, descricao, catalogo, quantidade, status, foto_path, foto_id
@@ -607,7 +572,7 @@ async def buscar_itens(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def listar_todos(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Lista todos os itens resumidamente"""
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
+        async with connect_async(DB_PATH) as db:
             db.row_factory = aiosqlite.Row
             cursor = await db.execute(
                 '''SELECT id, nome, quantidade, status, foto_path IS NOT NULL OR foto_id IS NOT NULL as tem_foto
@@ -638,32 +603,16 @@ async def listar_todos(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def relatorio(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Gera relatório com estatísticas e informações de fotos"""
     try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            db.row_factory = aiosqlite.Row
-            
-            # Total de itens
-            cursor = await db.execute('SELECT COUNT(*) as total FROM itens')
-            total_itens = (await cursor.fetchone())['total']
-            
-            # Itens por status
-            cursor = await db.execute('SELECT status, COUNT(*) as total FROM itens GROUP BY status')
-            status = {row['status']: row['total'] async for row in cursor}
-            
-            # Total de itens com foto
-            cursor = await db.execute(
-                '''SELECT COUNT(*) as total FROM itens 
-                WHERE foto_path IS NOT NULL OR foto_id IS NOT NULL''')
-            itens_com_foto = (await cursor.fetchone())['total']
-            
-            # Itens por catálogo
-            cursor = await db.execute(
-                '''SELECT catalogo, COUNT(*) as total FROM itens 
-                WHERE catalogo IS NOT NULL GROUP BY catalogo ORDER BY total DESC''')
-            catalogos = [(row['catalogo'], row['total']) async for row in cursor]
-            
-            # Total de estoque
-            cursor = await db.execute('SELECT SUM(quantidade) as total FROM itens')
-            total_estoque = (await cursor.fetchone())['total'] or 0
+        # Totais materializados em stats_snapshot (uma leitura, sem varrer itens)
+        async with connect_async(DB_PATH) as db:
+            cursor = await db.execute(SNAPSHOT_QUERY)
+            stats = stats_from_rows(await cursor.fetchall())
+        
+        total_itens = stats['total']['itens']
+        status = {s: m['itens'] for s, m in ranked(stats['status'], include_empty=True)}
+        itens_com_foto = stats['total']['com_midia']
+        catalogos = [(cat, m['itens']) for cat, m in ranked(stats['catalogo'])]
+        total_estoque = stats['total']['quantidade']
         
         # Construir relatório
         texto = "📊 *RELATÓRIO DE ESTOQUE*\n\n"
@@ -730,6 +679,11 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except:
         pass
 
+async def encerrar_recursos(app):
+    """Fecha os pools de conexões e de tarefas ao encerrar o bot"""
+    await close_async_pools()
+    await shutdown_job_executor()
+
 def main():
     """Função principal do bot"""
     try:
@@ -779,6 +733,8 @@ def main():
         app_builder.read_timeout(30.0)
         app_builder.write_timeout(30.0)
         
+        app_builder.post_shutdown(encerrar_recursos)
+        
         app = app_builder.build()
         
         # Adicionar handler de erro global
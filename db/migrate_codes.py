@@ -6,155 +6,29 @@ Autor: GitHub Copilot
 Data: 16/09/2025
 """
 
+import os
 import sqlite3
+import sys
 import asyncio
-import aiosqlite
-from datetime import datetime
 
-DB_PATH = '/home/hendel/Documentos/BOTS/Assistente_Stock_MPA/db/estoque.db'
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from utils.migrations import run_migrations
 
-# Schema atualizado com códigos automáticos
-UPDATE_ITENS_TABLE = '''
-ALTER TABLE itens ADD COLUMN codigo TEXT UNIQUE;
-'''
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'estoque.db')
 
-UPDATE_ITENS_TABLE_BARCODE = '''
-ALTER TABLE itens ADD COLUMN codigo_barras TEXT UNIQUE;
-'''
-
-UPDATE_ITENS_TABLE_CATEGORY = '''
-ALTER TABLE itens ADD COLUMN categoria TEXT;
-'''
-
-UPDATE_ITENS_TABLE_LOCATION = '''
-ALTER TABLE itens ADD COLUMN localizacao TEXT;
-'''
-
-UPDATE_ITENS_TABLE_QR = '''
-ALTER TABLE itens ADD COLUMN qr_code TEXT;
-'''
-
-UPDATE_ITENS_TABLE_BRAND = '''
-ALTER TABLE itens ADD COLUMN marca TEXT;
-'''
-
-UPDATE_ITENS_TABLE_MODEL = '''
-ALTER TABLE itens ADD COLUMN modelo TEXT;
-'''
-
-UPDATE_ITENS_TABLE_SERIAL = '''
-ALTER TABLE itens ADD COLUMN numero_serie TEXT;
-'''
-
-# Índices para performance
-CREATE_INDEXES = [
-    'CREATE INDEX IF NOT EXISTS idx_codigo ON itens(codigo);',
-    'CREATE INDEX IF NOT EXISTS idx_codigo_barras ON itens(codigo_barras);',
-    'CREATE INDEX IF NOT EXISTS idx_categoria ON itens(categoria);',
-    'CREATE INDEX IF NOT EXISTS idx_localizacao ON itens(localizacao);',
-    'CREATE INDEX IF NOT EXISTS idx_nome ON itens(nome);'
-]
+# Colunas, índices e versão do schema ficam em utils/migrations.py
 
 async def migrate_database():
     """Executa migração do banco de dados"""
-    print("🔄 Iniciando migração do banco de dados...")
-    
-    try:
-        async with aiosqlite.connect(DB_PATH) as db:
-            # Verificar colunas existentes
-            cursor = await db.execute("PRAGMA table_info(itens)")
-            columns = await cursor.fetchall()
-            existing_columns = [col[1] for col in columns]
-            
-            print(f"📋 Colunas existentes: {existing_columns}")
-            
-            # Adicionar novas colunas se não existirem
-            migrations = [
-                ('codigo', UPDATE_ITENS_TABLE),
-                ('codigo_barras', UPDATE_ITENS_TABLE_BARCODE),
-                ('categoria', UPDATE_ITENS_TABLE_CATEGORY),
-                ('localizacao', UPDATE_ITENS_TABLE_LOCATION),
-                ('qr_code', UPDATE_ITENS_TABLE_QR),
-                ('marca', UPDATE_ITENS_TABLE_BRAND),
-                ('modelo', UPDATE_ITENS_TABLE_MODEL),
-                ('numero_serie', UPDATE_ITENS_TABLE_SERIAL)
-            ]
-            
-            for column_name, sql in migrations:
-                if column_name not in existing_columns:
-                    try:
-                        await db.execute(sql)
-                        print(f"✅ Coluna '{column_name}' adicionada")
-                    except Exception as e:
-                        print(f"⚠️ Erro ao adicionar coluna '{column_name}': {e}")
-                else:
-                    print(f"➡️ Coluna '{column_name}' já existe")
-            
-            # Criar índices
-            for index_sql in CREATE_INDEXES:
-                try:
-                    await db.execute(index_sql)
-                    print(f"✅ Índice criado: {index_sql.split('(')[0].split()[-1]}")
-                except Exception as e:
-                    print(f"⚠️ Erro ao criar índice: {e}")
-            
-            await db.commit()
-            print("✅ Migração concluída com sucesso!")
-            
-    except Exception as e:
-        print(f"❌ Erro na migração: {e}")
-        return False
-    
-    return True
+    return await asyncio.to_thread(migrate_sync)
 
 def migrate_sync():
-    """Versão síncrona da migração"""
+    """Versão síncrona da migração (delegada às migrações versionadas)"""
     print("🔄 Iniciando migração síncrona do banco de dados...")
     
     try:
-        with sqlite3.connect(DB_PATH) as conn:
-            cursor = conn.cursor()
-            
-            # Verificar colunas existentes
-            cursor.execute("PRAGMA table_info(itens)")
-            columns = cursor.fetchall()
-            existing_columns = [col[1] for col in columns]
-            
-            print(f"📋 Colunas existentes: {existing_columns}")
-            
-            # Adicionar novas colunas se não existirem
-            migrations = [
-                ('codigo', 'ALTER TABLE itens ADD COLUMN codigo TEXT UNIQUE'),
-                ('codigo_barras', 'ALTER TABLE itens ADD COLUMN codigo_barras TEXT UNIQUE'),
-                ('categoria', 'ALTER TABLE itens ADD COLUMN categoria TEXT'),
-                ('localizacao', 'ALTER TABLE itens ADD COLUMN localizacao TEXT'),
-                ('qr_code', 'ALTER TABLE itens ADD COLUMN qr_code TEXT'),
-                ('marca', 'ALTER TABLE itens ADD COLUMN marca TEXT'),
-                ('modelo', 'ALTER TABLE itens ADD COLUMN modelo TEXT'),
-                ('numero_serie', 'ALTER TABLE itens ADD COLUMN numero_serie TEXT')
-            ]
-            
-            for column_name, sql in migrations:
-                if column_name not in existing_columns:
-                    try:
-                        cursor.execute(sql)
-                        print(f"✅ Coluna '{column_name}' adicionada")
-                    except Exception as e:
-                        print(f"⚠️ Erro ao adicionar coluna '{column_name}': {e}")
-                else:
-                    print(f"➡️ Coluna '{column_name}' já existe")
-            
-            # Criar índices
-            for index_sql in CREATE_INDEXES:
-                try:
-                    cursor.execute(index_sql)
-                    print(f"✅ Índice criado")
-                except Exception as e:
-                    print(f"⚠️ Erro ao criar índice: {e}")
-            
-            conn.commit()
-            print("✅ Migração síncrona concluída com sucesso!")
-            
+        version = run_migrations(DB_PATH)
+        print(f"✅ Migração síncrona concluída com sucesso! (schema v{version})")
     except Exception as e:
         print(f"❌ Erro na migração síncrona: {e}")
         return False
@@ -0,0 +1,689 @@
+#!/usr/bin/env python3
+"""
+API REST Assíncrona para Sistema de Estoque
+Mesmas rotas /api/v1 e mesmo envelope de resposta da api_rest.py, servidos por
+aiohttp sobre o pool aiosqlite (connect_async): consultas não bloqueiam o event loop
+e trabalho síncrono (códigos, QR, inventário, exportação) roda em threads.
+
+Execução:
+    python server/api_async.py
+    gunicorn 'server.api_async:create_app()' --worker-class aiohttp.GunicornWebWorker
+"""
+
+from aiohttp import web
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+import asyncio
+import json
+import math
+import os
+import sys
+import time
+import hashlib
+from datetime import datetime
+import logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.database import close_async_pools, connect_async
+from utils.inventory_reconciler import InventoryReconciler
+from utils.item_export import export_filename, export_items, export_mimetype
+from utils.item_listing import MAX_PAGE_SIZE, count_items_async, fetch_items_page_async
+from utils.item_lookup import lookup_items_async, parse_lookup_refs
+from utils.migrations import run_migrations
+from utils.qr_cache import QR_FIELDS, etag_matches, get_qr_cache, qr_etag, qr_response_headers
+from utils.rate_limiter import get_rate_limiter
+from utils.search_index import sync_search_index
+from utils.stats_snapshot import SNAPSHOT_QUERY, ranked, stats_from_rows
+from utils.suggestion_index import get_suggestion_index, parse_suggestion_limit, suggestion_limits
+
+API_VERSION = 'v1'
+BASE_PATH = f'/api/{API_VERSION}'
+
+# Rate limiting (token bucket por IP ou API key, configurado por variáveis de ambiente)
+rate_limiter = get_rate_limiter()
+
+# Logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Paths
+DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
+DOCS_PATH = os.path.join(os.path.dirname(__file__), 'static', 'api-docs.html')
+
+routes = web.RouteTableDef()
+
+# Chaves tipadas do estado da aplicação
+DB_PATH_KEY = web.AppKey('db_path', str)
+
+# ==================== AUTENTICAÇÃO ====================
+
+def generate_api_key(user_id):
+    """Gera API key para usuário"""
+    timestamp = str(int(time.time()))
+    data = f"{user_id}:{timestamp}"
+    return hashlib.sha256(data.encode()).hexdigest()
+
+def require_api_key(handler):
+    """Decorator para exigir API key"""
+    @wraps(handler)
+    async def decorated_handler(request):
+        api_key = request.headers.get('X-API-Key')
+        if not api_key:
+            return web.json_response({'error': 'API key required'}, status=401)
+
+        # Verificar rate limiting
+        decision = rate_limiter.check_request(api_key, request.remote)
+        if not decision.allowed:
+            return web.json_response({'error': 'Rate limit exceeded'}, status=429, headers={
+                'Retry-After': str(math.ceil(decision.retry_after))
+            })
+
+        return await handler(request)
+    return decorated_handler
+
+@web.middleware
+async def cors_middleware(request, handler):
+    """Equivalente ao CORS(app) da versão Flask (qualquer origem)"""
+    if request.method == 'OPTIONS':
+        response = web.Response(status=200)
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, PUT, DELETE, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get(
+            'Access-Control-Request-Headers', 'Content-Type, X-API-Key'
+        )
+    else:
+        try:
+            response = await handler(request)
+        except web.HTTPException as e:
+            # 404/405 das rotas e erros levantados pelos handlers também levam o header
+            e.headers['Access-Control-Allow-Origin'] = '*'
+            raise
+        except Exception as e:
+            logger.exception(f"Erro não tratado em {request.path}: {e}")
+            response = error_response("Erro interno do servidor", 500)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+# ==================== UTILITÁRIOS ====================
+
+def get_db_connection(request):
+    """Conexão do pool assíncrono (alterações sem `await db.commit()` são descartadas)"""
+    return connect_async(request.app[DB_PATH_KEY])
+
+def success_response(data, message="Success"):
+    """Resposta de sucesso padronizada"""
+    return web.json_response({
+        'success': True,
+        'message': message,
+        'data': data,
+        'timestamp': datetime.utcnow().isoformat()
+    })
+
+def error_response(message, code=400):
+    """Resposta de erro padronizada"""
+    return web.json_response({
+        'success': False,
+        'error': message,
+        'timestamp': datetime.utcnow().isoformat()
+    }, status=code)
+
+async def get_json(request):
+    """Corpo JSON da requisição (None se ausente ou inválido, como get_json silencioso)"""
+    try:
+        return await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+
+async def fetch_dicts(db, query, params=()):
+    """Executa a consulta e devolve as linhas como dicts"""
+    cursor = await db.execute(query, params)
+    columns = [description[0] for description in cursor.description]
+    return [dict(zip(columns, row)) for row in await cursor.fetchall()]
+
+# ==================== ENDPOINTS DE DOCUMENTAÇÃO ====================
+
+@routes.get(f'{BASE_PATH}/')
+async def api_info(request):
+    """Informações da API"""
+    return success_response({
+        'name': 'Sistema de Estoque API',
+        'version': API_VERSION,
+        'description': 'API REST para gerenciamento de estoque',
+        'endpoints': {
+            'items': f'{BASE_PATH}/items',
+            'qr_code': f'{BASE_PATH}/items/{{code}}/qr',
+            'search': f'{BASE_PATH}/items/search',
+            'suggestions': f'{BASE_PATH}/items/suggestions',
+            'export': f'{BASE_PATH}/items/export',
+            'lookup': f'{BASE_PATH}/items/lookup',
+            'inventory': f'{BASE_PATH}/inventory',
+            'categories': f'{BASE_PATH}/categories',
+            'reports': f'{BASE_PATH}/reports',
+            'webhooks': f'{BASE_PATH}/webhooks'
+        },
+        'documentation': f'{BASE_PATH}/docs'
+    })
+
+@routes.get(f'{BASE_PATH}/docs')
+async def api_docs(request):
+    """Documentação da API em formato OpenAPI"""
+    return web.FileResponse(DOCS_PATH)
+
+# ==================== ENDPOINTS DE ITENS ====================
+
+@routes.get(f'{BASE_PATH}/items')
+@require_api_key
+async def get_items(request):
+    """
+    Listar todos os itens (ordenados por nome)
+    Query params:
+    - limit: número máximo de itens (padrão: 50)
+    - cursor: next_cursor da página anterior (paginação por cursor)
+    - offset: pular N itens (compatibilidade; ignorado quando há cursor)
+    - category: filtrar por categoria
+    - low_stock: apenas itens com estoque baixo (true/false)
+    """
+    try:
+        limit = min(int(request.query.get('limit', 50)), MAX_PAGE_SIZE)
+        offset = int(request.query.get('offset', 0))
+        cursor = request.query.get('cursor')
+        category = request.query.get('category')
+        low_stock = request.query.get('low_stock', '').lower() == 'true'
+
+        async with get_db_connection(request) as db:
+            items_list, has_more, next_cursor = await fetch_items_page_async(
+                db, limit, category, low_stock, cursor=cursor, offset=offset
+            )
+            total = await count_items_async(db, request.app[DB_PATH_KEY], category, low_stock)
+
+        return success_response({
+            'items': items_list,
+            'pagination': {
+                'total': total,
+                'limit': limit,
+                'offset': None if cursor else offset,
+                'has_more': has_more,
+                'next_cursor': next_cursor
+            }
+        })
+
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        logger.error(f"Erro ao buscar itens: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@routes.get(f'{BASE_PATH}/items/export')
+@require_api_key
+async def export_items_stream(request):
+    """
+    Exportar o catálogo completo em streaming
+    Query params:
+    - format: ndjson (padrão) ou csv
+    - gzip: baixar como arquivo .gz (true/false)
+    - category / low_stock: mesmos filtros da listagem
+    """
+    try:
+        fmt = request.query.get('format', 'ndjson').lower()
+        compress = request.query.get('gzip', '').lower() == 'true'
+        chunks = export_items(
+            request.app[DB_PATH_KEY], fmt,
+            category=request.query.get('category'),
+            low_stock=request.query.get('low_stock', '').lower() == 'true',
+            compress=compress
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+
+    response = web.StreamResponse(headers={
+        'Content-Type': export_mimetype(fmt, compress),
+        'Content-Disposition': f'attachment; filename="{export_filename(fmt, compress)}"'
+    })
+
+    # O gerador abre sua conexão sqlite3 na primeira leitura: todos os blocos
+    # (e o fechamento) precisam rodar na mesma thread
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='export')
+    try:
+        await response.prepare(request)
+        while True:
+            chunk = await loop.run_in_executor(executor, next, chunks, None)
+            if chunk is None:
+                break
+            await response.write(chunk)
+        await response.write_eof()
+    finally:
+        await loop.run_in_executor(executor, chunks.close)
+        executor.shutdown(wait=False)
+    return response
+
+@routes.get(f'{BASE_PATH}/items/search')
+@require_api_key
+async def search_items(request):
+    """
+    Buscar itens
+    Query params:
+    - q: termo de busca
+    - limit: máximo de resultados
+    """
+    try:
+        query_term = request.query.get('q', '').strip()
+        limit = min(int(request.query.get('limit', 20)), 100)
+
+        if not query_term:
+            return error_response("Termo de busca é obrigatório")
+
+        async with get_db_connection(request) as db:
+            items_list = await fetch_dicts(db, """
+                SELECT * FROM itens
+                WHERE nome LIKE ? OR codigo LIKE ? OR descricao LIKE ? OR categoria LIKE ?
+                ORDER BY
+                    CASE
+                        WHEN nome LIKE ? THEN 1
+                        WHEN codigo LIKE ? THEN 2
+                        WHEN categoria LIKE ? THEN 3
+                        ELSE 4
+                    END
+                LIMIT ?
+            """, (
+                f'%{query_term}%', f'%{query_term}%', f'%{query_term}%', f'%{query_term}%',
+                f'%{query_term}%', f'%{query_term}%', f'%{query_term}%',
+                limit
+            ))
+
+        return success_response({
+            'query': query_term,
+            'results': items_list,
+            'count': len(items_list)
+        })
+
+    except Exception as e:
+        logger.error(f"Erro na busca: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@routes.get(f'{BASE_PATH}/items/suggestions')
+@require_api_key
+async def get_suggestions(request):
+    """
+    Sugestões de autocomplete (nome, categoria e marca)
+    Query params:
+    - q: termo parcial (mínimo 2 caracteres)
+    - limit: máximo de sugestões
+    """
+    try:
+        partial = request.query.get('q', '').strip()
+        try:
+            limit = parse_suggestion_limit(request.query.get('limit'))
+        except ValueError as e:
+            return error_response(str(e), 400)
+
+        if len(partial) < 2:
+            return success_response({'query': partial, 'suggestions': [], 'count': 0})
+
+        # Índice em memória (carga inicial lê o banco): fora do event loop
+        index = get_suggestion_index(request.app[DB_PATH_KEY])
+        suggestions = (await asyncio.to_thread(index.suggest, partial, suggestion_limits(limit)))[:limit]
+
+        return success_response({
+            'query': partial,
+            'suggestions': suggestions,
+            'count': len(suggestions)
+        })
+
+    except Exception as e:
+        logger.error(f"Erro nas sugestões: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@routes.post(f'{BASE_PATH}/items/lookup')
+@require_api_key
+async def lookup_items_batch(request):
+    """
+    Consultar vários itens em uma requisição
+    Body JSON:
+    {
+        "ids": [number],
+        "codes": ["string"]  (código ou código de barras)
+    }
+    """
+    try:
+        try:
+            ids, codes = parse_lookup_refs(await get_json(request))
+        except ValueError as e:
+            return error_response(str(e))
+
+        async with get_db_connection(request) as db:
+            result = await lookup_items_async(db, ids, codes)
+
+        return success_response(result)
+
+    except Exception as e:
+        logger.error(f"Erro na consulta em lote: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@routes.get(f'{BASE_PATH}/items/{{code}}')
+@require_api_key
+async def get_item(request):
+    """Obter item específico por código"""
+    code = request.match_info['code']
+    try:
+        async with get_db_connection(request) as db:
+            items = await fetch_dicts(db, "SELECT * FROM itens WHERE codigo = ?", (code,))
+
+        if not items:
+            return error_response("Item não encontrado", 404)
+
+        return success_response(items[0])
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar item {code}: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@routes.get(f'{BASE_PATH}/items/{{code}}/qr')
+@require_api_key
+async def get_item_qr(request):
+    """
+    QR code do item em PNG, gerado sob demanda
+    Query params:
+    - v: ETag atual (URL versionada recebe cache imutável)
+    """
+    code = request.match_info['code']
+    try:
+        async with get_db_connection(request) as db:
+            cursor = await db.execute(
+                f"SELECT {', '.join(QR_FIELDS)} FROM itens WHERE codigo = ?", (code,)
+            )
+            item = await cursor.fetchone()
+
+        if not item:
+            return error_response("Item não encontrado", 404)
+
+        item_dict = dict(zip(QR_FIELDS, item))
+        etag = qr_etag(item_dict)
+        headers = qr_response_headers(etag, request.query.get('v'))
+
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return web.Response(status=304, headers=headers)
+
+        png, _ = await asyncio.to_thread(get_qr_cache().get_png, item_dict)
+        return web.Response(body=png, content_type='image/png', headers=headers)
+
+    except Exception as e:
+        logger.error(f"Erro ao gerar QR do item {code}: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@routes.post(f'{BASE_PATH}/items')
+@require_api_key
+async def create_item(request):
+    """
+    Criar novo item
+    Body JSON:
+    {
+        "nome": "string",
+        "descricao": "string",
+        "quantidade": number,
+        "categoria": "string",
+        "localizacao": "string",
+        "fornecedor": "string",
+        "preco_unitario": number
+    }
+    """
+    try:
+        data = await get_json(request)
+
+        if not data or not data.get('nome'):
+            return error_response("Nome é obrigatório")
+
+        # Gerar código automático (reserva síncrona na tabela de sequências)
+        from utils.code_generator import CodeGenerator
+        code_gen = await asyncio.to_thread(CodeGenerator, request.app[DB_PATH_KEY])
+        codigo = await asyncio.to_thread(
+            code_gen.generate_mnemonic_code, data['nome'], data.get('categoria', '')
+        )
+
+        async with get_db_connection(request) as db:
+            await db.execute("""
+                INSERT INTO itens (codigo, nome, descricao, quantidade, categoria,
+                                 localizacao, fornecedor, preco_unitario, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                codigo,
+                data['nome'],
+                data.get('descricao', ''),
+                data.get('quantidade', 0),
+                data.get('categoria', ''),
+                data.get('localizacao', ''),
+                data.get('fornecedor', ''),
+                data.get('preco_unitario', 0.0),
+                data.get('status', 'ativo')
+            ))
+            await db.commit()
+        # Normaliza o texto de busca fora do loop (aiosqlite não usa `connect`)
+        await asyncio.to_thread(sync_search_index, request.app[DB_PATH_KEY])
+        get_suggestion_index(request.app[DB_PATH_KEY]).invalidate()
+
+        return success_response({
+            'codigo': codigo,
+            'message': f'Item {codigo} criado com sucesso'
+        }, "Item criado com sucesso")
+
+    except Exception as e:
+        logger.error(f"Erro ao criar item: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@routes.put(f'{BASE_PATH}/items/{{code}}')
+@require_api_key
+async def update_item(request):
+    """Atualizar item existente"""
+    code = request.match_info['code']
+    try:
+        data = await get_json(request)
+
+        if not data:
+            return error_response("Dados não fornecidos")
+
+        # Construir query de update dinamicamente
+        update_fields = []
+        params = []
+
+        for field in ['nome', 'descricao', 'quantidade', 'categoria',
+                     'localizacao', 'fornecedor', 'preco_unitario']:
+            if field in data:
+                update_fields.append(f"{field} = ?")
+                params.append(data[field])
+
+        async with get_db_connection(request) as db:
+            cursor = await db.execute("SELECT id FROM itens WHERE codigo = ?", (code,))
+            if not await cursor.fetchone():
+                return error_response("Item não encontrado", 404)
+
+            if not update_fields:
+                return error_response("Nenhum campo para atualizar")
+
+            params.append(code)
+
+            query = f"UPDATE itens SET {', '.join(update_fields)} WHERE codigo = ?"
+            await db.execute(query, params)
+            await db.commit()
+        await asyncio.to_thread(sync_search_index, request.app[DB_PATH_KEY])
+        get_suggestion_index(request.app[DB_PATH_KEY]).invalidate()
+
+        return success_response({
+            'codigo': code,
+            'updated_fields': list(data.keys())
+        }, "Item atualizado com sucesso")
+
+    except Exception as e:
+        logger.error(f"Erro ao atualizar item {code}: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@routes.delete(f'{BASE_PATH}/items/{{code}}')
+@require_api_key
+async def delete_item(request):
+    """Remover item"""
+    code = request.match_info['code']
+    try:
+        async with get_db_connection(request) as db:
+            cursor = await db.execute("DELETE FROM itens WHERE codigo = ?", (code,))
+            if cursor.rowcount == 0:
+                return error_response("Item não encontrado", 404)
+            await db.commit()
+
+        return success_response({
+            'codigo': code
+        }, "Item removido com sucesso")
+
+    except Exception as e:
+        logger.error(f"Erro ao remover item {code}: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@routes.post(f'{BASE_PATH}/inventory')
+@require_api_key
+async def apply_inventory(request):
+    """
+    Aplicar contagem de inventário
+    Body JSON:
+    {
+        "items": [{"id": number, "quantity": number}],
+        "usuario": "string"
+    }
+    """
+    try:
+        data = await get_json(request)
+
+        if not data or not isinstance(data.get('items'), list):
+            return error_response("Lista de itens é obrigatória")
+
+        reconciler = InventoryReconciler(request.app[DB_PATH_KEY])
+        report = await asyncio.to_thread(
+            reconciler.apply_counts, data['items'], data.get('usuario', 'API'),
+            acao='Inventário API'
+        )
+
+        return success_response(report, "Inventário aplicado com sucesso")
+
+    except ValueError as e:
+        return error_response(str(e))
+    except Exception as e:
+        logger.error(f"Erro ao aplicar inventário: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+# ==================== ENDPOINTS DE CATEGORIAS ====================
+
+@routes.get(f'{BASE_PATH}/categories')
+@require_api_key
+async def get_categories(request):
+    """Listar todas as categorias com contagem"""
+    try:
+        async with get_db_connection(request) as db:
+            stats = stats_from_rows(await (await db.execute(SNAPSHOT_QUERY)).fetchall())
+
+        categories_list = [
+            {
+                'name': categoria,
+                'item_count': metrics['itens'],
+                'total_quantity': metrics['quantidade']
+            }
+            for categoria, metrics in ranked(stats['categoria'])
+        ]
+
+        return success_response(categories_list)
+
+    except Exception as e:
+        logger.error(f"Erro ao buscar categorias: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+# ==================== ENDPOINTS DE RELATÓRIOS ====================
+
+@routes.get(f'{BASE_PATH}/reports/dashboard')
+@require_api_key
+async def dashboard_stats(request):
+    """Estatísticas para dashboard"""
+    try:
+        async with get_db_connection(request) as db:
+            # Totais materializados em stats_snapshot (sem varrer itens)
+            snapshot = stats_from_rows(await (await db.execute(SNAPSHOT_QUERY)).fetchall())
+            total = snapshot['total']
+
+            stats = {
+                'total_items': total['itens'],
+                'total_quantity': total['quantidade'],
+                'low_stock_items': total['estoque_baixo'],
+                'total_value': total['valor'],
+                'top_categories': [
+                    {'category': categoria, 'count': metrics['itens']}
+                    for categoria, metrics in ranked(snapshot['categoria'])[:5]
+                ]
+            }
+
+            # Itens recentes
+            cursor = await db.execute("""
+                SELECT codigo, nome, data_cadastro
+                FROM itens
+                ORDER BY data_cadastro DESC
+                LIMIT 5
+            """)
+            stats['recent_items'] = [
+                {'code': row[0], 'name': row[1], 'date': row[2]}
+                for row in await cursor.fetchall()
+            ]
+
+        return success_response(stats)
+
+    except Exception as e:
+        logger.error(f"Erro ao gerar relatório: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+# ==================== WEBHOOKS ====================
+
+@routes.post(f'{BASE_PATH}/webhooks/stock-alert')
+@require_api_key
+async def stock_alert_webhook(request):
+    """Webhook para alertas de estoque baixo"""
+    try:
+        data = await get_json(request) or {}
+        webhook_url = data.get('webhook_url')
+        threshold = data.get('threshold', 5)
+
+        if not webhook_url:
+            return error_response("URL do webhook é obrigatória")
+
+        # Buscar itens com estoque baixo
+        async with get_db_connection(request) as db:
+            cursor = await db.execute("""
+                SELECT codigo, nome, quantidade
+                FROM itens
+                WHERE quantidade < ?
+            """, (threshold,))
+            low_stock_items = await cursor.fetchall()
+
+        if low_stock_items:
+            # Aqui você enviaria para o webhook
+            # requests.post(webhook_url, json={'low_stock_items': low_stock_items})
+            pass
+
+        return success_response({
+            'webhook_url': webhook_url,
+            'threshold': threshold,
+            'low_stock_count': len(low_stock_items)
+        }, "Webhook configurado com sucesso")
+
+    except Exception as e:
+        logger.error(f"Erro no webhook: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+# ==================== APLICAÇÃO ====================
+
+def create_app(db_path=DB_PATH):
+    """Cria a aplicação aiohttp (migrações aplicadas antes de aceitar requisições)"""
+    run_migrations(db_path)
+
+    app = web.Application(middlewares=[cors_middleware])
+    app[DB_PATH_KEY] = db_path
+    app.add_routes(routes)
+    app.on_cleanup.append(close_async_pools)
+    return app
+
+# ==================== MAIN ====================
+
+if __name__ == '__main__':
+    port = int(os.environ.get('PORT', 5000))
+    web.run_app(create_app(), host='0.0.0.0', port=port)
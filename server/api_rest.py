@@ -4,17 +4,31 @@ API REST Avançada para Sistema de Estoque
 Endpoints profissionais com documentação OpenAPI
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 from functools import wraps
-import sqlite3
 import json
+import math
 import os
+import sys
 import time
 import hashlib
 from datetime import datetime, timedelta
 import logging
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.database import connect
+from utils.inventory_reconciler import InventoryReconciler
+from utils.item_export import export_filename, export_items, export_mimetype
+from utils.item_listing import MAX_PAGE_SIZE, count_items, fetch_items_page
+from utils.item_lookup import lookup_items, parse_lookup_refs
+from utils.migrations import run_migrations
+from utils.qr_cache import QR_FIELDS, etag_matches, get_qr_cache, qr_etag, qr_response_headers
+from utils.rate_limiter import get_rate_limiter
+from utils.search_index import index_pending
+from utils.stats_snapshot import ranked, read_stats
+from utils.suggestion_index import get_suggestion_index, parse_suggestion_limit, suggestion_limits
+
 # Configuração
 app = Flask(__name__)
 CORS(app)
@@ -24,9 +38,8 @@ app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-in-pr
 API_VERSION = 'v1'
 BASE_PATH = f'/api/{API_VERSION}'
 
-# Rate limiting simples
-request_counts = {}
-RATE_LIMIT = 100  # requests por hora
+# Rate limiting (token bucket por IP ou API key, configurado por variáveis de ambiente)
+rate_limiter = get_rate_limiter()
 
 # Logging
 logging.basicConfig(level=logging.INFO)
@@ -35,6 +48,9 @@ logger = logging.getLogger(__name__)
 # Paths
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 
+# Migrações na importação: sob gunicorn o bloco __main__ não roda (idempotente)
+run_migrations(DB_PATH)
+
 # ==================== AUTENTICAÇÃO ====================
 
 def generate_api_key(user_id):
@@ -52,20 +68,11 @@ def require_api_key(f):
             return jsonify({'error': 'API key required'}), 401
         
         # Verificar rate limiting
-        client_ip = request.remote_addr
-        now = time.time()
-        hour_ago = now - 3600
-        
-        if client_ip not in request_counts:
-            request_counts[client_ip] = []
-        
-        # Limpar requests antigos
-        request_counts[client_ip] = [req_time for req_time in request_counts[client_ip] if req_time > hour_ago]
-        
-        if len(request_counts[client_ip]) >= RATE_LIMIT:
-            return jsonify({'error': 'Rate limit exceeded'}), 429
-        
-        request_counts[client_ip].append(now)
+        decision = rate_limiter.check_request(api_key, request.remote_addr)
+        if not decision.allowed:
+            response = jsonify({'error': 'Rate limit exceeded'})
+            response.headers['Retry-After'] = str(math.ceil(decision.retry_after))
+            return response, 429
         
         return f(*args, **kwargs)
     return decorated_function
@@ -73,8 +80,8 @@ def require_api_key(f):
 # ==================== UTILITÁRIOS ====================
 
 def get_db_connection():
-    """Conexão com banco SQLite"""
-    return sqlite3.connect(DB_PATH)
+    """Conexão com banco SQLite (reutilizada por thread, commit ao sair do bloco with)"""
+    return connect(DB_PATH)
 
 def success_response(data, message="Success"):
     """Resposta de sucesso padronizada"""
@@ -104,7 +111,12 @@ def api_info():
         'description': 'API REST para gerenciamento de estoque',
         'endpoints': {
             'items': f'{BASE_PATH}/items',
+            'qr_code': f'{BASE_PATH}/items/{{code}}/qr',
             'search': f'{BASE_PATH}/items/search',
+            'suggestions': f'{BASE_PATH}/items/suggestions',
+            'export': f'{BASE_PATH}/items/export',
+            'lookup': f'{BASE_PATH}/items/lookup',
+            'inventory': f'{BASE_PATH}/inventory',
             'categories': f'{BASE_PATH}/categories',
             'reports': f'{BASE_PATH}/reports',
             'webhooks': f'{BASE_PATH}/webhooks'
@@ -123,74 +135,77 @@ def api_docs():
 @require_api_key
 def get_items():
     """
-    Listar todos os itens
+    Listar todos os itens (ordenados por nome)
     Query params:
     - limit: número máximo de itens (padrão: 50)
-    - offset: pular N itens (padrão: 0)
+    - cursor: next_cursor da página anterior (paginação por cursor)
+    - offset: pular N itens (compatibilidade; ignorado quando há cursor)
     - category: filtrar por categoria
     - low_stock: apenas itens com estoque baixo (true/false)
     """
     try:
-        limit = min(int(request.args.get('limit', 50)), 1000)
+        limit = min(int(request.args.get('limit', 50)), MAX_PAGE_SIZE)
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
         category = request.args.get('category')
         low_stock = request.args.get('low_stock', '').lower() == 'true'
         
         with get_db_connection() as db:
-            query = "SELECT * FROM itens WHERE 1=1"
-            params = []
-            
-            if category:
-                query += " AND categoria = ?"
-                params.append(category)
-            
-            if low_stock:
-                query += " AND quantidade < 5"
-            
-            query += " ORDER BY nome LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
-            
-            cursor = db.execute(query, params)
-            items = cursor.fetchall()
-            
-            # Converter para dicionários
-            columns = [description[0] for description in cursor.description]
-            items_list = [dict(zip(columns, item)) for item in items]
-            
-            # Contar total
-            count_query = "SELECT COUNT(*) FROM itens WHERE 1=1"
-            count_params = []
-            if category:
-                count_query += " AND categoria = ?"
-                count_params.append(category)
-            if low_stock:
-                count_query += " AND quantidade < 5"
-                
-            cursor = db.execute(count_query, count_params)
-            total = cursor.fetchone()[0]
+            items_list, has_more, next_cursor = fetch_items_page(
+                db, limit, category, low_stock, cursor=cursor, offset=offset
+            )
+            total = count_items(db, DB_PATH, category, low_stock)
         
         return success_response({
             'items': items_list,
             'pagination': {
                 'total': total,
                 'limit': limit,
-                'offset': offset,
-                'has_more': offset + limit < total
+                'offset': None if cursor else offset,
+                'has_more': has_more,
+                'next_cursor': next_cursor
             }
         })
         
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         logger.error(f"Erro ao buscar itens: {e}")
         return error_response("Erro interno do servidor", 500)
 
+@app.route(f'{BASE_PATH}/items/export', methods=['GET'])
+@require_api_key
+def export_items_stream():
+    """
+    Exportar o catálogo completo em streaming
+    Query params:
+    - format: ndjson (padrão) ou csv
+    - gzip: baixar como arquivo .gz (true/false)
+    - category / low_stock: mesmos filtros da listagem
+    """
+    try:
+        fmt = request.args.get('format', 'ndjson').lower()
+        compress = request.args.get('gzip', '').lower() == 'true'
+        chunks = export_items(
+            DB_PATH, fmt,
+            category=request.args.get('category'),
+            low_stock=request.args.get('low_stock', '').lower() == 'true',
+            compress=compress
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+    
+    headers = {'Content-Disposition': f'attachment; filename="{export_filename(fmt, compress)}"'}
+    return Response(chunks, mimetype=export_mimetype(fmt, compress), headers=headers)
+
 @app.route(f'{BASE_PATH}/items/<code>', methods=['GET'])
 @require_api_key
-async def get_item(code):
+def get_item(code):
     """Obter item específico por código"""
     try:
-        async with await get_db_connection() as db:
-            cursor = await db.execute("SELECT * FROM itens WHERE codigo = ?", (code,))
-            item = await cursor.fetchone()
+        with get_db_connection() as db:
+            cursor = db.execute("SELECT * FROM itens WHERE codigo = ?", (code,))
+            item = cursor.fetchone()
             
             if not item:
                 return error_response("Item não encontrado", 404)
@@ -204,9 +219,67 @@ async def get_item(code):
         logger.error(f"Erro ao buscar item {code}: {e}")
         return error_response("Erro interno do servidor", 500)
 
+@app.route(f'{BASE_PATH}/items/lookup', methods=['POST'])
+@require_api_key
+def lookup_items_batch():
+    """
+    Consultar vários itens em uma requisição
+    Body JSON:
+    {
+        "ids": [number],
+        "codes": ["string"]  (código ou código de barras)
+    }
+    """
+    try:
+        try:
+            ids, codes = parse_lookup_refs(request.get_json(silent=True))
+        except ValueError as e:
+            return error_response(str(e))
+        
+        with get_db_connection() as db:
+            result = lookup_items(db, ids, codes)
+        
+        return success_response(result)
+        
+    except Exception as e:
+        logger.error(f"Erro na consulta em lote: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@app.route(f'{BASE_PATH}/items/<code>/qr', methods=['GET'])
+@require_api_key
+def get_item_qr(code):
+    """
+    QR code do item em PNG, gerado sob demanda
+    Query params:
+    - v: ETag atual (URL versionada recebe cache imutável)
+    """
+    try:
+        with get_db_connection() as db:
+            cursor = db.execute(
+                f"SELECT {', '.join(QR_FIELDS)} FROM itens WHERE codigo = ?", (code,)
+            )
+            item = cursor.fetchone()
+        
+        if not item:
+            return error_response("Item não encontrado", 404)
+        
+        item_dict = dict(zip(QR_FIELDS, item))
+        etag = qr_etag(item_dict)
+        headers = qr_response_headers(etag, request.args.get('v'))
+        
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=headers)
+        
+        png, _ = get_qr_cache().get_png(item_dict)
+        return Response(png, mimetype='image/png', headers=headers)
+        
+    except Exception as e:
+        logger.error(f"Erro ao gerar QR do item {code}: {e}")
+        return error_response("Erro interno do servidor", 500)
+
 @app.route(f'{BASE_PATH}/items', methods=['POST'])
 @require_api_key
-async def create_item():
+def create_item():
     """
     Criar novo item
     Body JSON:
@@ -229,12 +302,12 @@ async def create_item():
         # Gerar código automático
         from utils.code_generator import CodeGenerator
         code_gen = CodeGenerator(DB_PATH)
-        codigo = await code_gen.generate_code(data['nome'])
+        codigo = code_gen.generate_mnemonic_code(data['nome'], data.get('categoria', ''))
         
-        async with await get_db_connection() as db:
-            await db.execute("""
+        with get_db_connection() as db:
+            db.execute("""
                 INSERT INTO itens (codigo, nome, descricao, quantidade, categoria, 
-                                 localizacao, fornecedor, preco_unitario, data_cadastro)
+                                 localizacao, fornecedor, preco_unitario, status)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 codigo,
@@ -245,9 +318,11 @@ async def create_item():
                 data.get('localizacao', ''),
                 data.get('fornecedor', ''),
                 data.get('preco_unitario', 0.0),
-                datetime.now().isoformat()
+                data.get('status', 'ativo')
             ))
-            await db.commit()
+            index_pending(db)
+            db.commit()
+            get_suggestion_index(DB_PATH).invalidate()
         
         return success_response({
             'codigo': codigo,
@@ -260,7 +335,7 @@ async def create_item():
 
 @app.route(f'{BASE_PATH}/items/<code>', methods=['PUT'])
 @require_api_key
-async def update_item(code):
+def update_item(code):
     """Atualizar item existente"""
     try:
         data = request.get_json()
@@ -269,9 +344,9 @@ async def update_item(code):
             return error_response("Dados não fornecidos")
         
         # Verificar se item existe
-        async with await get_db_connection() as db:
-            cursor = await db.execute("SELECT id FROM itens WHERE codigo = ?", (code,))
-            item = await cursor.fetchone()
+        with get_db_connection() as db:
+            cursor = db.execute("SELECT id FROM itens WHERE codigo = ?", (code,))
+            item = cursor.fetchone()
             
             if not item:
                 return error_response("Item não encontrado", 404)
@@ -289,13 +364,13 @@ async def update_item(code):
             if not update_fields:
                 return error_response("Nenhum campo para atualizar")
             
-            update_fields.append("data_atualizacao = ?")
-            params.append(datetime.now().isoformat())
             params.append(code)
             
             query = f"UPDATE itens SET {', '.join(update_fields)} WHERE codigo = ?"
-            await db.execute(query, params)
-            await db.commit()
+            db.execute(query, params)
+            index_pending(db)
+            db.commit()
+            get_suggestion_index(DB_PATH).invalidate()
         
         return success_response({
             'codigo': code,
@@ -308,18 +383,18 @@ async def update_item(code):
 
 @app.route(f'{BASE_PATH}/items/<code>', methods=['DELETE'])
 @require_api_key
-async def delete_item(code):
+def delete_item(code):
     """Remover item"""
     try:
-        async with await get_db_connection() as db:
-            cursor = await db.execute("SELECT id FROM itens WHERE codigo = ?", (code,))
-            item = await cursor.fetchone()
+        with get_db_connection() as db:
+            cursor = db.execute("SELECT id FROM itens WHERE codigo = ?", (code,))
+            item = cursor.fetchone()
             
             if not item:
                 return error_response("Item não encontrado", 404)
             
-            await db.execute("DELETE FROM itens WHERE codigo = ?", (code,))
-            await db.commit()
+            db.execute("DELETE FROM itens WHERE codigo = ?", (code,))
+            db.commit()
         
         return success_response({
             'codigo': code
@@ -333,7 +408,7 @@ async def delete_item(code):
 
 @app.route(f'{BASE_PATH}/items/search', methods=['GET'])
 @require_api_key
-async def search_items():
+def search_items():
     """
     Buscar itens
     Query params:
@@ -347,8 +422,8 @@ async def search_items():
         if not query_term:
             return error_response("Termo de busca é obrigatório")
         
-        async with await get_db_connection() as db:
-            cursor = await db.execute("""
+        with get_db_connection() as db:
+            cursor = db.execute("""
                 SELECT * FROM itens 
                 WHERE nome LIKE ? OR codigo LIKE ? OR descricao LIKE ? OR categoria LIKE ?
                 ORDER BY 
@@ -365,7 +440,7 @@ async def search_items():
                 limit
             ))
             
-            items = await cursor.fetchall()
+            items = cursor.fetchall()
             columns = [description[0] for description in cursor.description]
             items_list = [dict(zip(columns, item)) for item in items]
         
@@ -379,31 +454,84 @@ async def search_items():
         logger.error(f"Erro na busca: {e}")
         return error_response("Erro interno do servidor", 500)
 
+@app.route(f'{BASE_PATH}/items/suggestions', methods=['GET'])
+@require_api_key
+def get_suggestions():
+    """
+    Sugestões de autocomplete (nome, categoria e marca)
+    Query params:
+    - q: termo parcial (mínimo 2 caracteres)
+    - limit: máximo de sugestões
+    """
+    try:
+        partial = request.args.get('q', '').strip()
+        try:
+            limit = parse_suggestion_limit(request.args.get('limit'))
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        if len(partial) < 2:
+            return success_response({'query': partial, 'suggestions': [], 'count': 0})
+        
+        suggestions = get_suggestion_index(DB_PATH).suggest(partial, suggestion_limits(limit))[:limit]
+        
+        return success_response({
+            'query': partial,
+            'suggestions': suggestions,
+            'count': len(suggestions)
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro nas sugestões: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@app.route(f'{BASE_PATH}/inventory', methods=['POST'])
+@require_api_key
+def apply_inventory():
+    """
+    Aplicar contagem de inventário
+    Body JSON:
+    {
+        "items": [{"id": number, "quantity": number}],
+        "usuario": "string"
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('items'), list):
+            return error_response("Lista de itens é obrigatória")
+        
+        reconciler = InventoryReconciler(DB_PATH)
+        report = reconciler.apply_counts(data['items'], data.get('usuario', 'API'),
+                                         acao='Inventário API')
+        
+        return success_response(report, "Inventário aplicado com sucesso")
+        
+    except ValueError as e:
+        return error_response(str(e))
+    except Exception as e:
+        logger.error(f"Erro ao aplicar inventário: {e}")
+        return error_response("Erro interno do servidor", 500)
+
 # ==================== ENDPOINTS DE CATEGORIAS ====================
 
 @app.route(f'{BASE_PATH}/categories', methods=['GET'])
 @require_api_key
-async def get_categories():
+def get_categories():
     """Listar todas as categorias com contagem"""
     try:
-        async with await get_db_connection() as db:
-            cursor = await db.execute("""
-                SELECT categoria, COUNT(*) as count, SUM(quantidade) as total_quantity
-                FROM itens 
-                WHERE categoria IS NOT NULL AND categoria != ''
-                GROUP BY categoria 
-                ORDER BY count DESC
-            """)
-            categories = await cursor.fetchall()
-            
-            categories_list = [
-                {
-                    'name': cat[0],
-                    'item_count': cat[1],
-                    'total_quantity': cat[2]
-                }
-                for cat in categories
-            ]
+        with get_db_connection() as db:
+            stats = read_stats(db)
+        
+        categories_list = [
+            {
+                'name': categoria,
+                'item_count': metrics['itens'],
+                'total_quantity': metrics['quantidade']
+            }
+            for categoria, metrics in ranked(stats['categoria'])
+        ]
         
         return success_response(categories_list)
         
@@ -415,45 +543,27 @@ async def get_categories():
 
 @app.route(f'{BASE_PATH}/reports/dashboard', methods=['GET'])
 @require_api_key
-async def dashboard_stats():
+def dashboard_stats():
     """Estatísticas para dashboard"""
     try:
-        async with await get_db_connection() as db:
-            # Estatísticas gerais
-            stats = {}
-            
-            # Total de itens
-            cursor = await db.execute("SELECT COUNT(*) FROM itens")
-            stats['total_items'] = (await cursor.fetchone())[0]
-            
-            # Quantidade total
-            cursor = await db.execute("SELECT SUM(quantidade) FROM itens")
-            stats['total_quantity'] = (await cursor.fetchone())[0] or 0
-            
-            # Estoque baixo
-            cursor = await db.execute("SELECT COUNT(*) FROM itens WHERE quantidade < 5")
-            stats['low_stock_items'] = (await cursor.fetchone())[0]
-            
-            # Valor total do estoque
-            cursor = await db.execute("SELECT SUM(quantidade * preco_unitario) FROM itens")
-            stats['total_value'] = (await cursor.fetchone())[0] or 0
+        with get_db_connection() as db:
+            # Totais materializados em stats_snapshot (sem varrer itens)
+            snapshot = read_stats(db)
+            total = snapshot['total']
             
-            # Top categorias
-            cursor = await db.execute("""
-                SELECT categoria, COUNT(*) as count 
-                FROM itens 
-                WHERE categoria IS NOT NULL AND categoria != ''
-                GROUP BY categoria 
-                ORDER BY count DESC 
-                LIMIT 5
-            """)
-            stats['top_categories'] = [
-                {'category': row[0], 'count': row[1]} 
-                for row in await cursor.fetchall()
-            ]
+            stats = {
+                'total_items': total['itens'],
+                'total_quantity': total['quantidade'],
+                'low_stock_items': total['estoque_baixo'],
+                'total_value': total['valor'],
+                'top_categories': [
+                    {'category': categoria, 'count': metrics['itens']}
+                    for categoria, metrics in ranked(snapshot['categoria'])[:5]
+                ]
+            }
             
             # Itens recentes
-            cursor = await db.execute("""
+            cursor = db.execute("""
                 SELECT codigo, nome, data_cadastro 
                 FROM itens 
                 ORDER BY data_cadastro DESC 
@@ -461,7 +571,7 @@ async def dashboard_stats():
             """)
             stats['recent_items'] = [
                 {'code': row[0], 'name': row[1], 'date': row[2]}
-                for row in await cursor.fetchall()
+                for row in cursor.fetchall()
             ]
         
         return success_response(stats)
@@ -474,7 +584,7 @@ async def dashboard_stats():
 
 @app.route(f'{BASE_PATH}/webhooks/stock-alert', methods=['POST'])
 @require_api_key
-async def stock_alert_webhook():
+def stock_alert_webhook():
     """Webhook para alertas de estoque baixo"""
     try:
         data = request.get_json()
@@ -485,13 +595,13 @@ async def stock_alert_webhook():
             return error_response("URL do webhook é obrigatória")
         
         # Buscar itens com estoque baixo
-        async with await get_db_connection() as db:
-            cursor = await db.execute("""
+        with get_db_connection() as db:
+            cursor = db.execute("""
                 SELECT codigo, nome, quantidade 
                 FROM itens 
                 WHERE quantidade < ?
             """, (threshold,))
-            low_stock_items = await cursor.fetchall()
+            low_stock_items = cursor.fetchall()
         
         if low_stock_items:
             # Aqui você enviaria para o webhook
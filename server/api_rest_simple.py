@@ -4,17 +4,31 @@ API REST Simplificada para Sistema de Estoque
 Funcional e pronta para uso
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory
 from flask_cors import CORS
 from functools import wraps
 import sqlite3
 import json
+import math
 import os
-import time
+import sys
 import hashlib
 from datetime import datetime
 import logging
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.database import connect
+from utils.inventory_reconciler import InventoryReconciler
+from utils.item_export import export_filename, export_items, export_mimetype
+from utils.item_listing import MAX_PAGE_SIZE, count_items, fetch_items_page
+from utils.item_lookup import lookup_items, parse_lookup_refs
+from utils.migrations import run_migrations
+from utils.qr_cache import QR_FIELDS, etag_matches, get_qr_cache, qr_etag, qr_response_headers
+from utils.rate_limiter import get_rate_limiter
+from utils.search_index import index_pending
+from utils.stats_snapshot import ranked, read_stats
+from utils.suggestion_index import get_suggestion_index, parse_suggestion_limit, suggestion_limits
+
 # Configuração
 app = Flask(__name__)
 CORS(app)
@@ -24,9 +38,11 @@ API_VERSION = 'v1'
 BASE_PATH = f'/api/{API_VERSION}'
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 
-# Rate limiting simples
-request_counts = {}
-RATE_LIMIT = 100
+# Migrações na importação: sob gunicorn o bloco __main__ não roda (idempotente)
+run_migrations(DB_PATH)
+
+# Rate limiting (token bucket por IP ou API key, configurado por variáveis de ambiente)
+rate_limiter = get_rate_limiter()
 
 # Logging
 logging.basicConfig(level=logging.INFO)
@@ -42,30 +58,20 @@ def require_api_key(f):
         if not api_key:
             return jsonify({'error': 'API key required', 'success': False}), 401
         
-        # Rate limiting básico
-        client_ip = request.remote_addr
-        now = time.time()
-        hour_ago = now - 3600
-        
-        if client_ip not in request_counts:
-            request_counts[client_ip] = []
-        
-        request_counts[client_ip] = [req_time for req_time in request_counts[client_ip] if req_time > hour_ago]
-        
-        if len(request_counts[client_ip]) >= RATE_LIMIT:
-            return jsonify({'error': 'Rate limit exceeded', 'success': False}), 429
-        
-        request_counts[client_ip].append(now)
+        # Verificar rate limiting
+        decision = rate_limiter.check_request(api_key, request.remote_addr)
+        if not decision.allowed:
+            response = jsonify({'error': 'Rate limit exceeded', 'success': False})
+            response.headers['Retry-After'] = str(math.ceil(decision.retry_after))
+            return response, 429
         return f(*args, **kwargs)
     return decorated_function
 
 # ==================== UTILITÁRIOS ====================
 
 def get_db_connection():
-    """Conexão com banco SQLite"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Para retornar como dicionário
-    return conn
+    """Conexão com banco SQLite (reutilizada por thread, commit ao sair do bloco with)"""
+    return connect(DB_PATH, row_factory=sqlite3.Row)  # Para retornar como dicionário
 
 def success_response(data, message="Success"):
     """Resposta de sucesso padronizada"""
@@ -96,10 +102,15 @@ def api_info():
         'endpoints': [
             'GET /api/v1/items - Listar itens',
             'GET /api/v1/items/{code} - Item específico',
+            'GET /api/v1/items/{code}/qr - QR code do item (PNG)',
             'POST /api/v1/items - Criar item',
             'PUT /api/v1/items/{code} - Atualizar item',
             'DELETE /api/v1/items/{code} - Remover item',
             'GET /api/v1/items/search - Buscar itens',
+            'GET /api/v1/items/suggestions - Sugestões de autocomplete',
+            'GET /api/v1/items/export - Exportar catálogo (NDJSON/CSV)',
+            'POST /api/v1/items/lookup - Consultar vários itens (ids/códigos)',
+            'POST /api/v1/inventory - Aplicar contagem de inventário',
             'GET /api/v1/categories - Listar categorias',
             'GET /api/v1/reports/dashboard - Estatísticas'
         ],
@@ -121,55 +132,81 @@ def api_docs():
 @app.route(f'{BASE_PATH}/items', methods=['GET'])
 @require_api_key
 def get_items():
-    """Listar todos os itens"""
+    """Listar todos os itens (paginação por cursor ou offset)"""
     try:
-        limit = min(int(request.args.get('limit', 50)), 1000)
+        limit = min(int(request.args.get('limit', 50)), MAX_PAGE_SIZE)
         offset = int(request.args.get('offset', 0))
+        cursor = request.args.get('cursor')
         category = request.args.get('category')
         low_stock = request.args.get('low_stock', '').lower() == 'true'
         
         with get_db_connection() as conn:
-            query = "SELECT * FROM itens WHERE 1=1"
-            params = []
-            
-            if category:
-                query += " AND categoria = ?"
-                params.append(category)
-            
-            if low_stock:
-                query += " AND quantidade < 5"
-            
-            query += " ORDER BY nome LIMIT ? OFFSET ?"
-            params.extend([limit, offset])
-            
-            cursor = conn.execute(query, params)
-            items = [dict(row) for row in cursor.fetchall()]
-            
-            # Contar total
-            count_query = "SELECT COUNT(*) FROM itens WHERE 1=1"
-            count_params = []
-            if category:
-                count_query += " AND categoria = ?"
-                count_params.append(category)
-            if low_stock:
-                count_query += " AND quantidade < 5"
-                
-            total = conn.execute(count_query, count_params).fetchone()[0]
+            items, has_more, next_cursor = fetch_items_page(
+                conn, limit, category, low_stock, cursor=cursor, offset=offset
+            )
+            total = count_items(conn, DB_PATH, category, low_stock)
         
         return success_response({
             'items': items,
             'pagination': {
                 'total': total,
                 'limit': limit,
-                'offset': offset,
-                'has_more': offset + limit < total
+                'offset': None if cursor else offset,
+                'has_more': has_more,
+                'next_cursor': next_cursor
             }
         })
         
+    except ValueError as e:
+        return error_response(str(e), 400)
     except Exception as e:
         logger.error(f"Erro ao buscar itens: {e}")
         return error_response("Erro interno do servidor", 500)
 
+@app.route(f'{BASE_PATH}/items/export', methods=['GET'])
+@require_api_key
+def export_items_stream():
+    """
+    Exportar o catálogo completo em streaming
+    Query params:
+    - format: ndjson (padrão) ou csv
+    - gzip: baixar como arquivo .gz (true/false)
+    - category / low_stock: mesmos filtros da listagem
+    """
+    try:
+        fmt = request.args.get('format', 'ndjson').lower()
+        compress = request.args.get('gzip', '').lower() == 'true'
+        chunks = export_items(
+            DB_PATH, fmt,
+            category=request.args.get('category'),
+            low_stock=request.args.get('low_stock', '').lower() == 'true',
+            compress=compress
+        )
+    except ValueError as e:
+        return error_response(str(e), 400)
+    
+    headers = {'Content-Disposition': f'attachment; filename="{export_filename(fmt, compress)}"'}
+    return Response(chunks, mimetype=export_mimetype(fmt, compress), headers=headers)
+
+@app.route(f'{BASE_PATH}/items/lookup', methods=['POST'])
+@require_api_key
+def lookup_items_batch():
+    """Consultar vários itens em uma requisição: {"ids": [...], "codes": [...]}"""
+    try:
+        try:
+            ids, codes = parse_lookup_refs(request.get_json(silent=True))
+        except ValueError as e:
+            return error_response(str(e))
+        
+        with get_db_connection() as conn:
+            result = lookup_items(conn, ids, codes)
+        
+        return success_response(result)
+        
+    except Exception as e:
+        logger.error(f"Erro na consulta em lote: {e}")
+        return error_response("Erro interno do servidor", 500)
+
 @app.route(f'{BASE_PATH}/items/<code>', methods=['GET'])
 @require_api_key
 def get_item(code):
@@ -188,6 +225,38 @@ def get_item(code):
         logger.error(f"Erro ao buscar item {code}: {e}")
         return error_response("Erro interno do servidor", 500)
 
+@app.route(f'{BASE_PATH}/items/<code>/qr', methods=['GET'])
+@require_api_key
+def get_item_qr(code):
+    """
+    QR code do item em PNG, gerado sob demanda
+    Query params:
+    - v: ETag atual (URL versionada recebe cache imutável)
+    """
+    try:
+        with get_db_connection() as db:
+            cursor = db.execute(
+                f"SELECT {', '.join(QR_FIELDS)} FROM itens WHERE codigo = ?", (code,)
+            )
+            item = cursor.fetchone()
+        
+        if not item:
+            return error_response("Item não encontrado", 404)
+        
+        item_dict = dict(zip(QR_FIELDS, item))
+        etag = qr_etag(item_dict)
+        headers = qr_response_headers(etag, request.args.get('v'))
+        
+        if etag_matches(request.headers.get('If-None-Match'), etag):
+            return Response(status=304, headers=headers)
+        
+        png, _ = get_qr_cache().get_png(item_dict)
+        return Response(png, mimetype='image/png', headers=headers)
+        
+    except Exception as e:
+        logger.error(f"Erro ao gerar QR do item {code}: {e}")
+        return error_response("Erro interno do servidor", 500)
+
 @app.route(f'{BASE_PATH}/items', methods=['POST'])
 @require_api_key
 def create_item():
@@ -214,8 +283,8 @@ def create_item():
             # Inserir item
             conn.execute("""
                 INSERT INTO itens (codigo, nome, descricao, quantidade, categoria, 
-                                 localizacao, fornecedor, preco_unitario, data_cadastro)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                                 localizacao, fornecedor, preco_unitario)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             """, (
                 codigo,
                 data['nome'],
@@ -224,10 +293,11 @@ def create_item():
                 data.get('categoria', ''),
                 data.get('localizacao', ''),
                 data.get('fornecedor', ''),
-                data.get('preco_unitario', 0.0),
-                datetime.now().isoformat()
+                data.get('preco_unitario', 0.0)
             ))
+            index_pending(conn)
             conn.commit()
+            get_suggestion_index(DB_PATH).invalidate()
         
         return success_response({
             'codigo': codigo,
@@ -269,13 +339,13 @@ def update_item(code):
             if not update_fields:
                 return error_response("Nenhum campo válido para atualizar")
             
-            update_fields.append("data_atualizacao = ?")
-            params.append(datetime.now().isoformat())
             params.append(code)
             
             query = f"UPDATE itens SET {', '.join(update_fields)} WHERE codigo = ?"
             conn.execute(query, params)
+            index_pending(conn)
             conn.commit()
+            get_suggestion_index(DB_PATH).invalidate()
         
         return success_response({
             'codigo': code,
@@ -344,28 +414,82 @@ def search_items():
         logger.error(f"Erro na busca: {e}")
         return error_response("Erro interno do servidor", 500)
 
+@app.route(f'{BASE_PATH}/items/suggestions', methods=['GET'])
+@require_api_key
+def get_suggestions():
+    """
+    Sugestões de autocomplete (nome, categoria e marca)
+    Query params:
+    - q: termo parcial (mínimo 2 caracteres)
+    - limit: máximo de sugestões
+    """
+    try:
+        partial = request.args.get('q', '').strip()
+        try:
+            limit = parse_suggestion_limit(request.args.get('limit'))
+        except ValueError as e:
+            return error_response(str(e), 400)
+        
+        if len(partial) < 2:
+            return success_response({'query': partial, 'suggestions': [], 'count': 0})
+        
+        suggestions = get_suggestion_index(DB_PATH).suggest(partial, suggestion_limits(limit))[:limit]
+        
+        return success_response({
+            'query': partial,
+            'suggestions': suggestions,
+            'count': len(suggestions)
+        })
+        
+    except Exception as e:
+        logger.error(f"Erro nas sugestões: {e}")
+        return error_response("Erro interno do servidor", 500)
+
+@app.route(f'{BASE_PATH}/inventory', methods=['POST'])
+@require_api_key
+def apply_inventory():
+    """
+    Aplicar contagem de inventário
+    Body JSON:
+    {
+        "items": [{"id": number, "quantity": number}],
+        "usuario": "string"
+    }
+    """
+    try:
+        data = request.get_json()
+        
+        if not data or not isinstance(data.get('items'), list):
+            return error_response("Lista de itens é obrigatória")
+        
+        reconciler = InventoryReconciler(DB_PATH)
+        report = reconciler.apply_counts(data['items'], data.get('usuario', 'API'),
+                                         acao='Inventário API')
+        
+        return success_response(report, "Inventário aplicado com sucesso")
+        
+    except ValueError as e:
+        return error_response(str(e))
+    except Exception as e:
+        logger.error(f"Erro ao aplicar inventário: {e}")
+        return error_response("Erro interno do servidor", 500)
+
 @app.route(f'{BASE_PATH}/categories', methods=['GET'])
 @require_api_key
 def get_categories():
     """Listar categorias"""
     try:
         with get_db_connection() as conn:
-            cursor = conn.execute("""
-                SELECT categoria, COUNT(*) as count, SUM(quantidade) as total_quantity
-                FROM itens 
-                WHERE categoria IS NOT NULL AND categoria != ''
-                GROUP BY categoria 
-                ORDER BY count DESC
-            """)
-            
-            categories = [
-                {
-                    'name': row['categoria'],
-                    'item_count': row['count'],
-                    'total_quantity': row['total_quantity'] or 0
-                }
-                for row in cursor.fetchall()
-            ]
+            stats = read_stats(conn)
+        
+        categories = [
+            {
+                'name': categoria,
+                'item_count': metrics['itens'],
+                'total_quantity': metrics['quantidade']
+            }
+            for categoria, metrics in ranked(stats['categoria'])
+        ]
         
         return success_response(categories)
         
@@ -379,37 +503,20 @@ def dashboard_stats():
     """Estatísticas para dashboard"""
     try:
         with get_db_connection() as conn:
-            stats = {}
-            
-            # Total de itens
-            stats['total_items'] = conn.execute("SELECT COUNT(*) FROM itens").fetchone()[0]
-            
-            # Quantidade total
-            result = conn.execute("SELECT SUM(quantidade) FROM itens").fetchone()[0]
-            stats['total_quantity'] = result or 0
+            # Totais materializados em stats_snapshot (sem varrer itens)
+            snapshot = read_stats(conn)
+            total = snapshot['total']
             
-            # Estoque baixo
-            stats['low_stock_items'] = conn.execute(
-                "SELECT COUNT(*) FROM itens WHERE quantidade < 5"
-            ).fetchone()[0]
-            
-            # Valor total
-            result = conn.execute("SELECT SUM(quantidade * preco_unitario) FROM itens").fetchone()[0]
-            stats['total_value'] = float(result or 0)
-            
-            # Top categorias
-            cursor = conn.execute("""
-                SELECT categoria, COUNT(*) as count 
-                FROM itens 
-                WHERE categoria IS NOT NULL AND categoria != ''
-                GROUP BY categoria 
-                ORDER BY count DESC 
-                LIMIT 5
-            """)
-            stats['top_categories'] = [
-                {'category': row['categoria'], 'count': row['count']} 
-                for row in cursor.fetchall()
-            ]
+            stats = {
+                'total_items': total['itens'],
+                'total_quantity': total['quantidade'],
+                'low_stock_items': total['estoque_baixo'],
+                'total_value': float(total['valor']),
+                'top_categories': [
+                    {'category': categoria, 'count': metrics['itens']}
+                    for categoria, metrics in ranked(snapshot['categoria'])[:5]
+                ]
+            }
             
             # Itens recentes
             cursor = conn.execute("""
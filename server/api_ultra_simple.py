@@ -6,21 +6,44 @@ Sistema de Estoque - Funcional e pronta para uso
 
 from http.server import HTTPServer, BaseHTTPRequestHandler
 import json
+import queue
+import selectors
+import socket
 import sqlite3
 import os
+import sys
+import threading
 import time
 import urllib.parse
 from datetime import datetime
 import logging
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.database import close_thread_connections, connect
+from utils.inventory_reconciler import InventoryReconciler
+from utils.item_export import export_filename, export_items, export_mimetype
+from utils.item_listing import MAX_PAGE_SIZE, count_items, fetch_items_page
+from utils.item_lookup import lookup_items, parse_lookup_refs
+from utils.migrations import run_migrations
+from utils.qr_cache import QR_FIELDS, etag_matches, get_qr_cache, qr_etag, qr_response_headers
+from utils.rate_limiter import get_rate_limiter
+from utils.search_index import index_pending
+from utils.stats_snapshot import ranked, read_stats
+from utils.suggestion_index import get_suggestion_index, parse_suggestion_limit, suggestion_limits
+
 # Configurações
 API_VERSION = 'v1'
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
 PORT = 5000
 
-# Rate limiting simples
-request_counts = {}
-RATE_LIMIT = 100
+# Threads atendendo conexões (cada uma mantém sua conexão SQLite)
+WORKERS = int(os.getenv('API_WORKERS', 16))
+
+# Segundos que uma conexão keep-alive ociosa pode prender uma thread
+KEEPALIVE_TIMEOUT = float(os.getenv('API_KEEPALIVE_TIMEOUT', 10))
+
+# Rate limiting (token bucket por IP ou API key, configurado por variáveis de ambiente)
+rate_limiter = get_rate_limiter()
 
 # Logging
 logging.basicConfig(level=logging.INFO)
@@ -28,15 +51,68 @@ logger = logging.getLogger(__name__)
 
 class EstoqueAPIHandler(BaseHTTPRequestHandler):
     
-    def _set_headers(self, status_code=200, content_type='application/json'):
+    # HTTP/1.1: conexões persistentes (toda resposta informa o tamanho do corpo)
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    # Cabeçalhos e corpo saem em writes separados: sem Nagle não há espera pelo ACK
+    disable_nagle_algorithm = True
+    _unread_body = 0
+    
+    def handle(self):
+        """Uma requisição por chamada; o PooledHTTPServer decide se a conexão continua"""
+        self.close_connection = True
+        self.handle_one_request()
+    
+    def finish(self):
+        """Mantém os arquivos da conexão abertos enquanto ela continuar ativa"""
+        if self.close_connection:
+            super().finish()
+    
+    def has_buffered_request(self):
+        """Se o cliente já enviou (pipelining) a próxima requisição e ela está no buffer"""
+        self.connection.setblocking(False)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+    
+    def parse_request(self):
+        """Registra o corpo pendente de cada requisição da conexão"""
+        self._unread_body = 0
+        if not super().parse_request():
+            return False
+        try:
+            self._unread_body = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self._unread_body = 0
+        return True
+    
+    def _set_headers(self, status_code=200, content_type='application/json', content_length=0):
         """Define headers da resposta"""
         self.send_response(status_code)
         self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(content_length))
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type, X-API-Key')
         self.end_headers()
     
+    def end_headers(self):
+        """Fecha a conexão ao fim da resposta se o corpo da requisição não foi lido"""
+        if self._unread_body:
+            # Corpo pendente seria lido como início da próxima requisição
+            self.send_header('Connection', 'close')
+            self.close_connection = True
+        super().end_headers()
+    
+    def _send_response(self, response, status_code=200):
+        """Envia o corpo JSON com Content-Length (mantém a conexão aberta)"""
+        body = response.encode()
+        self._set_headers(status_code, content_length=len(body))
+        self.wfile.write(body)
+    
     def _authenticate(self):
         """Verifica autenticação"""
         api_key = self.headers.get('X-API-Key')
@@ -44,29 +120,12 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
             return False
         
         # Rate limiting básico
-        client_ip = self.client_address[0]
-        now = time.time()
-        hour_ago = now - 3600
-        
-        if client_ip not in request_counts:
-            request_counts[client_ip] = []
-        
-        request_counts[client_ip] = [req_time for req_time in request_counts[client_ip] if req_time > hour_ago]
-        
-        if len(request_counts[client_ip]) >= RATE_LIMIT:
-            return False
-        
-        request_counts[client_ip].append(now)
-        return True
+        return rate_limiter.check_request(api_key, self.client_address[0]).allowed
     
     def _get_db_connection(self):
-        """Conexão com banco SQLite"""
-        os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        
+        """Conexão com banco SQLite (reutilizada por thread, commit ao sair do bloco with)"""
         # A tabela já existe com estrutura diferente, não precisamos criar
-        return conn
+        return connect(DB_PATH, row_factory=sqlite3.Row)
     
     def _success_response(self, data, message="Success"):
         """Resposta de sucesso padronizada"""
@@ -79,13 +138,12 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
     
     def _error_response(self, message, status_code=400):
         """Resposta de erro padronizada"""
-        self._set_headers(status_code)
         response = json.dumps({
             'success': False,
             'error': message,
             'timestamp': datetime.utcnow().isoformat()
         }, ensure_ascii=False, indent=2)
-        self.wfile.write(response.encode())
+        self._send_response(response, status_code)
     
     def _parse_body(self):
         """Parse do corpo da requisição"""
@@ -93,6 +151,7 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
             content_length = int(self.headers.get('Content-Length', 0))
             if content_length > 0:
                 body = self.rfile.read(content_length)
+                self._unread_body = 0
                 return json.loads(body.decode())
             return {}
         except:
@@ -118,6 +177,13 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
             self._handle_get_items(query_params)
         elif path.startswith(f'/api/{API_VERSION}/items/') and path.endswith('/search'):
             self._handle_search_items(query_params)
+        elif path == f'/api/{API_VERSION}/items/suggestions':
+            self._handle_suggestions(query_params)
+        elif path == f'/api/{API_VERSION}/items/export':
+            self._handle_export_items(query_params)
+        elif path.startswith(f'/api/{API_VERSION}/items/') and path.endswith('/qr'):
+            code = path.split('/')[-2]
+            self._handle_get_item_qr(code, query_params)
         elif path.startswith(f'/api/{API_VERSION}/items/'):
             code = path.split('/')[-1]
             self._handle_get_item(code)
@@ -132,6 +198,10 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
         """Handle POST requests"""
         if self.path == f'/api/{API_VERSION}/items':
             self._handle_create_item()
+        elif self.path == f'/api/{API_VERSION}/items/lookup':
+            self._handle_lookup_items()
+        elif self.path == f'/api/{API_VERSION}/inventory':
+            self._handle_apply_inventory()
         else:
             self._error_response("Endpoint não encontrado", 404)
     
@@ -153,7 +223,6 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
     
     def _handle_api_info(self):
         """Informações da API"""
-        self._set_headers()
         response = self._success_response({
             'name': 'Sistema de Estoque API',
             'version': API_VERSION,
@@ -161,16 +230,21 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
             'endpoints': [
                 'GET /api/v1/items - Listar itens',
                 'GET /api/v1/items/{code} - Item específico',
+                'GET /api/v1/items/{code}/qr - QR code do item (PNG)',
                 'POST /api/v1/items - Criar item',
                 'PUT /api/v1/items/{code} - Atualizar item',
                 'DELETE /api/v1/items/{code} - Remover item',
                 'GET /api/v1/items/search - Buscar itens',
+                'GET /api/v1/items/suggestions - Sugestões de autocomplete',
+                'GET /api/v1/items/export - Exportar catálogo (NDJSON/CSV)',
+                'POST /api/v1/items/lookup - Consultar vários itens (ids/códigos)',
+                'POST /api/v1/inventory - Aplicar contagem de inventário',
                 'GET /api/v1/categories - Listar categorias',
                 'GET /api/v1/reports/dashboard - Estatísticas'
             ],
             'authentication': 'Header: X-API-Key'
         })
-        self.wfile.write(response.encode())
+        self._send_response(response)
     
     def _handle_get_items(self, params):
         """Listar itens"""
@@ -179,51 +253,32 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
             return
         
         try:
-            limit = min(int(params.get('limit', 50)), 1000)
+            limit = min(int(params.get('limit', 50)), MAX_PAGE_SIZE)
             offset = int(params.get('offset', 0))
+            cursor = params.get('cursor')
             category = params.get('category')
             low_stock = params.get('low_stock', '').lower() == 'true'
             
             with self._get_db_connection() as conn:
-                query = "SELECT * FROM itens WHERE 1=1"
-                query_params = []
-                
-                if category:
-                    query += " AND categoria = ?"
-                    query_params.append(category)
-                
-                if low_stock:
-                    query += " AND quantidade < 5"
-                
-                query += " ORDER BY nome LIMIT ? OFFSET ?"
-                query_params.extend([limit, offset])
-                
-                cursor = conn.execute(query, query_params)
-                items = [dict(row) for row in cursor.fetchall()]
-                
-                # Contar total
-                count_query = "SELECT COUNT(*) FROM itens WHERE 1=1"
-                count_params = []
-                if category:
-                    count_query += " AND categoria = ?"
-                    count_params.append(category)
-                if low_stock:
-                    count_query += " AND quantidade < 5"
-                    
-                total = conn.execute(count_query, count_params).fetchone()[0]
-            
-            self._set_headers()
+                items, has_more, next_cursor = fetch_items_page(
+                    conn, limit, category, low_stock, cursor=cursor, offset=offset
+                )
+                total = count_items(conn, DB_PATH, category, low_stock)
+            
             response = self._success_response({
                 'items': items,
                 'pagination': {
                     'total': total,
                     'limit': limit,
-                    'offset': offset,
-                    'has_more': offset + limit < total
+                    'offset': None if cursor else offset,
+                    'has_more': has_more,
+                    'next_cursor': next_cursor
                 }
             })
-            self.wfile.write(response.encode())
+            self._send_response(response)
             
+        except ValueError as e:
+            self._error_response(str(e), 400)
         except Exception as e:
             logger.error(f"Erro ao buscar itens: {e}")
             self._error_response("Erro interno do servidor", 500)
@@ -243,14 +298,112 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
                     self._error_response("Item não encontrado", 404)
                     return
                 
-                self._set_headers()
                 response = self._success_response(dict(item))
-                self.wfile.write(response.encode())
+                self._send_response(response)
                 
         except Exception as e:
             logger.error(f"Erro ao buscar item {code}: {e}")
             self._error_response("Erro interno do servidor", 500)
     
+    def _handle_lookup_items(self):
+        """Consultar vários itens em uma requisição: {"ids": [...], "codes": [...]}"""
+        if not self._authenticate():
+            self._error_response("API key required", 401)
+            return
+        
+        try:
+            try:
+                ids, codes = parse_lookup_refs(self._parse_body())
+            except ValueError as e:
+                self._error_response(str(e))
+                return
+            
+            with self._get_db_connection() as conn:
+                result = lookup_items(conn, ids, codes)
+            
+            self._send_response(self._success_response(result))
+            
+        except Exception as e:
+            logger.error(f"Erro na consulta em lote: {e}")
+            self._error_response("Erro interno do servidor", 500)
+    
+    def _handle_export_items(self, params):
+        """Exportar o catálogo completo em streaming (NDJSON ou CSV, .gz opcional)"""
+        if not self._authenticate():
+            self._error_response("API key required", 401)
+            return
+        
+        fmt = params.get('format', 'ndjson').lower()
+        compress = params.get('gzip', '').lower() == 'true'
+        try:
+            chunks = export_items(
+                DB_PATH, fmt,
+                category=params.get('category'),
+                low_stock=params.get('low_stock', '').lower() == 'true',
+                compress=compress
+            )
+        except ValueError as e:
+            self._error_response(str(e), 400)
+            return
+        
+        self.send_response(200)
+        self.send_header('Content-Type', export_mimetype(fmt, compress))
+        self.send_header('Content-Disposition', f'attachment; filename="{export_filename(fmt, compress)}"')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        # Tamanho desconhecido: chunked mantém a conexão reutilizável
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        
+        try:
+            for chunk in chunks:
+                if chunk:
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+        except Exception as e:
+            # Cabeçalhos já enviados: sem o bloco final o cliente vê a resposta truncada
+            logger.error(f"Erro na exportação: {e}")
+            self.close_connection = True
+    
+    def _handle_get_item_qr(self, code, params):
+        """QR code do item em PNG, gerado sob demanda (com ETag)"""
+        if not self._authenticate():
+            self._error_response("API key required", 401)
+            return
+        
+        try:
+            with self._get_db_connection() as conn:
+                cursor = conn.execute(
+                    f"SELECT {', '.join(QR_FIELDS)} FROM itens WHERE codigo = ?", (code,)
+                )
+                item = cursor.fetchone()
+            
+            if not item:
+                self._error_response("Item não encontrado", 404)
+                return
+            
+            item_dict = dict(item)
+            etag = qr_etag(item_dict)
+            headers = qr_response_headers(etag, params.get('v'))
+            
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(304)
+                png = b''
+            else:
+                png, _ = get_qr_cache().get_png(item_dict)
+                self.send_response(200)
+                self.send_header('Content-Type', 'image/png')
+                self.send_header('Content-Length', str(len(png)))
+            
+            self.send_header('Access-Control-Allow-Origin', '*')
+            for name, value in headers.items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(png)
+            
+        except Exception as e:
+            logger.error(f"Erro ao gerar QR do item {code}: {e}")
+            self._error_response("Erro interno do servidor", 500)
+    
     def _handle_create_item(self):
         """Criar novo item"""
         if not self._authenticate():
@@ -281,8 +434,8 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
                 # Inserir item
             conn.execute("""
                 INSERT INTO itens (codigo, nome, descricao, quantidade, categoria, 
-                                 localizacao, status, data_cadastro)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                                 localizacao, status)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
             """, (
                 codigo,
                 data['nome'],
@@ -290,17 +443,17 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
                 data.get('quantidade', 0),
                 data.get('categoria', ''),
                 data.get('localizacao', ''),
-                'ativo',
-                datetime.now().isoformat()
+                'ativo'
             ))
+            index_pending(conn)
             conn.commit()
+            get_suggestion_index(DB_PATH).invalidate()
             
-            self._set_headers(201)
             response = self._success_response({
                 'codigo': codigo,
                 'nome': data['nome']
             }, "Item criado com sucesso")
-            self.wfile.write(response.encode())
+            self._send_response(response, 201)
             
         except Exception as e:
             logger.error(f"Erro ao criar item: {e}")
@@ -342,20 +495,19 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
                 self._error_response("Nenhum campo válido para atualizar")
                 return
             
-            update_fields.append("data_cadastro = ?")
-            params.append(datetime.now().isoformat())
             params.append(code)
             
             query = f"UPDATE itens SET {', '.join(update_fields)} WHERE codigo = ?"
             conn.execute(query, params)
+            index_pending(conn)
             conn.commit()
+            get_suggestion_index(DB_PATH).invalidate()
             
-            self._set_headers()
             response = self._success_response({
                 'codigo': code,
                 'updated_fields': [k for k in data.keys() if k in allowed_fields]
             }, "Item atualizado com sucesso")
-            self.wfile.write(response.encode())
+            self._send_response(response)
             
         except Exception as e:
             logger.error(f"Erro ao atualizar item {code}: {e}")
@@ -377,9 +529,8 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
                 conn.execute("DELETE FROM itens WHERE codigo = ?", (code,))
                 conn.commit()
             
-            self._set_headers()
             response = self._success_response({'codigo': code}, "Item removido com sucesso")
-            self.wfile.write(response.encode())
+            self._send_response(response)
             
         except Exception as e:
             logger.error(f"Erro ao remover item {code}: {e}")
@@ -417,18 +568,72 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
                 
                 items = [dict(row) for row in cursor.fetchall()]
             
-            self._set_headers()
             response = self._success_response({
                 'query': query_term,
                 'results': items,
                 'count': len(items)
             })
-            self.wfile.write(response.encode())
+            self._send_response(response)
             
         except Exception as e:
             logger.error(f"Erro na busca: {e}")
             self._error_response("Erro interno do servidor", 500)
     
+    def _handle_suggestions(self, params):
+        """Sugestões de autocomplete (nome, categoria e marca)"""
+        if not self._authenticate():
+            self._error_response("API key required", 401)
+            return
+        
+        try:
+            partial = params.get('q', '').strip()
+            try:
+                limit = parse_suggestion_limit(params.get('limit'))
+            except ValueError as e:
+                self._error_response(str(e), 400)
+                return
+            
+            suggestions = []
+            if len(partial) >= 2:
+                suggestions = get_suggestion_index(DB_PATH).suggest(partial, suggestion_limits(limit))[:limit]
+            
+            response = self._success_response({
+                'query': partial,
+                'suggestions': suggestions,
+                'count': len(suggestions)
+            })
+            self._send_response(response)
+            
+        except Exception as e:
+            logger.error(f"Erro nas sugestões: {e}")
+            self._error_response("Erro interno do servidor", 500)
+    
+    def _handle_apply_inventory(self):
+        """Aplicar contagem de inventário"""
+        if not self._authenticate():
+            self._error_response("API key required", 401)
+            return
+        
+        try:
+            data = self._parse_body()
+            
+            if not isinstance(data.get('items'), list):
+                self._error_response("Lista de itens é obrigatória")
+                return
+            
+            reconciler = InventoryReconciler(DB_PATH)
+            report = reconciler.apply_counts(data['items'], data.get('usuario', 'API'),
+                                             acao='Inventário API')
+            
+            response = self._success_response(report, "Inventário aplicado com sucesso")
+            self._send_response(response)
+            
+        except ValueError as e:
+            self._error_response(str(e))
+        except Exception as e:
+            logger.error(f"Erro ao aplicar inventário: {e}")
+            self._error_response("Erro interno do servidor", 500)
+    
     def _handle_get_categories(self):
         """Listar categorias"""
         if not self._authenticate():
@@ -437,26 +642,19 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
         
         try:
             with self._get_db_connection() as conn:
-                cursor = conn.execute("""
-                    SELECT categoria, COUNT(*) as count, SUM(quantidade) as total_quantity
-                    FROM itens 
-                    WHERE categoria IS NOT NULL AND categoria != ''
-                    GROUP BY categoria 
-                    ORDER BY count DESC
-                """)
-                
-                categories = [
-                    {
-                        'name': row['categoria'],
-                        'item_count': row['count'],
-                        'total_quantity': row['total_quantity'] or 0
-                    }
-                    for row in cursor.fetchall()
-                ]
+                stats = read_stats(conn)
+            
+            categories = [
+                {
+                    'name': categoria,
+                    'item_count': metrics['itens'],
+                    'total_quantity': metrics['quantidade']
+                }
+                for categoria, metrics in ranked(stats['categoria'])
+            ]
             
-            self._set_headers()
             response = self._success_response(categories)
-            self.wfile.write(response.encode())
+            self._send_response(response)
             
         except Exception as e:
             logger.error(f"Erro ao buscar categorias: {e}")
@@ -470,34 +668,20 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
         
         try:
             with self._get_db_connection() as conn:
-                stats = {}
+                # Totais materializados em stats_snapshot (sem varrer itens)
+                snapshot = read_stats(conn)
+                total = snapshot['total']
                 
-                # Total de itens
-                stats['total_items'] = conn.execute("SELECT COUNT(*) FROM itens").fetchone()[0]
-                
-                # Quantidade total
-                result = conn.execute("SELECT SUM(quantidade) FROM itens").fetchone()[0]
-                stats['total_quantity'] = result or 0
-                
-                # Estoque baixo
-                stats['low_stock_items'] = conn.execute(
-                    "SELECT COUNT(*) FROM itens WHERE quantidade < 5"
-                ).fetchone()[0]
-                
-            # Valor total - removido pois não há coluna preco_unitario
-            # stats['total_value'] = 0.0                # Top categorias
-                cursor = conn.execute("""
-                    SELECT categoria, COUNT(*) as count 
-                    FROM itens 
-                    WHERE categoria IS NOT NULL AND categoria != ''
-                    GROUP BY categoria 
-                    ORDER BY count DESC 
-                    LIMIT 5
-                """)
-                stats['top_categories'] = [
-                    {'category': row['categoria'], 'count': row['count']} 
-                    for row in cursor.fetchall()
-                ]
+                stats = {
+                    'total_items': total['itens'],
+                    'total_quantity': total['quantidade'],
+                    'low_stock_items': total['estoque_baixo'],
+                    'total_value': float(total['valor']),
+                    'top_categories': [
+                        {'category': categoria, 'count': metrics['itens']}
+                        for categoria, metrics in ranked(snapshot['categoria'])[:5]
+                    ]
+                }
                 
                 # Itens recentes
                 cursor = conn.execute("""
@@ -511,20 +695,147 @@ class EstoqueAPIHandler(BaseHTTPRequestHandler):
                     for row in cursor.fetchall()
                 ]
             
-            self._set_headers()
             response = self._success_response(stats)
-            self.wfile.write(response.encode())
+            self._send_response(response)
             
         except Exception as e:
             logger.error(f"Erro ao gerar relatório: {e}")
             self._error_response("Erro interno do servidor", 500)
 
+class PooledHTTPServer(HTTPServer):
+    """
+    HTTPServer com pool fixo de threads e conexões keep-alive
+    
+    A thread principal só aceita conexões. Cada worker atende uma requisição por
+    vez, reaproveitando a conexão SQLite da thread; entre requisições a conexão
+    ociosa fica em um selector (thread keepalive) e não prende nenhum worker.
+    Conexões ociosas por mais de KEEPALIVE_TIMEOUT segundos são fechadas.
+    """
+    
+    request_queue_size = 128
+    
+    def __init__(self, server_address, handler_class, workers=WORKERS):
+        super().__init__(server_address, handler_class)
+        self._tasks = queue.Queue()
+        self._parking = queue.Queue()
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_reader, self._wakeup_writer = socket.socketpair()
+        self._selector.register(self._wakeup_reader, selectors.EVENT_READ)
+        self._closing = False
+        
+        self._workers = [
+            threading.Thread(target=self._serve_requests, name=f'api-worker-{index}', daemon=True)
+            for index in range(max(1, workers))
+        ]
+        self._keepalive = threading.Thread(target=self._watch_idle, name='api-keepalive', daemon=True)
+        for thread in self._workers + [self._keepalive]:
+            thread.start()
+    
+    def process_request(self, request, client_address):
+        self._tasks.put((request, client_address))
+    
+    def _serve_requests(self):
+        try:
+            while True:
+                task = self._tasks.get()
+                if task is None:
+                    break
+                
+                if isinstance(task, tuple):
+                    # Conexão nova: o construtor do handler atende a primeira requisição
+                    request, client_address = task
+                    try:
+                        handler = self.RequestHandlerClass(request, client_address, self)
+                    except Exception:
+                        self.handle_error(request, client_address)
+                        self.shutdown_request(request)
+                        continue
+                else:
+                    handler = task
+                    try:
+                        handler.handle()
+                    except Exception:
+                        handler.close_connection = True
+                        self.handle_error(handler.request, handler.client_address)
+                
+                if handler.close_connection:
+                    self._close_handler(handler)
+                elif handler.has_buffered_request():
+                    self._tasks.put(handler)
+                else:
+                    self._park(handler)
+        finally:
+            close_thread_connections()
+    
+    def _park(self, handler):
+        self._parking.put(handler)
+        try:
+            self._wakeup_writer.send(b'\0')
+        except OSError:
+            # Servidor encerrando
+            pass
+    
+    def _close_handler(self, handler):
+        handler.close_connection = True
+        try:
+            handler.finish()
+        except OSError:
+            pass
+        self.shutdown_request(handler.request)
+    
+    def _watch_idle(self):
+        """Devolve ao pool as conexões que voltaram a ter dados; fecha as ociosas demais"""
+        while not self._closing:
+            for key, _ in self._selector.select(timeout=1):
+                if key.fileobj is self._wakeup_reader:
+                    self._wakeup_reader.recv(4096)
+                    continue
+                self._selector.unregister(key.fileobj)
+                self._tasks.put(key.data[0])
+            
+            while True:
+                try:
+                    handler = self._parking.get_nowait()
+                except queue.Empty:
+                    break
+                self._selector.register(
+                    handler.connection, selectors.EVENT_READ,
+                    (handler, time.monotonic() + KEEPALIVE_TIMEOUT)
+                )
+            
+            now = time.monotonic()
+            expired = [
+                key for key in self._selector.get_map().values()
+                if key.data and key.data[1] < now
+            ]
+            for key in expired:
+                self._selector.unregister(key.fileobj)
+                self._close_handler(key.data[0])
+        
+        for key in list(self._selector.get_map().values()):
+            if key.data:
+                self._close_handler(key.data[0])
+        self._selector.close()
+    
+    def server_close(self):
+        super().server_close()
+        self._closing = True
+        self._wakeup_writer.send(b'\0')
+        self._keepalive.join(timeout=2)
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=KEEPALIVE_TIMEOUT + 1)
+        self._wakeup_reader.close()
+        self._wakeup_writer.close()
+
 def run_server():
     """Iniciar servidor"""
+    run_migrations(DB_PATH)
     server_address = ('', PORT)
-    httpd = HTTPServer(server_address, EstoqueAPIHandler)
+    httpd = PooledHTTPServer(server_address, EstoqueAPIHandler)
     
-    print(f"🚀 API REST iniciando na porta {PORT}")
+    print(f"🚀 API REST iniciando na porta {PORT} ({WORKERS} workers, HTTP/1.1 keep-alive)")
     print(f"📚 Endpoints: http://localhost:{PORT}/api/v1/")
     print(f"🔑 Use o header: X-API-Key: test-key-123")
     print("\n🔗 Endpoints disponíveis:")
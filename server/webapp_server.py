@@ -5,20 +5,45 @@ Fornece endpoints para servir arquivos estáticos e APIs
 """
 
 import os
-import json
+import sys
 import sqlite3
 from datetime import datetime
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, Response, request, jsonify, send_from_directory, send_file
 from flask_cors import CORS
-import aiosqlite
-import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from utils.database import connect
+from utils.inventory_reconciler import InventoryReconciler
+from utils.inventory_sessions import (archive_sessions, count_sessions, find_session_by_key, get_session,
+                                      import_legacy_files, list_sessions, purge_stale_uploads, save_session,
+                                      store_upload_part, take_upload)
+from utils.item_cache import cache_headers, get_item_cache, is_not_modified
+from utils.item_export import EXPORT_FORMATS, accepts_gzip, export_items
+from utils.item_listing import items_version
+from utils.item_lookup import lookup_items, parse_lookup_refs
+from utils.migrations import run_migrations
+from utils.photo_store import collect_garbage, is_content_addressed, resolve_photo
+from utils.qr_cache import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, etag_matches
+from utils.stats_snapshot import ranked, read_stats
+from utils.suggestion_index import get_suggestion_index, parse_suggestion_limit, suggestion_limits
 
 # Configurações
 WEBAPP_DIR = os.path.join(os.path.dirname(__file__), '../webapp')
 DB_PATH = os.path.join(os.path.dirname(__file__), '../db/estoque.db')
+INVENTORY_DIR = os.path.join(os.path.dirname(__file__), '../inventarios')
+FOTOS_DIR = os.path.join(os.path.dirname(__file__), '../fotos')
 HOST = '0.0.0.0'
 PORT = int(os.environ.get('PORT', 8080))
 
+# Migrações na importação: sob gunicorn o bloco __main__ não roda (idempotente)
+run_migrations(DB_PATH)
+
+# Colunas do snapshot do catálogo usado pelo WebApp sem rede
+CATALOG_COLUMNS = ['id', 'nome', 'codigo', 'codigo_barras', 'categoria', 'localizacao', 'quantidade']
+
+# Itens consultados pelo scanner (cache do processo)
+item_cache = get_item_cache(DB_PATH)
+
 # Criar aplicação Flask
 app = Flask(__name__)
 CORS(app)  # Permitir CORS para desenvolvimento
@@ -49,34 +74,94 @@ def health_check():
 
 @app.route('/api/items/<int:item_id>')
 def get_item(item_id):
-    """Buscar item por ID"""
+    """Buscar item por ID (cache em memória, com ETag/Last-Modified e 304)"""
     try:
-        # Conectar ao banco SQLite
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # Para acessar colunas por nome
-        cursor = conn.cursor()
+        with connect(DB_PATH) as conn:
+            cached = item_cache.get(conn, item_id)
         
-        # Buscar item
-        cursor.execute('SELECT * FROM itens WHERE id = ?', (item_id,))
-        row = cursor.fetchone()
-        
-        if not row:
+        if not cached:
             return jsonify({'error': 'Item não encontrado'}), 404
         
-        # Converter para dicionário
-        item = dict(row)
+        headers = cache_headers(cached)
+        if is_not_modified(cached, request.headers.get('If-None-Match'),
+                           request.headers.get('If-Modified-Since')):
+            return '', 304, headers
         
         # Adicionar log de acesso
-        logger.info(f'Item {item_id} acessado: {item["nome"]}')
-        
-        conn.close()
+        logger.info(f'Item {item_id} acessado: {cached.item["nome"]}')
         
-        return jsonify(item)
+        return app.response_class(cached.body, mimetype='application/json', headers=headers)
         
     except Exception as e:
         logger.error(f'Erro ao buscar item {item_id}: {str(e)}')
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+@app.route('/api/items/catalog')
+def item_catalog():
+    """Snapshot do catálogo em NDJSON para consultas offline (ETag pela versão de itens)"""
+    try:
+        with connect(DB_PATH) as conn:
+            version = items_version(conn)
+        
+        compress = accepts_gzip(request.headers.get('Accept-Encoding'))
+        headers = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+        if compress:
+            headers['Content-Encoding'] = 'gzip'
+        if version is not None:
+            # ETag por codificação: caches não trocam o corpo gzip pelo original
+            etag = f'catalogo-{version}{"-gzip" if compress else ""}'
+            headers['ETag'] = f'"{etag}"'
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                headers.pop('Content-Encoding', None)
+                return '', 304, headers
+        
+        chunks = export_items(DB_PATH, 'ndjson', compress=compress, columns=CATALOG_COLUMNS)
+        return Response(chunks, mimetype=EXPORT_FORMATS['ndjson'], headers=headers)
+        
+    except Exception as e:
+        logger.error(f'Erro ao gerar snapshot do catálogo: {str(e)}')
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@app.route('/api/items/lookup', methods=['POST'])
+def lookup_items_batch():
+    """Buscar vários itens de uma vez: {"ids": [...], "codes": [...]} (leituras agrupadas do scanner)"""
+    try:
+        try:
+            ids, codes = parse_lookup_refs(request.get_json(silent=True))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        with connect(DB_PATH) as conn:
+            result = lookup_items(conn, ids, codes)
+        
+        result['count'] = len(result['items'])
+        return jsonify(result)
+        
+    except Exception as e:
+        logger.error(f'Erro na consulta em lote: {str(e)}')
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@app.route('/api/photos/<name>')
+def get_photo(name):
+    """Foto do item (original ou ?size=160|480&format=webp|jpg); cache longo para nomes por conteúdo"""
+    try:
+        size = request.args.get('size', type=int)
+        fmt = request.args.get('format', 'webp') if size else None
+        path = resolve_photo(name, size, fmt, FOTOS_DIR)
+        if not path:
+            return jsonify({'error': 'Foto não encontrada'}), 404
+        
+        response = send_file(path, conditional=True, etag=True)
+        # Nomes por hash nunca mudam de conteúdo; nomes legados revalidam pelo ETag
+        response.headers['Cache-Control'] = (
+            IMMUTABLE_CACHE_CONTROL if is_content_addressed(name) else REVALIDATE_CACHE_CONTROL
+        )
+        return response
+        
+    except Exception as e:
+        logger.error(f'Erro ao servir foto {name}: {str(e)}')
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
 @app.route('/api/items/search')
 def search_items():
     """Buscar itens por termo"""
@@ -87,170 +172,209 @@ def search_items():
         if not query:
             return jsonify({'items': []})
         
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        with connect(DB_PATH, row_factory=sqlite3.Row) as conn:
+            # Buscar em nome, código e categoria
+            search_query = f'%{query}%'
+            cursor = conn.execute('''
+                SELECT * FROM itens 
+                WHERE nome LIKE ? OR codigo LIKE ? OR categoria LIKE ?
+                ORDER BY nome
+                LIMIT ?
+            ''', (search_query, search_query, search_query, limit))
+            
+            rows = cursor.fetchall()
+            items = [dict(row) for row in rows]
         
-        # Buscar em nome, código e categoria
-        search_query = f'%{query}%'
-        cursor.execute('''
-            SELECT * FROM itens 
-            WHERE nome LIKE ? OR codigo LIKE ? OR categoria LIKE ?
-            ORDER BY nome
-            LIMIT ?
-        ''', (search_query, search_query, search_query, limit))
+        return jsonify({'items': items, 'count': len(items)})
+        
+    except Exception as e:
+        logger.error(f'Erro na busca: {str(e)}')
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@app.route('/api/items/suggestions')
+def item_suggestions():
+    """Sugestões de autocomplete para a caixa de busca"""
+    try:
+        partial = request.args.get('q', '').strip()
+        try:
+            limit = parse_suggestion_limit(request.args.get('limit'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        rows = cursor.fetchall()
-        items = [dict(row) for row in rows]
+        if len(partial) < 2:
+            return jsonify({'suggestions': [], 'count': 0})
         
-        conn.close()
+        suggestions = get_suggestion_index(DB_PATH).suggest(partial, suggestion_limits(limit))[:limit]
         
-        return jsonify({'items': items, 'count': len(items)})
+        return jsonify({'suggestions': suggestions, 'count': len(suggestions)})
         
     except Exception as e:
-        logger.error(f'Erro na busca: {str(e)}')
+        logger.error(f'Erro nas sugestões: {str(e)}')
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
+def apply_inventory(conn, data, chave=None):
+    """Aplica as contagens e grava a sessão na transação de `conn`; retorna (id, relatório)"""
+    user = data.get('user') or {}
+    inventory_data = {
+        'timestamp': data.get('timestamp') or datetime.now().isoformat(),
+        'user_id': user.get('id'),
+        'user_name': user.get('name'),
+        'total_items': len(data['items']),
+        'items': data['items'],
+        'summary': data.get('summary', {})
+    }
+    
+    report = InventoryReconciler(DB_PATH).apply_counts(
+        data['items'],
+        inventory_data['user_name'] or 'WebApp',
+        timestamp=inventory_data['timestamp']
+    )
+    session_id = save_session(conn, inventory_data, report, chave=chave)
+    
+    logger.info(f'Inventário {session_id} finalizado: {inventory_data["total_items"]} itens, '
+                f'{report["differences_found"]} diferenças')
+    return session_id, report
+
+def begin_write(conn):
+    """Trava de escrita antes de consultar chaves: reenvios simultâneos não aplicam duas vezes"""
+    if not conn.in_transaction:
+        conn.execute("BEGIN IMMEDIATE")
+
 @app.route('/api/inventory/finish', methods=['POST'])
 def finish_inventory():
-    """Receber dados do inventário finalizado"""
+    """Receber dados do inventário finalizado (header Idempotency-Key opcional)"""
     try:
-        data = request.get_json()
+        data = request.get_json(silent=True)
         
-        if not data or 'items' not in data:
+        if not data or not isinstance(data.get('items'), list):
             return jsonify({'error': 'Dados inválidos'}), 400
         
-        # Salvar dados do inventário
-        inventory_data = {
-            'timestamp': data.get('timestamp', datetime.now().isoformat()),
-            'user_id': data.get('user', {}).get('id'),
-            'user_name': data.get('user', {}).get('name'),
-            'total_items': len(data['items']),
-            'items': data['items'],
-            'summary': data.get('summary', {})
-        }
-        
-        # Salvar em arquivo para processamento posterior
-        save_inventory_data(inventory_data)
-        
-        # Log da operação
-        logger.info(f'Inventário finalizado: {inventory_data["total_items"]} itens')
+        chave = request.headers.get('Idempotency-Key')
+        with connect(DB_PATH) as conn:
+            begin_write(conn)
+            existing = find_session_by_key(conn, chave) if chave else None
+            if existing:
+                return jsonify({'status': 'duplicate', 'inventory_id': existing})
+            
+            # Contagens e sessão na mesma transação
+            session_id, report = apply_inventory(conn, data, chave)
         
         return jsonify({
             'status': 'success',
             'message': 'Inventário recebido com sucesso',
-            'inventory_id': inventory_data['timestamp']
+            'inventory_id': session_id,
+            'report': report
         })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f'Erro ao finalizar inventário: {str(e)}')
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
-def save_inventory_data(data):
-    """Salvar dados do inventário em arquivo JSON"""
+@app.route('/api/inventory/sync', methods=['POST'])
+def sync_inventory():
+    """
+    Receber uma parte de um inventário enviado pela fila offline do WebApp
+    Body JSON:
+    {
+        "session_key": "string",  (chave de idempotência do envio)
+        "part": number, "total_parts": number,
+        "items": [...], "timestamp": "...", "user": {...}, "summary": {...}
+    }
+    O inventário é aplicado uma única vez, quando a última parte chega.
+    """
     try:
-        # Criar diretório se não existir
-        inventory_dir = os.path.join(os.path.dirname(__file__), '../inventarios')
-        os.makedirs(inventory_dir, exist_ok=True)
+        data = request.get_json(silent=True)
         
-        # Nome do arquivo baseado no timestamp
-        timestamp = data['timestamp'].replace(':', '-').replace('.', '-')
-        filename = f'inventario_{timestamp}.json'
-        filepath = os.path.join(inventory_dir, filename)
+        if not data or not isinstance(data.get('items'), list) or not data.get('session_key'):
+            return jsonify({'error': 'Dados inválidos'}), 400
         
-        # Salvar arquivo
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        chave = str(data['session_key'])[:100]
+        with connect(DB_PATH) as conn:
+            begin_write(conn)
+            existing = find_session_by_key(conn, chave)
+            if existing:
+                return jsonify({'status': 'duplicate', 'inventory_id': existing})
+            
+            try:
+                received = store_upload_part(conn, chave, int(data.get('part', 0)),
+                                             int(data.get('total_parts', 1)), data)
+            except (TypeError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+            
+            total_parts = int(data.get('total_parts', 1))
+            if received < total_parts:
+                return jsonify({'status': 'partial', 'received': received, 'total_parts': total_parts})
+            
+            session_id, report = apply_inventory(conn, take_upload(conn, chave), chave)
         
-        logger.info(f'Inventário salvo em: {filepath}')
+        return jsonify({
+            'status': 'success',
+            'message': 'Inventário recebido com sucesso',
+            'inventory_id': session_id,
+            'report': report
+        })
         
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        logger.error(f'Erro ao salvar inventário: {str(e)}')
+        logger.error(f'Erro ao sincronizar inventário: {str(e)}')
+        return jsonify({'error': 'Erro interno do servidor'}), 500
 
 @app.route('/api/inventories')
 def list_inventories():
-    """Listar inventários salvos"""
+    """Listar inventários salvos (paginado por cursor, sem as linhas)"""
     try:
-        inventory_dir = os.path.join(os.path.dirname(__file__), '../inventarios')
-        
-        if not os.path.exists(inventory_dir):
-            return jsonify({'inventories': []})
-        
-        inventories = []
-        for filename in sorted(os.listdir(inventory_dir), reverse=True):
-            if filename.endswith('.json'):
-                filepath = os.path.join(inventory_dir, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        data = json.load(f)
-                    
-                    inventories.append({
-                        'filename': filename,
-                        'timestamp': data.get('timestamp'),
-                        'user_name': data.get('user_name'),
-                        'total_items': data.get('total_items', 0),
-                        'summary': data.get('summary', {})
-                    })
-                except Exception as e:
-                    logger.warning(f'Erro ao ler {filename}: {str(e)}')
-        
-        return jsonify({'inventories': inventories})
+        limit = max(1, min(int(request.args.get('limit', 50)), 200))
+        
+        with connect(DB_PATH) as conn:
+            try:
+                inventories, has_more, next_cursor = list_sessions(
+                    conn, limit, request.args.get('cursor')
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        return jsonify({
+            'inventories': inventories,
+            'has_more': has_more,
+            'next_cursor': next_cursor
+        })
         
     except Exception as e:
         logger.error(f'Erro ao listar inventários: {str(e)}')
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
-@app.route('/api/inventories/<filename>')
-def get_inventory(filename):
-    """Obter dados completos de um inventário"""
+@app.route('/api/inventories/<ref>')
+def get_inventory(ref):
+    """Obter dados completos de um inventário (id ou nome do JSON legado)"""
     try:
-        inventory_dir = os.path.join(os.path.dirname(__file__), '../inventarios')
-        filepath = os.path.join(inventory_dir, filename)
+        with connect(DB_PATH) as conn:
+            data = get_session(conn, ref)
         
-        if not os.path.exists(filepath) or not filename.endswith('.json'):
+        if not data:
             return jsonify({'error': 'Inventário não encontrado'}), 404
         
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
         return jsonify(data)
         
     except Exception as e:
-        logger.error(f'Erro ao obter inventário {filename}: {str(e)}')
+        logger.error(f'Erro ao obter inventário {ref}: {str(e)}')
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
 @app.route('/api/stats')
 def get_stats():
     """Obter estatísticas do sistema"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Contar itens totais
-        cursor.execute('SELECT COUNT(*) FROM itens')
-        total_items = cursor.fetchone()[0]
-        
-        # Contar por categoria
-        cursor.execute('''
-            SELECT categoria, COUNT(*) as count 
-            FROM itens 
-            GROUP BY categoria 
-            ORDER BY count DESC
-        ''')
-        categories = [{'name': row[0] or 'Sem categoria', 'count': row[1]} 
-                     for row in cursor.fetchall()]
-        
-        # Valor total do estoque (se houver campo valor)
-        cursor.execute('SELECT SUM(quantidade) FROM itens')
-        total_quantity = cursor.fetchone()[0] or 0
-        
-        conn.close()
-        
-        # Contar inventários
-        inventory_dir = os.path.join(os.path.dirname(__file__), '../inventarios')
-        inventory_count = 0
-        if os.path.exists(inventory_dir):
-            inventory_count = len([f for f in os.listdir(inventory_dir) if f.endswith('.json')])
+        with connect(DB_PATH) as conn:
+            # Totais materializados em stats_snapshot (sem varrer itens)
+            stats = read_stats(conn)
+            inventory_count = count_sessions(conn)
+        
+        total_items = stats['total']['itens']
+        total_quantity = stats['total']['quantidade']
+        categories = [{'name': categoria or 'Sem categoria', 'count': metrics['itens']}
+                      for categoria, metrics in ranked(stats['categoria'], include_empty=True)]
         
         return jsonify({
             'total_items': total_items,
@@ -278,7 +402,7 @@ def internal_error(error):
 def create_directories():
     """Criar diretórios necessários"""
     directories = [
-        os.path.join(os.path.dirname(__file__), '../inventarios'),
+        INVENTORY_DIR,
         os.path.join(os.path.dirname(__file__), '../logs')
     ]
     
@@ -286,24 +410,22 @@ def create_directories():
         os.makedirs(directory, exist_ok=True)
         logger.info(f'Diretório criado/verificado: {directory}')
 
-def check_database():
-    """Verificar se o banco de dados existe"""
-    if not os.path.exists(DB_PATH):
-        logger.warning(f'Banco de dados não encontrado: {DB_PATH}')
-        logger.info('Execute: python db/init_db.py para criar o banco')
-        return False
-    return True
-
 if __name__ == '__main__':
     logger.info('Iniciando servidor WebApp...')
     
     # Criar diretórios necessários
     create_directories()
     
-    # Verificar banco de dados
-    if not check_database():
-        logger.error('Banco de dados não encontrado!')
-        exit(1)
+    # Inventários em JSON de versões anteriores e compactação dos antigos
+    imported = import_legacy_files(DB_PATH, INVENTORY_DIR)
+    with connect(DB_PATH) as conn:
+        archived = archive_sessions(conn)
+        purge_stale_uploads(conn)
+    if imported or archived:
+        logger.info(f'Inventários: {imported} JSON importados, {archived} sessões arquivadas')
+    
+    # Fotos órfãs só são contadas aqui; a remoção é feita por `python utils/photo_store.py`
+    collect_garbage(DB_PATH, FOTOS_DIR, dry_run=True)
     
     # Exibir informações de inicialização
     logger.info(f'WebApp disponível em: http://{HOST}:{PORT}')
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fixtures compartilhadas dos testes (banco SQLite temporário já migrado)
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import close_thread_connections
+from utils.migrations import run_migrations
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Banco vazio na versão mais recente do schema"""
+    path = str(tmp_path / 'db' / 'estoque.db')
+    run_migrations(path)
+    yield path
+    close_thread_connections()
+
+
+
+def insert_item(db_path, nome, **fields):
+    """Insere um item direto na tabela (como os bots antigos) e retorna o id"""
+    from utils.database import connect
+
+    values = {'nome': nome, 'quantidade': 1, 'status': 'ativo'}
+    values.update(fields)
+    columns = ', '.join(values)
+    placeholders = ', '.join('?' for _ in values)
+    with connect(db_path) as conn:
+        cursor = conn.execute(f"INSERT INTO itens ({columns}) VALUES ({placeholders})", list(values.values()))
+        return cursor.lastrowid
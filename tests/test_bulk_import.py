@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do cadastro em lote: unicidade dos códigos e substituições registradas
+"""
+
+from datetime import datetime
+
+from conftest import insert_item
+from utils.bulk_import import BulkImporter
+from utils.code_generator import CodeGenerator
+from utils.database import connect
+
+
+def _stored_codes(db_path):
+    with connect(db_path) as conn:
+        return conn.execute("SELECT codigo, codigo_barras FROM itens").fetchall()
+
+
+def test_import_assigns_unique_codes(db_path):
+    rows = [{'nome': 'Mouse Óptico', 'categoria': 'mouse'} for _ in range(30)]
+
+    result = BulkImporter(db_path, chunk_size=7).import_items(rows)
+
+    assert result['success'] == 30 and result['errors'] == 0
+    codes = _stored_codes(db_path)
+    assert len({codigo for codigo, _ in codes}) == 30
+    assert len({barras for _, barras in codes}) == 30
+    assert all(item['id'] for item in result['items'])
+
+
+def test_import_skips_codes_written_outside_generator(db_path):
+    insert_item(db_path, 'Mouse antigo', codigo='MOUS-001')
+
+    result = BulkImporter(db_path).import_items([{'nome': 'Mouse Novo', 'categoria': 'mouse'}])
+
+    assert result['items'][0]['codigo'] != 'MOUS-001'
+    assert len({codigo for codigo, _ in _stored_codes(db_path)}) == 2
+
+
+def test_import_reports_reassigned_barcode(db_path):
+    generator = CodeGenerator(db_path)
+    # Código de barras que o primeiro sequencial do dia geraria, gravado por fora
+    taken = generator._build_barcode(generator._get_category_numeric_prefix('mouse'), datetime.now(), 1)
+    insert_item(db_path, 'Mouse antigo', codigo='LEGADO-1', codigo_barras=taken)
+
+    result = BulkImporter(db_path).import_items([
+        {'nome': 'Mouse Novo', 'categoria': 'mouse'},
+        {'nome': 'Teclado Novo', 'categoria': 'teclado'}
+    ])
+
+    assert result['success'] == 2 and result['errors'] == 0
+    assert [(entry['row'], entry['field'], entry['original']) for entry in result['reassigned']] == \
+        [(1, 'codigo_barras', taken)]
+    replacement = result['reassigned'][0]['code']
+    assert len(replacement) == 13 and replacement.isdigit()
+    assert result['items'][0]['codigo_barras'] == replacement
+    barcodes = [barras for _, barras in _stored_codes(db_path)]
+    assert len(set(barcodes)) == len(barcodes) == 3
+
+
+def test_invalid_rows_are_reported_by_line(db_path):
+    result = BulkImporter(db_path).import_items([
+        {'nome': 'Monitor', 'categoria': 'monitor'},
+        {'nome': '', 'categoria': 'monitor'},
+        {'nome': 'Cadeira', 'quantidade': 'muitas'},
+        {'nome': 'Mesa', 'quantidade': 'inf'}
+    ])
+
+    assert result['success'] == 1
+    assert [detail['row'] for detail in result['error_details']] == [2, 3, 4]
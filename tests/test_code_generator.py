@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes dos códigos de barras (EAN-13) e da reserva de códigos em lote
+"""
+
+import pytest
+
+import utils.code_generator as code_generator
+from utils.code_generator import CodeGenerator
+
+
+def _ean13_valid(code):
+    digits = [int(char) for char in code]
+    total = sum(digit * (3 if i % 2 else 1) for i, digit in enumerate(digits[:12]))
+    return (10 - total % 10) % 10 == digits[12]
+
+
+def test_generate_barcode_is_ean13(db_path):
+    generator = CodeGenerator(db_path)
+
+    codes = [generator.generate_barcode('notebook') for _ in range(50)]
+
+    assert all(len(code) == 13 and code.isdigit() for code in codes)
+    assert all(_ean13_valid(code) for code in codes)
+    assert len(set(codes)) == len(codes)
+
+
+def test_reserved_barcodes_keep_width_past_four_digits(db_path):
+    generator = CodeGenerator(db_path)
+
+    codes = generator.reserve_item_codes([('Item', 'mouse')] * 12000)
+
+    barcodes = [codes_item['codigo_barras'] for codes_item in codes]
+    assert {len(code) for code in barcodes} == {13}
+    assert all(_ean13_valid(code) for code in barcodes)
+    assert len(set(barcodes)) == len(barcodes)
+    assert len({codes_item['codigo_mnemonico'] for codes_item in codes}) == len(codes)
+
+
+def test_reserve_raises_past_daily_limit(db_path, monkeypatch):
+    monkeypatch.setattr(code_generator, 'BARCODE_MAX_SEQUENTIAL', 10)
+    generator = CodeGenerator(db_path)
+
+    generator.reserve_item_codes([('Item', 'mouse')] * 10)
+    with pytest.raises(ValueError):
+        generator.reserve_item_codes([('Item', 'mouse')])
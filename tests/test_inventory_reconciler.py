@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da aplicação em lote das contagens de inventário
+"""
+
+import pytest
+
+from conftest import insert_item
+from utils.database import connect
+from utils.inventory_reconciler import InventoryReconciler
+
+
+def test_parse_counts_keeps_last_count_of_repeated_ids():
+    counts = InventoryReconciler.parse_counts([
+        {'id': 1, 'inventoryQuantity': 3},
+        {'id': '2', 'quantity': 5},
+        {'id': 1, 'inventoryQuantity': 7}
+    ])
+
+    assert counts == {1: 7, 2: 5}
+
+
+@pytest.mark.parametrize('item', [
+    1,
+    {'id': 'abc', 'quantity': 1},
+    {'id': None, 'quantity': 1},
+    {'id': 1, 'inventoryQuantity': '1.5'},
+    {'id': 1, 'inventoryQuantity': -2}
+])
+def test_parse_counts_rejects_invalid_entries(item):
+    with pytest.raises(ValueError):
+        InventoryReconciler.parse_counts([{'id': 9, 'quantity': 1}, item])
+
+
+def test_apply_counts_updates_and_records_movements(db_path):
+    mouse = insert_item(db_path, 'Mouse', quantidade=4)
+    teclado = insert_item(db_path, 'Teclado', quantidade=2)
+
+    report = InventoryReconciler(db_path).apply_counts([
+        {'id': mouse, 'inventoryQuantity': 1},
+        {'id': teclado, 'inventoryQuantity': 2},
+        {'id': mouse, 'inventoryQuantity': 6},
+        {'id': 999, 'inventoryQuantity': 1}
+    ], 'Ana')
+
+    assert report['not_found'] == [999]
+    assert report['total_items'] == 2 and report['differences_found'] == 1
+    assert [(entry['id'], entry['diferenca']) for entry in report['items']] == [(mouse, 2), (teclado, 0)]
+
+    with connect(db_path) as conn:
+        quantities = dict(conn.execute("SELECT id, quantidade FROM itens").fetchall())
+        movements = conn.execute(
+            "SELECT item_id, usuario, data_hora FROM movimentacoes ORDER BY item_id"
+        ).fetchall()
+    assert quantities == {mouse: 6, teclado: 2}
+    assert [(item_id, usuario) for item_id, usuario, _ in movements] == [(mouse, 'Ana'), (teclado, 'Ana')]
+    # Formato UTC de datetime('now')
+    assert all(len(data_hora) == 19 and 'T' not in data_hora for _, _, data_hora in movements)
+
+
+def test_apply_counts_rejects_invalid_input_without_writing(db_path):
+    mouse = insert_item(db_path, 'Mouse', quantidade=4)
+
+    with pytest.raises(ValueError):
+        InventoryReconciler(db_path).apply_counts([
+            {'id': mouse, 'inventoryQuantity': 1},
+            {'id': mouse, 'inventoryQuantity': 'muitos'}
+        ], 'Ana')
+
+    with connect(db_path) as conn:
+        assert conn.execute("SELECT quantidade FROM itens").fetchone()[0] == 4
+        assert conn.execute("SELECT COUNT(*) FROM movimentacoes").fetchone()[0] == 0
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes das sessões de inventário: envios em partes idempotentes e arquivamento das linhas
+"""
+
+import pytest
+
+from utils.database import connect
+from utils.inventory_sessions import (archive_sessions, find_session_by_key, get_session, list_sessions,
+                                      save_session, store_upload_part, take_upload)
+
+ITEMS = [
+    {'id': 1, 'codigo': 'MOUS-001', 'nome': 'Mouse', 'quantidade': 2, 'inventoryQuantity': 3,
+     'difference': 1, 'timestamp': '2025-01-02T10:00:00'},
+    {'id': 2, 'codigo': 'TECL-001', 'nome': 'Teclado', 'quantidade': 1, 'inventoryQuantity': 1,
+     'difference': 0, 'timestamp': '2025-01-02T10:01:00'}
+]
+
+
+def _session(timestamp='2025-01-02T10:05:00'):
+    return {'timestamp': timestamp, 'user_id': 7, 'user_name': 'Ana', 'items': ITEMS,
+            'summary': {'total': 2}}
+
+
+def test_redelivered_parts_are_stored_once(db_path):
+    header = {'timestamp': '2025-01-02T10:05:00', 'user': {'name': 'Ana'}}
+    with connect(db_path) as conn:
+        assert store_upload_part(conn, 'envio-1', 0, 2, dict(header, items=ITEMS[:1])) == 1
+        # Reentrega da mesma parte (rede instável) não conta de novo
+        assert store_upload_part(conn, 'envio-1', 0, 2, dict(header, items=ITEMS[:1])) == 1
+        assert store_upload_part(conn, 'envio-1', 1, 2, {'items': ITEMS[1:]}) == 2
+
+        data = take_upload(conn, 'envio-1')
+        assert data['user'] == {'name': 'Ana'}
+        assert [item['id'] for item in data['items']] == [1, 2]
+        assert conn.execute("SELECT COUNT(*) FROM inventario_envios").fetchone()[0] == 0
+
+        session_id = save_session(conn, _session(), chave='envio-1')
+        assert find_session_by_key(conn, 'envio-1') == session_id
+        assert find_session_by_key(conn, 'envio-2') is None
+
+
+@pytest.mark.parametrize('parte, total', [(2, 2), (-1, 2), (0, 0)])
+def test_invalid_part_is_rejected(db_path, parte, total):
+    with connect(db_path) as conn:
+        with pytest.raises(ValueError):
+            store_upload_part(conn, 'envio-1', parte, total, {'items': []})
+
+
+def test_archived_lines_read_back_unchanged(db_path):
+    with connect(db_path) as conn:
+        old_id = save_session(conn, _session('2020-01-01T08:00:00'))
+        recent_id = save_session(conn, _session('2999-01-01T08:00:00'))
+        before = get_session(conn, str(old_id))
+
+        assert archive_sessions(conn) == 1
+        assert archive_sessions(conn) == 0
+
+        remaining = conn.execute("SELECT DISTINCT sessao_id FROM inventario_linhas").fetchall()
+        assert remaining == [(recent_id,)]
+        after = get_session(conn, str(old_id))
+
+    assert after['archived'] and not before['archived']
+    assert after['items'] == before['items'] == ITEMS
+    assert dict(after, archived=False) == before
+
+
+def test_list_sessions_pages_newest_first(db_path):
+    with connect(db_path) as conn:
+        ids = [save_session(conn, _session(f'2025-01-0{day}T08:00:00')) for day in range(1, 6)]
+
+        first, has_more, cursor = list_sessions(conn, limit=3)
+        second, more_after, _ = list_sessions(conn, limit=3, cursor=cursor)
+
+    assert has_more and not more_after
+    assert [session['id'] for session in first + second] == ids[::-1]
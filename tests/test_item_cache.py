@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do cache de itens por id: invalidação por itens_versao e respostas 304
+"""
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+from conftest import insert_item
+from utils.database import connect
+from utils.item_cache import ItemCache, cache_headers, is_not_modified
+
+
+def test_update_from_another_connection_invalidates_entry(db_path):
+    item_id = insert_item(db_path, 'Mouse', quantidade=1)
+    cache = ItemCache()
+
+    with connect(db_path) as conn:
+        first = cache.get(conn, item_id)
+        assert cache.get(conn, item_id) is first
+
+    # Escrita direta (bots, outro processo): só os triggers avisam o cache
+    with connect(db_path) as conn:
+        conn.execute("UPDATE itens SET quantidade = 5 WHERE id = ?", (item_id,))
+
+    with connect(db_path) as conn:
+        second = cache.get(conn, item_id)
+    assert second.item['quantidade'] == 5
+    assert second.etag != first.etag
+
+
+def test_deleted_item_is_dropped(db_path):
+    item_id = insert_item(db_path, 'Mouse')
+    cache = ItemCache()
+    with connect(db_path) as conn:
+        cache.get(conn, item_id)
+        conn.execute("DELETE FROM itens WHERE id = ?", (item_id,))
+        assert cache.get(conn, item_id) is None
+    assert len(cache) == 0
+
+
+def test_lru_keeps_most_recent_items(db_path):
+    ids = [insert_item(db_path, f'Item {number}') for number in range(3)]
+    cache = ItemCache(max_items=2)
+    with connect(db_path) as conn:
+        for item_id in ids:
+            cache.get(conn, item_id)
+    assert len(cache) == 2
+
+
+def test_conditional_requests(db_path):
+    item_id = insert_item(db_path, 'Mouse')
+    with connect(db_path) as conn:
+        cached = ItemCache().get(conn, item_id)
+
+    headers = cache_headers(cached)
+    assert headers['ETag'] == f'"{cached.etag}"'
+    assert is_not_modified(cached, headers['ETag'], None)
+    assert is_not_modified(cached, f'W/"outro", W/{headers["ETag"]}', None)
+    assert not is_not_modified(cached, '"outro"', None)
+
+    # If-None-Match tem precedência sobre If-Modified-Since
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)
+    earlier = format_datetime(datetime.now(timezone.utc) - timedelta(days=1), usegmt=True)
+    assert is_not_modified(cached, None, later)
+    assert not is_not_modified(cached, None, earlier)
+    assert not is_not_modified(cached, '"outro"', later)
+    assert not is_not_modified(cached, None, 'data inválida')
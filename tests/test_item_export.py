@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da exportação em streaming: vários blocos do cursor, CSV, NDJSON e gzip
+"""
+
+import csv
+import gzip
+import io
+import json
+
+import pytest
+
+from utils import item_export
+from utils.database import connect
+from utils.item_export import accepts_gzip, export_items
+
+TOTAL = 23
+
+
+@pytest.fixture
+def many_items(db_path, monkeypatch):
+    # Blocos pequenos: a exportação atravessa várias leituras do cursor
+    monkeypatch.setattr(item_export, 'FETCH_SIZE', 5)
+    with connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO itens (nome, descricao, quantidade, status) VALUES (?, ?, ?, 'ativo')",
+            [(f"Item {number}", 'Cabo, "HDMI"\n2m', number) for number in range(TOTAL)]
+        )
+    return db_path
+
+
+def test_csv_streams_every_row_in_chunks(many_items):
+    chunks = list(export_items(many_items, 'csv', columns=['id', 'nome', 'descricao', 'qr_code']))
+
+    assert len(chunks) > 2
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))
+    assert rows[0] == ['id', 'nome', 'descricao']
+    assert [row[1] for row in rows[1:]] == [f"Item {number}" for number in range(TOTAL)]
+    assert rows[1][2] == 'Cabo, "HDMI"\n2m'
+
+
+def test_ndjson_gzip_round_trip(many_items):
+    data = gzip.decompress(b''.join(export_items(many_items, 'ndjson', compress=True)))
+
+    lines = [json.loads(line) for line in data.decode('utf-8').splitlines()]
+    assert [line['quantidade'] for line in lines] == list(range(TOTAL))
+    assert 'qr_code' not in lines[0]
+
+
+def test_unknown_format_fails_before_streaming(db_path):
+    with pytest.raises(ValueError):
+        export_items(db_path, 'xml')
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('gzip, deflate', True),
+    ('deflate, gzip;q=0', False),
+    ('*', True),
+    (None, False)
+])
+def test_accepts_gzip(header, expected):
+    assert accepts_gzip(header) is expected
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da listagem paginada: cursor keyset e totais em cache
+"""
+
+import pytest
+
+from conftest import insert_item
+from utils.database import connect
+from utils.item_listing import count_items, decode_cursor, encode_cursor, fetch_items_page
+
+
+def test_cursor_round_trip_keeps_accents():
+    assert decode_cursor(encode_cursor('Câmera Ótica', 42)) == ('Câmera Ótica', 42)
+
+
+@pytest.mark.parametrize('cursor', ['???', 'bm9wZQ', encode_cursor('Mouse', 1)[:-3]])
+def test_invalid_cursor_raises_value_error(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_pages_by_cursor_cover_every_item_once(db_path):
+    # Nomes repetidos: o desempate por id não pode pular nem repetir itens
+    for number in range(23):
+        insert_item(db_path, f"Item {number % 5}")
+
+    seen, cursor = [], None
+    with connect(db_path) as conn:
+        while True:
+            items, has_more, cursor = fetch_items_page(conn, 4, cursor=cursor)
+            seen.extend((item['nome'], item['id']) for item in items)
+            if not has_more:
+                assert cursor is None
+                break
+
+    assert len(seen) == 23
+    assert seen == sorted(seen)
+
+
+def test_count_items_refreshes_after_write(db_path):
+    insert_item(db_path, 'Mouse', categoria='perifericos')
+    with connect(db_path) as conn:
+        assert count_items(conn, db_path, category='perifericos') == 1
+
+    insert_item(db_path, 'Teclado', categoria='perifericos')
+    with connect(db_path) as conn:
+        assert count_items(conn, db_path, category='perifericos') == 2
+        assert count_items(conn, db_path, low_stock=True) == 2
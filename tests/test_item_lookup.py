@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da consulta em lote: validação do corpo e ids, códigos e etiquetas misturados
+"""
+
+import pytest
+
+from conftest import insert_item
+from utils.database import connect
+from utils.item_lookup import (MAX_LOOKUP_REFS, lookup_items, parse_lookup_refs, scanned_refs,
+                               tally_scanned_items)
+
+
+def test_parse_lookup_refs_dedupes_in_order():
+    ids, codes = parse_lookup_refs({'ids': [3, '1', 3], 'codes': [' MOUS-001 ', '', None, 'MOUS-001']})
+
+    assert ids == [3, 1]
+    assert codes == ['MOUS-001']
+
+
+@pytest.mark.parametrize('body', [
+    None,
+    [],
+    {},
+    {'ids': 'a'},
+    {'ids': [True]},
+    {'ids': ['x']},
+    {'ids': list(range(MAX_LOOKUP_REFS)), 'codes': ['extra']}
+])
+def test_parse_lookup_refs_rejects_invalid_bodies(body):
+    with pytest.raises(ValueError):
+        parse_lookup_refs(body)
+
+
+def test_parse_lookup_refs_accepts_the_limit():
+    ids, codes = parse_lookup_refs({'ids': list(range(MAX_LOOKUP_REFS - 1)), 'codes': ['A']})
+    assert len(ids) + len(codes) == MAX_LOOKUP_REFS
+
+
+def test_mixed_ids_and_codes_in_one_lookup(db_path):
+    mouse = insert_item(db_path, 'Mouse', codigo='MOUS-001', codigo_barras='7890000000017')
+    teclado = insert_item(db_path, 'Teclado', codigo='TECL-001')
+
+    with connect(db_path) as conn:
+        result = lookup_items(conn, [teclado, 999], ['7890000000017', 'NAO-EXISTE'])
+
+    assert sorted(item['id'] for item in result['items']) == [mouse, teclado]
+    assert result['not_found'] == {'ids': [999], 'codes': ['NAO-EXISTE']}
+
+
+def test_scanned_labels_tally_per_item(db_path):
+    mouse = insert_item(db_path, 'Mouse', codigo='MOUS-001', codigo_barras='7890000000017')
+    teclado = insert_item(db_path, 'Teclado', codigo='TECL-001')
+    scanned = [
+        f'ITEM:{mouse}|MOUS-001|Mouse|perifericos',
+        '7890000000017',
+        'ITEM:|TECL-001|Teclado|',
+        'DESCONHECIDO'
+    ]
+
+    with connect(db_path) as conn:
+        result = lookup_items(conn, *scanned_refs(scanned))
+    counts, unknown = tally_scanned_items(scanned, result)
+
+    assert [(item['id'], count) for item, count in counts] == [(mouse, 2), (teclado, 1)]
+    assert unknown == ['DESCONHECIDO']
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes das migrações: reexecução, atualização de bancos antigos e triggers de itens
+"""
+
+import re
+import sqlite3
+
+import utils.migrations as migrations
+from utils.database import connect, open_connection
+from utils.migrations import LATEST_VERSION, get_schema_version, run_migrations
+from utils.search_index import backfill_range, run_backfill
+from utils.smart_search import SmartSearch
+
+
+def _version(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return get_schema_version(conn)
+    finally:
+        conn.close()
+
+
+def _items_version(conn):
+    return conn.execute("SELECT versao FROM itens_versao WHERE id = 1").fetchone()[0]
+
+
+def _schema(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT type, name FROM sqlite_master ORDER BY type, name").fetchall()
+    finally:
+        conn.close()
+
+
+def _legacy_database(tmp_path, monkeypatch, items):
+    """Banco na versão 11 (antes dos índices de busca) com itens gravados pelas versões antigas"""
+    db_path = str(tmp_path / 'antigo.db')
+    monkeypatch.setattr(migrations, 'MIGRATIONS', migrations.MIGRATIONS[:11])
+    monkeypatch.setattr(migrations, 'LATEST_VERSION', 11)
+    assert run_migrations(db_path) == 11
+    monkeypatch.undo()
+
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO itens (nome, quantidade, status, data_cadastro) VALUES (?, 1, 'ativo', ?)",
+        items
+    )
+    conn.commit()
+    conn.close()
+    return db_path
+
+
+def test_fresh_database_reaches_latest_version(db_path):
+    assert _version(db_path) == LATEST_VERSION
+    assert [row[0] for row in sqlite3.connect(db_path).execute(
+        "SELECT version FROM schema_version ORDER BY version")] == list(range(1, LATEST_VERSION + 1))
+
+
+def test_run_migrations_twice_is_noop(db_path):
+    schema = _schema(db_path)
+    migrations._migrated.clear()
+
+    assert run_migrations(db_path) == LATEST_VERSION
+    assert _schema(db_path) == schema
+
+
+def test_steps_can_be_reapplied(db_path):
+    # Passos reaplicados (ex.: versão gravada perdida) não podem falhar nem duplicar objetos
+    schema = _schema(db_path)
+    conn = open_connection(db_path, isolation_level=None)
+    conn.execute("DELETE FROM schema_version WHERE version > 1")
+    conn.close()
+    migrations._migrated.clear()
+
+    assert run_migrations(db_path) == LATEST_VERSION
+    assert _schema(db_path) == schema
+
+
+def test_upgrade_defers_search_backfill(tmp_path, monkeypatch):
+    # Formato ISO em hora local gravado pelas versões anteriores
+    db_path = _legacy_database(tmp_path, monkeypatch, [
+        ('Notebook Dell', '2025-01-02T10:00:00.123456'),
+        ('Mouse Logitech', '2025-01-02 10:00:00')
+    ])
+
+    assert run_migrations(db_path, backfill=False) == LATEST_VERSION
+    with connect(db_path) as conn:
+        # A migração só cria as estruturas e registra a faixa a carregar
+        assert conn.execute("SELECT COUNT(*) FROM itens_busca_norm").fetchone()[0] == 0
+        assert backfill_range(conn) == (0, 2)
+        dates = [row[0] for row in conn.execute("SELECT data_cadastro FROM itens ORDER BY id")]
+        assert all(re.fullmatch(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d', date) for date in dates)
+        assert dates[1] == '2025-01-02 10:00:00'
+
+    # Itens ainda não carregados continuam visíveis na busca
+    assert [item['nome'] for item in SmartSearch(db_path).search_items('notebook')] == ['Notebook Dell']
+
+    assert run_backfill(db_path, batch_size=1) == 2
+    with connect(db_path) as conn:
+        assert backfill_range(conn) is None
+        assert conn.execute("SELECT nome FROM itens_busca_norm ORDER BY item_id").fetchall() == [
+            ('notebook dell',), ('mouse logitech',)
+        ]
+        assert conn.execute("SELECT COUNT(*) FROM itens_busca_pendentes").fetchone()[0] == 0
+        fts_ids = conn.execute("SELECT rowid FROM itens_fts WHERE itens_fts MATCH 'mouse'").fetchall()
+        assert fts_ids == [(2,)]
+    assert run_backfill(db_path) == 0
+
+
+def test_single_version_bump_per_update(db_path):
+    with connect(db_path) as conn:
+        conn.execute("INSERT INTO itens (nome, quantidade, status) VALUES ('Mouse', 1, 'ativo')")
+    with connect(db_path) as conn:
+        before = _items_version(conn)
+        conn.execute("UPDATE itens SET quantidade = 2, nome = 'Mouse USB'")
+    with connect(db_path) as conn:
+        assert _items_version(conn) == before + 1
+        triggers = [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'itens' "
+            "AND sql LIKE '%AFTER UPDATE ON itens%'")]
+        assert len(triggers) == 1
+
+
+def test_update_stamps_utc_timestamp(db_path):
+    with connect(db_path) as conn:
+        conn.execute("INSERT INTO itens (nome, quantidade, status) VALUES ('Mouse', 1, 'ativo')")
+        conn.execute("UPDATE itens SET data_atualizacao = '2000-01-01 00:00:00'")
+        conn.execute("UPDATE itens SET quantidade = 3")
+        stored, age = conn.execute(
+            "SELECT data_atualizacao, (julianday('now') - julianday(data_atualizacao)) * 86400 FROM itens"
+        ).fetchone()
+
+    # Mesmo formato (e fuso) do DEFAULT CURRENT_TIMESTAMP
+    assert re.fullmatch(r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d', stored)
+    assert abs(age) < 60
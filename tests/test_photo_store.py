@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da coleta de fotos órfãs com foto_path no formato antigo
+"""
+
+import io
+import os
+import time
+
+import pytest
+
+from conftest import insert_item
+from utils.photo_store import (THUMB_FORMATS, THUMB_SIZES, THUMBS_SUBDIR, collect_garbage,
+                               photo_file_path, photo_name, store_photo, thumbnail_name)
+
+LEGACY_PATHS = {
+    'relativa.jpg': 'bot/../fotos/relativa.jpg',
+    'absoluta.jpg': '/home/outro/Assistente_Stock_MPA/fotos/absoluta.jpg',
+    'windows.jpg': 'C:\\Users\\outro\\fotos\\windows.jpg',
+    'nome.jpg': 'nome.jpg'
+}
+
+
+def _touch(path, age=7200):
+    with open(path, 'wb') as f:
+        f.write(b'foto')
+    old = time.time() - age
+    os.utime(path, (old, old))
+
+
+@pytest.fixture
+def fotos_dir(tmp_path, db_path):
+    directory = tmp_path / 'fotos'
+    (directory / THUMBS_SUBDIR).mkdir(parents=True)
+    for name, foto_path in LEGACY_PATHS.items():
+        insert_item(db_path, name, foto_path=foto_path)
+        _touch(directory / name)
+        _touch(directory / THUMBS_SUBDIR / f"{os.path.splitext(name)[0]}_160.webp")
+    _touch(directory / 'orfa.jpg')
+    _touch(directory / THUMBS_SUBDIR / 'orfa_160.webp')
+    return str(directory)
+
+
+@pytest.mark.parametrize('foto_path', sorted(LEGACY_PATHS.values()))
+def test_photo_name_strips_legacy_directories(foto_path):
+    assert photo_name(foto_path) in LEGACY_PATHS
+
+
+def test_photo_file_path_resolves_legacy_paths(fotos_dir):
+    for name, foto_path in LEGACY_PATHS.items():
+        assert photo_file_path(foto_path, fotos_dir) == os.path.join(fotos_dir, name)
+
+
+def test_gc_keeps_photos_referenced_by_legacy_paths(db_path, fotos_dir):
+    removed = collect_garbage(db_path, fotos_dir)
+
+    assert removed == {'originals': 1, 'thumbnails': 1}
+    assert sorted(os.listdir(fotos_dir)) == sorted(list(LEGACY_PATHS) + [THUMBS_SUBDIR])
+    assert len(os.listdir(os.path.join(fotos_dir, THUMBS_SUBDIR))) == len(LEGACY_PATHS)
+
+
+def test_gc_dry_run_removes_nothing(db_path, fotos_dir):
+    before = sorted(os.listdir(fotos_dir))
+
+    assert collect_garbage(db_path, fotos_dir, dry_run=True) == {'originals': 1, 'thumbnails': 1}
+    assert sorted(os.listdir(fotos_dir)) == before
+
+
+def test_gc_respects_grace_period(db_path, fotos_dir):
+    _touch(os.path.join(fotos_dir, 'recente.jpg'), age=0)
+
+    collect_garbage(db_path, fotos_dir)
+
+    assert os.path.exists(os.path.join(fotos_dir, 'recente.jpg'))
+
+
+def test_restored_orphan_survives_gc(db_path, tmp_path):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), 'red').save(buffer, format='JPEG')
+    directory = str(tmp_path / 'fotos_novas')
+    name = store_photo(buffer.getvalue(), directory)
+    thumbs = [os.path.join(directory, THUMBS_SUBDIR, thumbnail_name(name, size, ext))
+              for size in THUMB_SIZES for ext in THUMB_FORMATS]
+    old = time.time() - 7200
+    for path in [os.path.join(directory, name)] + thumbs:
+        os.utime(path, (old, old))
+
+    # Mesma foto enviada de novo antes de o item ser gravado
+    assert store_photo(buffer.getvalue(), directory) == name
+    removed = collect_garbage(db_path, directory)
+
+    assert removed == {'originals': 0, 'thumbnails': 0}
+    assert all(os.path.exists(path) for path in [os.path.join(directory, name)] + thumbs)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do rate limiting: reposição, bloqueio e retry_after nos dois backends
+"""
+
+import pytest
+
+from utils import rate_limiter
+from utils.database import close_thread_connections
+from utils.rate_limiter import MemoryBackend, RateLimiter, SQLiteBackend, parse_quotas
+
+
+class _Clock:
+    """Relógio controlado para monotonic() e time()"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(rate_limiter, 'time', fake)
+    return fake
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        yield MemoryBackend()
+    else:
+        yield SQLiteBackend(str(tmp_path / 'limites.db'))
+        close_thread_connections()
+
+
+def test_bucket_denies_then_refills(clock, backend):
+    # 3 requisições por 30 s: um token a cada 10 s
+    limiter = RateLimiter(limit=3, window=30, backend=backend)
+
+    assert [limiter.hit('ip:1').allowed for _ in range(3)] == [True, True, True]
+    denied = limiter.hit('ip:1')
+    assert not denied.allowed and denied.remaining == 0
+    assert denied.retry_after == pytest.approx(10)
+
+    clock.now += 5
+    assert limiter.hit('ip:1').retry_after == pytest.approx(5)
+
+    clock.now += 5
+    assert limiter.hit('ip:1').allowed
+    # Outra chave tem bucket próprio
+    assert limiter.hit('ip:2').remaining == 2
+
+
+def test_idle_bucket_refills_to_capacity_only(clock, backend):
+    limiter = RateLimiter(limit=2, window=10, backend=backend)
+    limiter.hit('ip:1')
+
+    clock.now += 3600
+    assert limiter.hit('ip:1').remaining == 1
+
+
+def test_quota_keys_use_their_own_limit(clock):
+    limiter = RateLimiter(limit=1, window=60, quotas=parse_quotas('vip=3, ruim=x'))
+
+    assert [limiter.check_request('vip', '10.0.0.1').allowed for _ in range(4)] == [True, True, True, False]
+    assert limiter.check_request('ruim', '10.0.0.1').allowed
+    assert not limiter.check_request(None, '10.0.0.1').allowed
+
+
+def test_memory_backend_drops_least_recent_keys(clock):
+    backend = MemoryBackend(max_keys=2)
+    limiter = RateLimiter(limit=1, window=60, backend=backend)
+    for key in ('a', 'b', 'c'):
+        limiter.hit(key)
+
+    assert len(backend) == 2
+    # 'a' saiu: volta com o bucket cheio
+    assert limiter.hit('a').allowed
+
+
+def test_zero_limit_disables(clock):
+    assert RateLimiter(limit=0).hit('ip:1').allowed
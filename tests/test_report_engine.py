@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do relatório em streaming: PDF com várias páginas e blocos do cursor
+"""
+
+import csv
+import io
+import re
+
+import pytest
+
+from utils import report_engine
+from utils.database import connect
+from utils.report_engine import REPORT_COLUMNS, REPORT_TYPES, generate_report
+
+pytest.importorskip('reportlab')
+
+
+def _insert_items(db_path, total):
+    with connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO itens (nome, descricao, quantidade, status) VALUES (?, ?, 1, ?)",
+            [(f"Item {number}", 'Descrição ' * 10, REPORT_TYPES['estoque']) for number in range(total)]
+        )
+
+
+def _pdf_pages(db_path):
+    output, filename = generate_report(db_path, 'estoque', 'pdf')
+    with output:
+        data = output.read()
+    assert filename.endswith('.pdf') and data.startswith(b'%PDF')
+    return len(re.findall(rb'/Type /Page\b(?!s)', data))
+
+
+def test_pdf_spans_pages_across_cursor_chunks(db_path, monkeypatch):
+    monkeypatch.setattr(report_engine, 'FETCH_SIZE', 50)
+    _insert_items(db_path, 100)
+    pages_small = _pdf_pages(db_path)
+
+    _insert_items(db_path, 300)
+    pages_large = _pdf_pages(db_path)
+
+    assert pages_small > 1
+    # Todas as linhas de todos os blocos entram: 4x as linhas, ~4x as páginas
+    assert pages_large >= 3 * pages_small
+
+
+def test_empty_report_returns_no_file(db_path):
+    assert generate_report(db_path, 'estoque', 'pdf')[0] is None
+
+
+@pytest.mark.parametrize('formato', ['csv', 'xlsx'])
+def test_rows_from_every_cursor_chunk_are_written(db_path, monkeypatch, formato):
+    monkeypatch.setattr(report_engine, 'FETCH_SIZE', 7)
+    _insert_items(db_path, 30)
+
+    output, _ = generate_report(db_path, 'estoque', formato)
+    with output:
+        if formato == 'csv':
+            rows = list(csv.reader(io.TextIOWrapper(output, encoding='utf-8-sig')))
+        else:
+            from openpyxl import load_workbook
+            rows = list(load_workbook(output, read_only=True).active.values)
+
+    assert list(rows[0]) == REPORT_COLUMNS
+    assert [row[1] for row in rows[1:]] == [f"Item {number}" for number in range(30)]
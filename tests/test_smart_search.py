@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes da busca inteligente: índice FTS5 (prefixo), busca por trecho, score e similaridade
+"""
+
+from difflib import SequenceMatcher
+
+from conftest import insert_item
+from utils.bulk_import import BulkImporter
+from utils.database import connect
+from utils.search_index import FIELD_WEIGHTS, normalize_item_fields, similarity_filter
+from utils.smart_search import SmartSearch
+
+
+def _names(results):
+    return {item['nome'] for item in results}
+
+
+def _pending(db_path):
+    with connect(db_path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM itens_busca_pendentes").fetchone()[0]
+
+
+def _legacy_score(normalized_item, normalized_query):
+    """Cálculo por item anterior ao lote (SequenceMatcher campo a campo)"""
+    score = 0.0
+    for field, weight in FIELD_WEIGHTS.items():
+        normalized_field = normalized_item[field]
+        if normalized_query in normalized_field:
+            score += weight * 1.0
+        for term in normalized_query.split():
+            if term in normalized_field:
+                score += weight * 0.5
+        if normalized_field and normalized_query:
+            similarity = SequenceMatcher(None, normalized_query, normalized_field).ratio()
+            if similarity > 0.3:
+                score += weight * similarity * 0.3
+    return min(score, 1.0)
+
+
+def test_prefix_match_comes_from_fts(db_path):
+    BulkImporter(db_path).import_items([
+        {'nome': 'Notebook Dell', 'categoria': 'notebook'},
+        {'nome': 'Mouse Logitech', 'categoria': 'mouse'}
+    ])
+
+    results = SmartSearch(db_path).search_items('note')
+
+    assert _names(results) == {'Notebook Dell'}
+
+
+def test_substring_match_inside_words(db_path):
+    BulkImporter(db_path).import_items([
+        {'nome': 'Bookshelf', 'categoria': 'mobiliario'},
+        {'nome': 'Ebook Reader', 'categoria': 'eletronicos'},
+        {'nome': 'Notebook Dell', 'categoria': 'notebook'},
+        {'nome': 'Mouse Logitech', 'categoria': 'mouse'}
+    ])
+
+    results = SmartSearch(db_path).search_items('book')
+
+    # FTS só casa o prefixo (Bookshelf); os demais vêm da busca por trecho
+    assert _names(results) == {'Bookshelf', 'Ebook Reader', 'Notebook Dell'}
+
+
+def test_substring_fallback_respects_limit(db_path):
+    BulkImporter(db_path).import_items([
+        {'nome': f'Ebook {i}', 'categoria': 'eletronicos'} for i in range(5)
+    ])
+
+    assert len(SmartSearch(db_path).search_items('book', limit=3)) == 3
+
+
+def test_substring_search_uses_trigram_index(db_path):
+    from utils.database import connect
+
+    BulkImporter(db_path).import_items([{'nome': 'Ebook Reader', 'categoria': 'eletronicos'}])
+    search = SmartSearch(db_path)
+
+    with connect(db_path) as conn:
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT rowid FROM itens_trechos WHERE itens_trechos MATCH ?",
+            (search.search_index.build_substring_query(['book']),)
+        ).fetchall()
+
+    assert any('VIRTUAL TABLE INDEX' in row[3] for row in plan)
+    assert _names(search.search_items('book')) == {'Ebook Reader'}
+
+
+def test_short_terms_only_filter_indexed_matches(db_path):
+    BulkImporter(db_path).import_items([
+        {'nome': 'Ebook X1', 'categoria': 'eletronicos'},
+        {'nome': 'Ebook Z9', 'categoria': 'eletronicos'}
+    ])
+    search = SmartSearch(db_path)
+
+    assert _names(search.search_items('book x1')) == {'Ebook X1'}
+    # Sem termo de 3+ caracteres não há busca por trecho: só prefixos do FTS5
+    assert search.search_items('bo') == []
+
+
+def test_search_is_read_only(db_path):
+    item_id = insert_item(db_path, 'Cadeira Giratória')
+    assert _pending(db_path) == 1
+
+    results = SmartSearch(db_path).search_items('cadeira')
+
+    # Item pendente é pontuado com normalização em memória, sem gravar o índice
+    assert [item['id'] for item in results] == [item_id]
+    assert results[0]['relevance_score'] > 0
+    assert _pending(db_path) == 1
+
+
+def test_bulk_import_normalizes_on_write(db_path):
+    BulkImporter(db_path).import_items([{'nome': 'Impressora Épson', 'categoria': 'impressora'}])
+
+    assert _pending(db_path) == 0
+    with connect(db_path) as conn:
+        assert conn.execute("SELECT nome FROM itens_busca_norm").fetchone()[0] == 'impressora epson'
+
+
+def test_relevance_prefers_closer_text(db_path):
+    # descricao tem peso baixo: os scores ficam abaixo do limite de 1.0
+    search = SmartSearch(db_path)
+    exact = search._calculate_relevance_score({'descricao': 'Mouse'}, 'mouse')
+    partial = search._calculate_relevance_score({'descricao': 'Mousepad'}, 'mouse')
+    unrelated = search._calculate_relevance_score({'descricao': 'Teclado'}, 'mouse')
+
+    assert exact > partial > unrelated == 0
+
+
+def test_batch_scores_match_per_item_scores(db_path):
+    items = [normalize_item_fields(item) for item in [
+        {'nome': 'Mouse Logitech', 'marca': 'Logitech', 'categoria': 'mouse', 'descricao': 'Mouse sem fio'},
+        {'nome': 'Mousepad Gamer', 'marca': 'Corsair', 'categoria': 'acessorios', 'descricao': 'Mousepad grande'},
+        {'nome': 'Teclado Mecânico', 'marca': 'Logitech', 'categoria': 'teclado', 'descricao': 'Switch azul'},
+        {'nome': 'Monitor 24', 'modelo': 'M24', 'categoria': 'monitor', 'descricao': 'Monitor Full HD'},
+        {'nome': 'Cabo HDMI', 'codigo': 'CABO-001', 'descricao': None}
+    ]]
+    search = SmartSearch(db_path)
+
+    for query in ['mouse', 'logitech sem fio', 'monitr', 'CABO-001', 'xyz']:
+        scores = search._calculate_relevance_scores(items, query)
+        legacy = [_legacy_score(item, search.normalize_text(query)) for item in items]
+
+        # Mesmos valores, logo a mesma ordenação
+        assert scores == legacy
+
+
+def test_similar_names_include_pending_items(db_path):
+    BulkImporter(db_path).import_items([{'nome': 'Notebook Dell Latitude', 'categoria': 'notebook'}])
+    pending_id = insert_item(db_path, 'Notebok Dell Latitude')
+
+    results = SmartSearch(db_path).search_similar_names('Notebook Dell Latitude', threshold=0.9)
+
+    assert pending_id in {item['id'] for item in results}
+    assert all(not item['approximate'] for item in results)
+
+
+def test_similar_names_flag_approximate_thresholds(db_path):
+    BulkImporter(db_path).import_items([{'nome': 'Projetor Epson', 'categoria': 'projetor'}])
+    search = SmartSearch(db_path)
+
+    approximate = search.search_similar_names('Projetor Epsom', threshold=0.4)
+    exact = search.search_similar_names('Projetor Epsom', threshold=0.4, exact=True)
+
+    assert approximate and all(item['approximate'] for item in approximate)
+    assert exact and not any(item['approximate'] for item in exact)
+
+
+def test_similar_names_limit_keeps_best(db_path):
+    BulkImporter(db_path).import_items([
+        {'nome': 'Monitor Samsung 24', 'categoria': 'monitor'},
+        {'nome': 'Monitor Samsung 27', 'categoria': 'monitor'},
+        {'nome': 'Monitor Samsung', 'categoria': 'monitor'}
+    ])
+
+    results = SmartSearch(db_path).search_similar_names('Monitor Samsung', threshold=0.5, limit=1)
+
+    assert _names(results) == {'Monitor Samsung'}
+
+
+def test_similarity_filter_is_sound_only_for_high_thresholds():
+    assert similarity_filter('notebook dell latitude', 0.9)[1]
+    assert not similarity_filter('notebook dell latitude', 0.6)[1]
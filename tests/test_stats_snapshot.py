@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes dos agregados materializados: triggers acompanham o recálculo completo
+"""
+
+from conftest import insert_item
+from utils.database import connect
+from utils.stats_snapshot import ranked, read_stats, rebuild_stats
+
+
+def _stats(db_path):
+    with connect(db_path) as conn:
+        return read_stats(conn)
+
+
+def test_snapshot_follows_insert_update_and_delete(db_path):
+    mouse = insert_item(db_path, 'Mouse', categoria='perifericos', quantidade=2, preco_unitario=10.0)
+    monitor = insert_item(db_path, 'Monitor', categoria='video', quantidade=8, foto_path='m.jpg')
+    insert_item(db_path, 'Cabo', quantidade=20)
+
+    stats = _stats(db_path)
+    assert stats['total']['itens'] == 3 and stats['total']['quantidade'] == 30
+    assert stats['total']['estoque_baixo'] == 1 and stats['total']['com_foto'] == 1
+    assert stats['categoria']['perifericos']['valor'] == 20.0
+
+    with connect(db_path) as conn:
+        conn.execute("UPDATE itens SET categoria = 'video', quantidade = 6 WHERE id = ?", (mouse,))
+        conn.execute("DELETE FROM itens WHERE id = ?", (monitor,))
+
+    stats = _stats(db_path)
+    assert 'perifericos' not in stats['categoria']
+    assert stats['categoria']['video'] == {
+        'itens': 1, 'quantidade': 6, 'valor': 60.0, 'estoque_baixo': 0, 'com_foto': 0, 'com_midia': 0
+    }
+    assert stats['total']['itens'] == 2 and stats['total']['quantidade'] == 26
+    assert [key for key, _ in ranked(stats['categoria'], include_empty=True)] == ['', 'video']
+
+    # O recálculo completo confirma o que os triggers mantiveram
+    assert rebuild_stats(db_path) == stats
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Testes do índice de sugestões: top-k por prefixo, log e atualização
+"""
+
+import random
+
+from conftest import insert_item
+from utils.database import connect
+from utils.suggestion_index import (LOG_PRUNE_EVERY, LOG_RETENTION, SUGGESTION_LIMITS,
+                                    SuggestionIndex, parse_suggestion_limit, suggestion_limits)
+
+NOMES = ['Mouse', 'Mousepad', 'Monitor', 'Modem', 'Notebook', 'Nobreak']
+MARCAS = ['Dell', 'Logitech', 'Multilaser', 'Dell Pro']
+
+
+def _full_scan(index, prefix):
+    """Mesmas sugestões percorrendo toda a faixa do prefixo (limites acima do top-k)"""
+    limits = {column: limit + 100 for column, limit in SUGGESTION_LIMITS.items()}
+    ranked = {}
+    for suggestion in index.suggest(prefix, limits):
+        ranked.setdefault(suggestion['field'], []).append(suggestion)
+    expected = []
+    for column, limit in SUGGESTION_LIMITS.items():
+        expected += ranked.get(column, [])[:limit]
+    expected.sort(key=lambda s: (-s['count'], s['text']))
+    seen = set()
+    return [s for s in expected if not (s['text'] in seen or seen.add(s['text']))]
+
+
+def test_prefix_top_k_stays_exact_after_changes(db_path):
+    rng = random.Random(7)
+    ids = [
+        insert_item(db_path, f"{rng.choice(NOMES)} {rng.choice(MARCAS)}", marca=rng.choice(MARCAS))
+        for _ in range(60)
+    ]
+    index = SuggestionIndex(db_path, refresh_interval=0)
+    prefixes = ['m', 'mo', 'mou', 'no', 'd', 'dell p', 'l']
+
+    for _ in range(30):
+        for prefix in prefixes:
+            assert index.suggest(prefix) == _full_scan(index, prefix)
+
+        with connect(db_path) as conn:
+            item_id = rng.choice(ids)
+            if rng.random() < 0.3:
+                conn.execute("DELETE FROM itens WHERE id = ?", (item_id,))
+                ids.remove(item_id)
+            else:
+                conn.execute(
+                    "UPDATE itens SET nome = ?, marca = ? WHERE id = ?",
+                    (f"{rng.choice(NOMES)} {rng.choice(MARCAS)}", rng.choice(MARCAS), item_id)
+                )
+            ids.append(insert_item(db_path, rng.choice(NOMES), marca=rng.choice(MARCAS)))
+
+
+def test_reads_wait_for_interval_or_invalidate(db_path):
+    insert_item(db_path, 'Mouse Dell')
+    index = SuggestionIndex(db_path, refresh_interval=3600)
+    assert [s['text'] for s in index.suggest('mou')] == ['Mouse Dell']
+
+    insert_item(db_path, 'Mousepad')
+    assert [s['text'] for s in index.suggest('mou')] == ['Mouse Dell']
+
+    index.invalidate()
+    assert {s['text'] for s in index.suggest('mou')} == {'Mouse Dell', 'Mousepad'}
+
+
+def test_log_is_pruned_on_write(db_path):
+    with connect(db_path) as conn:
+        conn.executemany(
+            "INSERT INTO itens_sugestoes_log(item_id) VALUES (?)",
+            [(1,)] * (LOG_RETENTION + 2 * LOG_PRUNE_EVERY)
+        )
+        total = conn.execute("SELECT COUNT(*) FROM itens_sugestoes_log").fetchone()[0]
+
+    assert total <= LOG_RETENTION + LOG_PRUNE_EVERY
+
+
+def test_suggest_does_not_write(db_path):
+    insert_item(db_path, 'Monitor Dell')
+    index = SuggestionIndex(db_path, refresh_interval=0)
+    index.suggest('mon')
+
+    with connect(db_path) as conn:
+        changes = conn.total_changes
+        insert_item(db_path, 'Monitor LG')
+        changes_after_write = conn.total_changes
+        index.suggest('mon')
+        assert conn.total_changes == changes_after_write > changes
+
+
+def test_limit_above_top_k_returns_more_suggestions(db_path):
+    for number in range(30):
+        insert_item(db_path, f"Monitor {number:02d}")
+    index = SuggestionIndex(db_path, refresh_interval=0)
+    limit = parse_suggestion_limit('25')
+    assert limit > sum(SUGGESTION_LIMITS.values())
+
+    suggestions = index.suggest('monitor', suggestion_limits(limit))[:limit]
+
+    assert len(suggestions) == limit
+    assert len(index.suggest('monitor', suggestion_limits(10))) <= sum(SUGGESTION_LIMITS.values())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Tarefas Pesadas dos Handlers do Bot
+Funções de módulo (serializáveis) executadas fora do event loop pelo
+JobExecutor: leitura de QR em fotos, geração de QR e relatório de inventário.
+Bibliotecas opcionais são importadas dentro de cada função.
+"""
+
+import io
+from datetime import datetime
+from typing import Dict, List
+
+# Maior lado da imagem na primeira tentativa de leitura do QR
+QR_DECODE_MAX_SIDE = 800
+
+INVENTORY_REPORT_EXTENSIONS = {
+    'txt': 'txt',
+    'csv': 'csv',
+    'excel': 'xlsx'
+}
+
+
+def _decode_gray(img) -> List[str]:
+    from pyzbar.pyzbar import decode
+
+    return [obj.data.decode('utf-8') for obj in decode(img.convert('L'))]
+
+
+def decode_qr_bytes(data: bytes) -> List[str]:
+    """
+    Conteúdos dos códigos encontrados na foto (lista vazia se nenhum)
+
+    Tenta primeiro a imagem reduzida a QR_DECODE_MAX_SIDE em tons de cinza
+    (JPEG já é decodificado reduzido); resolução completa só se nada for lido.
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        if max(img.size) <= QR_DECODE_MAX_SIDE:
+            return _decode_gray(img)
+
+        img.draft('L', (QR_DECODE_MAX_SIDE, QR_DECODE_MAX_SIDE))
+        small = img.convert('L')
+        small.thumbnail((QR_DECODE_MAX_SIDE, QR_DECODE_MAX_SIDE))
+        found = _decode_gray(small)
+        if found:
+            return found
+
+    # Códigos pequenos na foto: nova leitura sem redução
+    with Image.open(io.BytesIO(data)) as img:
+        return _decode_gray(img)
+
+
+def render_qr_png(data: str) -> bytes:
+    """PNG do QR Code com o conteúdo dado"""
+    import qrcode
+
+    buffer = io.BytesIO()
+    qrcode.make(data).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _inventory_txt(lista: List[Dict]) -> str:
+    f = io.StringIO()
+    f.write('RELATÓRIO DE INVENTÁRIO\n')
+    f.write(f'Data: {datetime.now().strftime("%d/%m/%Y %H:%M:%S")}\n')
+    f.write(f'Total de itens: {len(lista)}\n')
+    f.write('=' * 80 + '\n\n')
+
+    for item in lista:
+        f.write(f'ID: {item["id"]}\n')
+        f.write(f'Nome: {item["nome"]}\n')
+        f.write(f'Código: {item["codigo"] or "N/A"}\n')
+        f.write(f'Categoria: {item["categoria"] or "N/A"}\n')
+        f.write(f'Localização: {item["localizacao"] or "N/A"}\n')
+        f.write(f'Qtd Sistema: {item["quantidade_sistema"]}\n')
+        f.write(f'Qtd Inventário: {item["quantidade_inventario"]}\n')
+        f.write(f'Diferença: {item["diferenca"]:+d}\n')
+        f.write(f'Data Inventário: {item["data_inventario"]}\n')
+        f.write('-' * 50 + '\n')
+    return f.getvalue()
+
+
+def _inventory_excel(lista: List[Dict]) -> bytes:
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    df = pd.DataFrame(lista)
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Inventário', index=False)
+        worksheet = writer.sheets['Inventário']
+
+        # Largura das colunas pelo maior valor (máximo 50)
+        for column in worksheet.columns:
+            max_length = max((len(str(cell.value)) for cell in column if cell.value is not None), default=0)
+            worksheet.column_dimensions[column[0].column_letter].width = min(max_length + 2, 50)
+    return buffer.getvalue()
+
+
+def render_inventory_report(lista: List[Dict], formato: str) -> bytes:
+    """Conteúdo do relatório do inventário do chat (formato: txt, csv ou excel)"""
+    if formato not in INVENTORY_REPORT_EXTENSIONS:
+        raise ValueError(f"Formato inválido: {formato}")
+
+    if formato == 'txt':
+        return _inventory_txt(lista).encode('utf-8')
+    if formato == 'csv':
+        import pandas as pd
+        return pd.DataFrame(lista).to_csv(index=False, sep=';').encode('utf-8-sig')
+    return _inventory_excel(lista)
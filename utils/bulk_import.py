@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Importação de Itens em Lote
+Valida o lote inteiro, reserva os códigos de uma vez e insere com executemany em
+transações por bloco (QR codes são gerados sob demanda pelo cache de QR)
+"""
+
+import csv
+import os
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from utils.code_generator import CodeGenerator
+    from utils.database import connect
+    from utils.search_index import index_pending
+except ImportError:
+    from code_generator import CodeGenerator
+    from database import connect
+    from search_index import index_pending
+
+# Linhas por transação de INSERT
+CHUNK_SIZE = 1000
+
+# Limite de parâmetros por consulta IN (SQLITE_MAX_VARIABLE_NUMBER antigo)
+_IN_CHUNK = 900
+
+ITEM_FIELDS = ['nome', 'descricao', 'quantidade', 'status', 'categoria',
+               'localizacao', 'marca', 'modelo', 'numero_serie']
+
+# Cabeçalhos alternativos aceitos nas planilhas
+HEADER_ALIASES = {
+    'descrição': 'descricao',
+    'qtd': 'quantidade',
+    'quantity': 'quantidade',
+    'localização': 'localizacao',
+    'número_de_série': 'numero_serie',
+    'numero_de_serie': 'numero_serie',
+    'serie': 'numero_serie'
+}
+
+# Colunas de código com índice único (valores são os dois últimos do INSERT)
+CODE_FIELDS = ('codigo', 'codigo_barras')
+
+# Tentativas de código substituto por linha (uma por coluna de código)
+_MAX_CODE_RETRIES = len(CODE_FIELDS)
+
+_INSERT = f'''
+INSERT INTO itens ({', '.join(ITEM_FIELDS)}, codigo, codigo_barras)
+VALUES ({', '.join('?' for _ in ITEM_FIELDS)}, ?, ?)
+'''
+
+
+def _conflicting_code_field(error: sqlite3.IntegrityError) -> Optional[str]:
+    """Coluna de código da violação UNIQUE ("UNIQUE constraint failed: itens.codigo")"""
+    message = str(error)
+    if 'UNIQUE' not in message:
+        return None
+    column = message.rsplit('.', 1)[-1].strip()
+    return column if column in CODE_FIELDS else None
+
+
+def _normalize_header(header: str) -> str:
+    key = (header or '').strip().lower().replace(' ', '_')
+    return HEADER_ALIASES.get(key, key)
+
+
+def read_rows(file_path: str) -> List[Dict]:
+    """Lê as linhas de um arquivo CSV (; ou ,) ou XLSX como dicts com cabeçalhos normalizados"""
+    extension = os.path.splitext(file_path)[1].lower()
+
+    if extension in ('.xlsx', '.xlsm'):
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            headers = [_normalize_header(str(h) if h is not None else '') for h in next(rows, [])]
+            return [dict(zip(headers, row)) for row in rows if any(v is not None for v in row)]
+        finally:
+            workbook.close()
+
+    with open(file_path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        delimiter = ';' if sample.count(';') > sample.count(',') else ','
+        reader = csv.DictReader(f, delimiter=delimiter)
+        reader.fieldnames = [_normalize_header(h) for h in reader.fieldnames or []]
+        return [row for row in reader if any(row.values())]
+
+
+def validate_row(row: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+    """Normaliza uma linha; retorna (item, None) ou (None, mensagem de erro)"""
+    item = {}
+    for field in ITEM_FIELDS:
+        value = row.get(field)
+        item[field] = str(value).strip() if value is not None else ''
+
+    if not item['nome']:
+        return None, 'Nome obrigatório'
+
+    try:
+        item['quantidade'] = int(float(item['quantidade'])) if item['quantidade'] else 1
+    except (ValueError, OverflowError):
+        return None, f"Quantidade inválida: {item['quantidade']}"
+    if item['quantidade'] < 0:
+        return None, 'Quantidade não pode ser negativa'
+
+    item['status'] = item['status'] or 'ativo'
+    return item, None
+
+
+class BulkImporter:
+    """Pipeline de cadastro em lote com erros por linha"""
+
+    def __init__(self, db_path: str, chunk_size: int = CHUNK_SIZE):
+        self.db_path = db_path
+        self.chunk_size = max(1, chunk_size)
+        self.code_generator = CodeGenerator(db_path)
+
+    def _replacement_code(self, field: str, line: int, values: Tuple) -> str:
+        if field == 'codigo':
+            return f"{self.code_generator.generate_random_code()}-{line}"
+        # Novo sequencial do dia: continua um EAN-13 válido
+        return self.code_generator.generate_barcode(values[ITEM_FIELDS.index('categoria')])
+
+    def _insert_row(self, conn: sqlite3.Connection, line: int, values: Tuple,
+                    reassigned: List[Dict]) -> Tuple:
+        """
+        Insere uma linha; código já gravado por fora do gerador é trocado só na
+        coluna em conflito e a troca é registrada em `reassigned`
+        """
+        for attempt in range(_MAX_CODE_RETRIES + 1):
+            try:
+                conn.execute(_INSERT, values)
+                return values
+            except sqlite3.IntegrityError as e:
+                field = _conflicting_code_field(e)
+                if field is None or attempt == _MAX_CODE_RETRIES:
+                    raise
+                position = len(values) - len(CODE_FIELDS) + CODE_FIELDS.index(field)
+                replacement = self._replacement_code(field, line, values)
+                reassigned.append({'row': line, 'item': values[0], 'field': field,
+                                   'original': values[position], 'code': replacement})
+                values = values[:position] + (replacement,) + values[position + 1:]
+
+    def _insert_chunk(self, conn: sqlite3.Connection, rows: List[Tuple], errors: List[Dict],
+                      reassigned: List[Dict]) -> List[Tuple]:
+        """Insere o bloco; se algo falhar, refaz linha a linha para isolar o erro"""
+        if not conn.in_transaction:
+            # Sem transação aberta o RELEASE faria commit antes do index_pending
+            conn.execute("BEGIN")
+        conn.execute("SAVEPOINT bulk_chunk")
+        try:
+            conn.executemany(_INSERT, [values for _, values in rows])
+            conn.execute("RELEASE bulk_chunk")
+            return rows
+        except sqlite3.Error:
+            conn.execute("ROLLBACK TO bulk_chunk")
+            conn.execute("RELEASE bulk_chunk")
+
+        inserted = []
+        for line, values in rows:
+            row_reassigned: List[Dict] = []
+            try:
+                values = self._insert_row(conn, line, values, row_reassigned)
+            except sqlite3.IntegrityError as e:
+                errors.append({'row': line, 'item': values[0], 'error': f'Erro de integridade: {e}'})
+                continue
+            except sqlite3.Error as e:
+                errors.append({'row': line, 'item': values[0], 'error': str(e)})
+                continue
+            reassigned.extend(row_reassigned)
+            inserted.append((line, values))
+        return inserted
+
+    def _fetch_ids(self, conn: sqlite3.Connection, codes: List[str]) -> Dict[str, int]:
+        ids = {}
+        for start in range(0, len(codes), _IN_CHUNK):
+            chunk = codes[start:start + _IN_CHUNK]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor = conn.execute(f"SELECT codigo, id FROM itens WHERE codigo IN ({placeholders})", chunk)
+            ids.update(cursor.fetchall())
+        return ids
+
+    def import_items(self, rows: Iterable[Dict]) -> Dict:
+        """
+        Cadastra as linhas em lote
+
+        Args:
+            rows: Dicts com os campos de ITEM_FIELDS (linhas de read_rows ou do bot)
+
+        Returns:
+            Dict com 'success', 'errors', 'items', 'error_details' ({'row', 'item', 'error'}),
+            'reassigned' (linhas cujo código reservado já existia: {'row', 'item', 'field',
+            'original', 'code'}) e 'message'; a numeração de 'row' começa em 1
+        """
+        error_details: List[Dict] = []
+        reassigned: List[Dict] = []
+        valid: List[Tuple[int, Dict]] = []
+
+        for line, row in enumerate(rows, start=1):
+            item, error = validate_row(row)
+            if error:
+                error_details.append({'row': line, 'item': row.get('nome') or 'N/A', 'error': error})
+            else:
+                valid.append((line, item))
+
+        # Todos os códigos do lote em uma única reserva
+        codes = self.code_generator.reserve_item_codes(
+            [(item['nome'], item['categoria']) for _, item in valid]
+        )
+
+        inserted: List[Tuple[int, Tuple]] = []
+        for start in range(0, len(valid), self.chunk_size):
+            chunk = [
+                (line, tuple(item[field] for field in ITEM_FIELDS)
+                 + (item_codes['codigo_mnemonico'], item_codes['codigo_barras']))
+                for (line, item), item_codes in zip(valid[start:start + self.chunk_size],
+                                                    codes[start:start + self.chunk_size])
+            ]
+            with connect(self.db_path) as conn:
+                inserted.extend(self._insert_chunk(conn, chunk, error_details, reassigned))
+                # Texto de busca normalizado na mesma transação do lote
+                index_pending(conn)
+
+        with connect(self.db_path) as conn:
+            ids = self._fetch_ids(conn, [values[-2] for _, values in inserted])
+
+        items = []
+        for _, values in inserted:
+            item = dict(zip(ITEM_FIELDS + ['codigo', 'codigo_barras'], values))
+            item['id'] = ids.get(item['codigo'])
+            items.append(item)
+
+        error_details.sort(key=lambda detail: detail['row'])
+        message = f"Cadastro em lote: {len(items)} sucessos, {len(error_details)} erros"
+        if reassigned:
+            message += f", {len(reassigned)} códigos substituídos"
+        return {
+            'success': len(items),
+            'errors': len(error_details),
+            'items': items,
+            'error_details': error_details,
+            'reassigned': reassigned,
+            'message': message
+        }
+
+    def import_file(self, file_path: str) -> Dict:
+        """Cadastra os itens de um arquivo CSV ou XLSX"""
+        return self.import_items(read_rows(file_path))
@@ -8,18 +8,68 @@ Data: 16/09/2025
 
 import re
 import random
-import sqlite3
 from typing import Optional, Dict, List, Tuple
 from datetime import datetime
 import qrcode
 from io import BytesIO
 import base64
 
+try:
+    from utils.database import connect
+    from utils.migrations import run_migrations
+    from utils.sequences import allocate, barcode_key, mnemonic_key, seed_mnemonic_sequences
+except ImportError:
+    from database import connect
+    from migrations import run_migrations
+    from sequences import allocate, barcode_key, mnemonic_key, seed_mnemonic_sequences
+
+# Limite de parâmetros por consulta IN (SQLITE_MAX_VARIABLE_NUMBER antigo)
+_IN_CHUNK = 900
+
+# Código de barras EAN-13: categoria (2) + data juliana AADDD (5) + sequencial do dia (5) + verificador
+BARCODE_SEQUENTIAL_DIGITS = 5
+BARCODE_MAX_SEQUENTIAL = 10 ** BARCODE_SEQUENTIAL_DIGITS - 1
+
+def qr_payload_text(item_data: Dict) -> str:
+    """Texto gravado no QR code (formato compacto)"""
+    return (
+        f"ITEM:{item_data.get('id', '')}|{item_data.get('codigo', '')}|"
+        f"{(item_data.get('nome') or '')[:30]}|{item_data.get('categoria', '')}"
+    )
+
+def render_qr_png(item_data: Dict) -> bytes:
+    """
+    Renderiza o QR code do item como PNG
+    
+    Função de módulo (sem acesso ao banco) para poder rodar em pool de processos.
+    """
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(qr_payload_text(item_data))
+    qr.make(fit=True)
+    
+    # Converte para imagem
+    img = qr.make_image(fill_color="black", back_color="white")
+    
+    buffer = BytesIO()
+    img.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def render_qr_code(item_data: Dict) -> str:
+    """QR code do item como PNG em base64"""
+    return base64.b64encode(render_qr_png(item_data)).decode()
+
 class CodeGenerator:
     """Gerador de códigos automáticos para itens do estoque"""
     
     def __init__(self, db_path: str):
         self.db_path = db_path
+        # Garante a tabela code_sequences (sem custo após a primeira chamada)
+        run_migrations(db_path)
         
         # Mapeamento de categorias para prefixos
         self.category_prefixes = {
@@ -117,25 +167,15 @@ class CodeGenerator:
             return self.generate_random_code()
     
     def generate_barcode(self, category: str = '') -> str:
-        """Gera código de barras único (formato EAN-13 simplificado)"""
+        """Gera código de barras único (EAN-13, sempre 13 dígitos)"""
         try:
             # Prefixo baseado na categoria (2 dígitos)
             prefix = self._get_category_numeric_prefix(category)
             
-            # Timestamp (6 dígitos - HHMMSS)
-            timestamp = datetime.now().strftime("%H%M%S")
-            
-            # Sequencial do dia (3 dígitos)
-            sequential = self._get_daily_sequential()
+            # Sequencial do dia e o dia em que foi reservado
+            sequential, day = self._get_daily_sequential()
             
-            # Dígito verificador (1 dígito)
-            partial_code = f"{prefix}{timestamp}{sequential}"
-            check_digit = self._calculate_check_digit(partial_code)
-            
-            # Código final (12 dígitos + 1 verificador = 13 total)
-            barcode = f"{partial_code}{check_digit}"
-            
-            return barcode
+            return self._build_barcode(prefix, day, sequential)
             
         except Exception as e:
             print(f"Erro ao gerar código de barras: {e}")
@@ -144,43 +184,23 @@ class CodeGenerator:
     def generate_qr_code(self, item_data: Dict) -> str:
         """Gera QR code com informações do item"""
         try:
-            # Dados para o QR code
-            qr_data = {
-                'id': item_data.get('id', ''),
-                'codigo': item_data.get('codigo', ''),
-                'nome': item_data.get('nome', ''),
-                'categoria': item_data.get('categoria', ''),
-                'localizacao': item_data.get('localizacao', ''),
-                'timestamp': datetime.now().isoformat()
-            }
-            
-            # Formato compacto para QR code
-            qr_text = f"ITEM:{qr_data['id']}|{qr_data['codigo']}|{qr_data['nome'][:30]}|{qr_data['categoria']}"
-            
-            # Gera QR code
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_M,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(qr_text)
-            qr.make(fit=True)
-            
-            # Converte para imagem
-            img = qr.make_image(fill_color="black", back_color="white")
-            
-            # Converte para base64
-            buffer = BytesIO()
-            img.save(buffer, format='PNG')
-            img_str = base64.b64encode(buffer.getvalue()).decode()
-            
-            return img_str
+            return render_qr_code(item_data)
             
         except Exception as e:
             print(f"Erro ao gerar QR code: {e}")
             return ""
     
+    def _build_barcode(self, prefix: str, day: datetime, sequential: int) -> str:
+        """Monta o EAN-13: 12 dígitos de largura fixa + dígito verificador"""
+        if not 0 < sequential <= BARCODE_MAX_SEQUENTIAL:
+            raise ValueError(f"Sequencial do dia fora do limite: {sequential} (máximo {BARCODE_MAX_SEQUENTIAL})")
+        
+        # Data juliana AADDD: única por dia dentro do século
+        partial_code = f"{prefix}{day.strftime('%y%j')}{sequential:0{BARCODE_SEQUENTIAL_DIGITS}d}"
+        check_digit = self._calculate_check_digit(partial_code)
+        
+        return f"{partial_code}{check_digit}"
+    
     def generate_random_code(self) -> str:
         """Gera código aleatório como fallback"""
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
@@ -213,59 +233,54 @@ class CodeGenerator:
         normalized = self.normalize_category(category)
         return category_map.get(normalized, '99')
     
-    def _get_next_sequential_number(self, prefix: str) -> int:
-        """Obtém próximo número sequencial para o prefixo"""
+    def _get_next_sequential_number(self, prefix: str, count: int = 1) -> int:
+        """Reserva o próximo número (ou bloco de `count` números) do prefixo; retorna o primeiro"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Busca o maior número usado para este prefixo
-                cursor.execute("""
-                    SELECT codigo FROM itens 
-                    WHERE codigo LIKE ? 
-                    ORDER BY codigo DESC 
-                    LIMIT 1
-                """, (f"{prefix}-%",))
-                
-                result = cursor.fetchone()
-                if result:
-                    # Extrai o número do código (ex: NOTE-015 -> 15)
-                    last_code = result[0]
-                    match = re.search(r'-(\d+)$', last_code)
-                    if match:
-                        return int(match.group(1)) + 1
-                
-                return 1  # Primeiro item desta categoria
+            with connect(self.db_path) as conn:
+                return allocate(conn, mnemonic_key(prefix), count) - count + 1
                 
         except Exception as e:
             print(f"Erro ao obter número sequencial: {e}")
             return random.randint(1, 999)
     
-    def _get_daily_sequential(self) -> str:
-        """Obtém sequencial do dia (3 dígitos)"""
+    def _allocate_daily(self, conn, count: int) -> Tuple[int, datetime]:
+        """
+        Reserva `count` sequenciais do dia na conexão informada
+        
+        Returns:
+            (primeiro sequencial, dia da reserva) - o dia entra no código de barras
+        """
+        day = datetime.now()
+        key = barcode_key(day.strftime("%Y%m%d"))
+        last = allocate(conn, key, count)
+        if last == count:
+            # Primeiro bloco do dia: contadores de dias anteriores não servem mais
+            conn.execute("DELETE FROM code_sequences WHERE nome GLOB 'barcode:*' AND nome <> ?", (key,))
+        return last - count + 1, day
+    
+    def _get_daily_sequential(self, count: int = 1) -> Tuple[int, datetime]:
+        """Obtém sequencial do dia (ou o primeiro de um bloco de `count`) e o dia"""
         try:
-            today = datetime.now().strftime("%Y-%m-%d")
-            
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Conta itens criados hoje
-                cursor.execute("""
-                    SELECT COUNT(*) FROM itens 
-                    WHERE DATE(data_cadastro) = ?
-                """, (today,))
-                
-                count = cursor.fetchone()[0]
-                return f"{count + 1:03d}"
+            with connect(self.db_path) as conn:
+                return self._allocate_daily(conn, count)
                 
         except Exception as e:
             print(f"Erro ao obter sequencial diário: {e}")
-            return f"{random.randint(1, 999):03d}"
+            return random.randint(1, BARCODE_MAX_SEQUENTIAL), datetime.now()
+    
+    def _resync_sequence(self, prefix: str) -> None:
+        """Alinha a sequência do prefixo com códigos gravados fora do gerador"""
+        try:
+            with connect(self.db_path) as conn:
+                seed_mnemonic_sequences(conn, prefix)
+                
+        except Exception as e:
+            print(f"Erro ao sincronizar sequência: {e}")
     
     def _calculate_check_digit(self, code: str) -> str:
-        """Calcula dígito verificador para código de barras"""
+        """Calcula dígito verificador do EAN-13 sobre os 12 primeiros dígitos"""
         try:
-            # Algoritmo simples de verificação
+            # Pesos 1 e 3 alternados a partir da esquerda
             total = 0
             for i, digit in enumerate(code):
                 weight = 3 if i % 2 == 1 else 1
@@ -281,7 +296,7 @@ class CodeGenerator:
     def validate_code_uniqueness(self, code: str) -> bool:
         """Valida se o código é único no banco"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 cursor.execute("SELECT COUNT(*) FROM itens WHERE codigo = ?", (code,))
                 count = cursor.fetchone()[0]
@@ -294,32 +309,19 @@ class CodeGenerator:
     def generate_complete_item_codes(self, name: str, category: str = '') -> Dict[str, str]:
         """Gera todos os códigos para um item"""
         try:
-            # Gera códigos únicos
-            attempts = 0
-            max_attempts = 10
+            mnemonic = self.generate_mnemonic_code(name, category)
             
-            while attempts < max_attempts:
+            # A sequência já garante unicidade; só códigos gravados por fora colidem
+            if not self.validate_code_uniqueness(mnemonic):
+                self._resync_sequence(self.get_category_prefix(category))
                 mnemonic = self.generate_mnemonic_code(name, category)
-                barcode = self.generate_barcode(category)
-                
-                # Verifica unicidade
-                if (self.validate_code_uniqueness(mnemonic) and 
-                    self.validate_code_uniqueness(barcode)):
-                    
-                    return {
-                        'codigo_mnemonico': mnemonic,
-                        'codigo_barras': barcode,
-                        'categoria_normalizada': self.normalize_category(category)
-                    }
-                
-                attempts += 1
+                if not self.validate_code_uniqueness(mnemonic):
+                    mnemonic = self.generate_random_code()
             
-            # Fallback com código aleatório único
-            random_code = self.generate_random_code()
             return {
-                'codigo_mnemonico': random_code,
-                'codigo_barras': random_code,
-                'categoria_normalizada': 'outros'
+                'codigo_mnemonico': mnemonic,
+                'codigo_barras': self.generate_barcode(category),
+                'categoria_normalizada': self.normalize_category(category)
             }
             
         except Exception as e:
@@ -333,6 +335,74 @@ class CodeGenerator:
                 'codigo_barras': fallback_code,
                 'categoria_normalizada': 'outros'
             }
+    
+    def _find_existing_codes(self, conn, codes: List[str]) -> set:
+        existing = set()
+        for start in range(0, len(codes), _IN_CHUNK):
+            chunk = codes[start:start + _IN_CHUNK]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor = conn.execute(f"SELECT codigo FROM itens WHERE codigo IN ({placeholders})", chunk)
+            existing.update(row[0] for row in cursor.fetchall())
+        return existing
+    
+    def reserve_item_codes(self, items: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+        """
+        Reserva os códigos de vários itens de uma vez (cadastro em lote)
+        
+        Um UPDATE por prefixo de categoria e um para o sequencial do dia, na mesma
+        transação, em vez de consultas e tentativas por item.
+        
+        Args:
+            items: Lista de (nome, categoria)
+        
+        Returns:
+            Lista na mesma ordem, no formato de generate_complete_item_codes
+        """
+        if not items:
+            return []
+        
+        categories = [self.normalize_category(category) for _, category in items]
+        prefixes = [self.category_prefixes.get(category, 'OUTR') for category in categories]
+        
+        by_prefix: Dict[str, List[int]] = {}
+        for index, prefix in enumerate(prefixes):
+            by_prefix.setdefault(prefix, []).append(index)
+        
+        mnemonics: List[Optional[str]] = [None] * len(items)
+        
+        with connect(self.db_path) as conn:
+            for prefix, indexes in by_prefix.items():
+                first = allocate(conn, mnemonic_key(prefix), len(indexes)) - len(indexes) + 1
+                for offset, index in enumerate(indexes):
+                    mnemonics[index] = f"{prefix}-{first + offset:03d}"
+            
+            # Códigos gravados por fora: realinha os prefixos afetados e reserva substitutos
+            taken = self._find_existing_codes(conn, mnemonics)
+            if taken:
+                clashes = [index for index, code in enumerate(mnemonics) if code in taken]
+                for prefix in {prefixes[index] for index in clashes}:
+                    seed_mnemonic_sequences(conn, prefix)
+                    indexes = [index for index in clashes if prefixes[index] == prefix]
+                    first = allocate(conn, mnemonic_key(prefix), len(indexes)) - len(indexes) + 1
+                    for offset, index in enumerate(indexes):
+                        mnemonics[index] = f"{prefix}-{first + offset:03d}"
+            
+            first_daily, day = self._allocate_daily(conn, len(items))
+            if first_daily + len(items) - 1 > BARCODE_MAX_SEQUENTIAL:
+                raise ValueError(f"Limite diário de {BARCODE_MAX_SEQUENTIAL} códigos de barras atingido")
+        
+        return [
+            {
+                'codigo_mnemonico': mnemonics[index],
+                'codigo_barras': self._build_barcode(
+                    self._get_category_numeric_prefix(categories[index]),
+                    day,
+                    first_daily + index
+                ),
+                'categoria_normalizada': categories[index]
+            }
+            for index in range(len(items))
+        ]
 
 def test_code_generator():
     """Teste do gerador de códigos"""
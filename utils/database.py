@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Acesso Compartilhado ao Banco SQLite
+Pool assíncrono de conexões (bots) e conexões por thread (Flask e http.server),
+com PRAGMAs aplicados uma única vez por conexão e cache de statements
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional, Set
+
+try:
+    import aiosqlite
+except ImportError:
+    # Servidores síncronos não dependem do aiosqlite
+    aiosqlite = None
+
+DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'db', 'estoque.db')
+
+# Aplicados ao abrir cada conexão (journal_mode=WAL fica gravado no arquivo)
+PRAGMAS = [
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),
+    ('mmap_size', 256 * 1024 * 1024),
+    ('cache_size', -16000),  # negativo = KiB (~16 MB por conexão)
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000)
+]
+
+# Statements preparados mantidos por conexão (padrão do sqlite3 é 128)
+STATEMENT_CACHE_SIZE = 256
+
+# Conexões simultâneas do pool assíncrono
+ASYNC_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 4))
+
+
+def _pragma_statements() -> List[str]:
+    return [f"PRAGMA {name} = {value}" for name, value in PRAGMAS]
+
+
+def _pool_key(db_path: str) -> str:
+    return os.path.abspath(db_path)
+
+
+# ==================== CONEXÕES SÍNCRONAS ====================
+
+_local = threading.local()
+
+
+def open_connection(db_path: str = DB_PATH, **kwargs) -> sqlite3.Connection:
+    """Abre uma conexão avulsa já configurada (o chamador é responsável por fechá-la)"""
+    kwargs.setdefault('cached_statements', STATEMENT_CACHE_SIZE)
+    conn = sqlite3.connect(db_path, **kwargs)
+    for statement in _pragma_statements():
+        conn.execute(statement)
+    return conn
+
+
+def get_connection(db_path: str = DB_PATH) -> sqlite3.Connection:
+    """Conexão reutilizável da thread atual (aberta na primeira chamada)"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+        _local.depth = {}
+
+    key = _pool_key(db_path)
+    conn = connections.get(key)
+    if conn is None:
+        conn = connections[key] = open_connection(db_path)
+    return conn
+
+
+@contextmanager
+def connect(db_path: str = DB_PATH, row_factory=None):
+    """
+    Usa a conexão da thread atual com a mesma semântica de `with sqlite3.connect()`:
+    commit ao sair do bloco e rollback em caso de exceção
+
+    Blocos aninhados na mesma thread compartilham a transação; apenas o mais
+    externo faz commit/rollback. O row_factory é restaurado ao sair.
+    """
+    conn = get_connection(db_path)
+    key = _pool_key(db_path)
+    depth = _local.depth.get(key, 0)
+    previous_factory = conn.row_factory
+    if row_factory is not None:
+        conn.row_factory = row_factory
+
+    _local.depth[key] = depth + 1
+    try:
+        yield conn
+        if depth == 0 and conn.in_transaction:
+            conn.commit()
+    except BaseException:
+        if depth == 0 and conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        _local.depth[key] = depth
+        conn.row_factory = previous_factory
+
+
+def close_thread_connections() -> None:
+    """Fecha as conexões abertas pela thread atual"""
+    connections = getattr(_local, 'connections', None) or {}
+    for conn in connections.values():
+        conn.close()
+    connections.clear()
+
+
+# ==================== POOL ASSÍNCRONO ====================
+
+async def open_async_connection(db_path: str = DB_PATH, **kwargs):
+    """Abre uma conexão aiosqlite avulsa já configurada"""
+    if aiosqlite is None:
+        raise RuntimeError("aiosqlite não instalado: pip install aiosqlite")
+
+    kwargs.setdefault('cached_statements', STATEMENT_CACHE_SIZE)
+    conn = await aiosqlite.connect(db_path, **kwargs)
+    for statement in _pragma_statements():
+        await conn.execute(statement)
+    return conn
+
+
+class AsyncConnectionPool:
+    """Pool limitado de conexões aiosqlite (cada conexão mantém sua própria thread)"""
+
+    def __init__(self, db_path: str = DB_PATH, size: int = ASYNC_POOL_SIZE):
+        self.db_path = db_path
+        self.size = max(1, size)
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._idle: Optional[asyncio.Queue] = None
+        self._connections: List = []
+        self._opening = 0
+
+    async def _get(self):
+        if self._idle is None:
+            self.loop = asyncio.get_running_loop()
+            self._idle = asyncio.Queue()
+
+        if self._idle.empty() and len(self._connections) + self._opening < self.size:
+            self._opening += 1
+            try:
+                conn = await open_async_connection(self.db_path)
+            finally:
+                self._opening -= 1
+            self._connections.append(conn)
+            return conn
+
+        return await self._idle.get()
+
+    async def _release(self, conn) -> None:
+        try:
+            # Transação não confirmada é descartada, como ao fechar a conexão
+            if conn.in_transaction:
+                await conn.rollback()
+        finally:
+            conn.row_factory = None
+            self._idle.put_nowait(conn)
+
+    @asynccontextmanager
+    async def acquire(self):
+        conn = await self._get()
+        try:
+            yield conn
+        finally:
+            await self._release(conn)
+
+    async def close(self) -> None:
+        connections, self._connections = self._connections, []
+        self._idle = None
+        for conn in connections:
+            await conn.close()
+
+
+_async_pools: Dict[str, AsyncConnectionPool] = {}
+
+# Fechamentos de pools de loops encerrados ainda em andamento
+_closing_pools: Set[asyncio.Task] = set()
+
+
+def _close_stale_pool(pool: AsyncConnectionPool, loop: asyncio.AbstractEventLoop) -> None:
+    # Loop ainda rodando em outra thread: as conexões continuam em uso por ele
+    if pool.loop.is_running() and not pool.loop.is_closed():
+        return
+    # As threads do aiosqlite respondem no loop de quem aguarda o close
+    task = loop.create_task(pool.close())
+    _closing_pools.add(task)
+    task.add_done_callback(_closing_pools.discard)
+
+
+def get_async_pool(db_path: str = DB_PATH) -> AsyncConnectionPool:
+    """Pool do banco informado para o event loop em execução"""
+    key = _pool_key(db_path)
+    loop = asyncio.get_running_loop()
+    pool = _async_pools.get(key)
+    if pool is None or (pool.loop is not None and pool.loop is not loop):
+        if pool is not None:
+            _close_stale_pool(pool, loop)
+        pool = _async_pools[key] = AsyncConnectionPool(db_path)
+    return pool
+
+
+def connect_async(db_path: str = DB_PATH):
+    """
+    Substitui `aiosqlite.connect(DB_PATH)` nos handlers:
+
+        async with connect_async(DB_PATH) as db:
+            cursor = await db.execute(...)
+
+    Alterações não confirmadas com `await db.commit()` são descartadas ao sair.
+    """
+    return get_async_pool(db_path).acquire()
+
+
+async def close_async_pools(*_args) -> None:
+    """Fecha os pools assíncronos (compatível com post_shutdown do ApplicationBuilder)"""
+    pools = list(_async_pools.values())
+    _async_pools.clear()
+    for pool in pools:
+        await pool.close()
+    loop = asyncio.get_running_loop()
+    pending = [task for task in _closing_pools if task.get_loop() is loop]
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
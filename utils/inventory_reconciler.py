@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reconciliação de Inventário em Lote
+Aplica as contagens do WebApp/API em uma única transação e devolve o relatório de diferenças
+"""
+
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+try:
+    from utils.database import connect
+except ImportError:
+    from database import connect
+
+# Limite de parâmetros por consulta IN (SQLITE_MAX_VARIABLE_NUMBER antigo)
+_IN_CHUNK = 900
+
+
+class InventoryReconciler:
+    """Concilia contagens de inventário com as quantidades do estoque"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    @staticmethod
+    def parse_counts(items: Iterable[Dict]) -> Dict[int, int]:
+        """
+        Converte a lista do WebApp ({'id', 'inventoryQuantity'} ou {'id', 'quantity'})
+        em item_id -> quantidade
+
+        Itens repetidos ficam com a última contagem.
+
+        Raises:
+            ValueError: se alguma entrada não for um objeto, não tiver id inteiro
+                ou tiver quantidade não inteira ou negativa
+        """
+        counts: Dict[int, int] = {}
+        for item in items:
+            if not isinstance(item, dict):
+                raise ValueError(f"Item de inventário inválido: {item!r}")
+            try:
+                item_id = int(str(item.get('id')))
+                quantity = int(str(item.get('inventoryQuantity', item.get('quantity', 0)) or 0))
+            except ValueError:
+                raise ValueError(f"Item de inventário inválido: {item!r}") from None
+            if quantity < 0:
+                raise ValueError(f"Quantidade negativa no inventário: {item!r}")
+            counts[item_id] = quantity
+        return counts
+
+    def _fetch_current(self, conn: sqlite3.Connection, item_ids: List[int]) -> Dict[int, tuple]:
+        current = {}
+        for start in range(0, len(item_ids), _IN_CHUNK):
+            chunk = item_ids[start:start + _IN_CHUNK]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor = conn.execute(
+                f"SELECT id, nome, quantidade FROM itens WHERE id IN ({placeholders})",
+                chunk
+            )
+            for row in cursor.fetchall():
+                current[row[0]] = (row[1], row[2])
+        return current
+
+    def apply_counts(self,
+                     items: Iterable[Dict],
+                     usuario: str,
+                     acao: str = 'Inventário WebApp',
+                     timestamp: Optional[str] = None) -> Dict:
+        """
+        Atualiza as quantidades inventariadas e registra as movimentações
+
+        Uma leitura em lote das quantidades atuais, UPDATE apenas dos itens com
+        diferença e uma movimentação por item contado, tudo em uma transação.
+
+        Returns:
+            Dict com 'items' (id, nome, quantidade_anterior, quantidade_inventariada,
+            diferenca), 'not_found', 'total_items', 'differences_found' e 'timestamp'
+        """
+        # Mesmo formato UTC de datetime('now') usado nas datas dos itens
+        timestamp = timestamp or datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+        counts = self.parse_counts(items)
+        item_ids = list(counts.keys())
+
+        report_items = []
+        not_found = []
+
+        with connect(self.db_path) as conn:
+            if not conn.in_transaction:
+                # Trava de escrita antes da leitura: ninguém altera as quantidades no meio
+                conn.execute("BEGIN IMMEDIATE")
+
+            current = self._fetch_current(conn, item_ids)
+
+            updates = []
+            movements = []
+            for item_id in item_ids:
+                if item_id not in current:
+                    not_found.append(item_id)
+                    continue
+
+                nome, quantidade_atual = current[item_id]
+                quantidade_inventario = counts[item_id]
+                diferenca = quantidade_inventario - (quantidade_atual or 0)
+
+                if diferenca != 0:
+                    updates.append((quantidade_inventario, item_id))
+                movements.append((
+                    item_id, acao,
+                    f'Ajuste: {quantidade_atual} → {quantidade_inventario}',
+                    usuario, timestamp
+                ))
+                report_items.append({
+                    'id': item_id,
+                    'nome': nome,
+                    'quantidade_anterior': quantidade_atual,
+                    'quantidade_inventariada': quantidade_inventario,
+                    'diferenca': diferenca
+                })
+
+            conn.executemany("UPDATE itens SET quantidade = ? WHERE id = ?", updates)
+            conn.executemany(
+                "INSERT INTO movimentacoes (item_id, acao, detalhes, usuario, data_hora) VALUES (?, ?, ?, ?, ?)",
+                movements
+            )
+
+        return {
+            'timestamp': timestamp,
+            'total_items': len(report_items),
+            'differences_found': len(updates),
+            'items': report_items,
+            'not_found': not_found
+        }
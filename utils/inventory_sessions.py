@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sessões de Inventário
+Cabeçalho e linhas de cada inventário finalizado em tabelas indexadas: a listagem
+lê só cabeçalhos (paginação por cursor), as linhas são carregadas apenas no detalhe
+e sessões antigas têm as linhas compactadas em um único blob.
+Envios do WebApp offline chegam em partes (inventario_envios) e viram uma sessão
+quando a última parte chega; a chave do envio torna a reentrega idempotente.
+`python utils/inventory_sessions.py` importa os JSON legados de inventarios/ e arquiva.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from utils.database import connect
+    from utils.item_listing import decode_cursor, encode_cursor
+except ImportError:
+    from database import connect
+    from item_listing import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'inventarios')
+
+# Sessões mais antigas que isso têm as linhas compactadas
+ARCHIVE_AFTER_DAYS = 90
+
+# Envios incompletos descartados depois disso
+UPLOAD_EXPIRE_DAYS = 7
+
+# Partes aceitas por envio (o WebApp manda 200 linhas por parte)
+MAX_UPLOAD_PARTS = 1000
+
+CREATE_INVENTORY_SESSIONS = '''
+CREATE TABLE IF NOT EXISTS inventario_sessoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    arquivo TEXT UNIQUE,
+    data_hora TEXT NOT NULL,
+    usuario_id TEXT,
+    usuario_nome TEXT,
+    total_itens INTEGER NOT NULL DEFAULT 0,
+    diferencas INTEGER NOT NULL DEFAULT 0,
+    resumo TEXT,
+    nao_encontrados TEXT,
+    linhas_arquivadas BLOB
+);
+'''
+
+CREATE_INVENTORY_LINES = '''
+CREATE TABLE IF NOT EXISTS inventario_linhas (
+    sessao_id INTEGER NOT NULL REFERENCES inventario_sessoes(id),
+    posicao INTEGER NOT NULL,
+    item_id INTEGER,
+    codigo TEXT,
+    nome TEXT,
+    quantidade_anterior INTEGER,
+    quantidade_contada INTEGER,
+    diferenca INTEGER,
+    contado_em TEXT,
+    PRIMARY KEY (sessao_id, posicao)
+) WITHOUT ROWID;
+'''
+
+# Listagem mais recente primeiro, com desempate por id (cursor)
+CREATE_INVENTORY_INDEX = '''
+CREATE INDEX IF NOT EXISTS idx_inventario_sessoes_data ON inventario_sessoes(data_hora DESC, id DESC)
+'''
+
+# Partes recebidas de envios ainda incompletos
+CREATE_INVENTORY_UPLOADS = '''
+CREATE TABLE IF NOT EXISTS inventario_envios (
+    chave TEXT NOT NULL,
+    parte INTEGER NOT NULL,
+    total_partes INTEGER NOT NULL,
+    dados TEXT NOT NULL,
+    recebido_em TEXT NOT NULL,
+    PRIMARY KEY (chave, parte)
+) WITHOUT ROWID;
+'''
+
+CREATE_INVENTORY_KEY_INDEX = '''
+CREATE UNIQUE INDEX IF NOT EXISTS idx_inventario_sessoes_chave ON inventario_sessoes(chave)
+'''
+
+LINE_COLUMNS = ['item_id', 'codigo', 'nome', 'quantidade_anterior', 'quantidade_contada',
+                'diferenca', 'contado_em']
+
+_SESSION_COLUMNS = '''
+    id, arquivo, data_hora, usuario_id, usuario_nome, total_itens, diferencas, resumo,
+    nao_encontrados, linhas_arquivadas IS NOT NULL
+'''
+
+
+def _as_int(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def session_lines(items: Iterable[Dict], report: Optional[Dict] = None) -> List[Tuple]:
+    """
+    Linhas (na ordem de LINE_COLUMNS) a partir dos itens do WebApp
+
+    Quando há relatório de reconciliação, quantidades anterior/contada e diferença
+    vêm dele (valores do banco no momento da aplicação).
+    """
+    reconciled = {entry['id']: entry for entry in (report or {}).get('items', [])}
+    lines = []
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        item_id = _as_int(item.get('id'))
+        entry = reconciled.get(item_id, {})
+        lines.append((
+            item_id,
+            item.get('codigo'),
+            entry.get('nome') or item.get('nome'),
+            _as_int(entry.get('quantidade_anterior', item.get('quantidade'))),
+            _as_int(entry.get('quantidade_inventariada',
+                              item.get('inventoryQuantity', item.get('quantity')))),
+            _as_int(entry.get('diferenca', item.get('difference'))),
+            item.get('timestamp')
+        ))
+    return lines
+
+
+def save_session(conn: sqlite3.Connection,
+                 data: Dict,
+                 report: Optional[Dict] = None,
+                 arquivo: Optional[str] = None,
+                 chave: Optional[str] = None) -> int:
+    """
+    Grava cabeçalho e linhas de um inventário
+
+    Args:
+        data: {'timestamp', 'user_id', 'user_name', 'items', 'summary'} (formato do WebApp)
+        report: Resultado de InventoryReconciler.apply_counts, se aplicado
+        arquivo: Nome do JSON legado de origem (importação)
+        chave: Chave de idempotência do envio (única entre as sessões)
+
+    Returns:
+        id da sessão
+    """
+    lines = session_lines(data.get('items') or [], report)
+    if report:
+        differences = report.get('differences_found', 0)
+    else:
+        differences = sum(1 for line in lines if line[5])
+
+    cursor = conn.execute('''
+        INSERT INTO inventario_sessoes
+            (arquivo, chave, data_hora, usuario_id, usuario_nome, total_itens, diferencas, resumo,
+             nao_encontrados)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (
+        arquivo,
+        chave,
+        data.get('timestamp') or datetime.now().isoformat(),
+        None if data.get('user_id') is None else str(data.get('user_id')),
+        data.get('user_name'),
+        data.get('total_items', len(lines)),
+        differences,
+        json.dumps(data.get('summary') or {}, ensure_ascii=False),
+        json.dumps((report or {}).get('not_found', []))
+    ))
+    session_id = cursor.lastrowid
+
+    conn.executemany(
+        f"INSERT INTO inventario_linhas (sessao_id, posicao, {', '.join(LINE_COLUMNS)}) "
+        f"VALUES (?, ?, {', '.join('?' for _ in LINE_COLUMNS)})",
+        [(session_id, position) + line for position, line in enumerate(lines)]
+    )
+    return session_id
+
+
+def _session_summary(row: Tuple) -> Dict:
+    return {
+        'id': row[0],
+        'filename': row[1],
+        'timestamp': row[2],
+        'user_id': row[3],
+        'user_name': row[4],
+        'total_items': row[5],
+        'differences_found': row[6],
+        'summary': json.loads(row[7]) if row[7] else {},
+        'archived': bool(row[9])
+    }
+
+
+def list_sessions(conn: sqlite3.Connection,
+                  limit: int = 50,
+                  cursor: Optional[str] = None) -> Tuple[List[Dict], bool, Optional[str]]:
+    """
+    Uma página de cabeçalhos, mais recentes primeiro (sem ler linhas)
+
+    Returns:
+        (sessões, has_more, next_cursor); ValueError para cursor inválido
+    """
+    where, params = '1=1', []
+    if cursor:
+        data_hora, session_id = decode_cursor(cursor)
+        where = '(data_hora, id) < (?, ?)'
+        params = [data_hora, session_id]
+
+    rows = conn.execute(f'''
+        SELECT {_SESSION_COLUMNS} FROM inventario_sessoes
+        WHERE {where}
+        ORDER BY data_hora DESC, id DESC
+        LIMIT ?
+    ''', params + [limit + 1]).fetchall()
+
+    has_more = len(rows) > limit
+    sessions = [_session_summary(row) for row in rows[:limit]]
+    next_cursor = encode_cursor(sessions[-1]['timestamp'], sessions[-1]['id']) if has_more else None
+    return sessions, has_more, next_cursor
+
+
+def count_sessions(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM inventario_sessoes").fetchone()[0]
+
+
+def _line_dict(line: Iterable) -> Dict:
+    # Mesmas chaves dos itens gravados pelo WebApp nos JSON legados
+    item_id, codigo, nome, anterior, contada, diferenca, contado_em = line
+    return {
+        'id': item_id,
+        'codigo': codigo,
+        'nome': nome,
+        'quantidade': anterior,
+        'inventoryQuantity': contada,
+        'difference': diferenca,
+        'timestamp': contado_em
+    }
+
+
+def get_session(conn: sqlite3.Connection, ref: str) -> Optional[Dict]:
+    """Sessão completa por id numérico ou nome do JSON legado (linhas lidas aqui)"""
+    column = 'id' if str(ref).isdigit() else 'arquivo'
+    row = conn.execute(
+        f"SELECT {_SESSION_COLUMNS}, linhas_arquivadas FROM inventario_sessoes WHERE {column} = ?",
+        (int(ref) if column == 'id' else ref,)
+    ).fetchone()
+    if not row:
+        return None
+
+    session = _session_summary(row)
+    if row[-1] is not None:
+        lines = json.loads(zlib.decompress(row[-1]).decode('utf-8'))
+    else:
+        lines = conn.execute(
+            f"SELECT {', '.join(LINE_COLUMNS)} FROM inventario_linhas WHERE sessao_id = ? ORDER BY posicao",
+            (session['id'],)
+        ).fetchall()
+
+    session['items'] = [_line_dict(line) for line in lines]
+    session['reconciliacao'] = {
+        'differences_found': session['differences_found'],
+        'not_found': json.loads(row[8]) if row[8] else []
+    }
+    return session
+
+
+def archive_sessions(conn: sqlite3.Connection, older_than_days: int = ARCHIVE_AFTER_DAYS) -> int:
+    """Compacta as linhas das sessões antigas em linhas_arquivadas; retorna quantas foram arquivadas"""
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+    session_ids = [row[0] for row in conn.execute('''
+        SELECT id FROM inventario_sessoes
+        WHERE data_hora < ? AND linhas_arquivadas IS NULL
+    ''', (cutoff,)).fetchall()]
+
+    for session_id in session_ids:
+        lines = conn.execute(
+            f"SELECT {', '.join(LINE_COLUMNS)} FROM inventario_linhas WHERE sessao_id = ? ORDER BY posicao",
+            (session_id,)
+        ).fetchall()
+        blob = zlib.compress(json.dumps(lines, ensure_ascii=False).encode('utf-8'), 9)
+        conn.execute("UPDATE inventario_sessoes SET linhas_arquivadas = ? WHERE id = ?", (blob, session_id))
+        conn.execute("DELETE FROM inventario_linhas WHERE sessao_id = ?", (session_id,))
+    return len(session_ids)
+
+
+def find_session_by_key(conn: sqlite3.Connection, chave: str) -> Optional[int]:
+    """id da sessão já criada com essa chave de idempotência"""
+    row = conn.execute("SELECT id FROM inventario_sessoes WHERE chave = ?", (chave,)).fetchone()
+    return row[0] if row else None
+
+
+def store_upload_part(conn: sqlite3.Connection,
+                      chave: str,
+                      parte: int,
+                      total_partes: int,
+                      dados: Dict) -> int:
+    """
+    Guarda uma parte de um envio (reentregas da mesma parte são ignoradas)
+
+    Returns:
+        Número de partes distintas já recebidas; ValueError para parte inválida
+    """
+    if not 1 <= total_partes <= MAX_UPLOAD_PARTS or not 0 <= parte < total_partes:
+        raise ValueError(f"Parte inválida: {parte} de {total_partes}")
+
+    conn.execute('''
+        INSERT OR IGNORE INTO inventario_envios (chave, parte, total_partes, dados, recebido_em)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (chave, parte, total_partes, json.dumps(dados, ensure_ascii=False), datetime.now().isoformat()))
+    return conn.execute(
+        "SELECT COUNT(*) FROM inventario_envios WHERE chave = ? AND total_partes = ?",
+        (chave, total_partes)
+    ).fetchone()[0]
+
+
+def take_upload(conn: sqlite3.Connection, chave: str) -> Dict:
+    """
+    Junta as partes de um envio completo (e as remove)
+
+    Cabeçalho (timestamp, user, summary) da parte 0; itens na ordem das partes.
+    """
+    parts = [json.loads(row[0]) for row in conn.execute(
+        "SELECT dados FROM inventario_envios WHERE chave = ? ORDER BY parte", (chave,)
+    ).fetchall()]
+    conn.execute("DELETE FROM inventario_envios WHERE chave = ?", (chave,))
+
+    data = dict(parts[0]) if parts else {}
+    data['items'] = [item for part in parts for item in part.get('items') or []]
+    return data
+
+
+def purge_stale_uploads(conn: sqlite3.Connection, older_than_days: int = UPLOAD_EXPIRE_DAYS) -> int:
+    """Remove partes de envios que nunca se completaram"""
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+    return conn.execute("DELETE FROM inventario_envios WHERE recebido_em < ?", (cutoff,)).rowcount
+
+
+def import_legacy_files(db_path: str, directory: str = INVENTORY_DIR) -> int:
+    """
+    Importa os inventario_*.json gravados pelas versões anteriores do WebApp
+
+    Cada arquivo importado é movido para `importados/` (não é relido a cada início);
+    arquivos já importados (mesmo nome) são apenas movidos.
+    """
+    if not os.path.isdir(directory):
+        return 0
+
+    imported_dir = os.path.join(directory, 'importados')
+    imported = 0
+    for filename in sorted(os.listdir(directory)):
+        if not (filename.startswith('inventario_') and filename.endswith('.json')):
+            continue
+        filepath = os.path.join(directory, filename)
+        try:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            with connect(db_path) as conn:
+                exists = conn.execute(
+                    "SELECT 1 FROM inventario_sessoes WHERE arquivo = ?", (filename,)
+                ).fetchone()
+                if not exists:
+                    save_session(conn, data, data.get('reconciliacao'), arquivo=filename)
+                    imported += 1
+            os.makedirs(imported_dir, exist_ok=True)
+            os.replace(filepath, os.path.join(imported_dir, filename))
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logger.warning(f"Inventário legado {filename} não importado: {e}")
+    return imported
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from utils.database import DB_PATH
+    from utils.migrations import run_migrations
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    run_migrations(db_path)
+    imported = import_legacy_files(db_path)
+    with connect(db_path) as conn:
+        archived = archive_sessions(conn)
+        purge_stale_uploads(conn)
+    print(f"Inventários: {imported} JSON importados, {archived} sessões arquivadas")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de Itens para Consultas por ID
+LRU em memória com o JSON já serializado de cada item, válido enquanto itens_versao
+não muda (qualquer escrita em itens, de qualquer processo, invalida pelos triggers).
+Cada entrada leva ETag (hash do corpo) e Last-Modified (data_atualizacao) para 304.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+try:
+    from utils.item_listing import items_version
+    from utils.qr_cache import etag_matches
+except ImportError:
+    from item_listing import items_version
+    from qr_cache import etag_matches
+
+# Itens mantidos em memória (~1 KB cada)
+ITEM_CACHE_SIZE = int(os.getenv('ITEM_CACHE_SIZE', 2048))
+
+# O cliente sempre revalida; com o ETag a resposta é um 304 sem corpo
+ITEM_CACHE_CONTROL = 'no-cache'
+
+
+class CachedItem(NamedTuple):
+    item: Dict
+    body: bytes
+    etag: str
+    last_modified: Optional[str]  # HTTP-date, None sem data_atualizacao válida
+
+
+def _http_date(value) -> Optional[str]:
+    """data_atualizacao (CURRENT_TIMESTAMP do SQLite, em UTC) no formato HTTP-date"""
+    try:
+        moment = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return format_datetime(moment.astimezone(timezone.utc), usegmt=True)
+
+
+def build_cached_item(item: Dict) -> CachedItem:
+    body = json.dumps(item, ensure_ascii=False, default=str).encode('utf-8')
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    return CachedItem(item, body, etag, _http_date(item.get('data_atualizacao')))
+
+
+def is_not_modified(cached: CachedItem,
+                    if_none_match: Optional[str],
+                    if_modified_since: Optional[str]) -> bool:
+    """Validação condicional: If-None-Match tem precedência sobre If-Modified-Since"""
+    if if_none_match:
+        return etag_matches(if_none_match, cached.etag)
+    if not (if_modified_since and cached.last_modified):
+        return False
+    try:
+        return parsedate_to_datetime(cached.last_modified) <= parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+
+def cache_headers(cached: CachedItem) -> Dict[str, str]:
+    headers = {'ETag': f'"{cached.etag}"', 'Cache-Control': ITEM_CACHE_CONTROL}
+    if cached.last_modified:
+        headers['Last-Modified'] = cached.last_modified
+    return headers
+
+
+class ItemCache:
+    """Itens por id na ordem de uso; cada entrada guarda a versão de itens em que foi lida"""
+
+    def __init__(self, max_items: int = ITEM_CACHE_SIZE):
+        self.max_items = max(1, max_items)
+        self._items: 'OrderedDict[int, Tuple[int, CachedItem]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, conn: sqlite3.Connection, item_id: int) -> Optional[CachedItem]:
+        """
+        Item do cache ou do banco (None se não existe)
+
+        A versão é lida antes da linha: uma escrita no meio deixa a entrada com a
+        versão antiga e ela é relida na próxima consulta, nunca o contrário.
+        """
+        version = items_version(conn)
+        if version is not None:
+            with self._lock:
+                entry = self._items.get(item_id)
+                if entry is not None and entry[0] == version:
+                    self._items.move_to_end(item_id)
+                    return entry[1]
+
+        cursor = conn.execute("SELECT * FROM itens WHERE id = ?", (item_id,))
+        row = cursor.fetchone()
+        if row is None:
+            self.invalidate([item_id])
+            return None
+
+        cached = build_cached_item(dict(zip([column[0] for column in cursor.description], row)))
+        if version is not None:
+            with self._lock:
+                self._items[item_id] = (version, cached)
+                self._items.move_to_end(item_id)
+                while len(self._items) > self.max_items:
+                    self._items.popitem(last=False)
+        return cached
+
+    def invalidate(self, item_ids: Optional[Iterable[int]] = None) -> None:
+        """Descarta os itens informados (ou todos)"""
+        with self._lock:
+            if item_ids is None:
+                self._items.clear()
+                return
+            for item_id in item_ids:
+                self._items.pop(item_id, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_caches: Dict[str, ItemCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_item_cache(db_path: str) -> ItemCache:
+    """Cache compartilhado do processo para o banco informado"""
+    key = os.path.abspath(db_path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = ItemCache()
+        return cache
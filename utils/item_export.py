@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Exportação Completa de Itens em Streaming
+NDJSON ou CSV gerados em blocos a partir de um cursor no servidor (memória constante),
+com compressão gzip opcional (entregue como anexo .gz, application/gzip)
+"""
+
+import csv
+import io
+import json
+import sqlite3
+import zlib
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+try:
+    from utils.database import open_connection
+    from utils.item_listing import build_item_filters
+except ImportError:
+    from database import open_connection
+    from item_listing import build_item_filters
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8'
+}
+
+# Exportação comprimida é um arquivo .gz, não uma codificação de transporte
+GZIP_MIMETYPE = 'application/gzip'
+
+# Linhas lidas do cursor por vez
+FETCH_SIZE = 500
+
+# Coluna legada sem conteúdo (QR é gerado sob demanda)
+EXCLUDED_COLUMNS = {'qr_code'}
+
+
+def export_filename(fmt: str, compress: bool = False) -> str:
+    """Nome sugerido para o arquivo exportado"""
+    suffix = '.gz' if compress else ''
+    return f"itens_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}{suffix}"
+
+
+def export_mimetype(fmt: str, compress: bool = False) -> str:
+    """Content-Type da exportação (o arquivo .gz é baixado comprimido)"""
+    return GZIP_MIMETYPE if compress else EXPORT_FORMATS[fmt]
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Header Accept-Encoding aceita gzip (q=0 recusa)"""
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        if coding.strip().lower() not in ('gzip', '*'):
+            continue
+        q = params.strip().lower()
+        if q.startswith('q='):
+            try:
+                return float(q[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+def _export_columns(conn: sqlite3.Connection, selected: Optional[List[str]] = None) -> List[str]:
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(itens)").fetchall()]
+    if selected is not None:
+        # Ordem pedida; colunas inexistentes no banco são ignoradas
+        existing = set(columns)
+        columns = [column for column in selected if column in existing]
+    return [column for column in columns if column not in EXCLUDED_COLUMNS]
+
+
+def _encode_batch(fmt: str, columns: List[str], rows: List[tuple]) -> bytes:
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    return ''.join(
+        json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str) + '\n'
+        for row in rows
+    ).encode('utf-8')
+
+
+def _gzip_stream(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = formato gzip
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_items(db_path: str,
+                 fmt: str = 'ndjson',
+                 category: Optional[str] = None,
+                 low_stock: bool = False,
+                 compress: bool = False,
+                 columns: Optional[List[str]] = None) -> Iterator[bytes]:
+    """
+    Gera o catálogo completo em blocos de bytes, ordenado por id
+
+    `columns` restringe as colunas exportadas (padrão: todas, exceto qr_code).
+
+    O formato é validado antes do primeiro bloco (ValueError para formato
+    desconhecido), para que a rota ainda possa responder 400.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato inválido: {fmt} (use {', '.join(EXPORT_FORMATS)})")
+
+    def generate() -> Iterator[bytes]:
+        # Conexão própria: o cursor fica aberto durante toda a resposta
+        conn = open_connection(db_path)
+        try:
+            selected = _export_columns(conn, columns)
+            where, params = build_item_filters(category, low_stock)
+            cursor = conn.execute(
+                f"SELECT {', '.join(selected)} FROM itens WHERE {where} ORDER BY id", params
+            )
+
+            if fmt == 'csv':
+                yield _encode_batch(fmt, selected, [selected])
+
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                yield _encode_batch(fmt, selected, rows)
+        finally:
+            conn.close()
+
+    return _gzip_stream(generate()) if compress else generate()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Listagem Paginada de Itens
+Paginação por cursor (keyset) em (nome, id) e totais por filtro em cache,
+invalidados pela versão de itens (tabela itens_versao, mantida por triggers);
+versões *_async para conexões aiosqlite (connect_async)
+"""
+
+import base64
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Limite de itens por página aceito pelas APIs
+MAX_PAGE_SIZE = 1000
+
+# Combinações de filtro mantidas no cache de totais
+TOTALS_CACHE_SIZE = 1024
+
+
+def encode_cursor(nome: str, item_id: int) -> str:
+    """Cursor opaco apontando para depois do item (nome, id)"""
+    raw = json.dumps([nome, item_id], ensure_ascii=False, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """Inverso de encode_cursor; ValueError se o cursor for inválido"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        nome, item_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+        return nome, int(item_id)
+    except (TypeError, ValueError, UnicodeError) as e:
+        raise ValueError(f"Cursor inválido: {cursor}") from e
+
+
+def build_item_filters(category: Optional[str] = None, low_stock: bool = False) -> Tuple[str, List]:
+    """Cláusula WHERE (sem o WHERE) e parâmetros dos filtros da listagem"""
+    clauses = ['1=1']
+    params: List = []
+
+    if category:
+        clauses.append('categoria = ?')
+        params.append(category)
+
+    if low_stock:
+        clauses.append('quantidade < 5')
+
+    return ' AND '.join(clauses), params
+
+
+def _page_query(limit: int,
+                category: Optional[str],
+                low_stock: bool,
+                cursor: Optional[str],
+                offset: int) -> Tuple[str, List]:
+    where, params = build_item_filters(category, low_stock)
+
+    if cursor:
+        nome, item_id = decode_cursor(cursor)
+        where += ' AND (nome, id) > (?, ?)'
+        params.extend([nome, item_id])
+        offset = 0
+
+    # Um item a mais indica se existe próxima página sem precisar do total
+    query = f"SELECT * FROM itens WHERE {where} ORDER BY nome, id LIMIT ? OFFSET ?"
+    return query, params + [limit + 1, offset]
+
+
+def _page_result(description, rows: List[tuple], limit: int) -> Tuple[List[Dict], bool, Optional[str]]:
+    columns = [column[0] for column in description]
+    items = [dict(zip(columns, row)) for row in rows]
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor(items[-1]['nome'], items[-1]['id']) if has_more else None
+    return items, has_more, next_cursor
+
+
+def fetch_items_page(conn: sqlite3.Connection,
+                     limit: int,
+                     category: Optional[str] = None,
+                     low_stock: bool = False,
+                     cursor: Optional[str] = None,
+                     offset: int = 0) -> Tuple[List[Dict], bool, Optional[str]]:
+    """
+    Uma página de itens ordenada por (nome, id)
+
+    Com `cursor` a página começa logo após o item do cursor (busca pelo índice,
+    custo constante em qualquer profundidade); sem ele, usa OFFSET (compatibilidade).
+
+    Returns:
+        (itens, has_more, next_cursor)
+    """
+    query, params = _page_query(limit, category, low_stock, cursor, offset)
+    db_cursor = conn.execute(query, params)
+    return _page_result(db_cursor.description, db_cursor.fetchall(), limit)
+
+
+async def fetch_items_page_async(db,
+                                 limit: int,
+                                 category: Optional[str] = None,
+                                 low_stock: bool = False,
+                                 cursor: Optional[str] = None,
+                                 offset: int = 0) -> Tuple[List[Dict], bool, Optional[str]]:
+    """fetch_items_page sobre uma conexão aiosqlite (connect_async)"""
+    query, params = _page_query(limit, category, low_stock, cursor, offset)
+    db_cursor = await db.execute(query, params)
+    return _page_result(db_cursor.description, await db_cursor.fetchall(), limit)
+
+
+_totals: Dict[Tuple, Tuple[int, int]] = {}
+_totals_lock = threading.Lock()
+
+ITEMS_VERSION_QUERY = "SELECT versao FROM itens_versao WHERE id = 1"
+
+
+def items_version(conn: sqlite3.Connection) -> Optional[int]:
+    """Contador de alterações em itens (triggers); None quando o banco não o possui"""
+    try:
+        row = conn.execute(ITEMS_VERSION_QUERY).fetchone()
+    except sqlite3.OperationalError:
+        # Banco ainda sem a migração 7: sem cache
+        return None
+    return row[0] if row else None
+
+
+def _totals_key(db_path: str, category: Optional[str], low_stock: bool) -> Tuple:
+    return (os.path.abspath(db_path), category or None, bool(low_stock))
+
+
+def _cached_total(key: Tuple, version: Optional[int]) -> Optional[int]:
+    if version is None:
+        return None
+    with _totals_lock:
+        cached = _totals.get(key)
+    return cached[1] if cached and cached[0] == version else None
+
+
+def _store_total(key: Tuple, version: Optional[int], total: int) -> None:
+    if version is None:
+        return
+    with _totals_lock:
+        if len(_totals) >= TOTALS_CACHE_SIZE:
+            _totals.clear()
+        _totals[key] = (version, total)
+
+
+def count_items(conn: sqlite3.Connection,
+                db_path: str,
+                category: Optional[str] = None,
+                low_stock: bool = False) -> int:
+    """Total de itens com os filtros, reaproveitado enquanto nenhuma escrita mudar itens"""
+    version = items_version(conn)
+    key = _totals_key(db_path, category, low_stock)
+
+    total = _cached_total(key, version)
+    if total is None:
+        where, params = build_item_filters(category, low_stock)
+        total = conn.execute(f"SELECT COUNT(*) FROM itens WHERE {where}", params).fetchone()[0]
+        _store_total(key, version, total)
+    return total
+
+
+async def count_items_async(db,
+                            db_path: str,
+                            category: Optional[str] = None,
+                            low_stock: bool = False) -> int:
+    """count_items sobre uma conexão aiosqlite, com o mesmo cache de totais"""
+    try:
+        row = await (await db.execute(ITEMS_VERSION_QUERY)).fetchone()
+        version = row[0] if row else None
+    except sqlite3.OperationalError:
+        version = None
+    key = _totals_key(db_path, category, low_stock)
+
+    total = _cached_total(key, version)
+    if total is None:
+        where, params = build_item_filters(category, low_stock)
+        total = (await (await db.execute(f"SELECT COUNT(*) FROM itens WHERE {where}", params)).fetchone())[0]
+        _store_total(key, version, total)
+    return total
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Consulta de Itens em Lote
+Resolve uma lista de ids, códigos e códigos de barras em uma única consulta
+indexada (id, codigo e codigo_barras), em vez de uma requisição por item escaneado
+"""
+
+import json
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+# Referências aceitas por requisição (ids + códigos)
+MAX_LOOKUP_REFS = 500
+
+# Um parâmetro JSON por lista: o número de referências não esbarra no limite de
+# variáveis do SQLite; cada IN usa o índice da coluna (OR de índices)
+LOOKUP_QUERY = '''
+SELECT * FROM itens
+WHERE id IN (SELECT value FROM json_each(?))
+   OR codigo IN (SELECT value FROM json_each(?))
+   OR codigo_barras IN (SELECT value FROM json_each(?))
+'''
+
+
+def parse_lookup_refs(data: Optional[Dict]) -> Tuple[List[int], List[str]]:
+    """
+    Valida o corpo {"ids": [...], "codes": [...]} (códigos valem para codigo e codigo_barras)
+
+    Returns:
+        (ids, códigos) sem repetições, na ordem recebida; ValueError se inválido
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Corpo JSON inválido")
+
+    raw_ids = data.get('ids') or []
+    raw_codes = data.get('codes') or []
+    if not isinstance(raw_ids, list) or not isinstance(raw_codes, list):
+        raise ValueError("'ids' e 'codes' devem ser listas")
+    if not raw_ids and not raw_codes:
+        raise ValueError("Informe 'ids' ou 'codes'")
+    if len(raw_ids) + len(raw_codes) > MAX_LOOKUP_REFS:
+        raise ValueError(f"Máximo de {MAX_LOOKUP_REFS} referências por consulta")
+
+    ids = []
+    for value in raw_ids:
+        if isinstance(value, bool):
+            raise ValueError(f"id inválido: {value}")
+        try:
+            ids.append(int(value))
+        except (TypeError, ValueError):
+            raise ValueError(f"id inválido: {value}")
+
+    codes = [str(value).strip() for value in raw_codes if value is not None and str(value).strip()]
+    return list(dict.fromkeys(ids)), list(dict.fromkeys(codes))
+
+
+def _lookup_params(ids: List[int], codes: List[str]) -> Tuple[str, str, str]:
+    codes_json = json.dumps(codes)
+    return json.dumps(ids), codes_json, codes_json
+
+
+def _lookup_result(description, rows, ids: List[int], codes: List[str]) -> Dict:
+    columns = [column[0] for column in description]
+    items = [dict(zip(columns, row)) for row in rows]
+
+    found_ids = {item['id'] for item in items}
+    found_codes = {item.get('codigo') for item in items} | {item.get('codigo_barras') for item in items}
+    return {
+        'items': items,
+        'not_found': {
+            'ids': [item_id for item_id in ids if item_id not in found_ids],
+            'codes': [code for code in codes if code not in found_codes]
+        }
+    }
+
+
+def lookup_items(conn: sqlite3.Connection, ids: List[int], codes: List[str]) -> Dict:
+    """
+    Itens que correspondem a qualquer referência
+
+    Returns:
+        {'items': [itens], 'not_found': {'ids': [...], 'codes': [...]}}
+    """
+    cursor = conn.execute(LOOKUP_QUERY, _lookup_params(ids, codes))
+    return _lookup_result(cursor.description, cursor.fetchall(), ids, codes)
+
+
+async def lookup_items_async(db, ids: List[int], codes: List[str]) -> Dict:
+    """lookup_items sobre uma conexão aiosqlite (connect_async)"""
+    cursor = await db.execute(LOOKUP_QUERY, _lookup_params(ids, codes))
+    return _lookup_result(cursor.description, await cursor.fetchall(), ids, codes)
+
+
+# Prefixo do texto dos QR codes gerados pelo sistema (qr_payload_text)
+ITEM_PAYLOAD_PREFIX = 'ITEM:'
+
+
+def scanned_candidates(value: Optional[str]) -> List[str]:
+    """
+    Referências de um conteúdo lido, em ordem de preferência
+
+    Etiqueta do próprio sistema ("ITEM:<id>|<codigo>|<nome>|<categoria>") vale
+    pelo id e, na falta dele, pelo código; qualquer outro conteúdo vale como está.
+    """
+    ref = value.strip() if value else ''
+    if not ref.startswith(ITEM_PAYLOAD_PREFIX):
+        return [ref] if ref else []
+
+    item_id, _, rest = ref[len(ITEM_PAYLOAD_PREFIX):].partition('|')
+    codigo = rest.split('|', 1)[0]
+    return [part.strip() for part in (item_id, codigo) if part.strip()]
+
+
+def scanned_refs(scanned: List[str]) -> Tuple[List[int], List[str]]:
+    """
+    Referências para lookup_items a partir dos conteúdos lidos em uma foto
+
+    Conteúdo numérico vale como id e também como código (códigos de barras EAN
+    são numéricos).
+    """
+    codes = list(dict.fromkeys(ref for value in scanned for ref in scanned_candidates(value)))
+    ids = [int(code) for code in codes if code.isdigit()]
+    return ids, codes
+
+
+def tally_scanned_items(scanned: List[str], result: Dict) -> Tuple[List[Tuple[Dict, int]], List[str]]:
+    """
+    Contagem por item dos conteúdos lidos (repetições somam quantidade)
+
+    Cada conteúdo casa primeiro com id e depois com codigo/codigo_barras; códigos
+    diferentes do mesmo item somam no mesmo total.
+
+    Returns:
+        ([(item, quantidade)] na ordem da primeira leitura, conteúdos sem item)
+    """
+    by_ref = {}
+    for item in result['items']:
+        for column in ('codigo_barras', 'codigo'):
+            if item.get(column):
+                by_ref[str(item[column])] = item
+    for item in result['items']:
+        by_ref[str(item['id'])] = item
+
+    tallies: Dict[int, List] = {}
+    unknown: List[str] = []
+    for value in scanned:
+        ref = value.strip() if value else ''
+        item = next((by_ref[candidate] for candidate in scanned_candidates(ref)
+                     if candidate in by_ref), None)
+        if item is None:
+            if ref and ref not in unknown:
+                unknown.append(ref)
+            continue
+        tallies.setdefault(item['id'], [item, 0])[1] += 1
+
+    return [(item, count) for item, count in tallies.values()], unknown
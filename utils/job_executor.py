@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Executor Compartilhado para Trabalho Bloqueante dos Handlers
+Pool de threads para I/O (banco, arquivos, geração com bibliotecas que liberam
+o GIL) e pool de processos para CPU (decodificação de imagens, renderização),
+com timeout por tarefa e métricas de fila.
+
+Funções enviadas ao pool de processos precisam ser importáveis no nível do
+módulo (ver utils/bot_jobs.py).
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+IO_WORKERS = int(os.getenv('BOT_IO_WORKERS', 8))
+CPU_WORKERS = int(os.getenv('BOT_CPU_WORKERS', max(1, min(4, (os.cpu_count() or 2) - 1))))
+
+# Tempo máximo de espera por tarefa (fila + execução), em segundos
+IO_TIMEOUT = float(os.getenv('BOT_IO_TIMEOUT', 120))
+CPU_TIMEOUT = float(os.getenv('BOT_CPU_TIMEOUT', 30))
+
+# Fila acima de workers * fator gera aviso no log
+QUEUE_WARN_FACTOR = 4
+
+# forkserver: processos filhos não herdam threads nem conexões do bot
+START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+
+class JobTimeout(TimeoutError):
+    """Tarefa não concluída dentro do timeout"""
+
+
+class _PoolMetrics:
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.in_flight = 0
+        self.max_queue_depth = 0
+        self.total_seconds = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        # Tarefas enviadas que ainda não têm worker livre
+        return max(0, self.in_flight - self.workers)
+
+    def as_dict(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            'workers': self.workers,
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'max_queue_depth': self.max_queue_depth,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'failed': self.failed,
+            'timed_out': self.timed_out,
+            'avg_seconds': round(self.total_seconds / finished, 4) if finished else 0.0
+        }
+
+
+class JobExecutor:
+    """Pools criados sob demanda; seguro para chamar de qualquer event loop"""
+
+    def __init__(self, io_workers: int = IO_WORKERS, cpu_workers: int = CPU_WORKERS):
+        self._lock = threading.Lock()
+        self._pools: Dict[str, Any] = {}
+        self._metrics = {
+            'io': _PoolMetrics(io_workers),
+            'cpu': _PoolMetrics(cpu_workers)
+        }
+
+    def _pool(self, kind: str):
+        with self._lock:
+            pool = self._pools.get(kind)
+            if pool is None:
+                workers = self._metrics[kind].workers
+                if kind == 'io':
+                    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bot-io')
+                else:
+                    pool = ProcessPoolExecutor(max_workers=workers,
+                                               mp_context=multiprocessing.get_context(START_METHOD))
+                self._pools[kind] = pool
+            return pool
+
+    def _discard_pool(self, kind: str, pool) -> None:
+        with self._lock:
+            if self._pools.get(kind) is pool:
+                del self._pools[kind]
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self, kind: str, func: Callable, args: tuple, timeout: float):
+        pool = self._pool(kind)
+        metrics = self._metrics[kind]
+        started = time.monotonic()
+
+        try:
+            future = pool.submit(func, *args)
+        except BrokenProcessPool:
+            # Um filho morreu (ex.: falha nativa ao decodificar): recria na próxima tarefa
+            self._discard_pool(kind, pool)
+            raise
+
+        with self._lock:
+            metrics.submitted += 1
+            metrics.in_flight += 1
+            metrics.max_queue_depth = max(metrics.max_queue_depth, metrics.queue_depth)
+            depth = metrics.queue_depth
+        if depth > metrics.workers * QUEUE_WARN_FACTOR:
+            logger.warning(f'Fila do pool {kind} com {depth} tarefas aguardando')
+
+        def finished(done_future):
+            with self._lock:
+                metrics.in_flight -= 1
+                metrics.total_seconds += time.monotonic() - started
+                if done_future.cancelled() or done_future.exception() is not None:
+                    metrics.failed += 1
+                else:
+                    metrics.completed += 1
+
+        future.add_done_callback(finished)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            # Ainda na fila: é cancelada; já em execução: termina sem ninguém aguardando
+            with self._lock:
+                metrics.timed_out += 1
+            raise JobTimeout(f'{getattr(func, "__name__", "tarefa")} excedeu {timeout:g}s') from None
+        except BrokenProcessPool:
+            self._discard_pool(kind, pool)
+            raise
+
+    async def run_io(self, func: Callable, *args, timeout: Optional[float] = None):
+        """Executa func(*args) no pool de threads"""
+        return await self._run('io', func, args, IO_TIMEOUT if timeout is None else timeout)
+
+    async def run_cpu(self, func: Callable, *args, timeout: Optional[float] = None):
+        """Executa func(*args) no pool de processos (func e args precisam ser serializáveis)"""
+        return await self._run('cpu', func, args, CPU_TIMEOUT if timeout is None else timeout)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Métricas por pool (io/cpu): fila atual e máxima, tarefas e tempo médio"""
+        with self._lock:
+            return {kind: metrics.as_dict() for kind, metrics in self._metrics.items()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pools = list(self._pools.values())
+            self._pools.clear()
+        for pool in pools:
+            pool.shutdown(wait=wait, cancel_futures=True)
+
+
+_executor: Optional[JobExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_job_executor() -> JobExecutor:
+    """Executor compartilhado do processo"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = JobExecutor()
+        return _executor
+
+
+async def shutdown_job_executor(*_args) -> None:
+    """Encerra os pools (compatível com post_shutdown do ApplicationBuilder)"""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        logger.info(f'Executor encerrado: {executor.stats()}')
+        await asyncio.to_thread(executor.shutdown)
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Migrações Versionadas do Banco de Dados
+Cada passo é idempotente e registrado em schema_version; executado na inicialização
+de todos os pontos de entrada (bots, servidores e scripts de db/)
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Callable, Dict, List, Set, Tuple
+
+try:
+    from utils.database import DB_PATH, open_connection
+    from utils.inventory_sessions import (CREATE_INVENTORY_INDEX, CREATE_INVENTORY_KEY_INDEX,
+                                          CREATE_INVENTORY_LINES, CREATE_INVENTORY_SESSIONS,
+                                          CREATE_INVENTORY_UPLOADS)
+    from utils.search_index import (CREATE_BACKFILL_TABLE, CREATE_FTS_TABLE, CREATE_FTS_TRIGGERS,
+                                    CREATE_NORM_TABLE, CREATE_NORM_TRIGGERS, CREATE_PENDING_TABLE,
+                                    CREATE_SUBSTRING_TABLE, CREATE_SUBSTRING_TRIGGERS, CREATE_TRIGRAM_INDEXES,
+                                    CREATE_TRIGRAM_TABLE, CREATE_TRIGRAM_TRIGGERS, backfill_range, start_backfill)
+    from utils.sequences import CREATE_CODE_SEQUENCES, seed_mnemonic_sequences
+    from utils.stats_snapshot import CREATE_STATS_SNAPSHOT, STATS_TRIGGERS, recompute_stats
+    from utils.suggestion_index import CREATE_LOG_TABLE, SUGGESTION_COLUMNS, create_log_triggers
+except ImportError:
+    from database import DB_PATH, open_connection
+    from inventory_sessions import (CREATE_INVENTORY_INDEX, CREATE_INVENTORY_KEY_INDEX, CREATE_INVENTORY_LINES,
+                                    CREATE_INVENTORY_SESSIONS, CREATE_INVENTORY_UPLOADS)
+    from search_index import (CREATE_BACKFILL_TABLE, CREATE_FTS_TABLE, CREATE_FTS_TRIGGERS,
+                              CREATE_NORM_TABLE, CREATE_NORM_TRIGGERS, CREATE_PENDING_TABLE,
+                              CREATE_SUBSTRING_TABLE, CREATE_SUBSTRING_TRIGGERS, CREATE_TRIGRAM_INDEXES,
+                              CREATE_TRIGRAM_TABLE, CREATE_TRIGRAM_TRIGGERS, backfill_range, start_backfill)
+    from sequences import CREATE_CODE_SEQUENCES, seed_mnemonic_sequences
+    from stats_snapshot import CREATE_STATS_SNAPSHOT, STATS_TRIGGERS, recompute_stats
+    from suggestion_index import CREATE_LOG_TABLE, SUGGESTION_COLUMNS, create_log_triggers
+
+logger = logging.getLogger(__name__)
+
+CREATE_SCHEMA_VERSION = '''
+CREATE TABLE IF NOT EXISTS schema_version (
+    version INTEGER PRIMARY KEY,
+    descricao TEXT NOT NULL,
+    aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+'''
+
+CREATE_ITENS = '''
+CREATE TABLE IF NOT EXISTS itens (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    nome TEXT NOT NULL,
+    descricao TEXT,
+    quantidade INTEGER NOT NULL,
+    catalogo TEXT,
+    status TEXT NOT NULL,
+    foto_path TEXT,
+    foto_id TEXT,
+    info_reparo TEXT,
+    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+'''
+
+CREATE_MOVIMENTACOES = '''
+CREATE TABLE IF NOT EXISTS movimentacoes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL,
+    usuario TEXT,
+    acao TEXT NOT NULL,
+    detalhes TEXT,
+    data_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (item_id) REFERENCES itens(id)
+);
+'''
+
+# Colunas adicionadas por migrate_codes.py (UNIQUE vira índice: ALTER TABLE não aceita)
+CODE_COLUMNS = [
+    ('codigo', 'TEXT'),
+    ('codigo_barras', 'TEXT'),
+    ('categoria', 'TEXT'),
+    ('localizacao', 'TEXT'),
+    ('qr_code', 'TEXT'),
+    ('marca', 'TEXT'),
+    ('modelo', 'TEXT'),
+    ('numero_serie', 'TEXT')
+]
+
+# Colunas gravadas pelos endpoints de criação/atualização da API REST
+API_COLUMNS = [
+    ('fornecedor', 'TEXT'),
+    ('preco_unitario', 'REAL DEFAULT 0')
+]
+
+# Índices por consulta frequente; (status, quantidade) e (categoria, quantidade)
+# cobrem contagens, somas e o filtro de estoque baixo sem ler a tabela
+HOT_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_itens_status ON itens(status, quantidade);',
+    'CREATE INDEX IF NOT EXISTS idx_itens_categoria ON itens(categoria, quantidade);',
+    'CREATE INDEX IF NOT EXISTS idx_itens_data_cadastro ON itens(data_cadastro);',
+    'CREATE INDEX IF NOT EXISTS idx_nome ON itens(nome);',
+    'CREATE INDEX IF NOT EXISTS idx_localizacao ON itens(localizacao);',
+    'CREATE INDEX IF NOT EXISTS idx_movimentacoes_item_data ON movimentacoes(item_id, data_hora);',
+    'CREATE INDEX IF NOT EXISTS idx_movimentacoes_data ON movimentacoes(data_hora);'
+]
+
+# Contador incrementado a cada escrita que muda contagens/somas de itens;
+# caches de totais comparam a versão (leitura de uma linha) antes de reutilizar
+CREATE_ITENS_VERSAO = '''
+CREATE TABLE IF NOT EXISTS itens_versao (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    versao INTEGER NOT NULL
+);
+'''
+
+ITENS_VERSAO_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS itens_versao_ai AFTER INSERT ON itens BEGIN
+        UPDATE itens_versao SET versao = versao + 1 WHERE id = 1;
+    END;''',
+    '''CREATE TRIGGER IF NOT EXISTS itens_versao_ad AFTER DELETE ON itens BEGIN
+        UPDATE itens_versao SET versao = versao + 1 WHERE id = 1;
+    END;''',
+    '''CREATE TRIGGER IF NOT EXISTS itens_versao_au AFTER UPDATE OF categoria, quantidade, status, preco_unitario ON itens BEGIN
+        UPDATE itens_versao SET versao = versao + 1 WHERE id = 1;
+    END;'''
+]
+
+# Substituídos pelos índices acima (prefixo idêntico)
+REDUNDANT_INDEXES = ['idx_categoria', 'idx_codigo', 'idx_codigo_barras']
+
+# Caches por item (utils/item_cache.py) dependem de qualquer UPDATE mudar a versão
+# e data_atualizacao, inclusive nos caminhos que não a atualizam (bots, reconciliação)
+ITENS_UPDATE_TRIGGERS = [
+    '''CREATE TRIGGER IF NOT EXISTS itens_versao_au AFTER UPDATE ON itens BEGIN
+        UPDATE itens_versao SET versao = versao + 1 WHERE id = 1;
+    END;''',
+    '''CREATE TRIGGER IF NOT EXISTS itens_data_atualizacao_au AFTER UPDATE ON itens
+    WHEN NEW.data_atualizacao IS OLD.data_atualizacao BEGIN
+        UPDATE itens SET data_atualizacao = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')
+        WHERE id = NEW.id;
+    END;'''
+]
+
+# Trigger único de UPDATE (migração 12): o UPDATE aninhado de data_atualizacao não
+# o redispara (recursive_triggers desligado), então a versão sobe uma vez por edição
+ITENS_ATUALIZACAO_TRIGGER = '''
+CREATE TRIGGER IF NOT EXISTS itens_atualizacao_au AFTER UPDATE ON itens BEGIN
+    UPDATE itens_versao SET versao = versao + 1 WHERE id = 1;
+    UPDATE itens SET data_atualizacao = CURRENT_TIMESTAMP
+    WHERE id = NEW.id AND NEW.data_atualizacao IS OLD.data_atualizacao;
+END;
+'''
+
+# Substitui ITENS_ATUALIZACAO_TRIGGER (migração 16): com o WHEN, UPDATE que grava
+# data_atualizacao não muda a versão nem é carimbado de novo. Formato do DEFAULT
+# CURRENT_TIMESTAMP (UTC, "AAAA-MM-DD HH:MM:SS"); escritores não a gravam no UPDATE
+ITENS_UPDATE_TRIGGER = '''
+CREATE TRIGGER IF NOT EXISTS itens_atualizacao_au AFTER UPDATE ON itens
+WHEN NEW.data_atualizacao IS OLD.data_atualizacao BEGIN
+    UPDATE itens_versao SET versao = versao + 1 WHERE id = 1;
+    UPDATE itens SET data_atualizacao = datetime('now') WHERE id = NEW.id;
+END;
+'''
+
+
+def _existing_columns(conn: sqlite3.Connection, table: str) -> Set[str]:
+    cursor = conn.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _add_columns(conn: sqlite3.Connection, table: str, columns: List[Tuple[str, str]]) -> None:
+    existing = _existing_columns(conn, table)
+    for column, definition in columns:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def _has_unique_index(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    """True se já existe índice UNIQUE exatamente sobre a coluna (ex.: coluna criada com UNIQUE)"""
+    for index in conn.execute(f"PRAGMA index_list({table})").fetchall():
+        if not index[2]:
+            continue
+        columns = [info[2] for info in conn.execute(f"PRAGMA index_info('{index[1]}')").fetchall()]
+        if columns == [column]:
+            return True
+    return False
+
+
+def _create_code_index(conn: sqlite3.Connection, column: str) -> None:
+    """Índice único para o código; cai para não único se já houver duplicados"""
+    if _has_unique_index(conn, 'itens', column):
+        return
+    try:
+        conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS idx_itens_{column} ON itens({column})")
+    except sqlite3.IntegrityError:
+        logger.warning(f"Valores duplicados em itens.{column}: índice criado sem UNIQUE")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_itens_{column} ON itens({column})")
+
+
+def _migration_base_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(CREATE_ITENS)
+    conn.execute(CREATE_MOVIMENTACOES)
+
+
+def _migration_code_columns(conn: sqlite3.Connection) -> None:
+    _add_columns(conn, 'itens', CODE_COLUMNS)
+
+
+def _migration_api_columns(conn: sqlite3.Connection) -> None:
+    _add_columns(conn, 'itens', API_COLUMNS)
+
+
+def _migration_hot_indexes(conn: sqlite3.Connection) -> None:
+    for index_name in REDUNDANT_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+    _create_code_index(conn, 'codigo')
+    _create_code_index(conn, 'codigo_barras')
+    for index_sql in HOT_INDEXES:
+        conn.execute(index_sql)
+
+
+def _migration_code_sequences(conn: sqlite3.Connection) -> None:
+    conn.execute(CREATE_CODE_SEQUENCES)
+    seed_mnemonic_sequences(conn)
+
+
+def _migration_items_version(conn: sqlite3.Connection) -> None:
+    conn.execute(CREATE_ITENS_VERSAO)
+    conn.execute("INSERT OR IGNORE INTO itens_versao (id, versao) VALUES (1, 0)")
+    for trigger_sql in ITENS_VERSAO_TRIGGERS:
+        conn.execute(trigger_sql)
+    # Listagem filtrada por categoria já ordenada por (nome, id)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_itens_categoria_nome ON itens(categoria, nome)")
+
+
+def _migration_stats_snapshot(conn: sqlite3.Connection) -> None:
+    conn.execute(CREATE_STATS_SNAPSHOT)
+    for trigger_sql in STATS_TRIGGERS:
+        conn.execute(trigger_sql)
+    recompute_stats(conn)
+    # Ranking por quantidade dos relatórios
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_itens_quantidade ON itens(quantidade)")
+
+
+def _migration_strip_qr_payload(conn: sqlite3.Connection) -> None:
+    # QR agora é gerado sob demanda (utils/qr_cache.py); a coluna fica por compatibilidade
+    conn.execute("UPDATE itens SET qr_code = NULL WHERE qr_code IS NOT NULL")
+
+
+def _migration_item_update_triggers(conn: sqlite3.Connection) -> None:
+    # itens_versao_au passa a valer para qualquer coluna
+    conn.execute("DROP TRIGGER IF EXISTS itens_versao_au")
+    for trigger_sql in ITENS_UPDATE_TRIGGERS:
+        conn.execute(trigger_sql)
+
+
+def _migration_inventory_sessions(conn: sqlite3.Connection) -> None:
+    # Os JSON legados de inventarios/ são importados pelo webapp_server na inicialização
+    conn.execute(CREATE_INVENTORY_SESSIONS)
+    conn.execute(CREATE_INVENTORY_LINES)
+    conn.execute(CREATE_INVENTORY_INDEX)
+
+
+def _migration_inventory_uploads(conn: sqlite3.Connection) -> None:
+    _add_columns(conn, 'inventario_sessoes', [('chave', 'TEXT')])
+    conn.execute(CREATE_INVENTORY_KEY_INDEX)
+    conn.execute(CREATE_INVENTORY_UPLOADS)
+
+
+def _migration_single_update_trigger(conn: sqlite3.Connection) -> None:
+    conn.execute("DROP TRIGGER IF EXISTS itens_versao_au")
+    conn.execute("DROP TRIGGER IF EXISTS itens_data_atualizacao_au")
+    conn.execute(ITENS_ATUALIZACAO_TRIGGER)
+
+
+def _migration_search_fts(conn: sqlite3.Connection) -> None:
+    # itens_fts com outro conteúdo externo é recriado; o texto normalizado é
+    # refeito pela carga inicial
+    cursor = conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'itens_fts'")
+    row = cursor.fetchone()
+    if row is None or "content='itens_busca_norm'" not in row[0]:
+        for trigger_name in ('itens_fts_ai', 'itens_fts_ad', 'itens_fts_au'):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger_name}")
+        conn.execute("DROP TABLE IF EXISTS itens_fts")
+        conn.execute("DROP TABLE IF EXISTS itens_busca_norm")
+    conn.execute(CREATE_NORM_TABLE)
+    try:
+        conn.execute(CREATE_FTS_TABLE)
+    except sqlite3.OperationalError as e:
+        # SQLite sem FTS5: a busca continua via LIKE
+        logger.warning(f"Índice FTS5 indisponível: {e}")
+        return
+    for trigger_sql in CREATE_FTS_TRIGGERS:
+        conn.execute(trigger_sql)
+
+
+def _migration_search_normalized(conn: sqlite3.Connection) -> None:
+    conn.execute(CREATE_PENDING_TABLE)
+    conn.execute(CREATE_TRIGRAM_TABLE)
+    for sql in CREATE_TRIGRAM_INDEXES + CREATE_NORM_TRIGGERS + CREATE_TRIGRAM_TRIGGERS:
+        conn.execute(sql)
+    try:
+        conn.execute(CREATE_SUBSTRING_TABLE)
+        for trigger_sql in CREATE_SUBSTRING_TRIGGERS:
+            conn.execute(trigger_sql)
+    except sqlite3.OperationalError as e:
+        # SQLite sem o tokenizer trigram (< 3.34): a busca fica só por prefixo
+        logger.warning(f"Índice de trechos indisponível: {e}")
+    # Só registra a faixa de itens existentes; a normalização roda fora da migração
+    # (search_index.start_backfill / python utils/search_index.py)
+    conn.execute(CREATE_BACKFILL_TABLE)
+    conn.execute(
+        "INSERT OR IGNORE INTO itens_busca_carga (id, ultimo_id, ate_id) "
+        "SELECT 1, 0, COALESCE(MAX(id), 0) FROM itens"
+    )
+
+
+def _migration_suggestion_log(conn: sqlite3.Connection) -> None:
+    conn.execute(CREATE_LOG_TABLE)
+    for trigger_sql in create_log_triggers(SUGGESTION_COLUMNS):
+        conn.execute(trigger_sql)
+
+
+def _migration_utc_timestamps(conn: sqlite3.Connection) -> None:
+    # Sem o trigger, converter data_cadastro não carimba data_atualizacao
+    conn.execute("DROP TRIGGER IF EXISTS itens_atualizacao_au")
+    # ISO em hora local (isoformat() das APIs e bots, trigger da migração 10) para o
+    # formato UTC do CURRENT_TIMESTAMP
+    for column in ('data_cadastro', 'data_atualizacao'):
+        conn.execute(f"""
+            UPDATE itens SET {column} = datetime({column}, 'utc')
+            WHERE {column} LIKE '____-__-__T%' AND datetime({column}, 'utc') IS NOT NULL
+        """)
+    conn.execute(ITENS_UPDATE_TRIGGER)
+    # Caches por item guardaram o formato antigo
+    conn.execute("UPDATE itens_versao SET versao = versao + 1 WHERE id = 1")
+
+
+# (versão, descrição, função) — nunca renumerar; novos passos entram no final
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, 'Tabelas itens e movimentacoes', _migration_base_tables),
+    (2, 'Colunas de códigos automáticos e catalogação', _migration_code_columns),
+    (3, 'Colunas fornecedor e preco_unitario da API REST', _migration_api_columns),
+    (4, 'Índices das consultas frequentes', _migration_hot_indexes),
+    (5, 'Sequências atômicas de códigos', _migration_code_sequences),
+    (6, 'Remove PNGs base64 de itens.qr_code', _migration_strip_qr_payload),
+    (7, 'Versão de itens para caches de totais', _migration_items_version),
+    (8, 'Agregados materializados (stats_snapshot)', _migration_stats_snapshot),
+    (9, 'Sessões de inventário (cabeçalho e linhas)', _migration_inventory_sessions),
+    (10, 'Versão e data_atualizacao em qualquer UPDATE de itens', _migration_item_update_triggers),
+    (11, 'Envios de inventário em partes com chave de idempotência', _migration_inventory_uploads),
+    (12, 'Trigger único de versão e data_atualizacao em UPDATE de itens', _migration_single_update_trigger),
+    (13, 'Índice FTS5 de busca de itens', _migration_search_fts),
+    (14, 'Texto normalizado, trigramas e índice de trechos de busca', _migration_search_normalized),
+    (15, 'Log de alterações das sugestões', _migration_suggestion_log),
+    (16, 'Datas de cadastro e atualização de itens em UTC', _migration_utc_timestamps)
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Bancos já migrados neste processo (evita até a consulta de versão)
+_migrated: Dict[str, int] = {}
+_migrate_lock = threading.Lock()
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Versão atual do schema (0 se nunca migrado)"""
+    try:
+        cursor = conn.execute("SELECT MAX(version) FROM schema_version")
+    except sqlite3.OperationalError:
+        return 0
+    return cursor.fetchone()[0] or 0
+
+
+def run_migrations(db_path: str, backfill: bool = True) -> int:
+    """
+    Aplica as migrações pendentes
+
+    Cada passo roda em sua própria transação (BEGIN IMMEDIATE), com a versão
+    relida dentro dela, para que processos iniciando juntos não repitam passos.
+
+    Args:
+        backfill: Inicia em segundo plano a carga inicial do índice de busca,
+            se houver (False para rodá-la com search_index.run_backfill)
+
+    Returns:
+        Versão do schema após a execução
+    """
+    key = os.path.abspath(db_path)
+    if _migrated.get(key) == LATEST_VERSION:
+        return LATEST_VERSION
+
+    with _migrate_lock:
+        os.makedirs(os.path.dirname(key), exist_ok=True)
+        conn = open_connection(db_path, isolation_level=None)
+        try:
+            version = get_schema_version(conn)
+            if version < LATEST_VERSION:
+                conn.execute(CREATE_SCHEMA_VERSION)
+
+                for step_version, descricao, apply in MIGRATIONS:
+                    if step_version <= version:
+                        continue
+
+                    conn.execute("BEGIN IMMEDIATE")
+                    try:
+                        if get_schema_version(conn) >= step_version:
+                            conn.execute("COMMIT")
+                            continue
+                        apply(conn)
+                        conn.execute(
+                            "INSERT INTO schema_version (version, descricao) VALUES (?, ?)",
+                            (step_version, descricao)
+                        )
+                        conn.execute("COMMIT")
+                    except Exception:
+                        conn.execute("ROLLBACK")
+                        raise
+
+                    logger.info(f"Migração {step_version} aplicada: {descricao}")
+
+                version = get_schema_version(conn)
+                # Estatísticas para o planejador escolher os novos índices
+                conn.execute("PRAGMA optimize")
+
+            # Itens anteriores ao índice de busca são normalizados em segundo plano
+            if backfill and backfill_range(conn) is not None:
+                start_backfill(db_path)
+        finally:
+            conn.close()
+
+        _migrated[key] = version
+        return version
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    print(f"Schema na versão {run_migrations(DB_PATH)}")
@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Armazenamento de Fotos dos Itens
+Originais endereçados por conteúdo (<hash>.jpg: a mesma foto enviada duas vezes
+ocupa um arquivo), miniaturas WebP/JPEG em thumbs/ e coleta das fotos que
+nenhum item referencia mais (itens.foto_path).
+
+store_photo é uma função de módulo para rodar no pool de processos do bot
+(JobExecutor.run_cpu); os nomes devolvidos vão em itens.foto_path.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import re
+import sqlite3
+import time
+from typing import Dict, Optional, Set
+
+try:
+    from utils.database import connect
+except ImportError:
+    from database import connect
+
+logger = logging.getLogger(__name__)
+
+FOTOS_DIR = os.getenv(
+    'FOTOS_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'fotos')
+)
+THUMBS_SUBDIR = 'thumbs'
+
+# Lado máximo das miniaturas (lista do WebApp e detalhe)
+THUMB_SIZES = (160, 480)
+THUMB_FORMATS = {'webp': 'WEBP', 'jpg': 'JPEG'}
+THUMB_QUALITY = 80
+
+# Fotos sem referência mais novas que isso são mantidas: o cadastro salva a
+# foto antes de gravar o item
+GC_GRACE_SECONDS = 3600
+
+# Nome de original endereçado por conteúdo
+HASHED_NAME = re.compile(r'^[0-9a-f]{32}\.(jpg|png|webp)$')
+
+FORMAT_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp'}
+
+
+def photo_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:32]
+
+
+def is_content_addressed(name: str) -> bool:
+    """Nome derivado do conteúdo: o arquivo nunca muda"""
+    return bool(HASHED_NAME.match(name))
+
+
+def photo_name(foto_path: str) -> str:
+    """
+    Nome do arquivo em fotos_dir para itens.foto_path
+
+    Versões anteriores gravavam caminhos ('bot/../fotos/x.jpg', caminhos absolutos
+    de outra máquina, separadores do Windows); o arquivo é sempre o do nome final.
+    """
+    return os.path.basename(foto_path.replace('\\', '/'))
+
+
+def photo_file_path(foto_path: str, fotos_dir: str = FOTOS_DIR) -> str:
+    """Caminho no disco de itens.foto_path (nome relativo ou caminho legado)"""
+    path = os.path.join(fotos_dir, foto_path)
+    if os.path.isfile(path):
+        return path
+    return os.path.join(fotos_dir, photo_name(foto_path))
+
+
+def thumbnail_name(name: str, size: int, ext: str) -> str:
+    return f"{os.path.splitext(name)[0]}_{size}.{ext}"
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _refresh_mtime(name: str, fotos_dir: str) -> None:
+    """Renova o mtime do original e das miniaturas: a coleta decide pela idade do arquivo"""
+    os.utime(os.path.join(fotos_dir, name))
+    thumbs_dir = os.path.join(fotos_dir, THUMBS_SUBDIR)
+    for size in THUMB_SIZES:
+        for ext in THUMB_FORMATS:
+            path = os.path.join(thumbs_dir, thumbnail_name(name, size, ext))
+            if os.path.exists(path):
+                os.utime(path)
+
+
+def make_thumbnails(name: str, fotos_dir: str = FOTOS_DIR) -> int:
+    """Gera as miniaturas que faltam para o original; retorna quantas foram criadas"""
+    from PIL import Image, ImageOps
+
+    thumbs_dir = os.path.join(fotos_dir, THUMBS_SUBDIR)
+    os.makedirs(thumbs_dir, exist_ok=True)
+
+    created = 0
+    with Image.open(os.path.join(fotos_dir, name)) as img:
+        img.draft('RGB', (max(THUMB_SIZES), max(THUMB_SIZES)))
+        # Orientação da câmera aplicada antes de reduzir
+        base = ImageOps.exif_transpose(img).convert('RGB')
+
+    for size in sorted(THUMB_SIZES, reverse=True):
+        base.thumbnail((size, size))
+        for ext, fmt in THUMB_FORMATS.items():
+            path = os.path.join(thumbs_dir, thumbnail_name(name, size, ext))
+            if os.path.exists(path):
+                continue
+            buffer = io.BytesIO()
+            base.save(buffer, format=fmt, quality=THUMB_QUALITY)
+            _write_atomic(path, buffer.getvalue())
+            created += 1
+    return created
+
+
+def store_photo(data: bytes, fotos_dir: str = FOTOS_DIR) -> str:
+    """
+    Grava a foto pelo hash do conteúdo (se ainda não existe) e suas miniaturas
+
+    Returns:
+        Nome relativo a fotos_dir para itens.foto_path
+    """
+    from PIL import Image
+
+    with Image.open(io.BytesIO(data)) as img:
+        ext = FORMAT_EXTENSIONS.get(img.format, 'jpg')
+
+    os.makedirs(fotos_dir, exist_ok=True)
+    name = f"{photo_hash(data)}.{ext}"
+    path = os.path.join(fotos_dir, name)
+    if os.path.exists(path):
+        # Órfã reenviada: sem isso a coleta poderia removê-la antes do item ser gravado
+        _refresh_mtime(name, fotos_dir)
+    else:
+        _write_atomic(path, data)
+
+    make_thumbnails(name, fotos_dir)
+    return name
+
+
+def referenced_photos(conn: sqlite3.Connection) -> Set[str]:
+    """
+    Nomes em fotos_dir referenciados por itens.foto_path
+
+    Casamento pelo nome do arquivo: um caminho legado que não resolve nesta
+    máquina ainda protege a foto de mesmo nome.
+    """
+    cursor = conn.execute("SELECT DISTINCT foto_path FROM itens WHERE foto_path IS NOT NULL AND foto_path != ''")
+    return {photo_name(foto_path) for (foto_path,) in cursor}
+
+
+def collect_garbage(db_path: str, fotos_dir: str = FOTOS_DIR,
+                    grace_seconds: int = GC_GRACE_SECONDS, dry_run: bool = False) -> Dict[str, int]:
+    """
+    Remove fotos e miniaturas que nenhum item referencia (item excluído ou foto trocada)
+
+    Destrutivo: rodar explicitamente (python utils/photo_store.py), de preferência
+    depois de conferir com dry_run=True / --dry-run.
+
+    Returns:
+        {'originals': removidos, 'thumbnails': removidas} (ou que seriam, em dry_run)
+    """
+    if not os.path.isdir(fotos_dir):
+        return {'originals': 0, 'thumbnails': 0}
+
+    with connect(db_path) as conn:
+        referenced = referenced_photos(conn)
+
+    cutoff = time.time() - grace_seconds
+    removed = {'originals': 0, 'thumbnails': 0}
+
+    for entry in os.scandir(fotos_dir):
+        if not entry.is_file() or entry.name in referenced or entry.name.startswith('.'):
+            continue
+        if entry.stat().st_mtime > cutoff:
+            continue
+        if not dry_run:
+            os.remove(entry.path)
+        removed['originals'] += 1
+
+    thumbs_dir = os.path.join(fotos_dir, THUMBS_SUBDIR)
+    if os.path.isdir(thumbs_dir):
+        kept = {os.path.splitext(name)[0] for name in referenced}
+        for entry in os.scandir(thumbs_dir):
+            stem = entry.name.rsplit('_', 1)[0]
+            if not entry.is_file() or stem in kept or entry.stat().st_mtime > cutoff:
+                continue
+            if not dry_run:
+                os.remove(entry.path)
+            removed['thumbnails'] += 1
+
+    if removed['originals'] or removed['thumbnails']:
+        if dry_run:
+            logger.info(f"Fotos órfãs encontradas (remover com python utils/photo_store.py): {removed}")
+        else:
+            logger.info(f"Fotos órfãs removidas: {removed}")
+    return removed
+
+
+def resolve_photo(name: str, size: Optional[int] = None, ext: Optional[str] = None,
+                  fotos_dir: str = FOTOS_DIR) -> Optional[str]:
+    """
+    Caminho do arquivo a servir: original ou miniatura (gerada se faltar)
+
+    None se o nome é inválido ou o original não existe.
+    """
+    if os.path.basename(name) != name or name.startswith('.'):
+        return None
+    original = os.path.join(fotos_dir, name)
+    if not os.path.isfile(original):
+        return None
+    if size is None:
+        return original
+
+    if size not in THUMB_SIZES or ext not in THUMB_FORMATS:
+        return None
+    path = os.path.join(fotos_dir, THUMBS_SUBDIR, thumbnail_name(name, size, ext))
+    if not os.path.exists(path):
+        # Fotos gravadas antes das miniaturas
+        make_thumbnails(name, fotos_dir)
+    return path
+
+
+if __name__ == '__main__':
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from utils.database import DB_PATH
+
+    dry_run = '--dry-run' in sys.argv
+    args = [arg for arg in sys.argv[1:] if arg != '--dry-run']
+    db_path = args[0] if args else DB_PATH
+    removed = collect_garbage(db_path, dry_run=dry_run)
+    print(f"Fotos órfãs{' (simulação)' if dry_run else ''}: "
+          f"{removed['originals']} originais, {removed['thumbnails']} miniaturas")
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache de Imagens QR Code
+PNGs gerados sob demanda a partir de id/código/nome/categoria, mantidos em LRU na
+memória e em disco endereçados pelo hash do conteúdo (o hash também é o ETag)
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+try:
+    from utils.code_generator import qr_payload_text, render_qr_png
+except ImportError:
+    from code_generator import qr_payload_text, render_qr_png
+
+logger = logging.getLogger(__name__)
+
+QR_CACHE_DIR = os.getenv(
+    'QR_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'db', 'qr_cache')
+)
+
+# PNGs mantidos em memória (~1 KB cada)
+MEMORY_CACHE_SIZE = 512
+
+# Colunas necessárias para gerar o QR (evita SELECT * nas rotas de imagem)
+QR_FIELDS = ('id', 'codigo', 'nome', 'categoria')
+
+# URL com ?v=<etag> aponta para um conteúdo que nunca muda
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+
+def qr_etag(item_data: Dict) -> str:
+    """Hash do conteúdo do QR; muda apenas quando código, nome ou categoria mudam"""
+    return hashlib.sha256(qr_payload_text(item_data).encode('utf-8')).hexdigest()[:32]
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara o header If-None-Match (lista de ETags, com ou sem W/) com o ETag atual"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+def qr_response_headers(etag: str, version: Optional[str] = None) -> Dict[str, str]:
+    """Headers de cache da imagem; imutável quando a URL traz a versão (ETag) correta"""
+    return {
+        'ETag': f'"{etag}"',
+        'Cache-Control': IMMUTABLE_CACHE_CONTROL if version == etag else REVALIDATE_CACHE_CONTROL
+    }
+
+
+class QRCodeCache:
+    """LRU em memória na frente de um diretório de PNGs endereçados por conteúdo"""
+
+    def __init__(self, cache_dir: str = QR_CACHE_DIR, max_items: int = MEMORY_CACHE_SIZE):
+        self.cache_dir = cache_dir
+        self.max_items = max(1, max_items)
+        self._memory: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, etag: str) -> str:
+        return os.path.join(self.cache_dir, etag[:2], f"{etag}.png")
+
+    def _remember(self, etag: str, png: bytes) -> None:
+        with self._lock:
+            self._memory[etag] = png
+            self._memory.move_to_end(etag)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def _read_disk(self, etag: str) -> Optional[bytes]:
+        try:
+            with open(self._path(etag), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, etag: str, png: bytes) -> None:
+        path = self._path(etag)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Escrita atômica: leitores concorrentes nunca veem arquivo pela metade
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(png)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Sem disco o cache em memória continua funcionando
+            logger.warning(f"Não foi possível gravar QR em cache ({path}): {e}")
+
+    def get_png(self, item_data: Dict) -> Tuple[bytes, str]:
+        """
+        PNG do QR code do item
+
+        Returns:
+            (bytes do PNG, ETag)
+        """
+        etag = qr_etag(item_data)
+
+        with self._lock:
+            png = self._memory.get(etag)
+            if png is not None:
+                self._memory.move_to_end(etag)
+                return png, etag
+
+        png = self._read_disk(etag)
+        if png is None:
+            png = render_qr_png(item_data)
+            self._write_disk(etag, png)
+
+        self._remember(etag, png)
+        return png, etag
+
+
+_caches: Dict[str, QRCodeCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_qr_cache(cache_dir: str = QR_CACHE_DIR) -> QRCodeCache:
+    """Cache compartilhado do processo para o diretório informado"""
+    key = os.path.abspath(cache_dir)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = QRCodeCache(cache_dir)
+        return cache
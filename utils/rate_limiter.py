@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Rate Limiting das APIs REST
+Token bucket por IP ou por API key (com cota própria), custo O(1) por requisição
+e thread-safe; o estado fica em memória ou em um SQLite compartilhado entre processos
+
+Configuração por variáveis de ambiente:
+    RATE_LIMIT          requisições por janela (padrão 100; 0 desliga)
+    RATE_LIMIT_WINDOW   janela em segundos (padrão 3600)
+    API_KEY_QUOTAS      cotas por API key: "chave1=1000,chave2=50"
+    RATE_LIMIT_DB       arquivo SQLite para compartilhar limites entre processos
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+try:
+    from utils.database import connect
+except ImportError:
+    from database import connect
+
+RATE_LIMIT = int(os.getenv('RATE_LIMIT', 100))
+RATE_LIMIT_WINDOW = float(os.getenv('RATE_LIMIT_WINDOW', 3600))
+
+# Buckets mantidos em memória (os menos usados saem primeiro)
+MAX_KEYS = 100_000
+
+# Escritas entre limpezas de buckets ociosos no SQLite
+SQLITE_CLEANUP_INTERVAL = 1000
+
+CREATE_RATE_LIMITS = '''
+CREATE TABLE IF NOT EXISTS rate_limits (
+    chave TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    atualizado REAL NOT NULL,
+    permitido INTEGER NOT NULL DEFAULT 1
+) WITHOUT ROWID;
+'''
+
+# RETURNING existe a partir do SQLite 3.35
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Reposição e consumo em um único statement (atômico entre processos);
+# no UPDATE todas as expressões enxergam os valores anteriores da linha
+_TAKE = '''
+INSERT INTO rate_limits (chave, tokens, atualizado, permitido)
+VALUES (:key, CASE WHEN :capacity >= :cost THEN :capacity - :cost ELSE :capacity END,
+        :now, :capacity >= :cost)
+ON CONFLICT(chave) DO UPDATE SET
+    tokens = MIN(:capacity, tokens + MAX(0, :now - atualizado) * :rate)
+             - CASE WHEN MIN(:capacity, tokens + MAX(0, :now - atualizado) * :rate) >= :cost
+                    THEN :cost ELSE 0 END,
+    permitido = MIN(:capacity, tokens + MAX(0, :now - atualizado) * :rate) >= :cost,
+    atualizado = :now
+'''
+
+
+class RateDecision(NamedTuple):
+    allowed: bool
+    remaining: int
+    retry_after: float  # segundos até haver token (0 quando permitido)
+
+
+class MemoryBackend:
+    """Buckets em um OrderedDict por ordem de uso: expirar ociosos é O(1) amortizado"""
+
+    def __init__(self, max_keys: int = MAX_KEYS):
+        self.max_keys = max(1, max_keys)
+        self._buckets: 'OrderedDict[str, List[float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, capacity: float, rate: float, cost: float, ttl: float) -> Tuple[bool, float]:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+                bucket = self._buckets[key] = [capacity, now]
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            bucket[0], bucket[1] = tokens, now
+
+            # Bucket ocioso por uma janela inteira já estaria cheio: removê-lo não muda nada
+            while self._buckets:
+                oldest = next(iter(self._buckets.values()))
+                if now - oldest[1] < ttl and len(self._buckets) <= self.max_keys:
+                    break
+                self._buckets.popitem(last=False)
+
+        return allowed, tokens
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteBackend:
+    """Buckets em uma tabela SQLite, compartilhados por todos os processos que usam o arquivo"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(directory, exist_ok=True)
+        with connect(db_path) as conn:
+            conn.execute(CREATE_RATE_LIMITS)
+
+    def take(self, key: str, capacity: float, rate: float, cost: float, ttl: float) -> Tuple[bool, float]:
+        now = time.time()
+        params = {'key': key, 'capacity': capacity, 'rate': rate, 'cost': cost, 'now': now}
+
+        with connect(self.db_path) as conn:
+            if _HAS_RETURNING:
+                # fetchall: o statement precisa terminar antes do commit
+                tokens, allowed = conn.execute(_TAKE + " RETURNING tokens, permitido", params).fetchall()[0]
+            else:
+                # Sem RETURNING: o INSERT já segura a trava de escrita até o commit
+                conn.execute(_TAKE, params)
+                tokens, allowed = conn.execute(
+                    "SELECT tokens, permitido FROM rate_limits WHERE chave = ?", (key,)
+                ).fetchone()
+
+            self._writes += 1
+            if self._writes % SQLITE_CLEANUP_INTERVAL == 0:
+                conn.execute("DELETE FROM rate_limits WHERE atualizado < ?", (now - ttl,))
+
+        return bool(allowed), tokens
+
+
+def parse_quotas(spec: Optional[str]) -> Dict[str, int]:
+    """Converte "chave1=1000,chave2=50" em {'chave1': 1000, 'chave2': 50}"""
+    quotas = {}
+    for entry in (spec or '').split(','):
+        key, _, limit = entry.strip().partition('=')
+        if key and limit.strip().isdigit():
+            quotas[key.strip()] = int(limit)
+    return quotas
+
+
+def _key_digest(api_key: str) -> str:
+    # A chave em si não é gravada no backend
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:24]
+
+
+class RateLimiter:
+    """Limite de requisições por janela, com reposição contínua (token bucket)"""
+
+    def __init__(self,
+                 limit: int = RATE_LIMIT,
+                 window: float = RATE_LIMIT_WINDOW,
+                 quotas: Optional[Dict[str, int]] = None,
+                 backend=None):
+        self.limit = limit
+        self.window = max(1.0, window)
+        self.quotas = quotas or {}
+        self.backend = backend if backend is not None else MemoryBackend()
+
+    def hit(self, key: str, limit: Optional[int] = None, cost: int = 1) -> RateDecision:
+        """Consome `cost` tokens do bucket `key` (capacidade `limit` por janela)"""
+        limit = self.limit if limit is None else limit
+        if limit <= 0:
+            return RateDecision(True, 0, 0.0)
+
+        rate = limit / self.window
+        allowed, tokens = self.backend.take(key, limit, rate, cost, self.window)
+        retry_after = 0.0 if allowed else (cost - tokens) / rate
+        return RateDecision(allowed, int(tokens), retry_after)
+
+    def check_request(self, api_key: Optional[str], client_ip: str) -> RateDecision:
+        """API keys com cota têm bucket próprio; as demais requisições são limitadas por IP"""
+        if api_key and api_key in self.quotas:
+            return self.hit(f"key:{_key_digest(api_key)}", self.quotas[api_key])
+        return self.hit(f"ip:{client_ip}")
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Limitador do processo configurado pelas variáveis de ambiente"""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            db_path = os.getenv('RATE_LIMIT_DB')
+            _limiter = RateLimiter(
+                quotas=parse_quotas(os.getenv('API_KEY_QUOTAS')),
+                backend=SQLiteBackend(db_path) if db_path else MemoryBackend()
+            )
+        return _limiter
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Relatórios de Itens em Streaming (/relatorio)
+Linhas lidas do cursor em blocos e escritas direto no formato de saída (CSV,
+XLSX em modo write-only ou PDF com tabelas platypus), em um arquivo temporário
+que fica em memória até SPOOL_MAX_SIZE. O arquivo volta posicionado no início,
+pronto para upload sem nova leitura do disco.
+
+Funções síncronas: no bot, chamar via get_job_executor().run_io (utils/job_executor.py).
+"""
+
+import csv
+import io
+import os
+import sqlite3
+import tempfile
+from datetime import datetime
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+try:
+    from utils.database import open_connection
+except ImportError:
+    from database import open_connection
+
+# tipo do comando -> status no banco
+REPORT_TYPES = {
+    'estoque': 'Em Estoque',
+    'reparo': 'Em Reparo Externo',
+    'baixados': 'Baixado'
+}
+
+REPORT_FORMATS = ('csv', 'xlsx', 'pdf')
+
+REPORT_COLUMNS = ['ID', 'Nome', 'Descrição', 'Quantidade', 'Status', 'Data Cadastro']
+
+REPORT_QUERY = """
+    SELECT id, nome, descricao, quantidade, status, data_cadastro
+    FROM itens WHERE status = ? ORDER BY id
+"""
+
+# Linhas lidas do cursor por vez (também o tamanho de cada tabela no PDF)
+FETCH_SIZE = 500
+
+# Acima disso o arquivo temporário passa da memória para o disco
+SPOOL_MAX_SIZE = int(os.getenv('REPORT_SPOOL_MAX_SIZE', 8 * 1024 * 1024))
+
+# Texto maior que isso é cortado nas células do PDF (CSV/XLSX trazem o valor completo)
+PDF_CELL_MAX_CHARS = 60
+
+
+def report_filename(tipo: str, formato: str) -> str:
+    """Nome do arquivo enviado no chat"""
+    return f"relatorio_{tipo}_{datetime.now().strftime('%Y%m%d%H%M%S')}.{formato}"
+
+
+def _row_chunks(cursor: sqlite3.Cursor, first: List[tuple]) -> Iterator[List[tuple]]:
+    rows = first
+    while rows:
+        yield rows
+        rows = cursor.fetchmany(FETCH_SIZE)
+
+
+# ==================== ESCRITORES ====================
+
+def _write_csv(output: BinaryIO, chunks: Iterator[List[tuple]]) -> None:
+    # utf-8-sig: acentos corretos ao abrir no Excel
+    text = io.TextIOWrapper(output, encoding='utf-8-sig', newline='')
+    writer = csv.writer(text)
+    writer.writerow(REPORT_COLUMNS)
+    for rows in chunks:
+        writer.writerows(rows)
+    text.flush()
+    # Devolve o binário ao chamador sem fechá-lo junto com o wrapper
+    text.detach()
+
+
+def _write_xlsx(output: BinaryIO, chunks: Iterator[List[tuple]], title: str) -> None:
+    from openpyxl import Workbook
+
+    # write_only: linhas vão direto para o XML da planilha, sem manter células em memória
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=title[:31])
+    for column, width in zip('ABCDEF', (8, 30, 50, 12, 20, 20)):
+        sheet.column_dimensions[column].width = width
+
+    sheet.append(REPORT_COLUMNS)
+    for rows in chunks:
+        for row in rows:
+            sheet.append(row)
+    workbook.save(output)
+
+
+class _ChunkedStory(list):
+    """
+    Story do platypus preenchida sob demanda: o build consome as tabelas da
+    frente e cada bloco do cursor só vira flowable quando a anterior acabou.
+
+    Toda leitura da lista vazia (len, bool, índice) puxa o próximo bloco;
+    `exhausted` indica se o build chegou ao fim do gerador.
+    """
+
+    def __init__(self, flowables: Iterator):
+        super().__init__()
+        self._flowables = flowables
+        self.exhausted = False
+
+    def _fill(self) -> None:
+        if not list.__len__(self) and not self.exhausted:
+            flowable = next(self._flowables, None)
+            if flowable is None:
+                self.exhausted = True
+            else:
+                self.append(flowable)
+
+    def __len__(self):
+        self._fill()
+        return super().__len__()
+
+    def __bool__(self):
+        return len(self) > 0
+
+    def __getitem__(self, index):
+        self._fill()
+        return super().__getitem__(index)
+
+
+def _write_pdf(output: BinaryIO, chunks: Iterator[List[tuple]], title: str) -> None:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import landscape, letter
+    from reportlab.lib.units import cm
+    from reportlab.platypus import BaseDocTemplate, Frame, PageTemplate, Table, TableStyle
+
+    pagesize = landscape(letter)
+    width, height = pagesize
+    margin = 1.5 * cm
+    gerado_em = datetime.now().strftime('%d/%m/%Y %H:%M')
+
+    def draw_page(canvas, doc):
+        canvas.saveState()
+        canvas.setFont('Helvetica-Bold', 12)
+        canvas.drawString(margin, height - margin + 0.5 * cm, title)
+        canvas.setFont('Helvetica', 8)
+        canvas.drawRightString(width - margin, height - margin + 0.5 * cm, f'Gerado em {gerado_em}')
+        canvas.drawRightString(width - margin, margin - 0.8 * cm, f'Página {doc.page}')
+        canvas.restoreState()
+
+    doc = BaseDocTemplate(output, pagesize=pagesize, title=title,
+                          leftMargin=margin, rightMargin=margin,
+                          topMargin=margin, bottomMargin=margin)
+    frame = Frame(doc.leftMargin, doc.bottomMargin, doc.width, doc.height, id='linhas')
+    doc.addPageTemplates([PageTemplate(id='relatorio', frames=[frame], onPage=draw_page)])
+
+    col_widths = [f * doc.width for f in (0.07, 0.23, 0.35, 0.09, 0.12, 0.14)]
+    style = TableStyle([
+        ('FONT', (0, 0), (-1, 0), 'Helvetica-Bold', 9),
+        ('FONT', (0, 1), (-1, -1), 'Helvetica', 8),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('LINEBELOW', (0, 0), (-1, 0), 0.5, colors.grey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ])
+
+    def cell(value) -> str:
+        text = '' if value is None else str(value)
+        return text if len(text) <= PDF_CELL_MAX_CHARS else text[:PDF_CELL_MAX_CHARS - 1] + '…'
+
+    def tables():
+        # Uma tabela por bloco; repeatRows repete o cabeçalho quando ela quebra de página
+        for rows in chunks:
+            data = [REPORT_COLUMNS] + [[cell(value) for value in row] for row in rows]
+            yield Table(data, colWidths=col_widths, repeatRows=1, style=style)
+
+    story = _ChunkedStory(tables())
+    doc.build(story)
+    if not story.exhausted:
+        # O build do reportlab parou antes do fim do gerador: nunca entregar PDF truncado
+        raise RuntimeError("PDF incompleto: nem todas as linhas foram renderizadas")
+
+
+# ==================== API ====================
+
+def generate_report(db_path: str, tipo: str, formato: str = 'csv') -> Tuple[Optional[BinaryIO], str]:
+    """
+    Gera o relatório de itens do tipo pedido
+
+    Retorna (arquivo, nome); arquivo é None quando não há itens. O chamador
+    fecha o arquivo depois do envio. ValueError para tipo ou formato inválido.
+    """
+    if tipo not in REPORT_TYPES:
+        raise ValueError(f"Tipo inválido: {tipo} (use {', '.join(REPORT_TYPES)})")
+    if formato not in REPORT_FORMATS:
+        raise ValueError(f"Formato inválido: {formato} (use {', '.join(REPORT_FORMATS)})")
+
+    filename = report_filename(tipo, formato)
+    title = f"Relatório de itens - {REPORT_TYPES[tipo]}"
+
+    # Conexão própria: o cursor fica aberto durante toda a geração
+    conn = open_connection(db_path)
+    try:
+        cursor = conn.execute(REPORT_QUERY, (REPORT_TYPES[tipo],))
+        first = cursor.fetchmany(FETCH_SIZE)
+        if not first:
+            return None, filename
+
+        output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        try:
+            chunks = _row_chunks(cursor, first)
+            if formato == 'csv':
+                _write_csv(output, chunks)
+            elif formato == 'xlsx':
+                _write_xlsx(output, chunks, REPORT_TYPES[tipo])
+            else:
+                _write_pdf(output, chunks, title)
+        except Exception:
+            output.close()
+            raise
+    finally:
+        conn.close()
+
+    output.seek(0)
+    return output, filename
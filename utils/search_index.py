@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índices de Busca para Itens (FTS5 e texto normalizado)
+Definições das estruturas auxiliares de busca (criadas pelas migrações em
+utils/migrations.py) e sua manutenção a partir da tabela itens
+
+Itens anteriores às migrações de busca são normalizados pela carga inicial,
+em lotes, fora da inicialização: em segundo plano (start_backfill) ou com
+    python utils/search_index.py
+"""
+
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+try:
+    from utils.database import DB_PATH, close_thread_connections, connect
+except ImportError:
+    from database import DB_PATH, close_thread_connections, connect
+
+logger = logging.getLogger(__name__)
+
+# Colunas indexadas, na ordem usada pela tabela virtual e pelo bm25
+FTS_COLUMNS = [
+    'nome', 'descricao', 'codigo', 'codigo_barras',
+    'marca', 'modelo', 'numero_serie', 'categoria'
+]
+
+# Campos pontuados pelo cálculo de relevância e seus pesos
+FIELD_WEIGHTS = {
+    'codigo': 1.0,
+    'codigo_barras': 1.0,
+    'nome': 0.8,
+    'marca': 0.6,
+    'modelo': 0.6,
+    'categoria': 0.4,
+    'descricao': 0.3
+}
+
+# Pesos do bm25 por coluna (numero_serie não entra no score, peso intermediário)
+FTS_WEIGHTS = dict(FIELD_WEIGHTS, numero_serie=0.5)
+
+# Campos pontuados e numero_serie (só para a busca por trecho)
+NORM_COLUMNS = list(FIELD_WEIGHTS.keys()) + ['numero_serie']
+
+# Texto normalizado de cada item, gravado fora do caminho de leitura
+CREATE_NORM_TABLE = f'''
+CREATE TABLE IF NOT EXISTS itens_busca_norm (
+    item_id INTEGER PRIMARY KEY,
+    {', '.join(f'{col} TEXT' for col in NORM_COLUMNS)}
+);
+'''
+
+# Conteúdo externo em itens_busca_norm: o índice acompanha a normalização (carga
+# inicial em lotes incluída) e nunca precisa de 'rebuild' sobre a tabela itens.
+# unicode61 sobre o texto já normalizado gera os mesmos tokens do texto original
+CREATE_FTS_TABLE = f'''
+CREATE VIRTUAL TABLE IF NOT EXISTS itens_fts USING fts5(
+    {', '.join(FTS_COLUMNS)},
+    content='itens_busca_norm',
+    content_rowid='item_id',
+    tokenize="unicode61 remove_diacritics 2"
+);
+'''
+
+_NEW_VALUES = ', '.join(f'new.{col}' for col in FTS_COLUMNS)
+_OLD_VALUES = ', '.join(f'old.{col}' for col in FTS_COLUMNS)
+_COLUMNS = ', '.join(FTS_COLUMNS)
+
+# Mantido a partir de itens_busca_norm (index_pending remove e reinsere a linha)
+CREATE_FTS_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS itens_fts_ai AFTER INSERT ON itens_busca_norm BEGIN
+        INSERT INTO itens_fts(rowid, {_COLUMNS}) VALUES (new.item_id, {_NEW_VALUES});
+    END;
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS itens_fts_ad AFTER DELETE ON itens_busca_norm BEGIN
+        INSERT INTO itens_fts(itens_fts, rowid, {_COLUMNS}) VALUES ('delete', old.item_id, {_OLD_VALUES});
+    END;
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS itens_fts_au AFTER UPDATE ON itens_busca_norm BEGIN
+        INSERT INTO itens_fts(itens_fts, rowid, {_COLUMNS}) VALUES ('delete', old.item_id, {_OLD_VALUES});
+        INSERT INTO itens_fts(rowid, {_COLUMNS}) VALUES (new.item_id, {_NEW_VALUES});
+    END;
+    '''
+]
+
+# Fila de itens inseridos/alterados aguardando normalização
+CREATE_PENDING_TABLE = '''
+CREATE TABLE IF NOT EXISTS itens_busca_pendentes (
+    item_id INTEGER PRIMARY KEY
+);
+'''
+
+CREATE_NORM_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS itens_busca_ai AFTER INSERT ON itens BEGIN
+        INSERT OR IGNORE INTO itens_busca_pendentes(item_id) VALUES (new.id);
+    END;
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS itens_busca_au AFTER UPDATE OF {', '.join(NORM_COLUMNS)} ON itens BEGIN
+        INSERT OR IGNORE INTO itens_busca_pendentes(item_id) VALUES (new.id);
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS itens_busca_ad AFTER DELETE ON itens BEGIN
+        DELETE FROM itens_busca_norm WHERE item_id = old.id;
+        DELETE FROM itens_busca_pendentes WHERE item_id = old.id;
+    END;
+    '''
+]
+
+# Colunas da busca por trecho ("book" em "Notebook"), as mesmas da busca LIKE original
+SUBSTRING_COLUMNS = ['nome', 'descricao', 'codigo', 'codigo_barras', 'marca', 'modelo', 'numero_serie']
+
+# Índice FTS5 de trigramas sobre o texto normalizado: MATCH com um termo de 3+
+# caracteres acha o trecho em qualquer posição sem varrer a tabela
+CREATE_SUBSTRING_TABLE = f'''
+CREATE VIRTUAL TABLE IF NOT EXISTS itens_trechos USING fts5(
+    {', '.join(SUBSTRING_COLUMNS)},
+    content='itens_busca_norm',
+    content_rowid='item_id',
+    tokenize='trigram'
+);
+'''
+
+_SUBSTRING = ', '.join(SUBSTRING_COLUMNS)
+_NEW_SUBSTRING = ', '.join(f'new.{col}' for col in SUBSTRING_COLUMNS)
+_OLD_SUBSTRING = ', '.join(f'old.{col}' for col in SUBSTRING_COLUMNS)
+
+# Mantido a partir de itens_busca_norm (index_pending remove e reinsere a linha)
+CREATE_SUBSTRING_TRIGGERS = [
+    f'''
+    CREATE TRIGGER IF NOT EXISTS itens_trechos_ai AFTER INSERT ON itens_busca_norm BEGIN
+        INSERT INTO itens_trechos(rowid, {_SUBSTRING}) VALUES (new.item_id, {_NEW_SUBSTRING});
+    END;
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS itens_trechos_ad AFTER DELETE ON itens_busca_norm BEGIN
+        INSERT INTO itens_trechos(itens_trechos, rowid, {_SUBSTRING}) VALUES ('delete', old.item_id, {_OLD_SUBSTRING});
+    END;
+    ''',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS itens_trechos_au AFTER UPDATE ON itens_busca_norm BEGIN
+        INSERT INTO itens_trechos(itens_trechos, rowid, {_SUBSTRING}) VALUES ('delete', old.item_id, {_OLD_SUBSTRING});
+        INSERT INTO itens_trechos(rowid, {_SUBSTRING}) VALUES (new.item_id, {_NEW_SUBSTRING});
+    END;
+    '''
+]
+
+# Menor termo que o tokenizer trigram consegue casar
+MIN_SUBSTRING_LENGTH = 3
+
+# Índice invertido de trigramas do nome normalizado (busca por similaridade)
+CREATE_TRIGRAM_TABLE = '''
+CREATE TABLE IF NOT EXISTS itens_trigramas (
+    trigrama TEXT NOT NULL,
+    item_id INTEGER NOT NULL,
+    PRIMARY KEY (trigrama, item_id)
+) WITHOUT ROWID;
+'''
+
+CREATE_TRIGRAM_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS idx_itens_trigramas_item ON itens_trigramas(item_id);'
+]
+
+CREATE_TRIGRAM_TRIGGERS = [
+    '''
+    CREATE TRIGGER IF NOT EXISTS itens_trigramas_ad AFTER DELETE ON itens BEGIN
+        DELETE FROM itens_trigramas WHERE item_id = old.id;
+    END;
+    '''
+]
+
+# Carga inicial: faixa de ids (ultimo_id, ate_id] de itens anteriores às migrações
+# de busca ainda sem texto normalizado. A migração só registra a faixa
+CREATE_BACKFILL_TABLE = '''
+CREATE TABLE IF NOT EXISTS itens_busca_carga (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    ultimo_id INTEGER NOT NULL,
+    ate_id INTEGER NOT NULL
+);
+'''
+
+# Limite de parâmetros por consulta IN (SQLITE_MAX_VARIABLE_NUMBER antigo)
+_IN_CHUNK = 900
+
+# Itens normalizados por rodada de index_pending
+INDEX_BATCH_SIZE = 5000
+
+
+def normalize_text(text: str) -> str:
+    """Normaliza texto para busca (remove acentos, lowercase, etc.)"""
+    if not text:
+        return ""
+    
+    # Remove acentos
+    text = unicodedata.normalize('NFD', text)
+    text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
+    
+    # Lowercase e remove caracteres especiais
+    text = re.sub(r'[^a-zA-Z0-9\s]', ' ', text.lower())
+    
+    # Remove espaços extras
+    text = ' '.join(text.split())
+    
+    return text
+
+
+def normalize_item_fields(item: Dict) -> Dict[str, str]:
+    """Normaliza os campos pontuados de um item (None vira texto vazio)"""
+    return {
+        col: normalize_text(str(item[col])) if item.get(col) is not None else ''
+        for col in NORM_COLUMNS
+    }
+
+
+def trigrams(text: str) -> Set[str]:
+    """Trigramas de um texto normalizado, com bordas marcadas por espaço"""
+    if not text:
+        return set()
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    cursor = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+def index_pending(conn: sqlite3.Connection, batch_size: int = INDEX_BATCH_SIZE) -> int:
+    """
+    Normaliza os itens da fila itens_busca_pendentes e atualiza itens_busca_norm
+    e itens_trigramas, na transação de `conn` (quem chama confirma)
+
+    Chamado no caminho de escrita (cadastro, edição, importação), logo após
+    alterar a tabela itens, para que as buscas apenas leiam o índice.
+
+    Returns:
+        Quantidade de itens processados (0 se o banco ainda não foi migrado)
+    """
+    if not _table_exists(conn, 'itens_busca_pendentes'):
+        return 0
+
+    processed = 0
+    columns_sql = ', '.join(f'i.{col}' for col in NORM_COLUMNS)
+    placeholders = ', '.join('?' for _ in range(len(NORM_COLUMNS) + 1))
+
+    while True:
+        cursor = conn.execute(f"""
+            SELECT p.item_id, i.id, {columns_sql}
+            FROM itens_busca_pendentes p
+            LEFT JOIN itens i ON i.id = p.item_id
+            LIMIT ?
+        """, (batch_size,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+
+        item_ids = []
+        records = []
+        trigram_rows = []
+        for row in rows:
+            values = tuple(row)
+            item_ids.append((values[0],))
+            if values[1] is None:
+                # Item removido antes da normalização
+                continue
+            item = dict(zip(NORM_COLUMNS, values[2:]))
+            normalized = normalize_item_fields(item)
+            records.append((values[0],) + tuple(normalized[col] for col in NORM_COLUMNS))
+            trigram_rows.extend((trigram, values[0]) for trigram in trigrams(normalized['nome']))
+
+        # DELETE + INSERT (e não INSERT OR REPLACE) para disparar os triggers de itens_trechos
+        conn.executemany("DELETE FROM itens_busca_norm WHERE item_id = ?", item_ids)
+        conn.executemany(
+            f"INSERT INTO itens_busca_norm (item_id, {', '.join(NORM_COLUMNS)}) "
+            f"VALUES ({placeholders})",
+            records
+        )
+        conn.executemany("DELETE FROM itens_trigramas WHERE item_id = ?", item_ids)
+        conn.executemany(
+            "INSERT OR IGNORE INTO itens_trigramas (trigrama, item_id) VALUES (?, ?)",
+            trigram_rows
+        )
+        conn.executemany("DELETE FROM itens_busca_pendentes WHERE item_id = ?", item_ids)
+        processed += len(item_ids)
+
+        if len(rows) < batch_size:
+            break
+
+    return processed
+
+
+def sync_search_index(db_path: str) -> int:
+    """
+    Normaliza os itens pendentes em uma transação própria
+
+    Para caminhos de escrita que não usam `connect` (aiosqlite, handlers
+    dos bots); roda bloqueante, então deve ir para uma thread.
+
+    Returns:
+        Quantidade de itens processados
+    """
+    with connect(db_path) as conn:
+        return index_pending(conn)
+
+
+def backfill_range(conn: sqlite3.Connection) -> Optional[Tuple[int, int]]:
+    """Faixa (ultimo_id, ate_id] ainda não carregada, ou None se a carga terminou"""
+    if not _table_exists(conn, 'itens_busca_carga'):
+        return None
+    row = conn.execute("SELECT ultimo_id, ate_id FROM itens_busca_carga WHERE id = 1").fetchone()
+    if row is None or row[0] >= row[1]:
+        return None
+    return row[0], row[1]
+
+
+def backfill_step(conn: sqlite3.Connection, batch_size: int = INDEX_BATCH_SIZE) -> int:
+    """
+    Normaliza o próximo lote da carga inicial na transação de `conn`
+
+    Os ids do lote passam pela fila itens_busca_pendentes (mesmo caminho das
+    escritas) e o avanço da faixa é gravado na mesma transação.
+
+    Returns:
+        Itens normalizados no lote
+    """
+    pending_range = backfill_range(conn)
+    if pending_range is None:
+        return 0
+
+    last_id, until_id = pending_range
+    cursor = conn.execute(
+        "SELECT id FROM itens WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+        (last_id, until_id, batch_size)
+    )
+    item_ids = [row[0] for row in cursor.fetchall()]
+    next_id = item_ids[-1] if len(item_ids) == batch_size else until_id
+
+    conn.executemany("INSERT OR IGNORE INTO itens_busca_pendentes(item_id) VALUES (?)",
+                     [(item_id,) for item_id in item_ids])
+    index_pending(conn, batch_size)
+    conn.execute("UPDATE itens_busca_carga SET ultimo_id = ? WHERE id = 1", (next_id,))
+    return len(item_ids)
+
+
+def run_backfill(db_path: str, batch_size: int = INDEX_BATCH_SIZE) -> int:
+    """
+    Executa a carga inicial até o fim, uma transação por lote (escritores
+    concorrentes esperam no máximo um lote)
+
+    Returns:
+        Quantidade de itens normalizados
+    """
+    total = 0
+    while True:
+        with connect(db_path) as conn:
+            if backfill_range(conn) is None:
+                return total
+            total += backfill_step(conn, batch_size)
+
+
+_backfills: Set[str] = set()
+_backfills_lock = threading.Lock()
+
+
+def _run_backfill_thread(db_path: str) -> None:
+    try:
+        total = run_backfill(db_path)
+        logger.info(f"Carga inicial do índice de busca concluída: {total} itens")
+    except Exception as e:
+        # Retomada na próxima inicialização, a partir do último lote confirmado
+        logger.error(f"Erro na carga inicial do índice de busca: {e}")
+    finally:
+        close_thread_connections()
+
+
+def start_backfill(db_path: str) -> bool:
+    """
+    Inicia a carga inicial em uma thread daemon (uma por banco e processo)
+
+    Returns:
+        True se a thread foi iniciada agora
+    """
+    key = os.path.abspath(db_path)
+    with _backfills_lock:
+        if key in _backfills:
+            return False
+        _backfills.add(key)
+
+    threading.Thread(
+        target=_run_backfill_thread, args=(db_path,), name='search-backfill', daemon=True
+    ).start()
+    return True
+
+
+def unindexed_condition(conn: sqlite3.Connection, column: str = 'id') -> Optional[Tuple[str, list]]:
+    """
+    Condição SQL sobre `column` que seleciona os itens sem texto normalizado
+    atualizado: fila de pendentes e faixa ainda não carregada
+
+    Returns:
+        (SQL, parâmetros), ou None se todos os itens estão indexados
+    """
+    conditions = []
+    params: list = []
+    if (_table_exists(conn, 'itens_busca_pendentes')
+            and conn.execute("SELECT 1 FROM itens_busca_pendentes LIMIT 1").fetchone()):
+        conditions.append(f"{column} IN (SELECT item_id FROM itens_busca_pendentes)")
+
+    pending_range = backfill_range(conn)
+    if pending_range is not None:
+        conditions.append(f"({column} > ? AND {column} <= ?)")
+        params.extend(pending_range)
+
+    if not conditions:
+        return None
+    return ' OR '.join(conditions), params
+
+
+def _length_window(length: int, threshold: float) -> Tuple[float, float]:
+    """Tamanhos de nome capazes de atingir o ratio (ratio <= 2*min/(la+lb))"""
+    if threshold <= 0:
+        return 0, 1e9
+    # Folga para arredondamento (ex.: 3 * 0.8 / 1.2 > 2.0)
+    return (length * threshold / (2 - threshold) - 1e-9,
+            min(length * (2 - threshold) / threshold + 1e-9, 1e9))
+
+
+def similarity_filter(normalized_name: str, threshold: float) -> Tuple[int, bool]:
+    """
+    Mínimo de trigramas em comum exigido dos candidatos e se o filtro é exato
+
+    ratio >= threshold implica uma subsequência comum de M >= t*(la+lb)/2
+    caracteres. Cada caractere removido do nome desfaz no máximo 3 trigramas
+    e cada inserção 2 (lema dos q-gramas), o que garante um mínimo de
+    trigramas em comum. Se esse mínimo é positivo para todo tamanho possível,
+    o filtro não perde resultados; senão (thresholds abaixo de ~0.8, nomes
+    curtos) usa-se um mínimo heurístico e a seleção é aproximada.
+
+    Returns:
+        (mínimo de trigramas em comum, True se o filtro é exato)
+    """
+    length = len(normalized_name)
+    distinct = len(trigrams(normalized_name))
+    # Trigramas repetidos no nome contam uma vez só no índice
+    repeated = length + 1 - distinct
+
+    sound = None
+    if threshold >= 0.8:
+        min_length, max_length = _length_window(length, threshold)
+        for other in range(math.ceil(min_length), math.floor(max_length) + 1):
+            common = math.ceil(threshold * (length + other) / 2 - 1e-9)
+            if common > min(length, other):
+                continue
+            bound = 5 * common - 2 * (length + other) + 1 - repeated
+            sound = bound if sound is None else min(sound, bound)
+
+    if sound is not None and sound >= 1:
+        return sound, True
+
+    # Heurístico: ao menos um trigrama e, acima de 0.5, fração proporcional ao threshold
+    return max(1, int(distinct * max(0.0, threshold - 0.5))), False
+
+
+class SearchIndex:
+    """Consulta os índices auxiliares de busca do estoque"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._fts_available: Optional[bool] = None
+        self._norm_available: Optional[bool] = None
+        self._substring_available: Optional[bool] = None
+
+    def ensure_fts(self, conn: sqlite3.Connection) -> bool:
+        """
+        Verifica se o índice FTS5 existe (criado pela migração 13)
+
+        Returns:
+            True se o índice está disponível para consultas, False se o
+            SQLite não tem FTS5 ou se o banco ainda não foi migrado
+        """
+        if not self._fts_available:
+            self._fts_available = _table_exists(conn, 'itens_fts')
+        return self._fts_available
+
+    def ensure_substring(self, conn: sqlite3.Connection) -> bool:
+        """
+        Verifica se o índice de trechos existe (criado pela migração 14; exige o
+        tokenizer trigram, SQLite 3.34+)
+        """
+        if not self._substring_available:
+            self._substring_available = _table_exists(conn, 'itens_trechos')
+        return self._substring_available
+
+    def ensure_normalized(self, conn: sqlite3.Connection) -> bool:
+        """
+        Verifica se as tabelas de texto normalizado e trigramas existem
+        (criadas pela migração 14)
+
+        Returns:
+            True se as tabelas podem ser usadas para pontuação
+        """
+        if not self._norm_available:
+            self._norm_available = (_table_exists(conn, 'itens_busca_norm')
+                                    and _table_exists(conn, 'itens_trigramas'))
+        return self._norm_available
+
+    def similar_name_candidates(self, conn: sqlite3.Connection, normalized_name: str,
+                                threshold: float, exact: bool = False) -> Tuple[List[Tuple[int, str]], bool]:
+        """
+        Candidatos para similaridade de nome via índice de trigramas
+
+        Só considera itens cujo tamanho permite atingir o threshold e, salvo
+        com `exact`, que compartilham trigramas suficientes com o nome
+        (ver similarity_filter). Itens ainda pendentes de normalização entram
+        sempre, normalizados em memória. Não há limite de candidatos.
+
+        Args:
+            exact: Ignora o filtro de trigramas e avalia todos os nomes do
+                intervalo de tamanho (varredura de itens_busca_norm)
+
+        Returns:
+            (lista de (item_id, nome normalizado), seleção aproximada?)
+        """
+        length = len(normalized_name)
+        if not length:
+            return [], False
+
+        min_length, max_length = _length_window(length, threshold)
+        # Texto gravado dos pendentes pode estar desatualizado: entram pela tabela itens
+        fresh = "item_id NOT IN (SELECT item_id FROM itens_busca_pendentes)"
+
+        if exact:
+            approximate = False
+            cursor = conn.execute(
+                f"SELECT item_id, nome FROM itens_busca_norm WHERE LENGTH(nome) BETWEEN ? AND ? AND {fresh}",
+                (min_length, max_length)
+            )
+        else:
+            min_shared, sound = similarity_filter(normalized_name, threshold)
+            approximate = not sound
+            query_trigrams = sorted(trigrams(normalized_name))
+            placeholders = ', '.join('?' for _ in query_trigrams)
+            cursor = conn.execute(f"""
+                SELECT c.item_id, n.nome
+                FROM (
+                    SELECT item_id
+                    FROM itens_trigramas
+                    WHERE trigrama IN ({placeholders})
+                    GROUP BY item_id
+                    HAVING COUNT(*) >= ?
+                ) c
+                JOIN itens_busca_norm n ON n.item_id = c.item_id
+                WHERE LENGTH(n.nome) BETWEEN ? AND ? AND n.{fresh}
+            """, query_trigrams + [min_shared, min_length, max_length])
+
+        candidates = [(row[0], row[1]) for row in cursor.fetchall()]
+
+        # Pendentes e itens ainda não carregados, normalizados em memória
+        unindexed = unindexed_condition(conn)
+        if unindexed:
+            condition, params = unindexed
+            cursor = conn.execute(f"SELECT id, nome FROM itens WHERE {condition}", params)
+            for item_id, nome in cursor.fetchall():
+                normalized = normalize_text(nome or '')
+                if min_length <= len(normalized) <= max_length:
+                    candidates.append((item_id, normalized))
+
+        return candidates, approximate
+
+    def get_normalized(self, conn: sqlite3.Connection, item_ids: Iterable[int]) -> Dict[int, Dict[str, str]]:
+        """
+        Retorna o texto normalizado dos itens informados (id -> campos)
+
+        Somente leitura: itens ainda na fila de pendentes (texto gravado
+        possivelmente desatualizado) ou fora da carga inicial ficam de fora;
+        quem chama normaliza esses itens em memória.
+        """
+        ids = list(item_ids)
+        result = {}
+        for start in range(0, len(ids), _IN_CHUNK):
+            chunk = ids[start:start + _IN_CHUNK]
+            placeholders = ', '.join('?' for _ in chunk)
+            cursor = conn.execute(
+                f"SELECT item_id, {', '.join(NORM_COLUMNS)} FROM itens_busca_norm "
+                f"WHERE item_id IN ({placeholders}) "
+                f"AND item_id NOT IN (SELECT item_id FROM itens_busca_pendentes)",
+                chunk
+            )
+            for row in cursor.fetchall():
+                values = tuple(row)
+                result[values[0]] = dict(zip(NORM_COLUMNS, values[1:]))
+
+        return result
+
+    @staticmethod
+    def build_match_query(terms: List[str]) -> str:
+        """Monta expressão MATCH com busca por prefixo para cada termo (AND)"""
+        # Termos já normalizados contêm apenas [a-z0-9], aspas são seguras
+        return ' AND '.join(f'"{term}"*' for term in terms)
+
+    @staticmethod
+    def build_substring_query(terms: List[str]) -> str:
+        """Expressão MATCH do índice de trechos: cada termo em qualquer posição (AND)"""
+        return ' AND '.join(f'"{term}"' for term in terms)
+
+    @staticmethod
+    def bm25_weights_sql() -> str:
+        """Lista de pesos do bm25 na ordem das colunas do índice"""
+        return ', '.join(str(FTS_WEIGHTS[col]) for col in FTS_COLUMNS)
+
+
+if __name__ == '__main__':
+    # Carga inicial em primeiro plano (ex.: logo após atualizar um banco grande)
+    logging.basicConfig(level=logging.INFO)
+    print(f"Itens normalizados: {run_backfill(DB_PATH)}")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Sequências de Códigos
+Contadores atômicos na tabela code_sequences: reservar 1 ou N valores custa um único statement
+"""
+
+import re
+import sqlite3
+from typing import Dict
+
+CREATE_CODE_SEQUENCES = '''
+CREATE TABLE IF NOT EXISTS code_sequences (
+    nome TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+'''
+
+# Código mnemônico gerado pelo CodeGenerator (ex: NOTE-001, MOUS-1015)
+MNEMONIC_CODE = re.compile(r'^([A-Z]+)-(\d+)$')
+
+# RETURNING existe a partir do SQLite 3.35
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+_ALLOCATE = '''
+INSERT INTO code_sequences (nome, valor) VALUES (?, ?)
+ON CONFLICT(nome) DO UPDATE SET valor = valor + excluded.valor
+'''
+
+_RAISE_TO = '''
+INSERT INTO code_sequences (nome, valor) VALUES (?, ?)
+ON CONFLICT(nome) DO UPDATE SET valor = MAX(valor, excluded.valor)
+'''
+
+
+def mnemonic_key(prefix: str) -> str:
+    return f"mnemonic:{prefix}"
+
+
+def barcode_key(day: str) -> str:
+    return f"barcode:{day}"
+
+
+def allocate(conn: sqlite3.Connection, name: str, count: int = 1) -> int:
+    """
+    Incrementa a sequência em `count` e retorna o novo valor
+
+    O bloco reservado é (valor - count + 1) .. valor; sequências novas começam em 1.
+    """
+    if _HAS_RETURNING:
+        # fetchall: o statement precisa terminar antes do commit
+        return conn.execute(_ALLOCATE + " RETURNING valor", (name, count)).fetchall()[0][0]
+
+    # Sem RETURNING: o INSERT já segura a trava de escrita até o commit
+    conn.execute(_ALLOCATE, (name, count))
+    return conn.execute("SELECT valor FROM code_sequences WHERE nome = ?", (name,)).fetchone()[0]
+
+
+def raise_to(conn: sqlite3.Connection, name: str, value: int) -> None:
+    """Garante que a sequência não fique abaixo de `value` (nunca diminui)"""
+    conn.execute(_RAISE_TO, (name, value))
+
+
+def max_mnemonic_numbers(conn: sqlite3.Connection, prefix: str = None) -> Dict[str, int]:
+    """Maior número já usado por prefixo nos códigos existentes (prefixo usa o índice de codigo)"""
+    pattern = f"{prefix}-[0-9]*" if prefix else "*-[0-9]*"
+    numbers: Dict[str, int] = {}
+    for (codigo,) in conn.execute("SELECT codigo FROM itens WHERE codigo GLOB ?", (pattern,)):
+        match = MNEMONIC_CODE.match(codigo)
+        if match:
+            number = int(match.group(2))
+            if number > numbers.get(match.group(1), 0):
+                numbers[match.group(1)] = number
+    return numbers
+
+
+def seed_mnemonic_sequences(conn: sqlite3.Connection, prefix: str = None) -> None:
+    """Alinha as sequências mnemônicas com os códigos já gravados em itens"""
+    for found_prefix, number in max_mnemonic_numbers(conn, prefix).items():
+        raise_to(conn, mnemonic_key(found_prefix), number)
@@ -16,7 +16,10 @@ import json
 sys.path.append('/home/hendel/Documentos/BOTS/Assistente_Stock_MPA/utils')
 
 from code_generator import CodeGenerator
+from bulk_import import BulkImporter
 from smart_search import SmartSearch
+from database import connect
+from search_index import index_pending
 
 class SmartRegistration:
     """Sistema de cadastro inteligente com códigos automáticos"""
@@ -46,7 +49,7 @@ class SmartRegistration:
             # Gera códigos automáticos
             codes = self.code_generator.generate_complete_item_codes(nome, categoria)
             
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Insere item
@@ -62,25 +65,17 @@ class SmartRegistration:
                 ))
                 
                 item_id = cursor.lastrowid
+                index_pending(conn)
                 
                 # Busca item completo
                 cursor.execute("SELECT * FROM itens WHERE id = ?", (item_id,))
                 row = cursor.fetchone()
                 
                 if row:
-                    # Converte para dict
+                    # Converte para dict (QR é gerado sob demanda pelo cache de QR codes)
                     columns = [description[0] for description in cursor.description]
                     item_data = dict(zip(columns, row))
                     
-                    # Gera QR code
-                    qr_code = self.code_generator.generate_qr_code(item_data)
-                    
-                    # Atualiza com QR code
-                    cursor.execute("UPDATE itens SET qr_code = ? WHERE id = ?", (qr_code, item_id))
-                    conn.commit()
-                    
-                    item_data['qr_code'] = qr_code
-                    
                     return {
                         'success': True,
                         'item': item_data,
@@ -110,35 +105,17 @@ class SmartRegistration:
             }
     
     def register_bulk_items(self, items_list: List[Dict]) -> Dict:
-        """Cadastra múltiplos itens em lote"""
-        results = {
-            'success': 0,
-            'errors': 0,
-            'items': [],
-            'error_details': []
-        }
-        
-        for item_data in items_list:
-            result = self.register_item(**item_data)
-            
-            if result['success']:
-                results['success'] += 1
-                results['items'].append(result['item'])
-            else:
-                results['errors'] += 1
-                results['error_details'].append({
-                    'item': item_data.get('nome', 'N/A'),
-                    'error': result['message']
-                })
-        
-        results['message'] = f"Cadastro em lote: {results['success']} sucessos, {results['errors']} erros"
-        
-        return results
+        """Cadastra múltiplos itens em lote (erros reportados por linha, sem abortar o lote)"""
+        return BulkImporter(self.db_path).import_items(items_list)
+    
+    def register_items_from_file(self, file_path: str) -> Dict:
+        """Cadastra os itens de uma planilha CSV ou XLSX"""
+        return BulkImporter(self.db_path).import_file(file_path)
     
     def update_item_codes(self, item_id: int) -> Dict:
         """Atualiza códigos de um item existente"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 # Busca item
@@ -160,16 +137,13 @@ class SmartRegistration:
                     item_data.get('categoria', '')
                 )
                 
-                # Gera novo QR code
-                item_data.update(codes)
-                qr_code = self.code_generator.generate_qr_code(item_data)
-                
-                # Atualiza no banco
+                # Atualiza no banco (o QR segue o novo código automaticamente)
                 cursor.execute("""
                     UPDATE itens 
-                    SET codigo = ?, codigo_barras = ?, qr_code = ?
+                    SET codigo = ?, codigo_barras = ?
                     WHERE id = ?
-                """, (codes['codigo_mnemonico'], codes['codigo_barras'], qr_code, item_id))
+                """, (codes['codigo_mnemonico'], codes['codigo_barras'], item_id))
+                index_pending(conn)
                 
                 conn.commit()
                 
@@ -204,6 +178,8 @@ class SmartRegistration:
             'results': results,
             'suggestions': suggestions,
             'similar': similar,
+            # Busca por similaridade com threshold baixo não garante todos os nomes
+            'similar_approximate': any(item.get('approximate') for item in similar),
             'total': len(results)
         }
     
@@ -236,7 +212,7 @@ class SmartRegistration:
             # Gera código aleatório como fallback
             fallback_code = self.code_generator.generate_random_code()
             
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 cursor.execute("""
@@ -251,6 +227,7 @@ class SmartRegistration:
                 ))
                 
                 item_id = cursor.lastrowid
+                index_pending(conn)
                 conn.commit()
                 
                 return {
@@ -360,6 +337,10 @@ def create_sample_items():
         for error in result['error_details']:
             print(f"   • {error['item']}: {error['error']}")
     
+    for change in result.get('reassigned', []):
+        print(f"⚠️ Linha {change['row']} ({change['item']}): {change['field']} "
+              f"{change['original']} já existia, usado {change['code']}")
+    
     print(f"\n📋 ITENS CADASTRADOS:")
     for item in result['items']:
         codigo = item.get('codigo', 'N/A')
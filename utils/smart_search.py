@@ -6,34 +6,45 @@ Autor: GitHub Copilot
 Data: 16/09/2025
 """
 
+import logging
 import sqlite3
-import re
 from typing import List, Dict, Optional, Tuple
 from difflib import SequenceMatcher
-import unicodedata
+
+import numpy as np
+
+try:
+    from utils.search_index import (SearchIndex, FIELD_WEIGHTS, MIN_SUBSTRING_LENGTH, SUBSTRING_COLUMNS,
+                                    normalize_text, normalize_item_fields, unindexed_condition)
+    from utils.suggestion_index import get_suggestion_index
+    from utils.database import connect
+except ImportError:
+    from search_index import (SearchIndex, FIELD_WEIGHTS, MIN_SUBSTRING_LENGTH, SUBSTRING_COLUMNS,
+                          normalize_text, normalize_item_fields, unindexed_condition)
+    from suggestion_index import get_suggestion_index
+    from database import connect
+
+logger = logging.getLogger(__name__)
+
+# Limite de parâmetros por consulta IN (SQLITE_MAX_VARIABLE_NUMBER antigo)
+_IN_CHUNK = 900
+
+# Colunas retornadas pela busca
+RESULT_COLUMNS = [
+    'id', 'nome', 'descricao', 'quantidade', 'status', 'categoria', 'localizacao',
+    'codigo', 'codigo_barras', 'marca', 'modelo', 'numero_serie', 'data_cadastro'
+]
 
 class SmartSearch:
     """Sistema de busca inteligente para itens do estoque"""
     
     def __init__(self, db_path: str):
         self.db_path = db_path
+        self.search_index = SearchIndex(db_path)
     
     def normalize_text(self, text: str) -> str:
         """Normaliza texto para busca (remove acentos, lowercase, etc.)"""
-        if not text:
-            return ""
-        
-        # Remove acentos
-        text = unicodedata.normalize('NFD', text)
-        text = ''.join(char for char in text if unicodedata.category(char) != 'Mn')
-        
-        # Lowercase e remove caracteres especiais
-        text = re.sub(r'[^a-zA-Z0-9\s]', ' ', text.lower())
-        
-        # Remove espaços extras
-        text = ' '.join(text.split())
-        
-        return text
+        return normalize_text(text)
     
     def search_items(self, 
                     query: str, 
@@ -53,103 +64,226 @@ class SmartSearch:
         
         Returns:
             Lista de itens encontrados com score de relevância
+        
+        Com o índice FTS5, cada termo casa pelo início das palavras ("note" acha
+        "Notebook"); se isso não preencher o limite, itens em que os termos
+        aparecem no meio das palavras ("book" em "Notebook") completam o resultado.
+        Itens ainda sem texto normalizado (fila de pendentes, carga inicial em
+        andamento) são buscados por LIKE restrito a eles.
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                # Base query
-                sql_parts = []
-                params = []
-                
-                # Query principal
-                base_query = """
-                    SELECT 
-                        id, nome, descricao, quantidade, status, categoria, 
-                        localizacao, codigo, codigo_barras, marca, modelo, 
-                        numero_serie, data_cadastro
-                    FROM itens 
-                    WHERE 1=1
-                """
                 
-                # Filtros específicos
-                if category:
-                    base_query += " AND LOWER(categoria) LIKE ?"
-                    params.append(f"%{category.lower()}%")
+                terms = self.normalize_text(query).split() if query else []
+                
+                # Índice FTS5 quando disponível, LIKE como fallback
+                if terms and self.search_index.ensure_fts(conn):
+                    rows = self._search_rows_fts(conn, terms, category, location, status, limit)
+                    unindexed = unindexed_condition(conn)
+                    if unindexed and (not limit or len(rows) < limit):
+                        rows += self._search_rows_like(
+                            conn, query, category, location, status,
+                            limit - len(rows) if limit else limit, scope=unindexed
+                        )
+                    if not limit or len(rows) < limit:
+                        rows += self._search_rows_substring(
+                            conn, terms, category, location, status, limit,
+                            exclude={row['id'] for row in rows}
+                        )
+                else:
+                    rows = self._search_rows_like(conn, query, category, location, status, limit)
                 
-                if location:
-                    base_query += " AND LOWER(localizacao) LIKE ?"
-                    params.append(f"%{location.lower()}%")
-                
-                if status:
-                    base_query += " AND LOWER(status) LIKE ?"
-                    params.append(f"%{status.lower()}%")
+                # Converter para lista de dicionários com score
+                results = [dict(row) for row in rows]
                 
-                # Busca por termo
                 if query:
-                    normalized_query = self.normalize_text(query)
-                    terms = normalized_query.split()
-                    
-                    # Busca em múltiplas colunas
-                    search_conditions = []
-                    
-                    for term in terms:
-                        term_condition = """(
-                            LOWER(nome) LIKE ? OR 
-                            LOWER(descricao) LIKE ? OR 
-                            LOWER(codigo) LIKE ? OR 
-                            LOWER(codigo_barras) LIKE ? OR
-                            LOWER(marca) LIKE ? OR
-                            LOWER(modelo) LIKE ? OR
-                            LOWER(numero_serie) LIKE ?
-                        )"""
-                        search_conditions.append(term_condition)
-                        # Adiciona o termo para cada coluna na condição
-                        for _ in range(7):  # 7 colunas na busca
-                            params.append(f"%{term}%")
-                    
-                    if search_conditions:
-                        base_query += " AND (" + " AND ".join(search_conditions) + ")"
-                
-                # Ordenação por relevância (itens com códigos primeiro)
-                base_query += " ORDER BY (CASE WHEN codigo IS NOT NULL THEN 0 ELSE 1 END), nome"
-                
-                if limit:
-                    base_query += f" LIMIT {limit}"
-                
-                # Executar busca
-                cursor.execute(base_query, params)
-                rows = cursor.fetchall()
-                
-                # Converter para lista de dicionários com score
-                results = []
-                for row in rows:
-                    item = dict(row)
+                    # Texto normalizado vem da tabela auxiliar (gravado na escrita)
+                    normalized = {}
+                    if self.search_index.ensure_normalized(conn):
+                        normalized = self.search_index.get_normalized(conn, [item['id'] for item in results])
                     
-                    # Calcular score de relevância
-                    if query:
-                        score = self._calculate_relevance_score(item, query)
+                    normalized_items = [
+                        normalized.get(item['id']) or normalize_item_fields(item)
+                        for item in results
+                    ]
+                    scores = self._calculate_relevance_scores(normalized_items, query)
+                    for item, score in zip(results, scores):
                         item['relevance_score'] = score
-                    else:
+                else:
+                    for item in results:
                         item['relevance_score'] = 0.5
-                    
-                    results.append(item)
                 
-                # Ordenar por relevância
+                # Ordenar por relevância (sort estável preserva a ordem do bm25 nos empates)
                 if query:
                     results.sort(key=lambda x: x['relevance_score'], reverse=True)
                 
                 return results
                 
         except Exception as e:
-            print(f"Erro na busca: {e}")
+            logger.error(f"Erro na busca: {e}")
             return []
     
+    def _search_rows_fts(self, conn, terms: List[str], category: str,
+                         location: str, status: str, limit: int) -> List[sqlite3.Row]:
+        """Busca via índice FTS5 ordenada por bm25"""
+        sql = f"""
+            SELECT {', '.join(f'i.{col}' for col in RESULT_COLUMNS)}
+            FROM itens_fts
+            JOIN itens i ON i.id = itens_fts.rowid
+            WHERE itens_fts MATCH ?
+            AND i.id NOT IN (SELECT item_id FROM itens_busca_pendentes)
+        """
+        params = [self.search_index.build_match_query(terms)]
+        
+        if category:
+            sql += " AND LOWER(i.categoria) LIKE ?"
+            params.append(f"%{category.lower()}%")
+        
+        if location:
+            sql += " AND LOWER(i.localizacao) LIKE ?"
+            params.append(f"%{location.lower()}%")
+        
+        if status:
+            sql += " AND LOWER(i.status) LIKE ?"
+            params.append(f"%{status.lower()}%")
+        
+        sql += f" ORDER BY bm25(itens_fts, {self.search_index.bm25_weights_sql()})"
+        
+        if limit:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        
+        return conn.execute(sql, params).fetchall()
+    
+    def _search_rows_substring(self, conn, terms: List[str], category: str, location: str,
+                               status: str, limit: int, exclude: set) -> List[sqlite3.Row]:
+        """
+        Itens com os termos em qualquer posição (complemento do FTS5, que só
+        casa prefixos de palavra)
+        
+        Usa o índice de trigramas itens_trechos sobre o texto normalizado; termos
+        com menos de 3 caracteres só filtram as linhas já casadas pelos demais.
+        Sem o índice ou sem termo de 3+ caracteres não há busca por trecho (o
+        resultado fica com os prefixos do FTS5), nunca uma varredura da tabela.
+        """
+        long_terms = [term for term in terms if len(term) >= MIN_SUBSTRING_LENGTH]
+        if not long_terms or not self.search_index.ensure_substring(conn):
+            return []
+        
+        sql = f"""
+            SELECT {', '.join(f'i.{col}' for col in RESULT_COLUMNS)}
+            FROM itens_trechos t
+            JOIN itens_busca_norm n ON n.item_id = t.rowid
+            JOIN itens i ON i.id = t.rowid
+            WHERE itens_trechos MATCH ?
+            AND i.id NOT IN (SELECT item_id FROM itens_busca_pendentes)
+        """
+        params = [self.search_index.build_substring_query(long_terms)]
+        
+        # Termos normalizados contêm apenas [a-z0-9]: sem curingas a escapar
+        for term in terms:
+            if len(term) < MIN_SUBSTRING_LENGTH:
+                sql += " AND (" + " OR ".join(f"n.{col} LIKE ?" for col in SUBSTRING_COLUMNS) + ")"
+                params.extend([f"%{term}%"] * len(SUBSTRING_COLUMNS))
+        
+        if category:
+            sql += " AND LOWER(i.categoria) LIKE ?"
+            params.append(f"%{category.lower()}%")
+        
+        if location:
+            sql += " AND LOWER(i.localizacao) LIKE ?"
+            params.append(f"%{location.lower()}%")
+        
+        if status:
+            sql += " AND LOWER(i.status) LIKE ?"
+            params.append(f"%{status.lower()}%")
+        
+        # Sem ORDER BY: o rank do trigrama exigiria pontuar todas as linhas casadas,
+        # e a ordem final vem do score de relevância
+        if limit:
+            # Os já encontrados pelo FTS5 também casam aqui e são descartados
+            sql += " LIMIT ?"
+            params.append(int(limit) + len(exclude))
+        
+        rows = [row for row in conn.execute(sql, params).fetchall() if row['id'] not in exclude]
+        return rows[:limit - len(exclude)] if limit else rows
+    
+    def _search_rows_like(self, conn, query: str, category: str, location: str, status: str,
+                          limit: int, scope: Optional[Tuple[str, list]] = None) -> List[sqlite3.Row]:
+        """
+        Busca por LIKE em múltiplas colunas (schema sem suporte a FTS5)
+        
+        Com `scope` ((SQL, parâmetros) de unindexed_condition), só os itens
+        ainda fora do índice são lidos.
+        """
+        cursor = conn.cursor()
+        params = []
+        
+        # Query principal
+        base_query = f"""
+            SELECT {', '.join(RESULT_COLUMNS)}
+            FROM itens 
+            WHERE 1=1
+        """
+        
+        if scope:
+            base_query += f" AND ({scope[0]})"
+            params.extend(scope[1])
+        
+        # Filtros específicos
+        if category:
+            base_query += " AND LOWER(categoria) LIKE ?"
+            params.append(f"%{category.lower()}%")
+        
+        if location:
+            base_query += " AND LOWER(localizacao) LIKE ?"
+            params.append(f"%{location.lower()}%")
+        
+        if status:
+            base_query += " AND LOWER(status) LIKE ?"
+            params.append(f"%{status.lower()}%")
+        
+        # Busca por termo
+        if query:
+            normalized_query = self.normalize_text(query)
+            terms = normalized_query.split()
+            
+            # Busca em múltiplas colunas
+            search_conditions = []
+            
+            for term in terms:
+                term_condition = """(
+                    LOWER(nome) LIKE ? OR 
+                    LOWER(descricao) LIKE ? OR 
+                    LOWER(codigo) LIKE ? OR 
+                    LOWER(codigo_barras) LIKE ? OR
+                    LOWER(marca) LIKE ? OR
+                    LOWER(modelo) LIKE ? OR
+                    LOWER(numero_serie) LIKE ?
+                )"""
+                search_conditions.append(term_condition)
+                # Adiciona o termo para cada coluna na condição
+                for _ in range(7):  # 7 colunas na busca
+                    params.append(f"%{term}%")
+            
+            if search_conditions:
+                base_query += " AND (" + " AND ".join(search_conditions) + ")"
+        
+        # Ordenação por relevância (itens com códigos primeiro)
+        base_query += " ORDER BY (CASE WHEN codigo IS NOT NULL THEN 0 ELSE 1 END), nome"
+        
+        if limit:
+            base_query += f" LIMIT {limit}"
+        
+        # Executar busca
+        cursor.execute(base_query, params)
+        return cursor.fetchall()
+    
     def search_by_code(self, code: str) -> Optional[Dict]:
         """Busca item por código específico (exato ou parcial)"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 
@@ -178,48 +312,102 @@ class SmartSearch:
                 return None
                 
         except Exception as e:
-            print(f"Erro na busca por código: {e}")
+            logger.error(f"Erro na busca por código: {e}")
             return None
     
-    def search_similar_names(self, name: str, threshold: float = 0.6) -> List[Dict]:
-        """Busca itens com nomes similares (fuzzy search)"""
+    def search_similar_names(self, name: str, threshold: float = 0.6,
+                             limit: Optional[int] = None, exact: bool = False) -> List[Dict]:
+        """
+        Busca itens com nomes similares (fuzzy search)
+        
+        Candidatos vêm do índice de trigramas e são pontuados pelo ratio do
+        SequenceMatcher (mesma semântica de `threshold`). O filtro de
+        trigramas só é garantido para thresholds altos (ver
+        similarity_filter); nos demais casos a seleção é aproximada e cada
+        resultado traz 'approximate': True. Com `exact=True` todos os nomes
+        de tamanho compatível são avaliados.
+        
+        Args:
+            limit: Máximo de resultados, os mais similares primeiro (None = todos)
+        
+        Returns:
+            Itens com 'similarity_score' e 'approximate', do mais similar ao menos
+        """
         try:
-            # Primeiro busca todos os nomes
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                cursor.execute("SELECT * FROM itens ORDER BY nome")
-                all_items = cursor.fetchall()
                 
-                # Calcula similaridade
-                similar_items = []
                 normalized_target = self.normalize_text(name)
                 
-                for item in all_items:
-                    item_dict = dict(item)
-                    normalized_name = self.normalize_text(item_dict['nome'])
-                    
-                    # Calcula similaridade
-                    similarity = SequenceMatcher(None, normalized_target, normalized_name).ratio()
-                    
+                if not self.search_index.ensure_normalized(conn):
+                    return self._search_similar_names_scan(conn, normalized_target, threshold)[:limit]
+                
+                # Candidatos pelo índice de trigramas, similaridade exata só neles
+                candidates, approximate = self.search_index.similar_name_candidates(
+                    conn, normalized_target, threshold, exact=exact)
+                matcher = SequenceMatcher(None)
+                matcher.set_seq1(normalized_target)
+                similarities = {}
+                name_ratios: Dict[str, float] = {}
+                
+                for item_id, normalized_name in candidates:
+                    similarity = name_ratios.get(normalized_name)
+                    if similarity is None:
+                        matcher.set_seq2(normalized_name)
+                        similarity = name_ratios[normalized_name] = matcher.ratio()
                     if similarity >= threshold:
-                        item_dict['similarity_score'] = similarity
+                        similarities[item_id] = similarity
+                
+                ranked = sorted(similarities, key=lambda item_id: -similarities[item_id])[:limit]
+                if not ranked:
+                    return []
+                
+                similar_items = []
+                for start in range(0, len(ranked), _IN_CHUNK):
+                    chunk = ranked[start:start + _IN_CHUNK]
+                    placeholders = ', '.join('?' for _ in chunk)
+                    cursor = conn.execute(f"SELECT * FROM itens WHERE id IN ({placeholders})", chunk)
+                    for item in cursor.fetchall():
+                        item_dict = dict(item)
+                        item_dict['similarity_score'] = similarities[item_dict['id']]
+                        item_dict['approximate'] = approximate
                         similar_items.append(item_dict)
                 
-                # Ordena por similaridade
-                similar_items.sort(key=lambda x: x['similarity_score'], reverse=True)
+                # Ordena por similaridade (empate pelo nome)
+                similar_items.sort(key=lambda x: (-x['similarity_score'], x['nome']))
                 
                 return similar_items
                 
         except Exception as e:
-            print(f"Erro na busca por similaridade: {e}")
+            logger.error(f"Erro na busca por similaridade: {e}")
             return []
     
+    def _search_similar_names_scan(self, conn, normalized_target: str, threshold: float) -> List[Dict]:
+        """Similaridade por varredura completa (schema sem tabelas auxiliares)"""
+        cursor = conn.execute("SELECT * FROM itens ORDER BY nome")
+        
+        similar_items = []
+        for item in cursor.fetchall():
+            item_dict = dict(item)
+            normalized_name = self.normalize_text(item_dict['nome'])
+            
+            # Calcula similaridade
+            similarity = SequenceMatcher(None, normalized_target, normalized_name).ratio()
+            
+            if similarity >= threshold:
+                item_dict['similarity_score'] = similarity
+                item_dict['approximate'] = False
+                similar_items.append(item_dict)
+        
+        # Ordena por similaridade
+        similar_items.sort(key=lambda x: x['similarity_score'], reverse=True)
+        
+        return similar_items
+    
     def search_by_category_tree(self, category: str) -> List[Dict]:
         """Busca itens organizados por árvore de categorias"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 conn.row_factory = sqlite3.Row
                 cursor = conn.cursor()
                 
@@ -254,7 +442,7 @@ class SmartSearch:
                 return result
                 
         except Exception as e:
-            print(f"Erro na busca por árvore de categorias: {e}")
+            logger.error(f"Erro na busca por árvore de categorias: {e}")
             return []
     
     def get_search_suggestions(self, partial_query: str) -> List[str]:
@@ -263,92 +451,121 @@ class SmartSearch:
             if len(partial_query) < 2:
                 return []
             
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                # Busca sugestões em várias colunas
-                suggestions = set()
+            try:
+                suggestions = get_suggestion_index(self.db_path).suggest(partial_query)
+                return [suggestion['text'] for suggestion in suggestions]
+            except sqlite3.Error as e:
+                logger.warning(f"Índice de sugestões indisponível: {e}")
+                return self._get_search_suggestions_like(partial_query)
                 
-                # Nomes
-                cursor.execute("""
-                    SELECT DISTINCT nome FROM itens 
-                    WHERE LOWER(nome) LIKE ? 
-                    LIMIT 5
-                """, (f"%{partial_query.lower()}%",))
-                
-                for row in cursor.fetchall():
+        except Exception as e:
+            logger.error(f"Erro ao obter sugestões: {e}")
+            return []
+    
+    def _get_search_suggestions_like(self, partial_query: str) -> List[str]:
+        """Sugestões via LIKE direto nas colunas (sem índice em memória)"""
+        with connect(self.db_path) as conn:
+            cursor = conn.cursor()
+                
+            # Busca sugestões em várias colunas
+            suggestions = set()
+                
+            # Nomes
+            cursor.execute("""
+                SELECT DISTINCT nome FROM itens 
+                WHERE LOWER(nome) LIKE ? 
+                LIMIT 5
+            """, (f"%{partial_query.lower()}%",))
+                
+            for row in cursor.fetchall():
+                suggestions.add(row[0])
+                
+            # Categorias
+            cursor.execute("""
+                SELECT DISTINCT categoria FROM itens 
+                WHERE categoria IS NOT NULL AND LOWER(categoria) LIKE ? 
+                LIMIT 3
+            """, (f"%{partial_query.lower()}%",))
+                
+            for row in cursor.fetchall():
+                if row[0]:
                     suggestions.add(row[0])
                 
-                # Categorias
-                cursor.execute("""
-                    SELECT DISTINCT categoria FROM itens 
-                    WHERE categoria IS NOT NULL AND LOWER(categoria) LIKE ? 
-                    LIMIT 3
-                """, (f"%{partial_query.lower()}%",))
-                
-                for row in cursor.fetchall():
-                    if row[0]:
-                        suggestions.add(row[0])
-                
-                # Marcas
-                cursor.execute("""
-                    SELECT DISTINCT marca FROM itens 
-                    WHERE marca IS NOT NULL AND LOWER(marca) LIKE ? 
-                    LIMIT 3
-                """, (f"%{partial_query.lower()}%",))
+            # Marcas
+            cursor.execute("""
+                SELECT DISTINCT marca FROM itens 
+                WHERE marca IS NOT NULL AND LOWER(marca) LIKE ? 
+                LIMIT 3
+            """, (f"%{partial_query.lower()}%",))
                 
-                for row in cursor.fetchall():
-                    if row[0]:
-                        suggestions.add(row[0])
-                
-                return sorted(list(suggestions))
+            for row in cursor.fetchall():
+                if row[0]:
+                    suggestions.add(row[0])
                 
-        except Exception as e:
-            print(f"Erro ao obter sugestões: {e}")
-            return []
+            return sorted(list(suggestions))
     
     def _calculate_relevance_score(self, item: Dict, query: str) -> float:
         """Calcula score de relevância de um item para a query"""
-        score = 0.0
-        normalized_query = self.normalize_text(query).lower()
+        return self._calculate_relevance_scores([normalize_item_fields(item)], query)[0]
+    
+    def _calculate_relevance_scores(self, normalized_items: List[Dict[str, str]], query: str) -> List[float]:
+        """
+        Calcula scores de relevância de um lote de itens já normalizados
+        
+        Mesmos pesos, regras e ordem de soma do cálculo por item (match exato,
+        match por termo e ratio do SequenceMatcher acima de 0.3), coluna a
+        coluna com arrays NumPy: os testes de trecho rodam uma vez por valor
+        distinto do campo e o ratio só é calculado quando os limites superiores
+        (tamanho e caracteres em comum) passam de 0.3 e o item ainda não
+        atingiu o teto de 1.0. Os scores são idênticos aos do cálculo por item.
+        """
+        if not normalized_items:
+            return []
+        
+        normalized_query = self.normalize_text(query)
         query_terms = normalized_query.split()
+        query_length = len(normalized_query)
+        matcher = SequenceMatcher(None, normalized_query, '')
+        scores = np.zeros(len(normalized_items))
         
-        # Pesos por campo
-        field_weights = {
-            'codigo': 1.0,
-            'codigo_barras': 1.0,
-            'nome': 0.8,
-            'marca': 0.6,
-            'modelo': 0.6,
-            'categoria': 0.4,
-            'descricao': 0.3
-        }
-        
-        for field, weight in field_weights.items():
-            field_value = str(item.get(field, ''))
-            normalized_field = self.normalize_text(field_value).lower()
+        for field, weight in FIELD_WEIGHTS.items():
+            values, inverse = np.unique(
+                np.array([item.get(field) or '' for item in normalized_items], dtype=str),
+                return_inverse=True
+            )
+            inverse = inverse.reshape(-1)
             
             # Match exato
-            if normalized_query in normalized_field:
-                score += weight * 1.0
+            scores += np.where(np.char.find(values, normalized_query) >= 0, weight * 1.0, 0.0)[inverse]
             
-            # Match parcial por termo
+            # Match parcial por termo (uma soma por termo, como no cálculo por item)
             for term in query_terms:
-                if term in normalized_field:
-                    score += weight * 0.5
+                scores += np.where(np.char.find(values, term) >= 0, weight * 0.5, 0.0)[inverse]
+            
+            if not query_length:
+                continue
+            
+            # Similaridade de sequência: só valores de itens abaixo do teto e cujo
+            # limite pelo tamanho, 2*min(a, b)/(a + b), passa de 0.3
+            lengths = np.char.str_len(values)
+            below_cap = np.zeros(len(values), dtype=bool)
+            below_cap[inverse[scores < 1.0]] = True
+            bound = 2.0 * np.minimum(lengths, query_length) / np.maximum(lengths + query_length, 1)
+            
+            similarity = np.zeros(len(values))
+            for index in np.flatnonzero(below_cap & (lengths > 0) & (bound > 0.3)):
+                matcher.set_seq2(str(values[index]))
+                if matcher.quick_ratio() > 0.3:
+                    similarity[index] = matcher.ratio()
             
-            # Similaridade de sequência
-            if normalized_field and normalized_query:
-                similarity = SequenceMatcher(None, normalized_query, normalized_field).ratio()
-                if similarity > 0.3:
-                    score += weight * similarity * 0.3
+            scores += np.where(similarity > 0.3, weight * similarity * 0.3, 0.0)[inverse]
         
-        return min(score, 1.0)  # Limita a 1.0
+        return np.minimum(scores, 1.0).tolist()  # Limita a 1.0
     
     def get_search_stats(self) -> Dict:
         """Retorna estatísticas da base de dados para busca"""
         try:
-            with sqlite3.connect(self.db_path) as conn:
+            with connect(self.db_path) as conn:
                 cursor = conn.cursor()
                 
                 stats = {}
@@ -396,7 +613,7 @@ class SmartSearch:
                 return stats
                 
         except Exception as e:
-            print(f"Erro ao obter estatísticas: {e}")
+            logger.error(f"Erro ao obter estatísticas: {e}")
             return {}
 
 def test_smart_search():
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agregados Materializados do Estoque
+A tabela stats_snapshot guarda totais globais e por categoria, status e catálogo,
+mantidos por triggers em itens; dashboards e relatórios leem poucas linhas
+em vez de varrer a tabela. `python utils/stats_snapshot.py` recalcula tudo.
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    from utils.database import connect
+except ImportError:
+    from database import connect
+
+CREATE_STATS_SNAPSHOT = '''
+CREATE TABLE IF NOT EXISTS stats_snapshot (
+    dimensao TEXT NOT NULL,
+    chave TEXT NOT NULL,
+    itens INTEGER NOT NULL DEFAULT 0,
+    quantidade INTEGER NOT NULL DEFAULT 0,
+    valor REAL NOT NULL DEFAULT 0,
+    estoque_baixo INTEGER NOT NULL DEFAULT 0,
+    com_foto INTEGER NOT NULL DEFAULT 0,
+    com_midia INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimensao, chave)
+) WITHOUT ROWID;
+'''
+
+# Dimensão -> coluna de itens ('total' é a linha única com os totais gerais)
+DIMENSIONS = {
+    'total': None,
+    'categoria': 'categoria',
+    'status': 'status',
+    'catalogo': 'catalogo'
+}
+
+METRICS = ['itens', 'quantidade', 'valor', 'estoque_baixo', 'com_foto', 'com_midia']
+
+# Colunas que alteram algum agregado quando atualizadas
+TRACKED_COLUMNS = ['quantidade', 'preco_unitario', 'categoria', 'status', 'catalogo', 'foto_path', 'foto_id']
+
+# Estoque baixo: mesmo critério do filtro low_stock das APIs
+LOW_STOCK_LIMIT = 5
+
+
+def _metric_expressions(row: str) -> List[str]:
+    """Contribuição de uma linha (NEW/OLD) para cada métrica, na ordem de METRICS"""
+    return [
+        '1',
+        f'COALESCE({row}.quantidade, 0)',
+        f'COALESCE({row}.quantidade, 0) * COALESCE({row}.preco_unitario, 0)',
+        f'COALESCE({row}.quantidade < {LOW_STOCK_LIMIT}, 0)',
+        f'({row}.foto_path IS NOT NULL)',
+        f'({row}.foto_path IS NOT NULL OR {row}.foto_id IS NOT NULL)'
+    ]
+
+
+def _apply_row(row: str, sign: str) -> str:
+    """Statements que somam (sign='+') ou subtraem (sign='-') a linha em todas as dimensões"""
+    values = ', '.join(f'{sign}({expression})' for expression in _metric_expressions(row))
+    updates = ', '.join(f'{metric} = {metric} + excluded.{metric}' for metric in METRICS)
+    statements = []
+    for dimension, column in DIMENSIONS.items():
+        key = f"COALESCE({row}.{column}, '')" if column else "''"
+        statements.append(
+            f"INSERT INTO stats_snapshot (dimensao, chave, {', '.join(METRICS)}) "
+            f"VALUES ('{dimension}', {key}, {values}) "
+            f"ON CONFLICT(dimensao, chave) DO UPDATE SET {updates};"
+        )
+    return '\n        '.join(statements)
+
+
+STATS_TRIGGERS = [
+    f'''CREATE TRIGGER IF NOT EXISTS stats_snapshot_ai AFTER INSERT ON itens BEGIN
+        {_apply_row('NEW', '+')}
+    END;''',
+    f'''CREATE TRIGGER IF NOT EXISTS stats_snapshot_ad AFTER DELETE ON itens BEGIN
+        {_apply_row('OLD', '-')}
+    END;''',
+    f'''CREATE TRIGGER IF NOT EXISTS stats_snapshot_au AFTER UPDATE OF {', '.join(TRACKED_COLUMNS)} ON itens BEGIN
+        {_apply_row('OLD', '-')}
+        {_apply_row('NEW', '+')}
+    END;'''
+]
+
+SNAPSHOT_QUERY = f"SELECT dimensao, chave, {', '.join(METRICS)} FROM stats_snapshot"
+
+
+def stats_from_rows(rows: Iterable[Tuple]) -> Dict:
+    """
+    Organiza as linhas de SNAPSHOT_QUERY (também usável com aiosqlite)
+
+    Returns:
+        {'total': {métricas}, 'categoria': {chave: {métricas}}, 'status': {...}, 'catalogo': {...}}
+        Chaves sem itens são omitidas; '' representa valores nulos ou vazios.
+    """
+    stats = {dimension: {} for dimension in DIMENSIONS if dimension != 'total'}
+    stats['total'] = {metric: 0 for metric in METRICS}
+
+    for row in rows:
+        dimension, key = row[0], row[1]
+        metrics = dict(zip(METRICS, row[2:]))
+        if dimension == 'total':
+            stats['total'] = metrics
+        elif dimension in stats and metrics['itens'] > 0:
+            stats[dimension][key] = metrics
+    return stats
+
+
+def ranked(group: Dict[str, Dict], include_empty: bool = False) -> List[Tuple[str, Dict]]:
+    """Chaves de uma dimensão ordenadas por número de itens (maior primeiro)"""
+    return sorted(
+        ((key, metrics) for key, metrics in group.items() if include_empty or key),
+        key=lambda entry: (-entry[1]['itens'], entry[0])
+    )
+
+
+def read_stats(conn: sqlite3.Connection) -> Dict:
+    """Agregados atuais (leitura de poucas linhas, independente do tamanho de itens)"""
+    return stats_from_rows(conn.execute(SNAPSHOT_QUERY).fetchall())
+
+
+def recompute_stats(conn: sqlite3.Connection) -> Dict:
+    """
+    Reconstrói stats_snapshot a partir de itens (reparo de divergências)
+
+    Uma única varredura agrupada por (categoria, status, catálogo); os totais de
+    cada dimensão são consolidados em Python. Deve rodar dentro de uma transação.
+    """
+    metric_sql = ', '.join(f'SUM({expression})' for expression in _metric_expressions('itens'))
+    cursor = conn.execute(f'''
+        SELECT COALESCE(categoria, ''), COALESCE(status, ''), COALESCE(catalogo, ''), {metric_sql}
+        FROM itens
+        GROUP BY 1, 2, 3
+    ''')
+
+    totals: Dict[Tuple[str, str], List] = {('total', ''): [0] * len(METRICS)}
+    for categoria, status, catalogo, *metrics in cursor.fetchall():
+        for key in (('total', ''), ('categoria', categoria), ('status', status), ('catalogo', catalogo)):
+            accumulated = totals.setdefault(key, [0] * len(METRICS))
+            for index, value in enumerate(metrics):
+                accumulated[index] += value or 0
+
+    conn.execute("DELETE FROM stats_snapshot")
+    conn.executemany(
+        f"INSERT INTO stats_snapshot (dimensao, chave, {', '.join(METRICS)}) "
+        f"VALUES (?, ?, {', '.join('?' for _ in METRICS)})",
+        [key + tuple(metrics) for key, metrics in totals.items()]
+    )
+    return read_stats(conn)
+
+
+def rebuild_stats(db_path: str) -> Dict:
+    """Recalcula stats_snapshot do banco informado (comando administrativo de reparo)"""
+    with connect(db_path) as conn:
+        if not conn.in_transaction:
+            # Trava de escrita antes da varredura: nenhum trigger roda no meio
+            conn.execute("BEGIN IMMEDIATE")
+        return recompute_stats(conn)
+
+
+if __name__ == '__main__':
+    import os
+    import sys
+
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from utils.database import DB_PATH
+    from utils.migrations import run_migrations
+
+    db_path = sys.argv[1] if len(sys.argv) > 1 else DB_PATH
+    run_migrations(db_path)
+    total = rebuild_stats(db_path)['total']
+    print(f"stats_snapshot recalculado: {total['itens']} itens, {total['quantidade']} unidades")
@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Índice de Sugestões (autocomplete) para Itens
+Mantém em memória um vetor ordenado de prefixos de nome, categoria e marca,
+atualizado incrementalmente a partir de um log de alterações preenchido por triggers
+(log e triggers criados pela migração 15)
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    from utils.search_index import normalize_text
+    from utils.database import connect
+except ImportError:
+    from search_index import normalize_text
+    from database import connect
+
+logger = logging.getLogger(__name__)
+
+# Colunas sugeridas e quantas sugestões cada uma contribui
+SUGGESTION_LIMITS = {
+    'nome': 5,
+    'categoria': 3,
+    'marca': 3
+}
+
+SUGGESTION_COLUMNS = list(SUGGESTION_LIMITS.keys())
+
+# Log de alterações: cada processo guarda o último seq aplicado
+CREATE_LOG_TABLE = '''
+CREATE TABLE IF NOT EXISTS itens_sugestoes_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_id INTEGER NOT NULL
+);
+'''
+
+# Entradas mantidas no log; leitores mais atrasados que isso reconstroem o índice
+LOG_RETENTION = 10000
+
+# A cada LOG_PRUNE_EVERY inserções no log, o trigger descarta as entradas antigas
+LOG_PRUNE_EVERY = 1000
+
+# Prefixos com top-k memorizado (mantidos incrementalmente a cada alteração)
+PREFIX_CACHE_SIZE = 4096
+
+# Intervalo padrão entre consultas ao log: alterações de outros processos aparecem
+# com até esse atraso; escritas do próprio processo chamam invalidate()
+REFRESH_INTERVAL = float(os.getenv('SUGGESTION_REFRESH_INTERVAL', 5.0))
+
+# Parâmetro limit dos endpoints de sugestões
+DEFAULT_SUGGESTION_LIMIT = 10
+MAX_SUGGESTION_LIMIT = 50
+
+
+def parse_suggestion_limit(value: Optional[str]) -> int:
+    """limit da query string entre 1 e MAX_SUGGESTION_LIMIT; ValueError se não for inteiro"""
+    if value is None or value == '':
+        return DEFAULT_SUGGESTION_LIMIT
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"limit inválido: {value}") from None
+    return max(1, min(limit, MAX_SUGGESTION_LIMIT))
+
+
+def suggestion_limits(limit: int) -> Dict[str, int]:
+    """
+    Limites por coluna para devolver até `limit` sugestões
+
+    Até a soma de SUGGESTION_LIMITS usa o top-k memorizado; acima disso cada
+    coluna pode contribuir com `limit` (o resultado é cortado pelo chamador).
+    """
+    if limit <= sum(SUGGESTION_LIMITS.values()):
+        return SUGGESTION_LIMITS
+    return {column: limit for column in SUGGESTION_COLUMNS}
+
+
+def create_log_triggers(columns: List[str]) -> List[str]:
+    """Triggers que registram no log os itens com colunas sugeridas alteradas"""
+    return [
+        '''
+        CREATE TRIGGER IF NOT EXISTS itens_sugestoes_ai AFTER INSERT ON itens BEGIN
+            INSERT INTO itens_sugestoes_log(item_id) VALUES (new.id);
+        END;
+        ''',
+        f'''
+        CREATE TRIGGER IF NOT EXISTS itens_sugestoes_au AFTER UPDATE OF {', '.join(columns)} ON itens BEGIN
+            INSERT INTO itens_sugestoes_log(item_id) VALUES (new.id);
+        END;
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS itens_sugestoes_ad AFTER DELETE ON itens BEGIN
+            INSERT INTO itens_sugestoes_log(item_id) VALUES (old.id);
+        END;
+        ''',
+        # Limpeza no caminho de escrita: leitores nunca gravam no banco
+        f'''
+        CREATE TRIGGER IF NOT EXISTS itens_sugestoes_log_ai AFTER INSERT ON itens_sugestoes_log
+        WHEN new.seq % {LOG_PRUNE_EVERY} = 0 BEGIN
+            DELETE FROM itens_sugestoes_log WHERE seq <= new.seq - {LOG_RETENTION};
+        END;
+        '''
+    ]
+
+
+def word_suffixes(normalized: str) -> List[str]:
+    """Sufixos que começam em cada palavra ("mouse sem fio" -> "mouse sem fio", "sem fio", "fio")"""
+    words = normalized.split()
+    return list(dict.fromkeys(' '.join(words[i:]) for i in range(len(words))))
+
+
+class SuggestionIndex:
+    """
+    Autocomplete por prefixo sobre os valores distintos de nome, categoria e marca
+
+    Cada valor é indexado pelos sufixos que iniciam em suas palavras, de modo que
+    "dell" sugere "Notebook Dell Inspiron". As sugestões são ordenadas pela
+    quantidade de itens que usam o valor.
+
+    Cada prefixo consultado guarda os k mais frequentes por coluna (k de
+    SUGGESTION_LIMITS); a faixa do vetor ordenado só é percorrida na primeira
+    consulta ao prefixo ou quando um valor do top-k perde itens e há outros
+    fora da lista que podem ultrapassá-lo.
+    """
+
+    def __init__(self, db_path: str, refresh_interval: float = REFRESH_INTERVAL):
+        self.db_path = db_path
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._columns: List[str] = []
+        self._log_available = False
+        self._loaded = False
+        self._last_seq = 0
+        # -inf: monotonic() pode ser menor que refresh_interval logo após o boot
+        self._checked_at = float('-inf')
+
+        # (sufixo normalizado, coluna, valor) em ordem, para busca com bisect
+        self._keys: List[Tuple[str, str, str]] = []
+        # (coluna, valor) -> quantidade de itens
+        self._counts: Dict[Tuple[str, str], int] = {}
+        # item_id -> valores atuais das colunas sugeridas
+        self._item_values: Dict[int, Tuple[Optional[str], ...]] = {}
+        # prefixo -> coluna -> [top-k em (-quantidade, valor), lista contém todos os valores?]
+        self._nodes: "OrderedDict[str, Dict[str, list]]" = OrderedDict()
+
+    def _ensure_log(self, conn: sqlite3.Connection) -> None:
+        """Descobre as colunas disponíveis e se o log de alterações existe"""
+        cursor = conn.execute("PRAGMA table_info(itens)")
+        existing_columns = {row[1] for row in cursor.fetchall()}
+        # Schema antigo (sem migrate_codes) não tem categoria/marca
+        self._columns = [col for col in SUGGESTION_COLUMNS if col in existing_columns]
+
+        cursor = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'itens_sugestoes_log'"
+        )
+        self._log_available = cursor.fetchone() is not None
+        if not self._log_available:
+            # Banco não migrado: o índice é recarregado por completo a cada consulta
+            logger.warning("Log de sugestões indisponível (migrações pendentes)")
+
+    def _current_seq(self, conn: sqlite3.Connection) -> int:
+        cursor = conn.execute("SELECT MAX(seq) FROM itens_sugestoes_log")
+        return cursor.fetchone()[0] or 0
+
+    def _add_value(self, column: str, value: Optional[str]) -> None:
+        if not value:
+            return
+        key = (column, value)
+        count = self._counts.get(key, 0)
+        self._counts[key] = count + 1
+        if count == 0:
+            for suffix in word_suffixes(normalize_text(value)):
+                insort(self._keys, (suffix, column, value))
+        self._update_nodes(column, value, count, count + 1)
+
+    def _remove_value(self, column: str, value: Optional[str]) -> None:
+        if not value:
+            return
+        key = (column, value)
+        count = self._counts.get(key, 0)
+        if count <= 1:
+            self._counts.pop(key, None)
+            for suffix in word_suffixes(normalize_text(value)):
+                entry = (suffix, column, value)
+                position = bisect_left(self._keys, entry)
+                if position < len(self._keys) and self._keys[position] == entry:
+                    del self._keys[position]
+        else:
+            self._counts[key] = count - 1
+        if count:
+            self._update_nodes(column, value, count, count - 1)
+
+    def _scan_prefix(self, prefix: str, columns) -> Dict[str, Dict[str, int]]:
+        """Percorre a faixa do prefixo no vetor ordenado: coluna -> valor -> quantidade"""
+        found: Dict[str, Dict[str, int]] = {column: {} for column in columns}
+        position = bisect_left(self._keys, (prefix,))
+        while position < len(self._keys):
+            suffix, column, value = self._keys[position]
+            if not suffix.startswith(prefix):
+                break
+            if column in found:
+                found[column][value] = self._counts.get((column, value), 0)
+            position += 1
+        return found
+
+    def _node(self, prefix: str) -> Dict[str, list]:
+        """Top-k do prefixo por coluna, calculado na primeira consulta e memorizado"""
+        node = self._nodes.get(prefix)
+        if node is not None:
+            self._nodes.move_to_end(prefix)
+            return node
+
+        node = {}
+        for column, values in self._scan_prefix(prefix, self._columns).items():
+            top = SUGGESTION_LIMITS[column]
+            ranked = sorted((-count, value) for value, count in values.items())
+            node[column] = [ranked[:top], len(ranked) <= top]
+
+        self._nodes[prefix] = node
+        if len(self._nodes) > PREFIX_CACHE_SIZE:
+            self._nodes.popitem(last=False)
+        return node
+
+    def _update_nodes(self, column: str, value: str, old_count: int, new_count: int) -> None:
+        """Ajusta o top-k memorizado dos prefixos do valor após mudar sua quantidade"""
+        if not self._nodes:
+            return
+
+        prefixes = {
+            suffix[:end]
+            for suffix in word_suffixes(normalize_text(value))
+            for end in range(1, len(suffix) + 1)
+        }
+        top = SUGGESTION_LIMITS[column]
+
+        for prefix in prefixes:
+            node = self._nodes.get(prefix)
+            if node is None or column not in node:
+                continue
+            ranked, complete = node[column]
+
+            old_key = (-old_count, value)
+            position = bisect_left(ranked, old_key)
+            listed = position < len(ranked) and ranked[position] == old_key
+            if listed:
+                if new_count < old_count and not complete:
+                    # Um valor fora da lista pode ter passado à frente: recalcula depois
+                    del self._nodes[prefix]
+                    continue
+                del ranked[position]
+
+            if new_count:
+                insort(ranked, (-new_count, value))
+                if len(ranked) > top:
+                    # O descartado tem quantidade <= a de todos os que ficam
+                    ranked.pop()
+                    node[column][1] = False
+
+    def _rebuild(self, conn: sqlite3.Connection) -> None:
+        """Carrega todos os itens e reconstrói o vetor ordenado"""
+        # seq lido antes dos itens: alterações concorrentes são reaplicadas depois
+        self._last_seq = self._current_seq(conn) if self._log_available else 0
+
+        cursor = conn.execute(f"SELECT id, {', '.join(self._columns)} FROM itens")
+        self._item_values = {row[0]: tuple(row[1:]) for row in cursor.fetchall()}
+
+        counts: Dict[Tuple[str, str], int] = {}
+        for values in self._item_values.values():
+            for column, value in zip(self._columns, values):
+                if value:
+                    counts[(column, value)] = counts.get((column, value), 0) + 1
+
+        keys = set()
+        for column, value in counts:
+            for suffix in word_suffixes(normalize_text(value)):
+                keys.add((suffix, column, value))
+
+        self._counts = counts
+        self._keys = sorted(keys)
+        self._nodes.clear()
+        self._loaded = True
+
+    def _apply_changes(self, conn: sqlite3.Connection) -> None:
+        """Reaplica os itens registrados no log desde o último seq"""
+        current_seq = self._current_seq(conn)
+        if current_seq <= self._last_seq:
+            return
+
+        cursor = conn.execute(
+            "SELECT MIN(seq) FROM itens_sugestoes_log WHERE seq > ?", (self._last_seq,)
+        )
+        oldest_seq = cursor.fetchone()[0]
+        if oldest_seq is None or oldest_seq > self._last_seq + 1:
+            # Parte do log já foi descartada: não há como aplicar incrementalmente
+            self._rebuild(conn)
+            return
+
+        cursor = conn.execute(
+            "SELECT DISTINCT item_id FROM itens_sugestoes_log WHERE seq > ? AND seq <= ?",
+            (self._last_seq, current_seq)
+        )
+        changed_ids = [row[0] for row in cursor.fetchall()]
+
+        for item_id in changed_ids:
+            cursor = conn.execute(
+                f"SELECT {', '.join(self._columns)} FROM itens WHERE id = ?", (item_id,)
+            )
+            row = cursor.fetchone()
+            new_values = tuple(row) if row else None
+            old_values = self._item_values.get(item_id)
+            if old_values == new_values:
+                continue
+
+            if old_values:
+                for column, value in zip(self._columns, old_values):
+                    self._remove_value(column, value)
+            if new_values:
+                for column, value in zip(self._columns, new_values):
+                    self._add_value(column, value)
+                self._item_values[item_id] = new_values
+            else:
+                self._item_values.pop(item_id, None)
+
+        self._last_seq = current_seq
+
+    def refresh(self) -> None:
+        """Sincroniza o índice com o banco (carga inicial ou alterações do log)"""
+        with self._lock:
+            self._refresh_locked()
+
+    def _refresh_locked(self) -> None:
+        with connect(self.db_path) as conn:
+            if not self._loaded:
+                self._ensure_log(conn)
+                self._rebuild(conn)
+            elif self._log_available:
+                self._apply_changes(conn)
+            else:
+                self._rebuild(conn)
+        self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """Força a consulta ao log na próxima sugestão (chamado após escritas no processo)"""
+        self._checked_at = float('-inf')
+
+    def _refresh_if_stale(self) -> None:
+        """
+        Consulta o log no máximo a cada refresh_interval (ou após invalidate);
+        o MAX(seq) é lido fora do lock, que só é tomado quando há alterações
+        """
+        if self._loaded and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+
+        if self._loaded and self._log_available:
+            with connect(self.db_path) as conn:
+                current_seq = self._current_seq(conn)
+            if current_seq <= self._last_seq:
+                self._checked_at = time.monotonic()
+                return
+
+        with self._lock:
+            self._refresh_locked()
+
+    def suggest(self, partial_query: str,
+                limits: Optional[Dict[str, int]] = None) -> List[Dict]:
+        """
+        Sugestões para o termo parcial
+
+        Returns:
+            Lista de {'text', 'field', 'count'}, mais frequentes primeiro
+        """
+        prefix = normalize_text(partial_query)
+        if not prefix:
+            return []
+
+        limits = limits or SUGGESTION_LIMITS
+
+        self._refresh_if_stale()
+
+        with self._lock:
+            results = []
+            if all(limit <= SUGGESTION_LIMITS.get(column, 0) for column, limit in limits.items()):
+                node = self._node(prefix)
+                for column, limit in limits.items():
+                    ranked = node[column][0] if column in node else []
+                    for negative_count, value in ranked[:limit]:
+                        results.append({'text': value, 'field': column, 'count': -negative_count})
+            else:
+                # Limites acima do top-k memorizado: percorre a faixa do prefixo
+                for column, values in self._scan_prefix(prefix, limits).items():
+                    ranked = sorted(values.items(), key=lambda kv: (-kv[1], kv[0]))
+                    for value, count in ranked[:limits[column]]:
+                        results.append({'text': value, 'field': column, 'count': count})
+
+            results.sort(key=lambda s: (-s['count'], s['text']))
+            seen = set()
+            suggestions = []
+            for suggestion in results:
+                if suggestion['text'] not in seen:
+                    seen.add(suggestion['text'])
+                    suggestions.append(suggestion)
+
+            return suggestions
+
+
+_indexes: Dict[str, SuggestionIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_suggestion_index(db_path: str, refresh_interval: Optional[float] = None) -> SuggestionIndex:
+    """
+    Índice compartilhado por processo para o banco informado
+
+    refresh_interval só vale na criação do índice (padrão REFRESH_INTERVAL)
+    """
+    key = os.path.abspath(db_path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = SuggestionIndex(
+                db_path, REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+            )
+            _indexes[key] = index
+        return index
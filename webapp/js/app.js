@@ -9,6 +9,12 @@ class InventoryApp {
         this.inventory = null;
         this.telegram = null;
         this.initialized = false;
+        // IndexedDB compartilhado: linhas contadas, catálogo offline e fila de envios
+        this.store = new OfflineStore();
+        this.itemLookup = new ItemLookup({
+            headers: () => ({ 'X-Telegram-Init-Data': this.telegram?.getInitData() || '' }),
+            store: this.store
+        });
         
         this.init();
     }
@@ -42,7 +48,11 @@ class InventoryApp {
             await this.delay(500);
             
             // Inicializar gerenciador de inventário
-            this.inventory = new InventoryManager();
+            this.inventory = new InventoryManager(this.store);
+            
+            // Snapshot do catálogo para leituras sem rede (em segundo plano)
+            this.store.refreshCatalog()
+                .catch(error => console.warn('Catálogo offline não atualizado:', error.message));
             
             // Inicializar scanner QR
             this.scanner = new QRScanner();
@@ -151,6 +161,7 @@ class InventoryApp {
 
                     // Enviar via Telegram
                     this.telegram.sendInventoryData(inventoryData);
+                    await this.store.clearLines();
 
                 } catch (error) {
                     console.error('Erro ao finalizar inventário:', error);
@@ -219,17 +230,11 @@ class InventoryApp {
 
     async fetchItem(itemId) {
         try {
-            // Tentar buscar via API local primeiro
-            const response = await fetch(`/api/items/${itemId}`, {
-                method: 'GET',
-                headers: {
-                    'Content-Type': 'application/json',
-                    'X-Telegram-Init-Data': this.telegram?.getInitData() || ''
-                }
-            });
+            // Tentar buscar via API local primeiro (consultas agrupadas em lote)
+            const item = await this.itemLookup.get(itemId);
 
-            if (response.ok) {
-                return await response.json();
+            if (item) {
+                return item;
             }
             
             throw new Error('Item não encontrado na API');
@@ -4,9 +4,14 @@
  */
 
 class InventoryManager {
-    constructor() {
+    constructor(store = new OfflineStore()) {
         this.items = [];
         this.currentItem = null;
+        // Linhas persistidas em IndexedDB a cada leitura e fila de envios offline
+        this.store = store;
+        // Ordem de inclusão de cada item (mantida ao atualizar a contagem)
+        this.positions = new Map();
+        this.nextPosition = 0;
         
         this.init();
     }
@@ -14,9 +19,46 @@ class InventoryManager {
     init() {
         this.setupEvents();
         this.updateCounter();
+        this.restoreItems();
+        
+        // Envios pendentes saem assim que a conexão voltar
+        window.addEventListener('online', () => this.syncPending());
+        this.syncPending();
+        
         console.log('Inventory Manager inicializado');
     }
 
+    async restoreItems() {
+        try {
+            const items = await this.store.getLines();
+            if (items.length > 0 && this.items.length === 0) {
+                items.forEach(item => this.positions.set(item.id, this.nextPosition++));
+                this.loadInventoryData({ items });
+                this.showToast(`${items.length} itens recuperados da contagem anterior`, 'info');
+            }
+        } catch (error) {
+            console.warn('Armazenamento local indisponível:', error);
+        }
+    }
+
+    persistItem(item) {
+        if (!this.positions.has(item.id)) {
+            this.positions.set(item.id, this.nextPosition++);
+        }
+        this.store.saveLine(item, this.positions.get(item.id))
+            .catch(error => console.warn('Linha não salva localmente:', error));
+    }
+
+    async syncPending() {
+        try {
+            if (await this.store.pendingCount() > 0) {
+                await this.store.scheduleSync();
+            }
+        } catch (error) {
+            console.warn('Sincronização pendente:', error.message);
+        }
+    }
+
     setupEvents() {
         // Botões de quantidade
         document.getElementById('qty-minus').addEventListener('click', () => {
@@ -103,6 +145,7 @@ class InventoryManager {
                 updated: true,
                 timestamp: new Date().toISOString()
             };
+            this.persistItem(this.items[existingIndex]);
             
             this.showToast(`Item ${this.currentItem.nome} atualizado!`, 'success');
         } else {
@@ -115,6 +158,7 @@ class InventoryManager {
             };
 
             this.items.push(inventoryItem);
+            this.persistItem(inventoryItem);
             this.showToast(`Item ${this.currentItem.nome} adicionado!`, 'success');
         }
 
@@ -137,6 +181,8 @@ class InventoryManager {
         if (index !== -1) {
             const item = this.items[index];
             this.items.splice(index, 1);
+            this.positions.delete(itemId);
+            this.store.deleteLine(itemId).catch(error => console.warn('Linha não removida localmente:', error));
             
             this.updateInventoryList();
             this.updateCounter();
@@ -154,6 +200,8 @@ class InventoryManager {
 
         if (confirm(`Remover todos os ${this.items.length} itens do inventário?`)) {
             this.items = [];
+            this.positions.clear();
+            this.store.clearLines().catch(error => console.warn('Linhas não removidas localmente:', error));
             this.updateInventoryList();
             this.updateCounter();
             this.updateFinishButton();
@@ -240,13 +288,18 @@ class InventoryManager {
             };
 
             // Enviar dados para o Telegram
-            await this.sendToTelegram(inventoryData);
+            const queued = await this.sendToTelegram(inventoryData);
 
             // Mostrar sucesso
-            this.showToast('Inventário finalizado com sucesso!', 'success');
+            if (queued) {
+                this.showToast('Inventário salvo na fila; será enviado assim que possível', 'info');
+            } else {
+                this.showToast('Inventário finalizado com sucesso!', 'success');
+            }
             
             // Limpar dados
             this.items = [];
+            this.positions.clear();
             this.updateInventoryList();
             this.updateCounter();
             this.updateFinishButton();
@@ -281,25 +334,23 @@ class InventoryManager {
             // Usar Telegram WebApp API para enviar dados
             if (window.Telegram && window.Telegram.WebApp) {
                 window.Telegram.WebApp.sendData(JSON.stringify(data));
+                await this.store.clearLines();
                 
                 // Fechar WebApp
                 setTimeout(() => {
                     window.Telegram.WebApp.close();
                 }, 1000);
-            } else {
-                // Fallback: tentar enviar via API local
-                const response = await fetch('/api/inventory/finish', {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify(data)
-                });
-
-                if (!response.ok) {
-                    throw new Error('Erro ao enviar dados');
-                }
+                return false;
+            }
+            
+            // Fallback: API local, pela fila offline (partes idempotentes)
+            await this.store.enqueueSubmission(data);
+            try {
+                await this.store.scheduleSync();
+            } catch (error) {
+                console.warn('Envio adiado:', error.message);
             }
+            return await this.store.pendingCount() > 0;
         } catch (error) {
             console.error('Erro ao enviar para Telegram:', error);
             throw error;
@@ -0,0 +1,91 @@
+/**
+ * Item Lookup Module
+ * Agrupa as consultas de itens feitas em uma janela curta em um único
+ * POST /api/items/lookup (uma ida ao servidor por rajada de leituras); com um
+ * OfflineStore, os itens recebidos alimentam o snapshot do catálogo e, sem rede,
+ * as consultas são respondidas por ele
+ */
+
+class ItemLookup {
+    constructor(options = {}) {
+        this.endpoint = options.endpoint || '/api/items/lookup';
+        this.windowMs = options.windowMs ?? 50;
+        this.maxBatch = options.maxBatch || 100;
+        this.headers = options.headers || (() => ({}));
+        this.store = options.store || null;
+
+        // id -> promessas aguardando o próximo lote
+        this.pending = new Map();
+        this.timer = null;
+    }
+
+    /**
+     * Item pelo id (null se não existe); rejeita se o servidor não responder
+     */
+    get(itemId) {
+        const id = Number(itemId);
+
+        return new Promise((resolve, reject) => {
+            if (!this.pending.has(id)) {
+                this.pending.set(id, []);
+            }
+            this.pending.get(id).push({ resolve, reject });
+
+            if (this.pending.size >= this.maxBatch) {
+                this.flush();
+            } else if (!this.timer) {
+                this.timer = setTimeout(() => this.flush(), this.windowMs);
+            }
+        });
+    }
+
+    async flush() {
+        clearTimeout(this.timer);
+        this.timer = null;
+
+        const batch = this.pending;
+        this.pending = new Map();
+        if (batch.size === 0) {
+            return;
+        }
+
+        try {
+            const response = await fetch(this.endpoint, {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    ...this.headers()
+                },
+                body: JSON.stringify({ ids: [...batch.keys()] })
+            });
+
+            if (!response.ok) {
+                throw new Error(`Consulta em lote falhou (HTTP ${response.status})`);
+            }
+
+            const result = await response.json();
+            const found = new Map(result.items.map(item => [item.id, item]));
+
+            if (this.store && result.items.length) {
+                this.store.putCatalogItems(result.items)
+                    .catch(error => console.warn('Catálogo local não atualizado:', error));
+            }
+
+            batch.forEach((waiters, id) => {
+                const item = found.get(id) || null;
+                waiters.forEach(waiter => waiter.resolve(item));
+            });
+
+        } catch (error) {
+            // Sem rede: itens presentes no snapshot local ainda são resolvidos
+            const cached = this.store
+                ? await this.store.getCatalogItems([...batch.keys()]).catch(() => new Map())
+                : new Map();
+
+            batch.forEach((waiters, id) => {
+                const item = cached.get(id);
+                waiters.forEach(waiter => (item ? waiter.resolve(item) : waiter.reject(error)));
+            });
+        }
+    }
+}
@@ -0,0 +1,255 @@
+/**
+ * Offline Store Module
+ * Persistência local do inventário em IndexedDB: linhas contadas (sobrevivem a
+ * queda de rede e aba fechada), snapshot do catálogo para consultas sem rede e
+ * fila de envios em partes sincronizada pelo service worker (tag inventory-sync).
+ * Carregado pela página e pelo sw.js (importScripts): usa apenas `self`.
+ */
+
+const OFFLINE_DB_NAME = 'qr-inventory';
+const OFFLINE_DB_VERSION = 1;
+const SYNC_TAG = 'inventory-sync';
+const SYNC_ENDPOINT = '/api/inventory/sync';
+const CATALOG_ENDPOINT = '/api/items/catalog';
+
+// Linhas por parte: cada POST é pequeno e reenviado isoladamente se falhar
+const SYNC_CHUNK_SIZE = 200;
+
+// Idade do snapshot do catálogo antes de revalidar com o servidor
+const CATALOG_MAX_AGE_MS = 30 * 60 * 1000;
+
+function requestToPromise(request) {
+    return new Promise((resolve, reject) => {
+        request.onsuccess = () => resolve(request.result);
+        request.onerror = () => reject(request.error);
+    });
+}
+
+function transactionDone(transaction) {
+    return new Promise((resolve, reject) => {
+        transaction.oncomplete = () => resolve();
+        transaction.onerror = () => reject(transaction.error);
+        transaction.onabort = () => reject(transaction.error);
+    });
+}
+
+function newSessionKey() {
+    if (self.crypto && self.crypto.randomUUID) {
+        return self.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
+class OfflineStore {
+    constructor() {
+        this.dbPromise = null;
+        this.flushing = null;
+    }
+
+    open() {
+        if (!this.dbPromise) {
+            this.dbPromise = new Promise((resolve, reject) => {
+                const request = indexedDB.open(OFFLINE_DB_NAME, OFFLINE_DB_VERSION);
+
+                request.onupgradeneeded = () => {
+                    const db = request.result;
+                    db.createObjectStore('lines', { keyPath: 'id' });
+                    db.createObjectStore('catalog', { keyPath: 'id' });
+                    db.createObjectStore('outbox', { keyPath: 'key' });
+                    db.createObjectStore('meta', { keyPath: 'name' });
+                };
+                request.onsuccess = () => resolve(request.result);
+                request.onerror = () => reject(request.error);
+            });
+        }
+        return this.dbPromise;
+    }
+
+    async write(storeNames, callback) {
+        const db = await this.open();
+        const transaction = db.transaction(storeNames, 'readwrite');
+        callback(transaction);
+        await transactionDone(transaction);
+    }
+
+    async readAll(storeName) {
+        const db = await this.open();
+        return requestToPromise(db.transaction(storeName).objectStore(storeName).getAll());
+    }
+
+    // ==================== LINHAS DO INVENTÁRIO ====================
+
+    saveLine(item, position) {
+        return this.write('lines', tx => tx.objectStore('lines').put({ id: item.id, position, item }));
+    }
+
+    deleteLine(itemId) {
+        return this.write('lines', tx => tx.objectStore('lines').delete(itemId));
+    }
+
+    clearLines() {
+        return this.write('lines', tx => tx.objectStore('lines').clear());
+    }
+
+    async getLines() {
+        const records = await this.readAll('lines');
+        return records.sort((a, b) => a.position - b.position).map(record => record.item);
+    }
+
+    // ==================== CATÁLOGO ====================
+
+    putCatalogItems(items) {
+        return this.write('catalog', tx => {
+            const store = tx.objectStore('catalog');
+            items.forEach(item => store.put(item));
+        });
+    }
+
+    async getCatalogItems(ids) {
+        const db = await this.open();
+        const store = db.transaction('catalog').objectStore('catalog');
+        const items = await Promise.all(ids.map(id => requestToPromise(store.get(id))));
+        return new Map(items.filter(Boolean).map(item => [item.id, item]));
+    }
+
+    async getMeta(name) {
+        const db = await this.open();
+        const record = await requestToPromise(db.transaction('meta').objectStore('meta').get(name));
+        return record ? record.value : null;
+    }
+
+    /**
+     * Baixa o catálogo (NDJSON) se o snapshot local estiver velho; 304 mantém o atual
+     */
+    async refreshCatalog(fetchFn = self.fetch.bind(self)) {
+        const snapshot = await this.getMeta('catalog');
+        if (snapshot && Date.now() - snapshot.checkedAt < CATALOG_MAX_AGE_MS) {
+            return false;
+        }
+
+        const headers = snapshot && snapshot.etag ? { 'If-None-Match': snapshot.etag } : {};
+        const response = await fetchFn(CATALOG_ENDPOINT, { headers });
+        if (!response.ok && response.status !== 304) {
+            throw new Error(`Catálogo indisponível (HTTP ${response.status})`);
+        }
+
+        const meta = {
+            name: 'catalog',
+            value: { etag: response.headers.get('ETag') || (snapshot && snapshot.etag), checkedAt: Date.now() }
+        };
+
+        if (response.status === 304) {
+            await this.write('meta', tx => tx.objectStore('meta').put(meta));
+            return false;
+        }
+
+        const items = (await response.text())
+            .split('\n')
+            .filter(line => line.trim())
+            .map(line => JSON.parse(line));
+
+        await this.write(['catalog', 'meta'], tx => {
+            const store = tx.objectStore('catalog');
+            store.clear();
+            items.forEach(item => store.put(item));
+            tx.objectStore('meta').put(meta);
+        });
+        return true;
+    }
+
+    // ==================== FILA DE ENVIOS ====================
+
+    /**
+     * Move o inventário para a fila em partes (as linhas locais são limpas na mesma transação)
+     */
+    async enqueueSubmission(data) {
+        const sessionKey = newSessionKey();
+        const items = data.items || [];
+        const totalParts = Math.max(1, Math.ceil(items.length / SYNC_CHUNK_SIZE));
+        const createdAt = Date.now();
+
+        await this.write(['outbox', 'lines'], tx => {
+            const outbox = tx.objectStore('outbox');
+            for (let part = 0; part < totalParts; part++) {
+                outbox.put({
+                    key: `${sessionKey}:${part}`,
+                    createdAt,
+                    part,
+                    body: {
+                        ...data,
+                        items: items.slice(part * SYNC_CHUNK_SIZE, (part + 1) * SYNC_CHUNK_SIZE),
+                        session_key: sessionKey,
+                        part,
+                        total_parts: totalParts
+                    }
+                });
+            }
+            tx.objectStore('lines').clear();
+        });
+        return sessionKey;
+    }
+
+    async pendingCount() {
+        const db = await this.open();
+        return requestToPromise(db.transaction('outbox').objectStore('outbox').count());
+    }
+
+    /**
+     * Envia as partes pendentes em ordem; falha de rede ou 5xx interrompe com erro
+     * (o background sync tenta de novo). Reenvios são deduplicados pelo servidor.
+     */
+    flushOutbox(fetchFn = self.fetch.bind(self)) {
+        if (!this.flushing) {
+            this.flushing = this.sendPending(fetchFn).finally(() => {
+                this.flushing = null;
+            });
+        }
+        return this.flushing;
+    }
+
+    async sendPending(fetchFn) {
+        const entries = (await this.readAll('outbox'))
+            .sort((a, b) => a.createdAt - b.createdAt || a.part - b.part);
+
+        let sent = 0;
+        for (const entry of entries) {
+            const response = await fetchFn(SYNC_ENDPOINT, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(entry.body)
+            });
+
+            if (response.status >= 500 || response.status === 408 || response.status === 429) {
+                throw new Error(`Sincronização adiada (HTTP ${response.status})`);
+            }
+            if (!response.ok) {
+                // Parte rejeitada pelo servidor: reenviar não resolveria
+                console.error('Parte de inventário rejeitada:', entry.key, response.status);
+            }
+
+            await this.write('outbox', tx => tx.objectStore('outbox').delete(entry.key));
+            sent++;
+        }
+        return sent;
+    }
+
+    /**
+     * Agenda o envio pelo service worker; sem Background Sync envia pela página
+     */
+    async scheduleSync() {
+        if (self.navigator && navigator.serviceWorker && 'SyncManager' in self) {
+            try {
+                const registration = await navigator.serviceWorker.getRegistration();
+                if (registration && registration.sync) {
+                    await registration.sync.register(SYNC_TAG);
+                    return;
+                }
+            } catch (error) {
+                console.warn('Background sync indisponível:', error);
+            }
+        }
+        await this.flushOutbox();
+    }
+}
+
+self.OfflineStore = OfflineStore;
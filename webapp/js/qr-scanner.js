@@ -13,6 +13,9 @@ class QRScanner {
         this.cameras = [];
         this.currentCameraIndex = 0;
         
+        // Leituras próximas viram uma única consulta ao backend
+        this.lookup = new ItemLookup();
+        
         this.init();
     }
 
@@ -232,15 +235,13 @@ class QRScanner {
 
     async fetchItemFromBackend(itemId) {
         try {
-            // Simular chamada para backend
-            // Em produção, seria uma chamada real para a API
-            const response = await fetch(`/api/items/${itemId}`);
+            const item = await this.lookup.get(itemId);
             
-            if (!response.ok) {
+            if (!item) {
                 throw new Error('Item não encontrado');
             }
             
-            return await response.json();
+            return item;
             
         } catch (error) {
             // Fallback: usar dados simulados para teste
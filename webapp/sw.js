@@ -1,6 +1,9 @@
 // Service Worker para QR Inventário PWA
-const CACHE_NAME = 'qr-inventory-v1.0.0';
-const STATIC_CACHE = 'qr-inventory-static-v1.0.0';
+const CACHE_NAME = 'qr-inventory-v1.1.0';
+const STATIC_CACHE = 'qr-inventory-static-v1.1.0';
+
+// OfflineStore: mesma fila IndexedDB usada pela página
+importScripts('/js/offline-store.js');
 
 // Recursos para cache
 const urlsToCache = [
@@ -8,6 +11,8 @@ const urlsToCache = [
     '/index.html',
     '/css/style-mobile.css',
     '/js/app.js',
+    '/js/item-lookup.js',
+    '/js/offline-store.js',
     '/js/qr-scanner.js',
     '/js/inventory.js',
     '/js/telegram-integration.js',
@@ -188,10 +193,9 @@ async function syncInventoryData() {
     try {
         console.log('[SW] Syncing inventory data...');
         
-        // Implementar lógica de sincronização aqui
-        // Por exemplo, enviar dados pendentes para o servidor
-        
-        return Promise.resolve();
+        // Erro de rede ou 5xx rejeita: o navegador repete o sync mais tarde
+        const sent = await new OfflineStore().flushOutbox();
+        console.log('[SW] Inventory parts sent:', sent);
     } catch (error) {
         console.error('[SW] Sync failed:', error);
         throw error;